@@ -0,0 +1,86 @@
+"""
+Microbenchmark for parsing angles.
+
+The fast parser in fcg.infrastructure.parse is compared with parsing every value with
+AstroPy's Angle class, which is what the parse functions used to do. Run the
+benchmark from the repository root with
+
+    python -m benchmarks.parse --values 10000
+"""
+
+import argparse
+import json
+import random
+import timeit
+from functools import partial
+from typing import Callable, Sequence
+
+from astropy.coordinates import Angle
+
+from fcg.infrastructure.parse import (
+    is_float,
+    parse_angle_column,
+    parse_declination,
+    parse_right_ascension,
+)
+
+
+def main(argv: Sequence[str] | None = None) -> int:
+    parser = argparse.ArgumentParser(description=__doc__.split("\n\n")[1].strip())
+    parser.add_argument(
+        "--values", type=int, default=10000, help="Number of values to parse."
+    )
+    parser.add_argument(
+        "--repeat",
+        type=int,
+        default=3,
+        help="Number of runs; the fastest one is reported.",
+    )
+    args = parser.parse_args(argv)
+
+    # The values are the same for every run of the benchmark.
+    rng = random.Random(0)  # nosec B311
+    decimal = [f"{rng.uniform(0, 360):.5f}" for _ in range(args.values)]
+    sexagesimal = [
+        f"{rng.randrange(24)}h {rng.randrange(60)}m {rng.uniform(0, 59.9):.2f}s"
+        for _ in range(args.values)
+    ]
+    declinations = [f"{rng.uniform(-90, 90):.5f}d" for _ in range(args.values)]
+
+    results: dict[str, dict[str, float]] = dict()
+    for name, texts, parse_func, field in [
+        ("decimal", decimal, parse_right_ascension, "right_ascension"),
+        ("sexagesimal", sexagesimal, parse_right_ascension, "right_ascension"),
+        ("decimal_with_unit", declinations, parse_declination, "declination"),
+    ]:
+        angle = _fastest(partial(_parse_all, _parse_with_angle, texts), args.repeat)
+        fast = _fastest(partial(_parse_all, parse_func, texts), args.repeat)
+        column = _fastest(partial(parse_angle_column, texts, field), args.repeat)
+        results[name] = {
+            "angle_seconds": angle,
+            "fast_seconds": fast,
+            "column_seconds": column,
+            "fast_speedup": angle / fast,
+            "column_speedup": angle / column,
+        }
+    print(json.dumps(results, indent=2))
+    return 0
+
+
+def _parse_with_angle(text: str) -> Angle:
+    if is_float(text):
+        text = text + "d"
+    return Angle(text)
+
+
+def _parse_all(parse_func: Callable[[str], Angle], texts: Sequence[str]) -> None:
+    for text in texts:
+        parse_func(text)
+
+
+def _fastest(func: Callable[[], object], repeat: int) -> float:
+    return min(timeit.repeat(func, number=1, repeat=repeat))
+
+
+if __name__ == "__main__":
+    raise SystemExit(main())
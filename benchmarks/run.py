@@ -0,0 +1,413 @@
+"""
+Benchmarks for the finder chart generation modes and the ephemerides endpoint.
+
+Every benchmark drives the FastAPI application in a fresh process, so that the first
+request is a genuine cold start. Finder charts are generated from the bundled FITS
+file (and MOS mask), and JPL Horizons is replaced with the bundled ephemerides, so
+that no network access is needed.
+
+Run the benchmarks from the repository root with
+
+    python -m benchmarks.run --output results.json
+
+and compare them with a stored baseline with
+
+    python -m benchmarks.run --baseline baseline.json --threshold 0.2
+
+The command fails if any metric is worse than in the baseline by more than the
+threshold (a fraction of the baseline value).
+
+Responses from JPL Horizons can be recorded once with
+
+    python -m benchmarks.run --benchmark ephemerides --cassettes cassettes --record
+
+and later be replayed with their original timing (scaled by ``--time-scale``) with
+
+    python -m benchmarks.run --benchmark ephemerides --cassettes cassettes
+"""
+
+import argparse
+import asyncio
+import json
+import os
+import pathlib
+import platform
+import resource
+import statistics
+import subprocess  # nosec B404
+import sys
+import tempfile
+import time
+from datetime import datetime, timezone
+from typing import Any, Awaitable, Callable, Sequence
+
+ROOT = pathlib.Path(__file__).parent.parent
+
+DATA = ROOT / "benchmarks" / "data"
+
+TEST_DATA = ROOT / "tests" / "data"
+
+FINDER_CHART_MODES = ("hrs", "imaging", "longslit", "mos", "smi", "nir", "slotmode")
+
+BENCHMARKS = (*FINDER_CHART_MODES, "ephemerides")
+
+# Metrics for which a larger value is better. For all other metrics a smaller value
+# is better.
+_HIGHER_IS_BETTER = ("throughput",)
+
+
+def main(argv: Sequence[str] | None = None) -> int:
+    args = _parse_args(argv)
+    if args.worker is not None:
+        result = asyncio.run(_benchmark(args.worker, args.requests, args.concurrency))
+        print(json.dumps(result))
+        return 0
+
+    results = {
+        "environment": _environment(args.render_workers),
+        "benchmarks": {
+            benchmark: _run_in_subprocess(benchmark, args)
+            for benchmark in args.benchmarks
+        },
+    }
+    text = json.dumps(results, indent=2)
+    if args.output:
+        pathlib.Path(args.output).write_text(text + "\n")
+    else:
+        print(text)
+
+    if args.baseline:
+        baseline = json.loads(pathlib.Path(args.baseline).read_text())
+        thresholds = dict(_parse_threshold(t) for t in args.metric_threshold)
+        regressions = compare(
+            results["benchmarks"], baseline["benchmarks"], args.threshold, thresholds
+        )
+        for regression in regressions:
+            print(regression, file=sys.stderr)
+        return 1 if regressions else 0
+    return 0
+
+
+def compare(
+    results: dict[str, dict[str, Any]],
+    baseline: dict[str, dict[str, Any]],
+    threshold: float,
+    thresholds: dict[str, float] | None = None,
+) -> list[str]:
+    """
+    Compare benchmark results with a baseline and return a description of every
+    regression.
+
+    A metric has regressed if it is worse than the baseline value by more than the
+    threshold, which is a fraction of the baseline value. Thresholds for individual
+    metrics (such as ``warm_latency`` or ``throughput``) override the general one.
+    Benchmarks and metrics which are missing in either the results or the baseline
+    are ignored.
+    """
+    thresholds = thresholds or dict()
+    regressions: list[str] = []
+    for benchmark, baseline_metrics in baseline.items():
+        metrics = _flatten(results.get(benchmark, dict()))
+        for metric, baseline_value in _flatten(baseline_metrics).items():
+            value = metrics.get(metric)
+            if value is None or not baseline_value:
+                continue
+            base_metric = metric.split(".")[0]
+            limit = thresholds.get(base_metric, threshold)
+            change = (value - baseline_value) / baseline_value
+            if base_metric in _HIGHER_IS_BETTER:
+                change = -change
+            if change > limit:
+                regressions.append(
+                    f"{benchmark} {metric}: {value:.4g} (baseline {baseline_value:.4g},"
+                    f" {100 * change:.1f}% worse, threshold {100 * limit:.1f}%)"
+                )
+    return regressions
+
+
+def _flatten(metrics: dict[str, Any], prefix: str = "") -> dict[str, float]:
+    flattened: dict[str, float] = dict()
+    for name, value in metrics.items():
+        if isinstance(value, dict):
+            flattened.update(_flatten(value, f"{prefix}{name}."))
+        elif isinstance(value, (int, float)):
+            flattened[f"{prefix}{name}"] = value
+    return flattened
+
+
+def _parse_args(argv: Sequence[str] | None) -> argparse.Namespace:
+    parser = argparse.ArgumentParser(description=__doc__.split("\n\n")[0].strip())
+    parser.add_argument(
+        "--benchmark",
+        dest="benchmarks",
+        action="append",
+        choices=BENCHMARKS,
+        help="Benchmark to run (may be repeated). By default all are run.",
+    )
+    parser.add_argument(
+        "--requests",
+        type=int,
+        default=10,
+        help="Number of requests for the warm latency and for each concurrency level.",
+    )
+    parser.add_argument(
+        "--concurrency",
+        type=lambda text: [int(c) for c in text.split(",")],
+        default=[1, 4, 8],
+        help="Comma separated concurrency levels for measuring the throughput.",
+    )
+    parser.add_argument(
+        "--render-workers",
+        type=int,
+        default=0,
+        help="Number of render worker processes (0 for rendering in the server).",
+    )
+    parser.add_argument(
+        "--cassettes",
+        help="Directory with recorded JPL Horizons and survey responses. If given,"
+        " the recorded responses are replayed instead of the bundled ephemerides.",
+    )
+    parser.add_argument(
+        "--record",
+        action="store_true",
+        help="Query the real services and record their responses in the --cassettes"
+        " directory.",
+    )
+    parser.add_argument(
+        "--time-scale",
+        type=float,
+        default=1,
+        help="Factor by which recorded response times are scaled when replaying.",
+    )
+    parser.add_argument("--output", help="File for storing the results as JSON.")
+    parser.add_argument("--baseline", help="JSON file with baseline results.")
+    parser.add_argument(
+        "--threshold",
+        type=float,
+        default=0.2,
+        help="Allowed fractional regression compared to the baseline.",
+    )
+    parser.add_argument(
+        "--metric-threshold",
+        action="append",
+        default=[],
+        metavar="METRIC=THRESHOLD",
+        help="Allowed fractional regression for a metric (may be repeated).",
+    )
+    parser.add_argument("--worker", choices=BENCHMARKS, help=argparse.SUPPRESS)
+    args = parser.parse_args(argv)
+    if args.record and not args.cassettes:
+        parser.error("--record requires --cassettes.")
+    args.benchmarks = args.benchmarks or list(BENCHMARKS)
+    return args
+
+
+def _parse_threshold(text: str) -> tuple[str, float]:
+    metric, threshold = text.split("=")
+    return metric.strip(), float(threshold)
+
+
+def _environment(render_workers: int) -> dict[str, Any]:
+    return {
+        "time": datetime.now(timezone.utc).isoformat(),
+        "python": platform.python_version(),
+        "platform": platform.platform(),
+        "cpus": os.cpu_count(),
+        "render_workers": render_workers,
+    }
+
+
+def _run_in_subprocess(benchmark: str, args: argparse.Namespace) -> dict[str, Any]:
+    with tempfile.TemporaryDirectory(prefix="fcg-benchmark-") as cache_dir:
+        env = {
+            **os.environ,
+            "FCG_CACHE_DIR": cache_dir,
+            # Every request should generate a finder chart or query ephemerides.
+            "FCG_CHART_CACHE_MAX_BYTES": "0",
+            "FCG_HORIZONS_CACHE_TTL": "0",
+            "FCG_RENDER_WORKERS": str(args.render_workers),
+            "FCG_RENDER_QUEUE_DEPTH": "1000",
+            "FCG_JOB_WORKERS": "0",
+        }
+        if args.cassettes:
+            env["FCG_CASSETTE_MODE"] = "record" if args.record else "replay"
+            env["FCG_CASSETTE_DIR"] = str(pathlib.Path(args.cassettes).resolve())
+            env["FCG_CASSETTE_TIME_SCALE"] = str(args.time_scale)
+        completed = subprocess.run(  # nosec B603
+            [
+                sys.executable,
+                "-m",
+                "benchmarks.run",
+                "--worker",
+                benchmark,
+                "--requests",
+                str(args.requests),
+                "--concurrency",
+                ",".join(str(c) for c in args.concurrency),
+            ],
+            cwd=ROOT,
+            env=env,
+            capture_output=True,
+            text=True,
+        )
+    if completed.returncode != 0:
+        raise RuntimeError(f"The benchmark {benchmark} has failed:\n{completed.stderr}")
+    result: dict[str, Any] = json.loads(completed.stdout.strip().splitlines()[-1])
+    return result
+
+
+async def _benchmark(
+    benchmark: str, requests: int, concurrency: list[int]
+) -> dict[str, Any]:
+    import httpx
+
+    # Recorded responses are used instead of the bundled ephemerides if there are
+    # cassettes.
+    if benchmark == "ephemerides" and "FCG_CASSETTE_MODE" not in os.environ:
+        _replace_horizons()
+
+    started = time.perf_counter()
+    from fcg.main import app
+
+    post = _ephemerides_request if benchmark == "ephemerides" else _finder_chart_request
+    async with app.router.lifespan_context(app):
+        startup = time.perf_counter() - started
+        async with httpx.AsyncClient(
+            transport=httpx.ASGITransport(app=app),
+            base_url="http://benchmark",
+            timeout=600,
+        ) as client:
+
+            def send(i: int) -> Awaitable[httpx.Response]:
+                return post(client, benchmark, i)
+
+            cold_latency, output_bytes = await _timed(send, 0)
+            warm_latencies = [(await _timed(send, i))[0] for i in range(1, requests)]
+            throughput = {
+                str(c): await _throughput(send, c, requests) for c in concurrency
+            }
+
+    return {
+        "startup": startup,
+        "cold_latency": cold_latency,
+        "warm_latency": statistics.median(warm_latencies or [cold_latency]),
+        "throughput": throughput,
+        "peak_rss_bytes": _peak_rss(),
+        "output_bytes": output_bytes,
+    }
+
+
+async def _timed(send: Callable[[int], Awaitable[Any]], i: int) -> tuple[float, int]:
+    started = time.perf_counter()
+    response = await send(i)
+    duration = time.perf_counter() - started
+    response.raise_for_status()
+    return duration, len(response.content)
+
+
+async def _throughput(
+    send: Callable[[int], Awaitable[Any]], concurrency: int, requests: int
+) -> float:
+    semaphore = asyncio.Semaphore(concurrency)
+
+    async def limited_send(i: int) -> None:
+        async with semaphore:
+            (await send(i)).raise_for_status()
+
+    # The request index makes requests distinct, so that they are not coalesced.
+    offset = 1000 * concurrency
+    started = time.perf_counter()
+    await asyncio.gather(*(limited_send(offset + i) for i in range(requests)))
+    return requests / (time.perf_counter() - started)
+
+
+def _finder_chart_request(client: Any, mode: str, i: int) -> Awaitable[Any]:
+    data = {
+        "proposal_code": "2023-1-SCI-042",
+        "principal_investigator": "Adams",
+        "target": "Magrathea",
+        "right_ascension": "170.1",
+        "declination": "-55.5",
+        # Distinct position angles lead to distinct finder charts.
+        "position_angle": f"{(i % 3600) / 20 - 90:.2f}",
+        "output_format": "png",
+    }
+    files = {"custom_fits": (TEST_DATA / "ra170.1_dec-55.5.fits").read_bytes()}
+    if mode in ("longslit", "smi", "nir"):
+        data["reference_star_right_ascension"] = "170.129425288"
+        data["reference_star_declination"] = "-55.48333333333"
+    match mode:
+        case "longslit":
+            data["slit_width"] = "4"
+        case "mos":
+            del data["right_ascension"]
+            del data["declination"]
+            files["mos_mask_file"] = (TEST_DATA / "mos_mask.xml").read_bytes()
+        case "smi":
+            data["smi_barcode"] = "PF0200N001"
+            data["include_fibers"] = "false"
+        case "nir":
+            data["nir_bundle_separation"] = "100"
+    return client.post(  # type: ignore[no-any-return]
+        "/finder-charts", params={"mode": mode}, data=data, files=files
+    )
+
+
+def _ephemerides_request(client: Any, benchmark: str, i: int) -> Awaitable[Any]:
+    data = {
+        # Distinct identifiers lead to distinct Horizons queries.
+        "identifier": f"benchmark-{i}",
+        "start": "1689595200",
+        "end": "1689616800",
+        "output_interval": "1",
+    }
+    return client.post("/ephemerides", data=data)  # type: ignore[no-any-return]
+
+
+def _replace_horizons() -> None:
+    import astropy.units as u
+    from astropy.coordinates import SkyCoord
+    from imephu.utils import Ephemeris, MagnitudeRange, SkyCoordRate
+
+    import fcg.views.ephemerides
+
+    rows = json.loads((DATA / "ephemerides.json").read_text())
+
+    class BundledHorizonsService:
+        def __init__(self, object_id: str, **kwargs: Any):
+            self.start = kwargs["start"].timestamp()
+            self.end = kwargs["end"].timestamp()
+
+        def ephemerides(self) -> list[Ephemeris]:
+            return [
+                Ephemeris(
+                    epoch=datetime.fromtimestamp(row["epoch"], timezone.utc),
+                    position=SkyCoord(ra=row["ra"] * u.deg, dec=row["dec"] * u.deg),
+                    position_rate=SkyCoordRate(
+                        ra=row["ra_rate"] * u.arcsec / u.hour,
+                        dec=row["dec_rate"] * u.arcsec / u.hour,
+                    ),
+                    magnitude_range=MagnitudeRange(
+                        bandpass="V",
+                        min_magnitude=row["magnitude"],
+                        max_magnitude=row["magnitude"],
+                    ),
+                )
+                for row in rows
+                if self.start <= row["epoch"] <= self.end
+            ]
+
+    fcg.views.ephemerides.HorizonsService = BundledHorizonsService  # type: ignore
+
+
+def _peak_rss() -> int:
+    # ru_maxrss is given in bytes on macOS and in kilobytes elsewhere.
+    scale = 1 if sys.platform == "darwin" else 1024
+    return scale * max(
+        resource.getrusage(resource.RUSAGE_SELF).ru_maxrss,
+        resource.getrusage(resource.RUSAGE_CHILDREN).ru_maxrss,
+    )
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,285 @@
+"""
+A local stand-in for the image survey services.
+
+The server returns FITS files for requests of the form
+
+    GET /?survey=POSS2/UKSTU%20Red&ra=170.1&dec=-55.5&size=10
+
+where ``ra`` and ``dec`` are the image center in degrees and ``size`` is the width
+and height of the image in arcminutes. The FITS files are either synthetic star
+fields or cut from recorded FITS files. The latency, error rate and bandwidth of the
+server can be configured, so that load tests and benchmarks can be run reproducibly
+without network access.
+
+Start the server with
+
+    python -m benchmarks.survey_server --port 8001 --latency 0.5
+
+and point the Finder Chart Generator at it by setting ``FCG_SURVEY_URL`` to
+``http://localhost:8001``.
+"""
+
+import argparse
+import pathlib
+import random
+import threading
+import time
+import urllib.parse
+import warnings
+import zlib
+from contextlib import contextmanager
+from http import HTTPStatus
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from typing import Iterator, NamedTuple, Sequence
+
+import numpy as np
+from astropy import units as u
+from astropy.coordinates import SkyCoord
+from astropy.io import fits
+from astropy.wcs import WCS, FITSFixedWarning
+
+from fcg.infrastructure.fits import crop_fits, synthetic_fits
+
+# Size (in arcseconds) of the pixels of synthetic FITS files. This is roughly the
+# pixel size of the Digitized Sky Survey.
+_PIXEL_SIZE = 1.7
+
+# Maximum width and height (in pixels) of synthetic FITS files.
+_MAX_PIXELS = 2048
+
+# Number of bytes written at a time if the bandwidth is limited.
+_CHUNK_SIZE = 16 * 1024
+
+
+class SurveyServerOptions(NamedTuple):
+    """
+    Options for the behavior of a survey server.
+
+    Attributes
+    ----------
+    latency
+        Time (in seconds) before a response is sent.
+    latency_jitter
+        Maximum time (in seconds) randomly added to or subtracted from the latency.
+    error_rate
+        Fraction of requests which fail with status 503.
+    bandwidth
+        Maximum number of bytes sent per second for a response. If this is 0, the
+        bandwidth is not limited.
+    recordings
+        Directory with recorded FITS files. If this is None, synthetic FITS files are
+        returned.
+    seed
+        Seed for the random number generator used for latencies and errors.
+    """
+
+    latency: float = 0
+    latency_jitter: float = 0
+    error_rate: float = 0
+    bandwidth: float = 0
+    recordings: pathlib.Path | None = None
+    seed: int = 0
+
+
+class SurveyServer(ThreadingHTTPServer):
+    """
+    An HTTP server standing in for the image survey services.
+
+    Parameters
+    ----------
+    address
+        The host and port to listen on. If the port is 0, a free port is chosen.
+    options
+        The options for the behavior of the server.
+    """
+
+    daemon_threads = True
+
+    def __init__(self, address: tuple[str, int], options: SurveyServerOptions):
+        super().__init__(address, _SurveyRequestHandler)
+        self.options = options
+        self.requests = 0
+        self._lock = threading.Lock()
+        self._random = random.Random(options.seed)  # nosec B311
+        self._recordings = (
+            _load_recordings(options.recordings) if options.recordings else []
+        )
+
+    @property
+    def url(self) -> str:
+        """The URL of the server."""
+        host, port = self.server_address[:2]
+        return f"http://{host!s}:{port}"
+
+    def fits(self, survey: str, center: SkyCoord, size: u.Quantity) -> bytes:
+        """
+        Return the FITS file for a request.
+        """
+        if self._recordings:
+            return _recorded_fits(self._recordings, center, size)
+        pixels = min(int(np.ceil(size.to_value(u.arcsec) / _PIXEL_SIZE)), _MAX_PIXELS)
+        # The same request always leads to the same image.
+        seed = zlib.crc32(
+            f"{survey.lower()}|{center.ra.deg:.6f}|{center.dec.deg:.6f}".encode()
+        )
+        # The star density is the same for all image sizes.
+        stars = max(pixels**2 // 2000, 1)
+        return synthetic_fits(center, size, pixels=pixels, stars=stars, seed=seed)
+
+    def next_request(self) -> tuple[float, bool]:
+        """
+        Count a request and return its latency and whether it should fail.
+        """
+        with self._lock:
+            self.requests += 1
+            jitter = self._random.uniform(
+                -self.options.latency_jitter, self.options.latency_jitter
+            )
+            fail = self._random.random() < self.options.error_rate
+        return max(self.options.latency + jitter, 0), fail
+
+
+class _SurveyRequestHandler(BaseHTTPRequestHandler):
+    server: SurveyServer
+
+    def do_GET(self) -> None:
+        latency, fail = self.server.next_request()
+        time.sleep(latency)
+        if fail:
+            self.send_error(HTTPStatus.SERVICE_UNAVAILABLE, "Simulated failure")
+            return
+
+        query = urllib.parse.parse_qs(urllib.parse.urlparse(self.path).query)
+        try:
+            survey = query["survey"][0]
+            center = SkyCoord(
+                ra=float(query["ra"][0]) * u.deg, dec=float(query["dec"][0]) * u.deg
+            )
+            size = float(query["size"][0]) * u.arcmin
+        except (KeyError, ValueError):
+            self.send_error(
+                HTTPStatus.BAD_REQUEST, "The survey, ra, dec and size are required."
+            )
+            return
+
+        content = self.server.fits(survey, center, size)
+        self.send_response(HTTPStatus.OK)
+        self.send_header("Content-Type", "application/fits")
+        self.send_header("Content-Length", str(len(content)))
+        self.end_headers()
+        self._write(content)
+
+    def _write(self, content: bytes) -> None:
+        bandwidth = self.server.options.bandwidth
+        if bandwidth <= 0:
+            self.wfile.write(content)
+            return
+        for start in range(0, len(content), _CHUNK_SIZE):
+            chunk = content[start : start + _CHUNK_SIZE]
+            self.wfile.write(chunk)
+            time.sleep(len(chunk) / bandwidth)
+
+    def log_message(self, format: str, *args: object) -> None:
+        # Logging every request would distort benchmarks.
+        pass
+
+
+class _Recording(NamedTuple):
+    center: SkyCoord
+    content: bytes
+
+
+def _load_recordings(directory: pathlib.Path) -> list[_Recording]:
+    recordings: list[_Recording] = []
+    for path in sorted(directory.glob("*.fits")):
+        content = path.read_bytes()
+        with fits.open(path) as hdul, warnings.catch_warnings():
+            warnings.simplefilter("ignore", category=FITSFixedWarning)
+            wcs = WCS(hdul[0].header)
+            height, width = hdul[0].data.shape
+        center = wcs.pixel_to_world((width - 1) / 2, (height - 1) / 2)
+        recordings.append(_Recording(center=center, content=content))
+    if not recordings:
+        raise ValueError(f"There are no FITS files in {directory}.")
+    return recordings
+
+
+def _recorded_fits(
+    recordings: Sequence[_Recording], center: SkyCoord, size: u.Quantity
+) -> bytes:
+    # The recording closest to the requested center is used, and the requested region
+    # is cut from it if possible.
+    nearest = min(recordings, key=lambda r: r.center.separation(center).deg)
+    cropped = crop_fits(nearest.content, center, size)
+    return cropped if cropped is not None else nearest.content
+
+
+@contextmanager
+def run_survey_server(
+    options: SurveyServerOptions, host: str = "127.0.0.1", port: int = 0
+) -> Iterator[SurveyServer]:
+    """
+    Run a survey server in a background thread while the context is active.
+    """
+    server = SurveyServer((host, port), options)
+    thread = threading.Thread(target=server.serve_forever, daemon=True)
+    thread.start()
+    try:
+        yield server
+    finally:
+        server.shutdown()
+        server.server_close()
+        thread.join()
+
+
+def main(argv: Sequence[str] | None = None) -> None:
+    parser = argparse.ArgumentParser(description=__doc__.split("\n\n")[1].strip())
+    parser.add_argument("--host", default="127.0.0.1", help="Host to listen on.")
+    parser.add_argument("--port", type=int, default=8001, help="Port to listen on.")
+    parser.add_argument("--latency", type=float, default=0, help="Latency in seconds.")
+    parser.add_argument(
+        "--latency-jitter",
+        type=float,
+        default=0,
+        help="Maximum random deviation from the latency, in seconds.",
+    )
+    parser.add_argument(
+        "--error-rate",
+        type=float,
+        default=0,
+        help="Fraction of requests which fail with status 503.",
+    )
+    parser.add_argument(
+        "--bandwidth",
+        type=float,
+        default=0,
+        help="Maximum bytes per second for a response (0 for no limit).",
+    )
+    parser.add_argument(
+        "--recordings",
+        type=pathlib.Path,
+        help="Directory with recorded FITS files to serve instead of synthetic ones.",
+    )
+    parser.add_argument("--seed", type=int, default=0, help="Random number seed.")
+    args = parser.parse_args(argv)
+
+    options = SurveyServerOptions(
+        latency=args.latency,
+        latency_jitter=args.latency_jitter,
+        error_rate=args.error_rate,
+        bandwidth=args.bandwidth,
+        recordings=args.recordings,
+        seed=args.seed,
+    )
+    server = SurveyServer((args.host, args.port), options)
+    print(f"Survey server listening on {server.url}")
+    try:
+        server.serve_forever()
+    except KeyboardInterrupt:
+        pass
+    finally:
+        server.server_close()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,73 @@
+"""
+Gunicorn configuration for running the Finder Chart Generator in production.
+
+The server is started with
+
+    gunicorn -c fcg/gunicorn_conf.py fcg.main:app
+
+The application (with its heavy modules) is loaded and warmed up in the Gunicorn
+master process before the server worker processes are forked, so that they share its
+memory pages. Server worker processes are replaced after a number of requests or
+when their memory usage becomes too large.
+
+This does not apply to the render worker processes, which are spawned rather than
+forked. They share no memory with the master process, and each of them imports the
+heavy modules and warms up itself. They are replaced by their render pool (see
+`fcg.infrastructure.pool.RenderPool`) rather than by Gunicorn.
+"""
+
+import gc
+import os
+import signal
+from typing import Any
+
+from fcg.infrastructure.memory import watch_memory
+from fcg.infrastructure.settings import get_settings
+from fcg.infrastructure.warm_up import warm_up
+
+# Each server worker process has its own pool of render worker processes. Unless
+# configured otherwise, the CPUs are shared among the server worker processes. This
+# must be done before the settings are read for the first time.
+_server_workers = max(int(os.environ.get("FCG_SERVER_WORKERS", 2)), 1)
+os.environ.setdefault(
+    "FCG_RENDER_WORKERS", str(max((os.cpu_count() or 1) // _server_workers, 1))
+)
+_settings = get_settings()
+
+bind = "0.0.0.0:8000"
+workers = _settings.server_workers
+worker_class = "uvicorn_worker.UvicornWorker"
+preload_app = True
+max_requests = _settings.server_max_requests
+# Avoid replacing all server worker processes at the same time.
+max_requests_jitter = max(_settings.server_max_requests // 10, 1)
+graceful_timeout = _settings.render_timeout
+timeout = _settings.render_timeout + 30
+
+# Objects created while loading the application live as long as the master process.
+# Collecting them in a server worker process would touch their memory pages, which
+# then would be copied.
+gc.disable()
+
+
+def when_ready(server: Any) -> None:
+    # The application has been loaded, but no server worker process has been forked
+    # yet.
+    if _settings.warm_up:
+        warm_up(coverage=True)
+    gc.freeze()
+
+
+def post_fork(server: Any, worker: Any) -> None:
+    gc.enable()
+
+
+def post_worker_init(worker: Any) -> None:
+    if _settings.server_max_rss > 0:
+        # Gunicorn replaces a server worker process which has shut down gracefully.
+        # Only the memory of the server worker process itself is watched; the render
+        # pool checks that of its render worker processes.
+        watch_memory(
+            _settings.server_max_rss,
+            lambda: os.kill(os.getpid(), signal.SIGTERM),
+        )
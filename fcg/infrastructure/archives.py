@@ -0,0 +1,70 @@
+import io
+import zipfile
+from typing import Iterable
+
+from pypdf import PdfWriter
+
+
+class _ChunkBuffer(io.RawIOBase):
+    """
+    A non-seekable stream which collects the bytes written to it until they are
+    taken.
+    """
+
+    def __init__(self) -> None:
+        self._chunks: list[bytes] = []
+
+    def writable(self) -> bool:
+        return True
+
+    def write(self, b: bytes) -> int:  # type: ignore[override]
+        self._chunks.append(bytes(b))
+        return len(b)
+
+    def take(self) -> bytes:
+        content = b"".join(self._chunks)
+        self._chunks.clear()
+        return content
+
+
+class ZipStream:
+    """
+    A ZIP archive which is created entry by entry, so that it can be streamed.
+
+    Every method returns the bytes of the archive which have become available. As the
+    archive is never seeked, the entries' sizes and checksums are written after their
+    content.
+
+    The entries are stored without compression, as PDF and PNG files are compressed
+    already.
+    """
+
+    def __init__(self) -> None:
+        self._buffer = _ChunkBuffer()
+        self._zip = zipfile.ZipFile(self._buffer, mode="w")
+
+    def add(self, name: str, content: bytes) -> bytes:
+        """
+        Add an entry and return the bytes written for it.
+        """
+        self._zip.writestr(name, content)
+        return self._buffer.take()
+
+    def close(self) -> bytes:
+        """
+        Finish the archive and return its remaining bytes.
+        """
+        self._zip.close()
+        return self._buffer.take()
+
+
+def merge_pdfs(documents: Iterable[bytes]) -> bytes:
+    """
+    Merge PDF documents into a single document, in the given order.
+    """
+    writer = PdfWriter()
+    for document in documents:
+        writer.append(io.BytesIO(document))
+    content = io.BytesIO()
+    writer.write(content)
+    return content.getvalue()
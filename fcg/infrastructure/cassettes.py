@@ -0,0 +1,142 @@
+import hashlib
+import json
+import os
+import pathlib
+import tempfile
+import time
+from functools import lru_cache
+from typing import Any, Callable, Literal, cast
+
+from fcg.infrastructure.settings import get_settings
+
+CassetteMode = Literal["record", "replay"]
+
+
+class MissingRecordingError(Exception):
+    """Raised if there is no recording for a request in replay mode."""
+
+    pass
+
+
+class Cassette:
+    """
+    A directory of recorded responses from external services such as JPL Horizons and
+    the image surveys.
+
+    In record mode the responses are requested from the service and stored together
+    with the time it took to get them. In replay mode the stored responses are
+    returned instead, after waiting for the recorded time multiplied by
+    ``time_scale``. So a time scale of 0 returns responses immediately, and a time
+    scale of 2 simulates a service which is twice as slow.
+
+    Every response is stored in two files, named after a hash of the service name and
+    the request: a JSON file with the request and the duration, and a file with the
+    response body. Files are written to a temporary file first, which is then
+    renamed, so that several processes may share the same directory.
+
+    Parameters
+    ----------
+    directory
+        The directory for the recordings. It is created if it does not exist yet.
+    mode
+        Whether to record or to replay responses.
+    time_scale
+        The factor by which recorded durations are multiplied in replay mode.
+    """
+
+    def __init__(
+        self, directory: pathlib.Path, mode: CassetteMode, time_scale: float = 1
+    ):
+        if mode not in ("record", "replay"):
+            raise ValueError(f"Unsupported cassette mode: {mode}")
+        if time_scale < 0:
+            raise ValueError("The time scale must not be negative.")
+        self.directory = directory
+        self.mode = mode
+        self.time_scale = time_scale
+        directory.mkdir(parents=True, exist_ok=True)
+
+    def play(
+        self, service: str, request: dict[str, Any], fetch: Callable[[], bytes]
+    ) -> bytes:
+        """
+        Return the response for a request.
+
+        In record mode ``fetch`` is called for getting the response, which is then
+        stored. In replay mode the stored response is returned, and
+        `MissingRecordingError` is raised if there is none.
+
+        Parameters
+        ----------
+        service
+            The name of the service, such as "horizons".
+        request
+            The request parameters. They must be serializable as JSON.
+        fetch
+            The function requesting the response from the service.
+        """
+        path = self._path(service, request)
+        if self.mode == "record":
+            started = time.perf_counter()
+            body = fetch()
+            duration = time.perf_counter() - started
+            metadata = {"service": service, "request": request, "duration": duration}
+            self._write(path.with_suffix(".body"), body)
+            self._write(path.with_suffix(".json"), json.dumps(metadata).encode())
+            return body
+
+        try:
+            metadata = json.loads(path.with_suffix(".json").read_text())
+            body = path.with_suffix(".body").read_bytes()
+        except FileNotFoundError:
+            raise MissingRecordingError(
+                f"There is no recorded {service} response for {json.dumps(request)}."
+            ) from None
+        time.sleep(metadata["duration"] * self.time_scale)
+        return body
+
+    def _path(self, service: str, request: dict[str, Any]) -> pathlib.Path:
+        key = json.dumps({"service": service, "request": request}, sort_keys=True)
+        digest = hashlib.sha256(key.encode("utf-8")).hexdigest()
+        return self.directory / f"{service}-{digest}"
+
+    def _write(self, path: pathlib.Path, content: bytes) -> None:
+        fd, tmp_name = tempfile.mkstemp(dir=self.directory, prefix=".tmp-")
+        try:
+            with os.fdopen(fd, "wb") as f:
+                f.write(content)
+            os.replace(tmp_name, path)
+        except BaseException:
+            pathlib.Path(tmp_name).unlink(missing_ok=True)
+            raise
+
+
+@lru_cache
+def get_cassette() -> Cassette | None:
+    """
+    Return the cassette for recording or replaying responses from external services,
+    or None if responses are neither recorded nor replayed.
+    """
+    settings = get_settings()
+    if settings.cassette_mode == "off":
+        return None
+    return Cassette(
+        settings.cassette_dir,
+        cast(CassetteMode, settings.cassette_mode),
+        time_scale=settings.cassette_time_scale,
+    )
+
+
+def fetch_or_replay(
+    service: str, request: dict[str, Any], fetch: Callable[[], bytes]
+) -> bytes:
+    """
+    Request a response from an external service, recording or replaying it if a
+    cassette is used.
+
+    See `Cassette.play` for the parameters.
+    """
+    cassette = get_cassette()
+    if cassette is None:
+        return fetch()
+    return cassette.play(service, request, fetch)
@@ -0,0 +1,175 @@
+import json
+import os
+import pathlib
+import re
+import tempfile
+import threading
+import time
+from contextlib import contextmanager
+from typing import Iterator, Literal, NamedTuple
+
+from fcg.infrastructure.single_flight import file_lock
+
+CircuitState = Literal["closed", "open", "half_open"]
+
+
+class CircuitStatus(NamedTuple):
+    """
+    The recorded status of a circuit breaker.
+
+    Attributes
+    ----------
+    failures
+        The number of consecutive failed requests.
+    opened_at
+        The time (in seconds since the epoch) when the circuit has been opened, or
+        None if it is closed.
+    probe_started_at
+        The time (in seconds since the epoch) when the last probe request has been
+        let through, or None if there has been none since the circuit was opened.
+    """
+
+    failures: int = 0
+    opened_at: float | None = None
+    probe_started_at: float | None = None
+
+
+class CircuitBreaker:
+    """
+    A circuit breaker for an external service.
+
+    The circuit is closed as long as requests succeed. After ``failure_threshold``
+    consecutive failures it is opened, and requests are refused for
+    ``reset_timeout`` seconds. Then a single probe request is let through (and the
+    circuit is half open while it is under way). If the probe succeeds, the circuit
+    is closed again; if it fails, the circuit is opened again. A probe which hasn't
+    finished after ``reset_timeout`` seconds is given up, and another one is let
+    through.
+
+    If a directory is given, the status is kept in a JSON file in it, so that all
+    processes using the same directory share the circuit breaker.
+
+    Parameters
+    ----------
+    name
+        The name of the service.
+    failure_threshold
+        The number of consecutive failures after which the circuit is opened.
+    reset_timeout
+        The time (in seconds) after which a probe request is let through.
+    directory
+        The directory for the status file.
+    """
+
+    def __init__(
+        self,
+        name: str,
+        failure_threshold: int,
+        reset_timeout: float,
+        directory: pathlib.Path | None = None,
+    ):
+        if failure_threshold < 1:
+            raise ValueError("The failure threshold must be positive.")
+        self.name = name
+        self.failure_threshold = failure_threshold
+        self.reset_timeout = reset_timeout
+        self.directory = directory
+        self._lock = threading.Lock()
+        self._status = CircuitStatus()
+        self._key = re.sub(r"[^a-z0-9]+", "-", name.lower()).strip("-")
+
+    def status(self) -> CircuitStatus:
+        """
+        Return the recorded status.
+        """
+        with self._locked():
+            return self._load()
+
+    def state(self) -> CircuitState:
+        """
+        Return whether the circuit is closed, open or half open.
+        """
+        status = self.status()
+        if status.opened_at is None:
+            return "closed"
+        if self._is_probing(status, time.time()):
+            return "half_open"
+        return "open"
+
+    def allow_request(self) -> bool:
+        """
+        Return whether a request may be made.
+
+        If the request is let through as a probe, this is recorded, so that no other
+        request is let through until the probe has finished.
+        """
+        with self._locked():
+            status = self._load()
+            if status.opened_at is None:
+                return True
+            now = time.time()
+            if now - status.opened_at < self.reset_timeout or self._is_probing(
+                status, now
+            ):
+                return False
+            self._save(status._replace(probe_started_at=now))
+            return True
+
+    def record_success(self) -> None:
+        """
+        Record a successful request, which closes the circuit.
+        """
+        with self._locked():
+            if self._load() != CircuitStatus():
+                self._save(CircuitStatus())
+
+    def record_failure(self) -> None:
+        """
+        Record a failed request, which may open the circuit.
+        """
+        with self._locked():
+            status = self._load()
+            failures = status.failures + 1
+            if status.opened_at is not None or failures >= self.failure_threshold:
+                # The circuit is opened, or a probe has failed.
+                self._save(CircuitStatus(failures=failures, opened_at=time.time()))
+            else:
+                self._save(status._replace(failures=failures))
+
+    def _is_probing(self, status: CircuitStatus, now: float) -> bool:
+        return (
+            status.probe_started_at is not None
+            and now - status.probe_started_at < self.reset_timeout
+        )
+
+    @contextmanager
+    def _locked(self) -> Iterator[None]:
+        with self._lock:
+            if self.directory is None:
+                yield
+            else:
+                with file_lock(self.directory, f"circuit-{self._key}"):
+                    yield
+
+    def _load(self) -> CircuitStatus:
+        if self.directory is None:
+            return self._status
+        try:
+            path = self.directory / f"{self._key}.json"
+            return CircuitStatus(**json.loads(path.read_text()))
+        except (FileNotFoundError, TypeError, ValueError):
+            return CircuitStatus()
+
+    def _save(self, status: CircuitStatus) -> None:
+        if self.directory is None:
+            self._status = status
+            return
+        # The file is replaced atomically, as other processes may read it at any time.
+        fd, tmp_name = tempfile.mkstemp(dir=self.directory, prefix=".tmp-")
+        try:
+            with os.fdopen(fd, "w") as f:
+                json.dump(status._asdict(), f)
+            os.replace(tmp_name, self.directory / f"{self._key}.json")
+        except BaseException:
+            pathlib.Path(tmp_name).unlink(missing_ok=True)
+            raise
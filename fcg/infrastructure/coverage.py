@@ -0,0 +1,169 @@
+import math
+from functools import lru_cache
+
+import numpy as np
+import numpy.typing as npt
+from astropy import units as u
+from astropy.coordinates import SkyCoord
+from imephu.service.survey import is_covering_position
+
+# The image surveys supported by imephu.
+SURVEYS = (
+    "POSS2/UKSTU Red",
+    "POSS2/UKSTU Blue",
+    "POSS2/UKSTU IR",
+    "POSS1 Red",
+    "POSS1 Blue",
+    "Quick-V",
+    "HST Phase2 (GSC2)",
+    "HST Phase2 (GSC1)",
+    "2MASS-H",
+    "2MASS-J",
+    "2MASS-K",
+)
+
+# Width and height (in degrees) of the cells of a coverage index.
+_CELL_SIZE = 1.0
+
+# Cell states of a coverage index.
+_NOT_COVERED = 0
+_COVERED = 1
+_BOUNDARY = 2
+
+
+class CoverageIndex:
+    """
+    An index of the part of the sky covered by an image survey.
+
+    The sky is divided into cells of ``cell_size`` degrees in right ascension and
+    declination, and the coverage function of imephu is evaluated for the corners of
+    all cells when the index is created. A cell is covered if all its corners are
+    covered, and it is not covered if none of them are. For a position in any other
+    (boundary) cell, the coverage function is called. This assumes that the coverage
+    of a survey has no features smaller than a cell.
+
+    Parameters
+    ----------
+    survey
+        The name of the image survey.
+    cell_size
+        The width and height (in degrees) of the cells. It must divide 180.
+    """
+
+    def __init__(self, survey: str, cell_size: float = _CELL_SIZE):
+        self.survey = survey
+        self.cell_size = cell_size
+        self._ra_cells = round(360 / cell_size)
+        self._dec_cells = round(180 / cell_size)
+
+        corners = _grid_corners(cell_size)
+        try:
+            covered = np.broadcast_to(
+                np.asarray(self._is_covering(corners), dtype=bool), corners.shape
+            )
+        except (TypeError, ValueError):
+            # The coverage function cannot be evaluated for many positions at once,
+            # so that all positions are checked individually.
+            self._states = np.full(
+                (self._dec_cells, self._ra_cells), _BOUNDARY, dtype=np.uint8
+            )
+            return
+
+        covered_corners = (
+            covered[:-1, :-1].astype(int)
+            + covered[1:, :-1]
+            + covered[:-1, 1:]
+            + covered[1:, 1:]
+        )
+        self._states = np.full(covered_corners.shape, _BOUNDARY, dtype=np.uint8)
+        self._states[covered_corners == 4] = _COVERED
+        self._states[covered_corners == 0] = _NOT_COVERED
+
+    def covers(self, ra: float, dec: float) -> bool:
+        """
+        Return whether the survey covers a position.
+
+        Parameters
+        ----------
+        ra
+            The right ascension, in degrees.
+        dec
+            The declination, in degrees.
+        """
+        row = min(max(math.floor((dec + 90) / self.cell_size), 0), self._dec_cells - 1)
+        column = min(math.floor((ra % 360) / self.cell_size), self._ra_cells - 1)
+        state = self._states[row, column]
+        if state == _BOUNDARY:
+            return bool(self._is_covering(SkyCoord(ra=ra * u.deg, dec=dec * u.deg)))
+        return bool(state == _COVERED)
+
+    def covers_many(
+        self, ra: npt.ArrayLike, dec: npt.ArrayLike
+    ) -> npt.NDArray[np.bool_]:
+        """
+        Return whether the survey covers each of a list of positions.
+
+        Parameters
+        ----------
+        ra
+            The right ascensions, in degrees.
+        dec
+            The declinations, in degrees.
+        """
+        ra_ = np.asarray(ra, dtype=float) % 360
+        dec_ = np.asarray(dec, dtype=float)
+        rows = np.clip(
+            np.floor((dec_ + 90) / self.cell_size).astype(int), 0, self._dec_cells - 1
+        )
+        columns = np.minimum(
+            np.floor(ra_ / self.cell_size).astype(int), self._ra_cells - 1
+        )
+        states = self._states[rows, columns]
+        covered: npt.NDArray[np.bool_] = states == _COVERED
+
+        boundary = np.flatnonzero(states == _BOUNDARY)
+        if len(boundary):
+            positions = SkyCoord(ra=ra_[boundary] * u.deg, dec=dec_[boundary] * u.deg)
+            try:
+                covered[boundary] = self._is_covering(positions)
+            except (TypeError, ValueError):
+                covered[boundary] = [self._is_covering(p) for p in positions]
+        return covered
+
+    def _is_covering(self, positions: SkyCoord) -> bool:
+        return is_covering_position(self.survey, positions)
+
+
+@lru_cache
+def _grid_corners(cell_size: float) -> SkyCoord:
+    ra = np.linspace(0, 360, round(360 / cell_size) + 1)
+    dec = np.linspace(-90, 90, round(180 / cell_size) + 1)
+    ra_grid, dec_grid = np.meshgrid(ra, dec)
+    return SkyCoord(ra=ra_grid * u.deg, dec=dec_grid * u.deg)
+
+
+def get_coverage_index(survey: str) -> CoverageIndex:
+    """
+    Return the coverage index for an image survey.
+
+    The survey name is case-insensitive. A ValueError is raised for an unknown
+    survey.
+    """
+    for name in SURVEYS:
+        if name.lower() == survey.lower():
+            return _coverage_index(name)
+    raise ValueError(f"Unknown survey: {survey}")
+
+
+@lru_cache
+def _coverage_index(survey: str) -> CoverageIndex:
+    return CoverageIndex(survey)
+
+
+def build_coverage_indexes() -> None:
+    """
+    Create the coverage indexes for all image surveys, so that no request has to wait
+    for them.
+    """
+    for survey in SURVEYS:
+        get_coverage_index(survey)
@@ -0,0 +1,98 @@
+import hashlib
+import os
+import pathlib
+import tempfile
+import threading
+
+
+class DiskCache:
+    """
+    A cache of byte strings, which is stored in a directory.
+
+    Every entry is stored in its own file. The total size of all entries is bounded;
+    if it exceeds the maximum, the least recently used entries are removed. The
+    modification time of a file is used for tracking when its entry was last used.
+
+    Entries are written to a temporary file first, which is then renamed. So several
+    processes may safely share the same directory.
+
+    Parameters
+    ----------
+    directory
+        The directory for storing the cache entries. It is created if it does not
+        exist yet.
+    max_bytes
+        The maximum total size (in bytes) of all entries.
+    """
+
+    def __init__(self, directory: pathlib.Path, max_bytes: int):
+        self.directory = directory
+        self.max_bytes = max_bytes
+        self.hits = 0
+        self.misses = 0
+        self._lock = threading.Lock()
+        directory.mkdir(parents=True, exist_ok=True)
+
+    def get(self, key: str) -> bytes | None:
+        """
+        Return the entry for a key, or None if there is no such entry.
+        """
+        path = self._path(key)
+        try:
+            content = path.read_bytes()
+            os.utime(path)
+        except FileNotFoundError:
+            with self._lock:
+                self.misses += 1
+            return None
+        with self._lock:
+            self.hits += 1
+        return content
+
+    def put(self, key: str, content: bytes) -> None:
+        """
+        Store an entry, replacing any existing entry for the key.
+        """
+        fd, tmp_name = tempfile.mkstemp(dir=self.directory, prefix=".tmp-")
+        try:
+            with os.fdopen(fd, "wb") as f:
+                f.write(content)
+            os.replace(tmp_name, self._path(key))
+        except BaseException:
+            pathlib.Path(tmp_name).unlink(missing_ok=True)
+            raise
+        self._evict()
+
+    def __contains__(self, key: str) -> bool:
+        return self._path(key).exists()
+
+    @property
+    def hit_ratio(self) -> float:
+        """The fraction of lookups which found an entry."""
+        lookups = self.hits + self.misses
+        return self.hits / lookups if lookups else 0
+
+    def _path(self, key: str) -> pathlib.Path:
+        digest = hashlib.sha256(key.encode("utf-8")).hexdigest()
+        return self.directory / digest
+
+    def _evict(self) -> None:
+        entries = []
+        total_size = 0
+        for entry in os.scandir(self.directory):
+            if entry.name.startswith("."):
+                continue
+            try:
+                stat = entry.stat()
+            except FileNotFoundError:
+                # Another process has removed the entry in the meantime.
+                continue
+            entries.append((stat.st_mtime, stat.st_size, entry.path))
+            total_size += stat.st_size
+
+        entries.sort()
+        for ignore_me, size, path in entries:
+            if total_size <= self.max_bytes:
+                break
+            pathlib.Path(path).unlink(missing_ok=True)
+            total_size -= size
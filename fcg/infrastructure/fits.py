@@ -0,0 +1,183 @@
+import warnings
+from io import BytesIO
+
+import numpy as np
+import numpy.typing as npt
+from astropy import units as u
+from astropy.coordinates import Angle, SkyCoord
+from astropy.io import fits
+from astropy.wcs import WCS, FITSFixedWarning
+from astropy.wcs.utils import proj_plane_pixel_scales
+
+
+def crop_fits(content: bytes, center: SkyCoord, size: Angle) -> bytes | None:
+    """
+    Crop a square region from a FITS image.
+
+    The returned FITS file has the header of the original one, with the reference
+    pixel (and, for DSS plate solutions, the plate offset) shifted accordingly. None
+    is returned if the region is not fully contained in the image.
+
+    Parameters
+    ----------
+    content
+        The content of the FITS file.
+    center
+        The center of the region.
+    size
+        The width and height of the region, as an angle on the sky.
+    """
+    with fits.open(BytesIO(content)) as hdul:
+        hdu = hdul[0]
+        if hdu.data is None or hdu.data.ndim != 2:
+            return None
+        with warnings.catch_warnings():
+            warnings.simplefilter("ignore", category=FITSFixedWarning)
+            wcs = WCS(hdu.header)
+
+        x, y = wcs.world_to_pixel(center)
+        x_scale, y_scale = proj_plane_pixel_scales(wcs)
+        half_width = 0.5 * size.to_value(u.deg) / x_scale
+        half_height = 0.5 * size.to_value(u.deg) / y_scale
+        # Pixel i extends from i - 0.5 to i + 0.5.
+        x_min = int(np.round(x - half_width + 0.5))
+        x_max = int(np.round(x + half_width + 0.5))
+        y_min = int(np.round(y - half_height + 0.5))
+        y_max = int(np.round(y + half_height + 0.5))
+        height, width = hdu.data.shape
+        if x_min < 0 or y_min < 0 or x_max > width or y_max > height:
+            return None
+
+        header = hdu.header.copy()
+        for axis, offset in ((1, x_min), (2, y_min)):
+            if f"CRPIX{axis}" in header:
+                header[f"CRPIX{axis}"] -= offset
+            if f"LTV{axis}" in header:
+                header[f"LTV{axis}"] -= offset
+            if f"CNPIX{axis}" in header:
+                header[f"CNPIX{axis}"] += offset
+        cropped = fits.PrimaryHDU(
+            data=hdu.data[y_min:y_max, x_min:x_max].copy(), header=header
+        )
+
+    output = BytesIO()
+    cropped.writeto(output)
+    return output.getvalue()
+
+
+def downsample_fits(content: bytes, factor: int) -> bytes:
+    """
+    Reduce the resolution of a FITS image by averaging blocks of pixels.
+
+    Every block of ``factor`` x ``factor`` pixels is replaced by a single pixel, and
+    rows and columns which don't fill a block are dropped. The world coordinates of
+    the downsampled image are given by a gnomonic (TAN) projection fitted to those of
+    the original one, so that survey specific plate solutions are replaced. The
+    content is returned unchanged if it has no two-dimensional image or if the factor
+    is less than 2.
+
+    Parameters
+    ----------
+    content
+        The content of the FITS file.
+    factor
+        The width and height (in pixels) of the averaged blocks.
+    """
+    with fits.open(BytesIO(content)) as hdul:
+        hdu = hdul[0]
+        if factor < 2 or hdu.data is None or hdu.data.ndim != 2:
+            return content
+        height, width = (n // factor for n in hdu.data.shape)
+        if height < 2 or width < 2:
+            return content
+        with warnings.catch_warnings():
+            warnings.simplefilter("ignore", category=FITSFixedWarning)
+            wcs = WCS(hdu.header)
+        data = (
+            hdu.data[: height * factor, : width * factor]
+            .astype(np.float32)
+            .reshape(height, factor, width, factor)
+            .mean(axis=(1, 3))
+        )
+
+    # The world coordinates of a grid of downsampled pixels are projected onto the
+    # tangent plane at the image center, and the linear transformation from pixel
+    # coordinates is fitted. Downsampled pixel i covers the original pixels
+    # factor * i to factor * (i + 1) - 1.
+    def original_pixel(p: npt.NDArray[np.float64]) -> npt.NDArray[np.float64]:
+        return factor * p + (factor - 1) / 2
+
+    y, x = (v.ravel() for v in np.mgrid[0 : height - 1 : 9j, 0 : width - 1 : 9j])
+    center_x, center_y = (width - 1) / 2, (height - 1) / 2
+    center = wcs.pixel_to_world(original_pixel(center_x), original_pixel(center_y))
+    tangent_plane = WCS(naxis=2)
+    tangent_plane.wcs.ctype = ["RA---TAN", "DEC--TAN"]
+    tangent_plane.wcs.crval = [center.ra.deg, center.dec.deg]
+    tangent_plane.wcs.crpix = [0, 0]
+    tangent_plane.wcs.cd = np.eye(2)
+    xi, eta = tangent_plane.world_to_pixel(
+        wcs.pixel_to_world(original_pixel(x), original_pixel(y))
+    )
+    cd, *_ = np.linalg.lstsq(
+        np.column_stack([x - center_x, y - center_y]),
+        np.column_stack([xi, eta]),
+        rcond=None,
+    )
+    tangent_plane.wcs.cd = cd.T
+    # FITS pixel coordinates start at 1.
+    tangent_plane.wcs.crpix = [center_x + 1, center_y + 1]
+
+    output = BytesIO()
+    fits.PrimaryHDU(data, header=tangent_plane.to_header()).writeto(output)
+    return output.getvalue()
+
+
+def synthetic_fits(
+    center: SkyCoord, size: Angle, pixels: int, stars: int = 50, seed: int = 0
+) -> bytes:
+    """
+    Create a FITS image of a random star field.
+
+    The image is square and has a gnomonic (TAN) projection. The same arguments always
+    lead to the same image.
+
+    Parameters
+    ----------
+    center
+        The center of the image.
+    size
+        The width and height of the image, as an angle on the sky.
+    pixels
+        The width and height of the image, in pixels.
+    stars
+        The number of stars.
+    seed
+        The seed for the random number generator.
+    """
+    wcs = WCS(naxis=2)
+    wcs.wcs.ctype = ["RA---TAN", "DEC--TAN"]
+    wcs.wcs.crval = [center.ra.deg, center.dec.deg]
+    wcs.wcs.crpix = [(pixels + 1) / 2, (pixels + 1) / 2]
+    pixel_size = size.to_value(u.deg) / pixels
+    wcs.wcs.cdelt = [-pixel_size, pixel_size]
+
+    rng = np.random.default_rng(seed)
+    data = rng.normal(loc=1000, scale=30, size=(pixels, pixels))
+    for star_x, star_y, flux, width in zip(
+        rng.uniform(0, pixels, stars),
+        rng.uniform(0, pixels, stars),
+        rng.lognormal(mean=8, sigma=1, size=stars),
+        rng.uniform(1, 3, stars),
+        strict=True,
+    ):
+        # Only the pixels close to the star are affected noticeably.
+        x_min, x_max = max(int(star_x - 5 * width), 0), int(star_x + 5 * width) + 1
+        y_min, y_max = max(int(star_y - 5 * width), 0), int(star_y + 5 * width) + 1
+        y, x = np.mgrid[y_min : min(y_max, pixels), x_min : min(x_max, pixels)]
+        data[y, x] += flux * np.exp(
+            -((x - star_x) ** 2 + (y - star_y) ** 2) / (2 * width**2)
+        )
+
+    output = BytesIO()
+    fits.PrimaryHDU(data.astype(np.float32), header=wcs.to_header()).writeto(output)
+    return output.getvalue()
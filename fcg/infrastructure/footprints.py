@@ -0,0 +1,311 @@
+import fcntl
+import json
+import math
+import os
+import pathlib
+import tempfile
+import threading
+from contextlib import contextmanager
+from itertools import product
+from typing import Callable, Iterator, NamedTuple
+
+import numpy as np
+
+# Minimum number of lines in a footprint file before it is compacted.
+_MIN_COMPACTION_LINES = 100
+
+
+class Footprint(NamedTuple):
+    """
+    The square footprint of a FITS image on the sky.
+
+    Attributes
+    ----------
+    survey
+        The (lowercase) name of the survey from which the image was taken.
+    ra
+        The right ascension of the image center, in degrees.
+    dec
+        The declination of the image center, in degrees.
+    size
+        The width and height of the image, in degrees.
+    key
+        The cache key of the image.
+    """
+
+    survey: str
+    ra: float
+    dec: float
+    size: float
+    key: str
+
+
+def _unit_vector(ra: float, dec: float) -> np.ndarray:
+    ra_rad = math.radians(ra)
+    dec_rad = math.radians(dec)
+    return np.array(
+        [
+            math.cos(dec_rad) * math.cos(ra_rad),
+            math.cos(dec_rad) * math.sin(ra_rad),
+            math.sin(dec_rad),
+        ]
+    )
+
+
+def _tangent_plane_offset(
+    ra: float, dec: float, ra0: float, dec0: float
+) -> tuple[float, float] | None:
+    """
+    Return the gnomonic projection (in degrees) of a position onto the tangent plane
+    at (ra0, dec0), or None if the position is in the other hemisphere.
+    """
+    ra, dec, ra0, dec0 = (math.radians(v) for v in (ra, dec, ra0, dec0))
+    cos_c = math.sin(dec0) * math.sin(dec) + math.cos(dec0) * math.cos(dec) * math.cos(
+        ra - ra0
+    )
+    if cos_c <= 0:
+        return None
+    xi = math.cos(dec) * math.sin(ra - ra0) / cos_c
+    eta = (
+        math.cos(dec0) * math.sin(dec)
+        - math.sin(dec0) * math.cos(dec) * math.cos(ra - ra0)
+    ) / cos_c
+    return math.degrees(xi), math.degrees(eta)
+
+
+class FootprintIndex:
+    """
+    A spatial index of the footprints of FITS images.
+
+    The unit sphere is embedded in a grid of cubic cells, and every footprint is
+    registered with all the cells overlapped by its bounding box. A lookup thus only
+    needs to check the footprints in a single cell, however many footprints there
+    are.
+
+    If a path is given, footprints are appended to that file (as JSON lines), and
+    footprints added by other processes are picked up before every lookup. The file
+    is compacted when it has doubled in size since it was last loaded or when at least
+    half of its lines are for discarded footprints. Compacting rewrites the file with
+    the footprints which are still live; the other processes notice the new file and
+    reload it.
+
+    Parameters
+    ----------
+    cell_size
+        The size of the grid cells, in degrees. It should be at least as large as the
+        largest footprint.
+    path
+        The file for sharing footprints between processes.
+    is_live
+        A function returning whether a footprint's image still exists. Footprints for
+        which it returns False are dropped when the file is compacted. If this is
+        None, only discarded footprints are dropped.
+    """
+
+    def __init__(
+        self,
+        cell_size: float,
+        path: pathlib.Path | None = None,
+        is_live: Callable[[Footprint], bool] | None = None,
+    ):
+        self.cell_size = math.radians(cell_size)
+        self.path = path
+        self.is_live = is_live
+        self._cells: dict[tuple[int, int, int], set[Footprint]] = dict()
+        self._lock = threading.Lock()
+        # The file which has been loaded, how far it has been read, how many lines
+        # it had when it was loaded and how many have been read, and the footprints
+        # which have been discarded since.
+        self._inode: int | None = None
+        self._offset = 0
+        self._loaded_lines = 0
+        self._lines = 0
+        self._discarded: set[Footprint] = set()
+
+    def add(self, footprint: Footprint) -> None:
+        """
+        Add a footprint to the index.
+        """
+        if self.path is not None:
+            self.path.parent.mkdir(parents=True, exist_ok=True)
+            # Appends may happen concurrently, but not while the file is compacted.
+            with _file_lock(self.path, exclusive=False):
+                # A single short write in append mode is atomic, so that several
+                # processes may append to the same file.
+                with open(self.path, "a") as f:
+                    f.write(json.dumps(footprint._asdict()) + "\n")
+        with self._lock:
+            self._discarded.discard(footprint)
+        self._register(footprint)
+
+    def discard(self, footprint: Footprint) -> None:
+        """
+        Remove a footprint from the index, if it is in the index.
+
+        The footprint is removed from the file when the file is compacted.
+        """
+        with self._lock:
+            cells = [cell for cell in self._cells.values() if footprint in cell]
+            for cell in cells:
+                cell.discard(footprint)
+            if cells:
+                self._discarded.add(footprint)
+        self._compact_if_needed()
+
+    def find(self, survey: str, ra: float, dec: float, size: float) -> list[Footprint]:
+        """
+        Return all footprints which fully contain a square region.
+
+        Parameters
+        ----------
+        survey
+            The survey.
+        ra
+            The right ascension of the region center, in degrees.
+        dec
+            The declination of the region center, in degrees.
+        size
+            The width and height of the region, in degrees.
+        """
+        self._refresh()
+        with self._lock:
+            candidates = list(self._cells.get(self.cell(ra, dec), set()))
+        return [
+            footprint
+            for footprint in candidates
+            if footprint.survey == survey.lower()
+            and self._contains(footprint, ra, dec, size)
+        ]
+
+    def cell(self, ra: float, dec: float) -> tuple[int, int, int]:
+        """
+        Return the grid cell containing a position.
+
+        Parameters
+        ----------
+        ra
+            The right ascension, in degrees.
+        dec
+            The declination, in degrees.
+        """
+        cell = np.floor(_unit_vector(ra, dec) / self.cell_size).astype(int)
+        return int(cell[0]), int(cell[1]), int(cell[2])
+
+    def __len__(self) -> int:
+        with self._lock:
+            return len(set().union(*self._cells.values()))
+
+    def compact(self) -> None:
+        """
+        Rewrite the file with the footprints which have neither been discarded nor
+        are dead according to ``is_live``.
+        """
+        if self.path is None:
+            return
+        self.path.parent.mkdir(parents=True, exist_ok=True)
+        with _file_lock(self.path, exclusive=True):
+            self._read()
+            with self._lock:
+                footprints = set().union(*self._cells.values())
+            live = sorted(
+                footprint
+                for footprint in footprints
+                if self.is_live is None or self.is_live(footprint)
+            )
+            content = "".join(json.dumps(f._asdict()) + "\n" for f in live)
+            fd, tmp_name = tempfile.mkstemp(dir=self.path.parent, prefix=".tmp-")
+            try:
+                with os.fdopen(fd, "w") as f:
+                    f.write(content)
+                os.replace(tmp_name, self.path)
+            except BaseException:
+                pathlib.Path(tmp_name).unlink(missing_ok=True)
+                raise
+            with self._lock:
+                self._cells = dict()
+                self._inode = os.stat(self.path).st_ino
+                self._offset = len(content.encode("utf-8"))
+                self._loaded_lines = self._lines = len(live)
+                self._discarded = set()
+            for footprint in live:
+                self._register(footprint)
+
+    def _refresh(self) -> None:
+        self._read()
+        self._compact_if_needed()
+
+    def _read(self) -> None:
+        if self.path is None or not self.path.exists():
+            return
+        with self._lock:
+            with open(self.path, "rb") as f:
+                inode = os.fstat(f.fileno()).st_ino
+                reload = inode != self._inode
+                if reload:
+                    # The file has been compacted (or created), so that the index
+                    # is loaded from scratch.
+                    self._cells = dict()
+                    self._inode = inode
+                    self._offset = self._lines = 0
+                f.seek(self._offset)
+                lines = f.readlines()
+            # A line which is still being written is read again later.
+            complete = [line for line in lines if line.endswith(b"\n")]
+            self._offset += sum(len(line) for line in complete)
+            self._lines += len(complete)
+            if reload:
+                self._loaded_lines = self._lines
+            footprints = [Footprint(**json.loads(line)) for line in complete]
+            # Lines read for the first time may be for discarded footprints.
+            footprints = [f for f in footprints if f not in self._discarded]
+        for footprint in footprints:
+            self._register(footprint)
+
+    def _compact_if_needed(self) -> None:
+        with self._lock:
+            needed = self._lines >= _MIN_COMPACTION_LINES and (
+                self._lines >= 2 * self._loaded_lines
+                or 2 * len(self._discarded) >= self._lines
+            )
+        if needed:
+            self.compact()
+
+    def _register(self, footprint: Footprint) -> None:
+        center = _unit_vector(footprint.ra, footprint.dec)
+        # radius of the circle circumscribing the footprint
+        radius = math.radians(footprint.size) / math.sqrt(2)
+        lower = np.floor((center - radius) / self.cell_size).astype(int)
+        upper = np.floor((center + radius) / self.cell_size).astype(int)
+        with self._lock:
+            for cell in product(
+                *(range(lower[i], upper[i] + 1) for i in range(len(center)))
+            ):
+                self._cells.setdefault(
+                    (int(cell[0]), int(cell[1]), int(cell[2])), set()
+                ).add(footprint)
+
+    @staticmethod
+    def _contains(footprint: Footprint, ra: float, dec: float, size: float) -> bool:
+        offset = _tangent_plane_offset(ra, dec, footprint.ra, footprint.dec)
+        if offset is None:
+            return False
+        xi, eta = offset
+        # The region's axes are slightly rotated relative to those of the footprint,
+        # as meridians converge. A small margin takes care of that.
+        half_size = 0.5 * size * 1.02
+        return (
+            abs(xi) + half_size <= 0.5 * footprint.size
+            and abs(eta) + half_size <= 0.5 * footprint.size
+        )
+
+
+@contextmanager
+def _file_lock(path: pathlib.Path, exclusive: bool) -> Iterator[None]:
+    # The lock file is separate from the lock files of the cache, as footprints are
+    # added while a cache lock is held.
+    with open(path.with_name(path.name + ".lock"), "a") as f:
+        fcntl.flock(f, fcntl.LOCK_EX if exclusive else fcntl.LOCK_SH)
+        try:
+            yield
+        finally:
+            fcntl.flock(f, fcntl.LOCK_UN)
@@ -0,0 +1,212 @@
+import threading
+import time
+from collections import OrderedDict
+from concurrent.futures import FIRST_COMPLETED, Future, ThreadPoolExecutor, wait
+from io import BytesIO
+from typing import BinaryIO, Iterator
+
+from astropy import units as u
+from astropy.coordinates import Angle, SkyCoord
+from astropy.io import fits
+
+from fcg.infrastructure.coverage import get_coverage_index
+from fcg.infrastructure.metrics import SURVEY_HEDGES
+from fcg.infrastructure.settings import get_settings
+from fcg.infrastructure.surveys import (
+    canonical_fits_center,
+    fits_cache_key,
+    get_survey_breaker,
+    get_survey_stats,
+    load_survey_fits,
+)
+
+# The name of the automatic image survey.
+AUTO_SURVEY = "auto"
+
+# The surveys which the automatic image survey chooses from, in order of preference.
+AUTO_SURVEYS = ("POSS2/UKSTU Red", "POSS2/UKSTU Blue", "POSS1 Red", "POSS1 Blue")
+
+# Latency percentile of a survey after which a second survey is requested.
+_HEDGE_PERCENTILE = 90
+
+# Maximum number of positions for which the chosen survey is remembered.
+_MAX_CHOICES = 1024
+
+# The surveys chosen by the automatic image survey, keyed by position and size, with
+# the most recently used last.
+_choices: OrderedDict[str, str] = OrderedDict()
+_choices_lock = threading.Lock()
+
+
+def is_auto_survey(survey: str) -> bool:
+    """
+    Return whether a survey name refers to the automatic image survey.
+    """
+    return survey.lower() == AUTO_SURVEY
+
+
+def rank_surveys(fits_center: SkyCoord) -> list[str]:
+    """
+    Return the surveys covering a position, the one expected to be fastest first.
+
+    Surveys whose circuit breaker isn't closed are put last.
+    """
+    ra = fits_center.ra.to_value(u.deg)
+    dec = fits_center.dec.to_value(u.deg)
+    covering = [s for s in AUTO_SURVEYS if get_coverage_index(s).covers(ra, dec)]
+    ranked = get_survey_stats().rank(
+        covering, default_latency=get_settings().survey_hedge_delay
+    )
+    # Surveys which are known to be failing are only tried as a last resort.
+    return sorted(ranked, key=_is_failing)
+
+
+def remember_survey_choice(fits_center: SkyCoord, size: Angle, survey: str) -> None:
+    """
+    Remember the survey chosen by the automatic image survey for a FITS image.
+
+    Only the most recently used choices are kept. They are kept per process.
+    """
+    key = auto_survey_key(fits_center, size)
+    with _choices_lock:
+        _choices[key] = survey
+        _choices.move_to_end(key)
+        while len(_choices) > _MAX_CHOICES:
+            _choices.popitem(last=False)
+
+
+def remembered_survey_choice(fits_center: SkyCoord, size: Angle) -> str | None:
+    """
+    Return the survey chosen by the automatic image survey for a FITS image before,
+    or None if there is none or if that survey's circuit breaker isn't closed.
+    """
+    key = auto_survey_key(fits_center, size)
+    with _choices_lock:
+        survey = _choices.get(key)
+        if survey is not None:
+            _choices.move_to_end(key)
+    if survey is None or _is_failing(survey):
+        return None
+    return survey
+
+
+def auto_survey_key(fits_center: SkyCoord, size: Angle) -> str:
+    """
+    Return a key identifying the choice of the automatic image survey for a FITS
+    file.
+
+    FITS files which share a FITS file in the cache share their key.
+    """
+    return fits_cache_key(AUTO_SURVEY, canonical_fits_center(fits_center), size)
+
+
+def load_fastest_survey_fits(
+    fits_center: SkyCoord, size: Angle
+) -> tuple[str, BinaryIO]:
+    """
+    Load a FITS file from whichever image survey covering a position delivers first.
+
+    The FITS file is requested from the best ranked survey (see `rank_surveys`). If
+    that takes longer than the survey's 90th latency percentile, the next best survey
+    is requested as well, and the first valid FITS file is used. If a request fails,
+    the next survey is requested instead. The name of the survey used is returned
+    together with the FITS file.
+
+    A request which has lost cannot be aborted. It is left to finish in the
+    background, so that its FITS file still ends up in the cache and its duration in
+    the survey statistics.
+
+    Parameters
+    ----------
+    fits_center
+        The center of the FITS image.
+    size
+        The width and height of the FITS image.
+    """
+    surveys = rank_surveys(fits_center)
+    if not surveys:
+        raise ValueError("None of the image surveys covers the position.")
+    candidates = iter(surveys)
+
+    # A new executor is used for every call, as executors don't survive the forking
+    # of render worker processes.
+    executor = ThreadPoolExecutor(max_workers=len(surveys))
+    pending: dict[Future[bytes], tuple[str, float]] = dict()
+    try:
+        _submit(executor, pending, candidates, fits_center, size)
+        hedged = False
+        hedge: str | None = None
+        error: Exception | None = None
+        while pending:
+            timeout = None
+            if not hedged and len(pending) == 1:
+                survey, started = next(iter(pending.values()))
+                timeout = max(_hedge_delay(survey) - (time.monotonic() - started), 0)
+            done, _ = wait(pending, timeout=timeout, return_when=FIRST_COMPLETED)
+            if not done:
+                # The request is slow, so that the next best survey is requested too.
+                hedge = _submit(executor, pending, candidates, fits_center, size)
+                hedged = True
+                continue
+
+            for future in done:
+                survey, _ = pending.pop(future)
+                try:
+                    content = future.result()
+                except Exception as e:
+                    error = e
+                    continue
+                if hedge is not None:
+                    SURVEY_HEDGES.inc(winner="hedge" if survey == hedge else "first")
+                return survey, BytesIO(content)
+
+            # All finished requests have failed, so that another survey is tried.
+            if not pending:
+                _submit(executor, pending, candidates, fits_center, size)
+        raise error or ValueError("No image survey has returned a FITS file.")
+    finally:
+        executor.shutdown(wait=False, cancel_futures=True)
+
+
+def _submit(
+    executor: ThreadPoolExecutor,
+    pending: dict[Future[bytes], tuple[str, float]],
+    candidates: Iterator[str],
+    fits_center: SkyCoord,
+    size: Angle,
+) -> str | None:
+    survey = next(candidates, None)
+    if survey is not None:
+        future = executor.submit(_load, survey, fits_center, size)
+        pending[future] = (survey, time.monotonic())
+    return survey
+
+
+def _is_failing(survey: str) -> bool:
+    breaker = get_survey_breaker(survey)
+    return breaker is not None and breaker.state() != "closed"
+
+
+def _hedge_delay(survey: str) -> float:
+    latency = get_survey_stats().latency(survey, _HEDGE_PERCENTILE)
+    return latency if latency is not None else get_settings().survey_hedge_delay
+
+
+def _load(survey: str, fits_center: SkyCoord, size: Angle) -> bytes:
+    # Survey responses are checked (and recorded in the survey statistics) by
+    # load_survey_fits. Only FITS files which have been cached by requests without a
+    # check have to be checked here.
+    content = load_survey_fits(
+        survey=survey, fits_center=fits_center, size=size, is_valid=_is_valid_fits
+    ).read()
+    if not _is_valid_fits(content):
+        raise ValueError(f"The cached {survey} FITS file is invalid.")
+    return content
+
+
+def _is_valid_fits(content: bytes) -> bool:
+    try:
+        with fits.open(BytesIO(content)) as hdul:
+            return hdul[0].data is not None
+    except Exception:
+        return False
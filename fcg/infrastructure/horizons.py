@@ -0,0 +1,160 @@
+import json
+import pathlib
+import sqlite3
+import time
+from contextlib import closing
+from functools import lru_cache
+from typing import Any
+
+from fcg.infrastructure.settings import get_settings
+
+_SCHEMA = """
+CREATE TABLE IF NOT EXISTS ephemerides (
+    identifier TEXT NOT NULL,
+    location TEXT NOT NULL,
+    start REAL NOT NULL,
+    end REAL NOT NULL,
+    step REAL NOT NULL,
+    fetched REAL NOT NULL,
+    data TEXT NOT NULL
+);
+CREATE INDEX IF NOT EXISTS ephemerides_query
+    ON ephemerides (identifier, location, start, end);
+"""
+
+# Tolerance (in seconds) when comparing epochs. Horizons returns epochs with a
+# precision of a minute.
+_EPOCH_TOLERANCE = 30
+
+
+class EphemerisCache:
+    """
+    A persistent cache of ephemerides queried from JPL Horizons, backed by an SQLite
+    database.
+
+    Ephemerides are stored as lists of dictionaries with (at least) an ``epoch`` item,
+    which is a Unix timestamp. A query is answered from any cached ephemerides for the
+    same object and location which cover its time interval on a grid containing its
+    epochs, so that a query for a narrower interval or a coarser step size requires no
+    further Horizons query.
+
+    Cached ephemerides are discarded after ``ttl`` seconds, as the orbits of comets
+    and asteroids are refined over time.
+
+    Parameters
+    ----------
+    path
+        The database file.
+    ttl
+        Time (in seconds) for which ephemerides are cached.
+    """
+
+    def __init__(self, path: pathlib.Path, ttl: float):
+        self.path = path
+        self.ttl = ttl
+        path.parent.mkdir(parents=True, exist_ok=True)
+        with closing(self._connect()) as connection:
+            connection.execute("PRAGMA journal_mode=WAL")
+            connection.executescript(_SCHEMA)
+
+    def get(
+        self, identifier: str, location: str, start: float, end: float, step: float
+    ) -> list[dict[str, Any]] | None:
+        """
+        Return the ephemerides for a query, or None if they aren't cached.
+
+        The ephemerides start at ``start`` and are ``step`` seconds apart. The last
+        ephemeris is the first one at or after ``end``.
+        """
+        with closing(self._connect()) as connection:
+            rows = connection.execute(
+                "SELECT step, data FROM ephemerides"
+                " WHERE identifier = ? AND location = ? AND start <= ? AND end >= ?"
+                " AND step <= ? AND fetched >= ?"
+                " ORDER BY step DESC, end - start",
+                (
+                    identifier,
+                    location,
+                    start + _EPOCH_TOLERANCE,
+                    end - _EPOCH_TOLERANCE,
+                    step,
+                    time.time() - self.ttl,
+                ),
+            ).fetchall()
+        for cached_step, data in rows:
+            if abs(step / cached_step - round(step / cached_step)) > 1e-9:
+                continue
+            ephemerides = _select(json.loads(data), start, end, step)
+            if ephemerides is not None:
+                return ephemerides
+        return None
+
+    def put(
+        self,
+        identifier: str,
+        location: str,
+        start: float,
+        end: float,
+        step: float,
+        ephemerides: list[dict[str, Any]],
+    ) -> None:
+        """
+        Store the ephemerides for a query, and discard expired ones.
+        """
+        now = time.time()
+        with closing(self._connect()) as connection, connection:
+            connection.execute(
+                "DELETE FROM ephemerides WHERE fetched < ?", (now - self.ttl,)
+            )
+            connection.execute(
+                "INSERT INTO ephemerides"
+                " (identifier, location, start, end, step, fetched, data)"
+                " VALUES (?, ?, ?, ?, ?, ?, ?)",
+                (
+                    identifier,
+                    location,
+                    start,
+                    end,
+                    step,
+                    now,
+                    json.dumps(ephemerides),
+                ),
+            )
+
+    def _connect(self) -> sqlite3.Connection:
+        return sqlite3.connect(self.path, timeout=30)
+
+
+def _select(
+    ephemerides: list[dict[str, Any]], start: float, end: float, step: float
+) -> list[dict[str, Any]] | None:
+    selected: list[dict[str, Any]] = []
+    for ephemeris in ephemerides:
+        epoch = ephemeris["epoch"]
+        if epoch < start - _EPOCH_TOLERANCE:
+            continue
+        offset = (epoch - start) % step
+        if min(offset, step - offset) > _EPOCH_TOLERANCE:
+            continue
+        if not selected and epoch > start + _EPOCH_TOLERANCE:
+            # The first epoch is missing.
+            return None
+        selected.append(ephemeris)
+        if epoch >= end - _EPOCH_TOLERANCE:
+            return selected
+
+    # The end time is not covered.
+    return None
+
+
+@lru_cache
+def get_ephemeris_cache() -> EphemerisCache | None:
+    """
+    Return the cache for ephemerides, or None if caching is disabled.
+    """
+    settings = get_settings()
+    if settings.horizons_cache_ttl <= 0:
+        return None
+    return EphemerisCache(
+        path=settings.cache_dir / "horizons.sqlite3", ttl=settings.horizons_cache_ttl
+    )
@@ -0,0 +1,198 @@
+import math
+from typing import Any, NamedTuple, Sequence
+
+import numpy as np
+
+# The fields of an ephemeris.
+FIELDS = ("epoch", "ra", "dec", "ra_rate", "dec_rate", "magnitude")
+
+# Fields which may be missing.
+_NULLABLE_FIELDS = ("ra_rate", "dec_rate", "magnitude")
+
+# Factor for converting rates in arcseconds per hour to degrees per second.
+_ARCSEC_PER_HOUR = 1 / (3600 * 3600)
+
+# Maximum number of ephemerides withheld for estimating the interpolation error.
+_VALIDATION_SAMPLE_SIZE = 20
+
+
+class InterpolationError(NamedTuple):
+    """
+    An estimate of the error of interpolated ephemerides.
+
+    Attributes
+    ----------
+    position
+        The maximum position error, in arcseconds.
+    magnitude
+        The maximum magnitude error, or None if there are no magnitudes.
+    """
+
+    position: float
+    magnitude: float | None
+
+
+def interpolate_ephemerides(
+    ephemerides: Sequence[dict[str, Any]], epochs: np.ndarray
+) -> list[dict[str, Any]]:
+    """
+    Interpolate ephemerides at the given epochs.
+
+    See `interpolate_ephemeris_columns` for details. The interpolated ephemerides are
+    returned as dictionaries, with None for missing rates and magnitudes.
+    """
+    return ephemeris_rows(interpolate_ephemeris_columns(ephemerides, epochs))
+
+
+def interpolate_ephemeris_columns(
+    ephemerides: Sequence[dict[str, Any]], epochs: np.ndarray
+) -> dict[str, np.ndarray]:
+    """
+    Interpolate ephemerides at the given epochs and return them as columns.
+
+    There must be at least two ephemerides, sorted by epoch and covering all the
+    epochs. Right ascension, declination, their rates and the magnitude are
+    interpolated with cubic Hermite splines. The derivatives of right ascension and
+    declination are given by their rates (in arcseconds per hour, with the right
+    ascension rate including the cosine of the declination, as returned by JPL
+    Horizons). All other derivatives, and those for missing rates, are estimated from
+    the ephemerides.
+
+    The columns are arrays of 64-bit floats keyed by field name, with NaN for
+    missing rates and magnitudes.
+    """
+    columns = _interpolate(_columns(ephemerides), epochs)
+    columns["epoch"] = np.asarray(epochs, dtype=np.float64)
+    return {field: columns[field] for field in FIELDS}
+
+
+def ephemeris_columns(ephemerides: Sequence[dict[str, Any]]) -> dict[str, np.ndarray]:
+    """
+    Return ephemerides as columns.
+
+    The columns are arrays of 64-bit floats keyed by field name, with NaN for
+    missing rates and magnitudes.
+    """
+    count = len(ephemerides)
+    columns = {
+        field: np.fromiter(
+            (e[field] for e in ephemerides), dtype=np.float64, count=count
+        )
+        for field in FIELDS
+        if field not in _NULLABLE_FIELDS
+    }
+    for field in _NULLABLE_FIELDS:
+        columns[field] = np.fromiter(
+            (e[field] if e[field] is not None else np.nan for e in ephemerides),
+            dtype=np.float64,
+            count=count,
+        )
+    return {field: columns[field] for field in FIELDS}
+
+
+def ephemeris_rows(columns: dict[str, np.ndarray]) -> list[dict[str, Any]]:
+    """
+    Return ephemerides given as columns as dictionaries.
+
+    NaN rates and magnitudes are replaced with None.
+    """
+    values = {field: columns[field].tolist() for field in FIELDS}
+    for field in _NULLABLE_FIELDS:
+        values[field] = [None if math.isnan(v) else v for v in values[field]]
+    return [
+        dict(zip(FIELDS, row, strict=True))
+        for row in zip(*(values[field] for field in FIELDS), strict=True)
+    ]
+
+
+def estimate_interpolation_error(
+    ephemerides: Sequence[dict[str, Any]],
+) -> InterpolationError:
+    """
+    Estimate the error of interpolating ephemerides.
+
+    A sparse sample of the ephemerides is withheld and interpolated from the others.
+    As the withheld ephemerides leave gaps twice as large as the spacing of the
+    ephemerides, the estimate is conservative.
+    """
+    columns = _columns(ephemerides)
+    count = len(columns["epoch"])
+    if count < 3:
+        return InterpolationError(position=float("nan"), magnitude=None)
+
+    withheld = np.unique(
+        np.linspace(1, count - 2, min(_VALIDATION_SAMPLE_SIZE, count - 2)).astype(int)
+    )
+    kept = np.setdiff1d(np.arange(count), withheld)
+    interpolated = _interpolate(
+        {field: values[kept] for field, values in columns.items()},
+        columns["epoch"][withheld],
+    )
+
+    dec = np.radians(columns["dec"][withheld])
+    ra_error = _ra_difference(interpolated["ra"], columns["ra"][withheld])
+    dec_error = interpolated["dec"] - columns["dec"][withheld]
+    position_error = 3600 * np.hypot(ra_error * np.cos(dec), dec_error)
+    magnitude_error = np.abs(interpolated["magnitude"] - columns["magnitude"][withheld])
+    return InterpolationError(
+        position=float(np.max(position_error)),
+        magnitude=(
+            float(np.nanmax(magnitude_error))
+            if not np.all(np.isnan(magnitude_error))
+            else None
+        ),
+    )
+
+
+def _columns(ephemerides: Sequence[dict[str, Any]]) -> dict[str, np.ndarray]:
+    columns = ephemeris_columns(ephemerides)
+    # Avoid the jump from 360 to 0 degrees.
+    columns["ra"] = np.unwrap(columns["ra"], period=360)
+    return columns
+
+
+def _interpolate(
+    columns: dict[str, np.ndarray], epochs: np.ndarray
+) -> dict[str, np.ndarray]:
+    x = columns["epoch"]
+    indices = np.clip(np.searchsorted(x, epochs, side="right") - 1, 0, len(x) - 2)
+    h = x[indices + 1] - x[indices]
+    t = (epochs - x[indices]) / h
+
+    # cubic Hermite basis functions
+    t2 = t * t
+    t3 = t2 * t
+    h00 = 2 * t3 - 3 * t2 + 1
+    h10 = t3 - 2 * t2 + t
+    h01 = -2 * t3 + 3 * t2
+    h11 = t3 - t2
+
+    # The rates are used as the derivatives of the position, as estimating these from
+    # the ephemerides is inaccurate for fast moving targets, especially at the ends.
+    rates = {
+        "ra": columns["ra_rate"]
+        * _ARCSEC_PER_HOUR
+        / np.cos(np.radians(columns["dec"])),
+        "dec": columns["dec_rate"] * _ARCSEC_PER_HOUR,
+    }
+
+    interpolated: dict[str, np.ndarray] = dict()
+    for field, y in columns.items():
+        if field == "epoch":
+            continue
+        slopes = np.gradient(y, x, edge_order=2 if len(x) > 2 else 1)
+        if field in rates:
+            slopes = np.where(np.isnan(rates[field]), slopes, rates[field])
+        interpolated[field] = (
+            h00 * y[indices]
+            + h10 * h * slopes[indices]
+            + h01 * y[indices + 1]
+            + h11 * h * slopes[indices + 1]
+        )
+    interpolated["ra"] = np.mod(interpolated["ra"], 360)
+    return interpolated
+
+
+def _ra_difference(ra1: np.ndarray, ra2: np.ndarray) -> np.ndarray:
+    difference: np.ndarray = np.mod(ra1 - ra2 + 180, 360) - 180
+    return difference
@@ -0,0 +1,354 @@
+import asyncio
+import logging
+import pathlib
+import pickle  # nosec B403
+import sqlite3
+import time
+import uuid
+from contextlib import closing
+from functools import lru_cache
+from typing import Awaitable, Callable, Literal, NamedTuple
+
+from fcg.infrastructure.pool import RenderPoolBusyError
+from fcg.infrastructure.rendering import FinderChartSpec
+from fcg.infrastructure.settings import get_settings
+from fcg.infrastructure.types import OutputFormat
+
+JobStatus = Literal["queued", "running", "finished", "failed"]
+
+_SCHEMA = """
+CREATE TABLE IF NOT EXISTS jobs (
+    id TEXT PRIMARY KEY,
+    status TEXT NOT NULL,
+    spec BLOB NOT NULL,
+    output_format TEXT NOT NULL,
+    result BLOB,
+    error TEXT,
+    attempts INTEGER NOT NULL DEFAULT 0,
+    lease_expires REAL,
+    created REAL NOT NULL,
+    updated REAL NOT NULL
+);
+CREATE INDEX IF NOT EXISTS jobs_status_created ON jobs (status, created);
+"""
+
+
+class Job(NamedTuple):
+    """
+    A finder chart generation job.
+
+    Attributes
+    ----------
+    id
+        The job id.
+    status
+        The job status.
+    output_format
+        The output format of the finder chart.
+    error
+        The error message, if the job has failed.
+    created
+        The time (as a Unix timestamp) when the job was submitted.
+    updated
+        The time (as a Unix timestamp) when the job status was last changed.
+    """
+
+    id: str
+    status: JobStatus
+    output_format: OutputFormat
+    error: str | None
+    created: float
+    updated: float
+
+
+class JobStore:
+    """
+    A persistent queue of finder chart generation jobs, backed by an SQLite database.
+
+    The store may be shared by several processes. A job is claimed for a lease period;
+    if the process running it dies, the job is claimed again once the lease has
+    expired. A job which has been claimed ``max_attempts`` times without finishing is
+    marked as failed.
+
+    Jobs (and their results) are deleted once they are older than ``retention``
+    seconds.
+
+    Parameters
+    ----------
+    path
+        The database file.
+    retention
+        Time (in seconds) after which jobs are deleted.
+    lease
+        Time (in seconds) for which a claimed job is reserved for the claiming
+        process.
+    max_attempts
+        Maximum number of times a job is claimed.
+    """
+
+    def __init__(
+        self,
+        path: pathlib.Path,
+        retention: float,
+        lease: float,
+        max_attempts: int = 3,
+    ):
+        self.path = path
+        self.retention = retention
+        self.lease = lease
+        self.max_attempts = max_attempts
+        path.parent.mkdir(parents=True, exist_ok=True)
+        with closing(self._connect()) as connection:
+            connection.execute("PRAGMA journal_mode=WAL")
+            connection.executescript(_SCHEMA)
+
+    def submit(self, spec: FinderChartSpec) -> Job:
+        """
+        Add a job to the queue and return it.
+        """
+        now = time.time()
+        job = Job(
+            id=uuid.uuid4().hex,
+            status="queued",
+            output_format=spec.output_format,
+            error=None,
+            created=now,
+            updated=now,
+        )
+        with closing(self._connect()) as connection, connection:
+            connection.execute(
+                "INSERT INTO jobs (id, status, spec, output_format, created, updated)"
+                " VALUES (?, ?, ?, ?, ?, ?)",
+                (
+                    job.id,
+                    job.status,
+                    pickle.dumps(spec),
+                    job.output_format,
+                    job.created,
+                    job.updated,
+                ),
+            )
+        return job
+
+    def get(self, job_id: str) -> Job | None:
+        """
+        Return a job, or None if there is no such job.
+        """
+        with closing(self._connect()) as connection:
+            row = connection.execute(
+                "SELECT id, status, output_format, error, created, updated FROM jobs"
+                " WHERE id = ? AND created >= ?",
+                (job_id, time.time() - self.retention),
+            ).fetchone()
+        return Job(*row) if row is not None else None
+
+    def result(self, job_id: str) -> bytes | None:
+        """
+        Return the finder chart generated by a job, or None if the job hasn't
+        finished.
+        """
+        with closing(self._connect()) as connection:
+            row = connection.execute(
+                "SELECT result FROM jobs WHERE id = ? AND status = 'finished'"
+                " AND created >= ?",
+                (job_id, time.time() - self.retention),
+            ).fetchone()
+        return row[0] if row is not None else None
+
+    def claim(self) -> tuple[str, FinderChartSpec] | None:
+        """
+        Claim the oldest job which is waiting to be run, and return its id and spec.
+
+        None is returned if there is no such job.
+        """
+        now = time.time()
+        with closing(self._connect()) as connection, connection:
+            # Jobs whose lease has expired have been given up by the process that
+            # claimed them.
+            connection.execute(
+                "UPDATE jobs SET status = 'failed', updated = ?,"
+                " error = 'The finder chart could not be generated.'"
+                " WHERE status = 'running' AND lease_expires < ? AND attempts >= ?",
+                (now, now, self.max_attempts),
+            )
+            row = connection.execute(
+                "UPDATE jobs SET status = 'running', attempts = attempts + 1,"
+                " lease_expires = ?, updated = ?"
+                " WHERE id = ("
+                "   SELECT id FROM jobs"
+                "   WHERE status = 'queued' OR (status = 'running' AND lease_expires < ?)"
+                "   ORDER BY created LIMIT 1"
+                " ) RETURNING id, spec",
+                (now + self.lease, now, now),
+            ).fetchone()
+        if row is None:
+            return None
+        # The database only contains specs pickled by the store itself.
+        return row[0], pickle.loads(row[1])  # nosec B301
+
+    def release(self, job_id: str) -> None:
+        """
+        Put a claimed job back into the queue, without counting the attempt.
+        """
+        with closing(self._connect()) as connection, connection:
+            connection.execute(
+                "UPDATE jobs SET status = 'queued', attempts = attempts - 1,"
+                " lease_expires = NULL, updated = ? WHERE id = ?",
+                (time.time(), job_id),
+            )
+
+    def finish(self, job_id: str, result: bytes) -> None:
+        """
+        Store the result of a job and mark the job as finished.
+        """
+        with closing(self._connect()) as connection, connection:
+            connection.execute(
+                "UPDATE jobs SET status = 'finished', result = ?, updated = ?"
+                " WHERE id = ?",
+                (result, time.time(), job_id),
+            )
+
+    def fail(self, job_id: str, error: str) -> None:
+        """
+        Mark a job as failed.
+        """
+        with closing(self._connect()) as connection, connection:
+            connection.execute(
+                "UPDATE jobs SET status = 'failed', error = ?, updated = ?"
+                " WHERE id = ?",
+                (error, time.time(), job_id),
+            )
+
+    def expire(self) -> int:
+        """
+        Delete the jobs which are older than the retention period, and return their
+        number.
+        """
+        with closing(self._connect()) as connection, connection:
+            cursor = connection.execute(
+                "DELETE FROM jobs WHERE created < ?", (time.time() - self.retention,)
+            )
+            return cursor.rowcount
+
+    def _connect(self) -> sqlite3.Connection:
+        return sqlite3.connect(self.path, timeout=30)
+
+
+@lru_cache
+def get_job_store() -> JobStore:
+    """
+    Return the store for finder chart generation jobs.
+    """
+    settings = get_settings()
+    return JobStore(
+        path=settings.cache_dir / "jobs.sqlite3",
+        retention=settings.job_retention,
+        # A running job is given up by the render pool after the render timeout.
+        lease=2 * settings.render_timeout + 60,
+    )
+
+
+class JobRunner:
+    """
+    A background task which runs the jobs in a job store.
+
+    At most ``concurrency`` jobs are run at the same time. If the render pool is busy,
+    a job is put back into the queue and tried again later.
+
+    Parameters
+    ----------
+    store
+        The job store.
+    render
+        The function for generating a finder chart.
+    concurrency
+        Maximum number of jobs run at the same time.
+    poll_interval
+        Time (in seconds) between checks for new jobs submitted by other processes.
+    """
+
+    def __init__(
+        self,
+        store: JobStore,
+        render: Callable[[FinderChartSpec], Awaitable[bytes]],
+        concurrency: int,
+        poll_interval: float = 1,
+    ):
+        self.store = store
+        self.render = render
+        self.concurrency = concurrency
+        self.poll_interval = poll_interval
+        self._wake_up = asyncio.Event()
+        self._task: asyncio.Task[None] | None = None
+        self._jobs: set[asyncio.Task[None]] = set()
+
+    def start(self) -> None:
+        """
+        Start running jobs.
+        """
+        if self._task is None:
+            # The event must belong to the running event loop.
+            self._wake_up = asyncio.Event()
+            self._task = asyncio.create_task(self._run())
+
+    async def stop(self) -> None:
+        """
+        Stop running jobs. Jobs which are still running are claimed again after a
+        restart.
+        """
+        tasks = [t for t in (self._task, *self._jobs) if t is not None]
+        for task in tasks:
+            task.cancel()
+        await asyncio.gather(*tasks, return_exceptions=True)
+        self._task = None
+
+    def notify(self) -> None:
+        """
+        Notify the runner that a job has been submitted.
+        """
+        self._wake_up.set()
+
+    async def _run(self) -> None:
+        last_expiry = 0.0
+        while True:
+            if time.time() - last_expiry > 60:
+                await asyncio.to_thread(self.store.expire)
+                last_expiry = time.time()
+
+            while len(self._jobs) < self.concurrency:
+                claimed = await asyncio.to_thread(self.store.claim)
+                if claimed is None:
+                    break
+                task = asyncio.create_task(self._run_job(*claimed))
+                self._jobs.add(task)
+                task.add_done_callback(self._job_done)
+
+            self._wake_up.clear()
+            try:
+                await asyncio.wait_for(self._wake_up.wait(), self.poll_interval)
+            except asyncio.TimeoutError:
+                pass
+
+    async def _run_job(self, job_id: str, spec: FinderChartSpec) -> None:
+        try:
+            result = await self.render(spec)
+        except asyncio.CancelledError:
+            # The runner is stopped, so the job should be run after a restart.
+            self.store.release(job_id)
+            raise
+        except RenderPoolBusyError:
+            await asyncio.to_thread(self.store.release, job_id)
+            # Keep the slot for a while, so that the job isn't claimed again
+            # straight away.
+            await asyncio.sleep(self.poll_interval)
+            return
+        except Exception as e:
+            logging.log(logging.ERROR, str(e))
+            await asyncio.to_thread(self.store.fail, job_id, str(e))
+            return
+        await asyncio.to_thread(self.store.finish, job_id, result)
+
+    def _job_done(self, task: "asyncio.Task[None]") -> None:
+        self._jobs.discard(task)
+        # A slot for the next job has become available.
+        self._wake_up.set()
@@ -0,0 +1,51 @@
+import logging
+import os
+import resource
+import sys
+import threading
+from typing import Callable
+
+
+def resident_set_size() -> int:
+    """
+    Return the resident set size (in bytes) of the current process.
+
+    On systems without a ``/proc`` file system the peak resident set size is returned
+    instead.
+    """
+    try:
+        with open("/proc/self/statm") as f:
+            pages = int(f.read().split()[1])
+        return pages * os.sysconf("SC_PAGE_SIZE")
+    except (OSError, ValueError, IndexError):
+        peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+        # The peak is given in bytes on macOS and in kilobytes elsewhere.
+        return peak if sys.platform == "darwin" else 1024 * peak
+
+
+def watch_memory(
+    max_bytes: int, on_exceeded: Callable[[], None], interval: float = 10
+) -> threading.Event:
+    """
+    Check the resident set size of the current process in a background thread, and
+    call a function once it exceeds a maximum.
+
+    The check is made every ``interval`` seconds. The function is called at most
+    once, after which the thread ends. Setting the returned event stops the thread.
+    """
+    stopped = threading.Event()
+
+    def watch() -> None:
+        while not stopped.wait(interval):
+            rss = resident_set_size()
+            if rss > max_bytes:
+                logging.log(
+                    logging.WARNING,
+                    f"Process {os.getpid()} uses {rss} bytes of memory, more than "
+                    f"the maximum of {max_bytes} bytes.",
+                )
+                on_exceeded()
+                return
+
+    threading.Thread(target=watch, name="memory-watch", daemon=True).start()
+    return stopped
@@ -0,0 +1,407 @@
+import math
+import threading
+import time
+from contextlib import contextmanager
+from contextvars import ContextVar
+from typing import Any, Callable, Iterator, NamedTuple, Sequence, TypeVar
+
+T = TypeVar("T")
+
+# Upper bounds (in seconds) of the buckets of latency histograms.
+LATENCY_BUCKETS = (0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10, 25, 60, 120)
+
+
+class Observation(NamedTuple):
+    """
+    A value recorded for a metric in a worker process.
+
+    Attributes
+    ----------
+    metric
+        The metric name.
+    labels
+        The label values.
+    value
+        The value.
+    """
+
+    metric: str
+    labels: tuple[str, ...]
+    value: float
+
+
+# Observations made while running a function with `run_recorded`. If this is None,
+# observations are applied to the metrics directly.
+_recorded: list[Observation] | None = None
+
+
+# The durations (in seconds) of the stages of the current request, keyed by stage
+# name. If this is None, durations are not collected.
+_request_timings: ContextVar[dict[str, float] | None] = ContextVar(
+    "request_timings", default=None
+)
+
+
+class _Metric:
+    """
+    A metric with a name, a description and label names.
+
+    The metric is added to ``registry``, or to the default registry if this is None.
+    """
+
+    type = ""
+
+    def __init__(
+        self,
+        name: str,
+        documentation: str,
+        labels: Sequence[str] = (),
+        registry: "Registry | None" = None,
+    ):
+        self.name = name
+        self.documentation = documentation
+        self.label_names = tuple(labels)
+        self._lock = threading.Lock()
+        (registry if registry is not None else REGISTRY).register(self)
+
+    def _label_values(self, labels: dict[str, str]) -> tuple[str, ...]:
+        if set(labels) != set(self.label_names):
+            raise ValueError(
+                f"The labels of {self.name} must be {', '.join(self.label_names)}."
+            )
+        return tuple(str(labels[name]) for name in self.label_names)
+
+    def _record(self, labels: dict[str, str], value: float) -> None:
+        label_values = self._label_values(labels)
+        if _recorded is not None:
+            _recorded.append(Observation(self.name, label_values, value))
+        else:
+            self.apply(label_values, value)
+
+    def apply(self, label_values: tuple[str, ...], value: float) -> None:
+        """
+        Apply a value for the given label values.
+        """
+        raise NotImplementedError()
+
+    def samples(self) -> Iterator[tuple[str, dict[str, str], float]]:
+        raise NotImplementedError()
+
+    def _labels(self, label_values: tuple[str, ...]) -> dict[str, str]:
+        return dict(zip(self.label_names, label_values, strict=True))
+
+
+class Counter(_Metric):
+    """
+    A metric whose value only increases, such as a number of requests.
+    """
+
+    type = "counter"
+
+    def __init__(
+        self,
+        name: str,
+        documentation: str,
+        labels: Sequence[str] = (),
+        registry: "Registry | None" = None,
+    ):
+        super().__init__(name, documentation, labels, registry)
+        self._values: dict[tuple[str, ...], float] = dict()
+
+    def inc(self, value: float = 1, **labels: str) -> None:
+        """
+        Increase the value for the given labels.
+        """
+        self._record(labels, value)
+
+    def apply(self, label_values: tuple[str, ...], value: float) -> None:
+        with self._lock:
+            self._values[label_values] = self._values.get(label_values, 0) + value
+
+    def values(self) -> dict[tuple[str, ...], float]:
+        """
+        Return the values, keyed by label values.
+        """
+        with self._lock:
+            return dict(self._values)
+
+    def samples(self) -> Iterator[tuple[str, dict[str, str], float]]:
+        for label_values, value in self.values().items():
+            yield self.name, self._labels(label_values), value
+
+
+class Gauge(_Metric):
+    """
+    A metric whose value is computed when the metrics are collected.
+
+    The function returns the values, keyed by label values.
+    """
+
+    type = "gauge"
+
+    def __init__(
+        self,
+        name: str,
+        documentation: str,
+        function: Callable[[], dict[tuple[str, ...], float]],
+        labels: Sequence[str] = (),
+        registry: "Registry | None" = None,
+    ):
+        super().__init__(name, documentation, labels, registry)
+        self.function = function
+
+    def apply(self, label_values: tuple[str, ...], value: float) -> None:
+        raise TypeError("Gauge values cannot be recorded.")
+
+    def samples(self) -> Iterator[tuple[str, dict[str, str], float]]:
+        for label_values, value in self.function().items():
+            yield self.name, self._labels(label_values), value
+
+
+class Histogram(_Metric):
+    """
+    A metric counting values (such as latencies) in buckets.
+
+    If ``timing_label`` is given, the values are durations, which are added to the
+    timings collected with `collect_timings`. The value of this label is used as the
+    name of the timing.
+    """
+
+    type = "histogram"
+
+    def __init__(
+        self,
+        name: str,
+        documentation: str,
+        labels: Sequence[str] = (),
+        buckets: Sequence[float] = LATENCY_BUCKETS,
+        timing_label: str | None = None,
+        registry: "Registry | None" = None,
+    ):
+        super().__init__(name, documentation, labels, registry)
+        self.timing_label = timing_label
+        self.buckets = tuple(sorted(buckets)) + (math.inf,)
+        self._counts: dict[tuple[str, ...], list[int]] = dict()
+        self._sums: dict[tuple[str, ...], float] = dict()
+
+    def observe(self, value: float, **labels: str) -> None:
+        """
+        Count a value for the given labels.
+        """
+        self._record(labels, value)
+
+    @contextmanager
+    def time(self, **labels: str) -> Iterator[None]:
+        """
+        Observe the time (in seconds) taken by a block of code.
+        """
+        started = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.observe(time.perf_counter() - started, **labels)
+
+    def apply(self, label_values: tuple[str, ...], value: float) -> None:
+        with self._lock:
+            counts = self._counts.setdefault(label_values, [0] * len(self.buckets))
+            for i, bound in enumerate(self.buckets):
+                if value <= bound:
+                    counts[i] += 1
+            self._sums[label_values] = self._sums.get(label_values, 0) + value
+
+        timings = _request_timings.get()
+        if self.timing_label is not None and timings is not None:
+            timing = label_values[self.label_names.index(self.timing_label)]
+            timings[timing] = timings.get(timing, 0) + value
+
+    def samples(self) -> Iterator[tuple[str, dict[str, str], float]]:
+        with self._lock:
+            counts = {k: list(v) for k, v in self._counts.items()}
+            sums = dict(self._sums)
+        for label_values, bucket_counts in counts.items():
+            labels = self._labels(label_values)
+            for bound, count in zip(self.buckets, bucket_counts, strict=True):
+                yield f"{self.name}_bucket", {**labels, "le": _number(bound)}, count
+            yield f"{self.name}_sum", labels, sums[label_values]
+            yield f"{self.name}_count", labels, bucket_counts[-1]
+
+
+class Registry:
+    """
+    A collection of metrics, which can be exposed in the Prometheus text format.
+    """
+
+    def __init__(self) -> None:
+        self._metrics: dict[str, _Metric] = dict()
+
+    def register(self, metric: _Metric) -> None:
+        """
+        Add a metric.
+        """
+        if metric.name in self._metrics:
+            raise ValueError(f"There already is a metric called {metric.name}.")
+        self._metrics[metric.name] = metric
+
+    def get(self, name: str) -> _Metric:
+        """
+        Return the metric with the given name.
+        """
+        return self._metrics[name]
+
+    def expose(self) -> str:
+        """
+        Return the metrics in the Prometheus text exposition format.
+        """
+        lines: list[str] = []
+        for metric in self._metrics.values():
+            lines.append(f"# HELP {metric.name} {_escape(metric.documentation)}")
+            lines.append(f"# TYPE {metric.name} {metric.type}")
+            for name, labels, value in metric.samples():
+                if labels:
+                    label_text = ",".join(
+                        f'{k}="{_escape(v, quote=True)}"' for k, v in labels.items()
+                    )
+                    name = f"{name}{{{label_text}}}"
+                lines.append(f"{name} {_number(value)}")
+        return "\n".join(lines) + "\n"
+
+
+REGISTRY = Registry()
+
+
+def run_recorded(func: Callable[..., T], *args: Any) -> tuple[T, list[Observation]]:
+    """
+    Run a function and return its result together with the observations made for
+    metrics while it was running.
+
+    This allows metrics to be collected in worker processes and to be applied in the
+    server process with `replay`.
+    """
+    global _recorded
+    previous = _recorded
+    _recorded = []
+    try:
+        return func(*args), _recorded
+    finally:
+        _recorded = previous
+
+
+def replay(observations: Sequence[Observation]) -> None:
+    """
+    Apply observations recorded with `run_recorded` to the metrics.
+    """
+    for observation in observations:
+        REGISTRY.get(observation.metric).apply(observation.labels, observation.value)
+
+
+@contextmanager
+def collect_timings() -> Iterator[dict[str, float]]:
+    """
+    Collect the durations (in seconds) observed by histograms with a timing label
+    while the context is active.
+
+    The durations are summed by timing name. Observations replayed from worker
+    processes are included.
+    """
+    timings: dict[str, float] = dict()
+    token = _request_timings.set(timings)
+    try:
+        yield timings
+    finally:
+        _request_timings.reset(token)
+
+
+def _escape(text: str, quote: bool = False) -> str:
+    text = text.replace("\\", "\\\\").replace("\n", "\\n")
+    return text.replace('"', '\\"') if quote else text
+
+
+def _number(value: float) -> str:
+    if value == math.inf:
+        return "+Inf"
+    return repr(float(value))
+
+
+def _cache_hit_ratios() -> dict[tuple[str, ...], float]:
+    totals: dict[str, float] = dict()
+    hits: dict[str, float] = dict()
+    for (cache, result), count in CACHE_REQUESTS.values().items():
+        totals[cache] = totals.get(cache, 0) + count
+        if result == "hit":
+            hits[cache] = hits.get(cache, 0) + count
+    return {(cache,): hits.get(cache, 0) / total for cache, total in totals.items()}
+
+
+FINDER_CHART_REQUESTS = Counter(
+    "fcg_finder_chart_requests_total",
+    "Number of finder chart requests.",
+    labels=("mode", "status"),
+)
+
+FINDER_CHART_REQUEST_DURATION = Histogram(
+    "fcg_finder_chart_request_duration_seconds",
+    "Time taken for handling a finder chart request.",
+    labels=("mode",),
+)
+
+FINDER_CHART_STAGE_DURATION = Histogram(
+    "fcg_finder_chart_stage_duration_seconds",
+    "Time taken by a stage of generating a finder chart.",
+    labels=("mode", "stage"),
+    timing_label="stage",
+)
+
+UPSTREAM_DURATION = Histogram(
+    "fcg_upstream_request_duration_seconds",
+    "Time taken by a request to an external service.",
+    labels=("service",),
+    timing_label="service",
+)
+
+SURVEY_HEDGES = Counter(
+    "fcg_survey_hedges_total",
+    "Number of times a second survey has been requested for the automatic survey.",
+    labels=("winner",),
+)
+
+SURVEY_REJECTED_REQUESTS = Counter(
+    "fcg_survey_rejected_requests_total",
+    "Number of requests to an image survey refused by its circuit breaker.",
+    labels=("survey",),
+)
+
+
+# Values of the circuit breaker state gauge.
+_CIRCUIT_STATE_VALUES = {"closed": 0, "half_open": 1, "open": 2}
+
+
+def _survey_circuit_states() -> dict[tuple[str, ...], float]:
+    # The surveys module records metrics itself, so it can only be imported here.
+    from fcg.infrastructure.surveys import get_survey_breakers
+
+    return {
+        (survey.lower(),): _CIRCUIT_STATE_VALUES[breaker.state()]
+        for survey, breaker in get_survey_breakers().items()
+    }
+
+
+SURVEY_CIRCUIT_STATE = Gauge(
+    "fcg_survey_circuit_state",
+    "State of the circuit breaker of an image survey (0 for closed, 1 for half open"
+    " and 2 for open).",
+    _survey_circuit_states,
+    labels=("survey",),
+)
+
+CACHE_REQUESTS = Counter(
+    "fcg_cache_requests_total",
+    "Number of cache lookups.",
+    labels=("cache", "result"),
+)
+
+CACHE_HIT_RATIO = Gauge(
+    "fcg_cache_hit_ratio",
+    "Fraction of cache lookups which have found the requested item.",
+    _cache_hit_ratios,
+    labels=("cache",),
+)
@@ -1,8 +1,15 @@
+import csv
+import json
 import re
 from datetime import datetime, timezone
-from typing import Callable, TypeVar, cast
+from io import BytesIO
+from typing import Callable, NamedTuple, Sequence, TypeVar, cast
 
+import numpy as np
+import numpy.typing as npt
+from astropy import units as u
 from astropy.coordinates import Angle
+from astropy.io.votable import parse_single_table
 from starlette.datastructures import FormData
 
 T = TypeVar("T")
@@ -67,22 +74,122 @@ def parse_timestamp(text: str) -> datetime:
         raise ValueError(error) from e
 
 
+class _AngleField(NamedTuple):
+    # Unit of values without a unit, in which the range is given as well.
+    unit: str
+    minimum: float
+    maximum: float
+    error: str
+
+
+_ANGLE_FIELDS = {
+    "right_ascension": _AngleField(
+        unit="deg",
+        minimum=0,
+        maximum=360,
+        error=f"The right ascension must be an angle between 0 and 360 degrees. {_BEWARE_OF_DASH}",
+    ),
+    "declination": _AngleField(
+        unit="deg",
+        minimum=-90,
+        maximum=90,
+        error=f"The declination must be an angle between -90 and 90 degrees. {_BEWARE_OF_DASH}",
+    ),
+    "slit_width": _AngleField(
+        unit="arcsec",
+        minimum=0.5,
+        maximum=5,
+        error="The slit width must be an angle between 0.5 and 5 arcseconds.",
+    ),
+    "position_angle": _AngleField(
+        unit="deg",
+        minimum=-180,
+        maximum=180,
+        error=f"The slit width must be an angle between -180 and +180 degrees. {_BEWARE_OF_DASH}",
+    ),
+    "nir_bundle_separation": _AngleField(
+        unit="arcsec",
+        minimum=54,
+        maximum=165,
+        error="The slit width must be an angle between 54 and 165 arcseconds.",
+    ),
+}
+
+# Size (in degrees) of the angle units understood by the fast parser.
+_UNIT_DEGREES = {
+    "h": 15.0,
+    "d": 1.0,
+    "deg": 1.0,
+    "arcmin": 1 / 60,
+    "arcsec": 1 / 3600,
+}
+
+_NUMBER = r"\d+(?:\.\d*)?"
+
+# A decimal number without a unit, such as "-17.5".
+_DECIMAL = re.compile(rf"[+-]?{_NUMBER}")
+
+# A decimal number with a unit, such as "225.16d" or "3.984 arcsec".
+_DECIMAL_WITH_UNIT = re.compile(rf"([+-]?{_NUMBER})\s*(h|d|deg|arcmin|arcsec)")
+
+# A sexagesimal angle, such as "10h 30m 12.5s" or "-45d30m".
+_SEXAGESIMAL = re.compile(rf"([+-]?)(\d+)\s*([hd])\s*(\d+)\s*m(?:\s*({_NUMBER})\s*s)?")
+
+
+def _fast_angle_value(text: str, unit: str) -> float | None:
+    """
+    Return the value of an angle in the given unit, or None if the text is not one of
+    the common decimal or sexagesimal forms understood by the fast parser.
+
+    Numbers without a unit are assumed to be in the given unit.
+    """
+    if _DECIMAL.fullmatch(text):
+        return float(text)
+    match = _DECIMAL_WITH_UNIT.fullmatch(text)
+    if match:
+        return float(match[1]) * (_UNIT_DEGREES[match[2]] / _UNIT_DEGREES[unit])
+    match = _SEXAGESIMAL.fullmatch(text)
+    if match:
+        minutes = int(match[4])
+        seconds = float(match[5]) if match[5] else 0
+        if minutes >= 60 or seconds >= 60:
+            # Let AstroPy decide what to make of this.
+            return None
+        value = int(match[2]) + minutes / 60 + seconds / 3600
+        if match[1] == "-":
+            value = -value
+        return value * (_UNIT_DEGREES[match[3]] / _UNIT_DEGREES[unit])
+    return None
+
+
+def _angle_value(text: str, field: _AngleField) -> float:
+    """
+    Return the value of an angle in the unit of a field.
+
+    Common forms are parsed directly, and AstroPy is used for all other forms. A
+    ValueError with the field's error message is raised if the text is not a valid
+    angle or if the angle is out of range.
+    """
+    value = _fast_angle_value(text, field.unit)
+    if value is None:
+        if is_float(text):
+            text = text + field.unit
+        try:
+            value = Angle(text).to_value(field.unit)
+        except Exception:
+            raise ValueError(field.error) from None
+    if value < field.minimum or value > field.maximum:
+        raise ValueError(field.error)
+    return value
+
+
 def parse_right_ascension(text: str) -> Angle:
     """
     Parse a right ascension value.
 
     The value is returned as an AstroPy Angle instance.
     """
-    error = f"The right ascension must be an angle between 0 and 360 degrees. {_BEWARE_OF_DASH}"
-    if is_float(text):
-        text = text + "d"
-    try:
-        angle = Angle(text)
-    except BaseException:
-        raise ValueError(error) from None
-    if angle.degree < 0 or angle.degree > 360:
-        raise ValueError(error)
-    return angle
+    return Angle(_angle_value(text, _ANGLE_FIELDS["right_ascension"]), u.deg)
 
 
 def parse_declination(text: str) -> Angle:
@@ -91,16 +198,7 @@ def parse_declination(text: str) -> Angle:
 
     The value is returned as an AstroPy Angle instance
     """
-    error = f"The declination must be an angle between -90 and 90 degrees. {_BEWARE_OF_DASH}"
-    if is_float(text):
-        text = text + "d"
-    try:
-        angle = Angle(text)
-    except ValueError:
-        raise ValueError(error) from None
-    if angle.degree < -90 or angle.degree > 90:
-        raise ValueError(error)
-    return angle
+    return Angle(_angle_value(text, _ANGLE_FIELDS["declination"]), u.deg)
 
 
 def parse_slit_width(text: str) -> Angle:
@@ -109,16 +207,7 @@ def parse_slit_width(text: str) -> Angle:
 
     The value is returned as an AstroPy Angle instance
     """
-    error = "The slit width must be an angle between 0.5 and 5 arcseconds."
-    if is_float(text):
-        text = text + "arcsec"
-    try:
-        angle = Angle(text)
-    except ValueError:
-        raise ValueError(error) from None
-    if angle.arcsecond < 0.5 or angle.arcsecond > 5:
-        raise ValueError(error)
-    return angle
+    return Angle(_angle_value(text, _ANGLE_FIELDS["slit_width"]), u.arcsec)
 
 
 def parse_position_angle(text: str) -> Angle:
@@ -127,16 +216,7 @@ def parse_position_angle(text: str) -> Angle:
 
     The value is returned as an AstroPy Angle instance
     """
-    error = f"The slit width must be an angle between -180 and +180 degrees. {_BEWARE_OF_DASH}"
-    if is_float(text):
-        text = text + "d"
-    try:
-        angle = Angle(text)
-    except ValueError:
-        raise ValueError(error) from None
-    if angle.degree < -180 or angle.degree > 180:
-        raise ValueError(error)
-    return angle
+    return Angle(_angle_value(text, _ANGLE_FIELDS["position_angle"]), u.deg)
 
 
 def parse_nir_bundle_separation(text: str) -> Angle:
@@ -145,16 +225,123 @@ def parse_nir_bundle_separation(text: str) -> Angle:
 
     The value is returned as an AstroPy Angle instance
     """
-    error = "The slit width must be an angle between 54 and 165 arcseconds."
-    if is_float(text):
-        text = text + "arcsec"
+    return Angle(_angle_value(text, _ANGLE_FIELDS["nir_bundle_separation"]), u.arcsec)
+
+
+def parse_angle_column(
+    texts: Sequence[str], field: str
+) -> tuple[npt.NDArray[np.float64], list[str | None]]:
+    """
+    Parse a column of angle values, such as the right ascensions of a target list.
+
+    The values are returned in degrees, with NaN for invalid values, together with
+    the error message for every value (or None if the value is valid). The error
+    messages are the same as for the corresponding parse function.
+
+    Parameters
+    ----------
+    texts
+        The values. Surrounding whitespace is ignored.
+    field
+        The field name, such as "right_ascension" or "slit_width". Plain numbers are
+        taken to be in the same unit as for the field's parse function.
+    """
+    angle_field = _ANGLE_FIELDS[field]
+    texts = [text.strip() for text in texts]
+    values = np.full(len(texts), np.nan)
+
+    # Plain numbers are by far the most common values, and NumPy converts them all at
+    # once.
+    is_decimal = np.fromiter(
+        (_DECIMAL.fullmatch(text) is not None for text in texts),
+        dtype=bool,
+        count=len(texts),
+    )
+    values[is_decimal] = np.array(texts, dtype=str)[is_decimal].astype(np.float64)
+    for i in np.flatnonzero(~is_decimal):
+        value = _fast_angle_value(texts[i], angle_field.unit)
+        if value is None:
+            try:
+                value = _angle_value(texts[i], angle_field)
+            except ValueError:
+                continue
+        values[i] = value
+
+    valid = (values >= angle_field.minimum) & (values <= angle_field.maximum)
+    values[~valid] = np.nan
+    errors = [None if is_valid else angle_field.error for is_valid in valid]
+    degrees = values * _UNIT_DEGREES[angle_field.unit]
+    return degrees, errors
+
+
+def parse_target_list(text: str) -> list[dict[str, str]]:
+    """
+    Parse a target list.
+
+    The target list may be a JSON array of objects, a VOTable or a CSV table with a
+    header row. Every target is returned as a dictionary of form field names and
+    values. Field names are lowercased, and empty values are omitted.
+    """
+    text = text.strip()
+    if not text:
+        raise ValueError("The target list is empty.")
+
+    rows: list[dict[str, object]]
+    if text.startswith("<"):
+        rows = _parse_votable(text)
+    elif text.startswith("["):
+        try:
+            rows = json.loads(text)
+        except ValueError:
+            raise ValueError("The target list is not valid JSON.") from None
+        if not all(isinstance(row, dict) for row in rows):
+            raise ValueError("The JSON target list must be an array of objects.")
+    else:
+        try:
+            rows = list(csv.DictReader(text.splitlines(), restval=""))
+        except csv.Error:
+            raise ValueError("The target list is not valid CSV.") from None
+        if any(None in row for row in rows):
+            raise ValueError("A row of the CSV target list has too many values.")
+
+    targets = [
+        {
+            str(field).strip().lower(): str(value).strip()
+            for field, value in row.items()
+            if value is not None and str(value).strip()
+        }
+        for row in rows
+    ]
+    if not targets:
+        raise ValueError("The target list is empty.")
+    return targets
+
+
+def _parse_votable(text: str) -> list[dict[str, object]]:
     try:
-        angle = Angle(text)
-    except ValueError:
-        raise ValueError(error) from None
-    if angle.arcsecond < 54 or angle.arcsecond > 165:
-        raise ValueError(error)
-    return angle
+        table = parse_single_table(BytesIO(text.encode("utf-8"))).to_table()
+    except Exception:
+        raise ValueError("The target list is not a valid VOTable.") from None
+
+    # Angles with a unit are passed on in degrees. Masked values are omitted.
+    columns: dict[str, list[object]] = dict()
+    for name in table.colnames:
+        column = table[name]
+        values: list[object]
+        if column.unit is not None and column.unit.is_equivalent(u.deg):
+            degrees = column.quantity.to_value(u.deg)
+            values = [f"{value!r}d" for value in degrees.tolist()]
+        else:
+            values = [str(value) for value in column.tolist()]
+        mask = np.broadcast_to(
+            np.asarray(getattr(column, "mask", False), dtype=bool), (len(column),)
+        )
+        columns[name] = [
+            None if masked else v for v, masked in zip(values, mask, strict=True)
+        ]
+    return [
+        {name: values[i] for name, values in columns.items()} for i in range(len(table))
+    ]
 
 
 def is_int(text: str) -> bool:
@@ -0,0 +1,244 @@
+import asyncio
+import logging
+import multiprocessing
+import os
+import platform
+import threading
+from concurrent.futures import Future, ProcessPoolExecutor, wait
+from typing import Any, Callable, TypeVar
+
+from fcg.infrastructure.memory import resident_set_size
+from fcg.infrastructure.metrics import Gauge
+from fcg.infrastructure.settings import get_settings
+from fcg.infrastructure.warm_up import warm_up
+
+T = TypeVar("T")
+
+
+class RenderPoolBusyError(Exception):
+    """Raised if no further task can be queued in a render pool."""
+
+    pass
+
+
+class RenderTimeoutError(Exception):
+    """Raised if a task in a render pool does not finish in time."""
+
+    pass
+
+
+def _initialize_worker() -> None:
+    import matplotlib as mpl
+
+    # See fcg.main for why the pdf backend is used on macOS.
+    if "darwin" in platform.system().lower():
+        mpl.use("pdf")
+
+    global _startup_durations
+    if get_settings().warm_up:
+        # Do the slow work of the first finder chart once per worker process rather
+        # than in the first request.
+        _startup_durations = warm_up()
+    else:
+        # Import the heavy modules once per worker process rather than once per task.
+        import imephu.salt.finder_chart  # noqa: F401
+        import matplotlib.pyplot  # noqa: F401
+
+
+# The time taken by the warm-up steps in a worker process.
+_startup_durations: dict[str, float] = dict()
+
+
+def _warm_up() -> tuple[int, dict[str, float]]:
+    return os.getpid(), _startup_durations
+
+
+def _run_task(func: Callable[..., T], *args: Any) -> tuple[T, int]:
+    # The resident set size of the worker process is returned along with the result,
+    # so that the pool can replace worker processes which use too much memory.
+    return func(*args), resident_set_size()
+
+
+class RenderPool:
+    """
+    A bounded pool of worker processes for CPU heavy tasks.
+
+    At most ``workers + queue_depth`` tasks may be pending at any time. Any further
+    task is rejected with a `RenderPoolBusyError`. A task which does not finish within
+    ``timeout`` seconds is given up with a `RenderTimeoutError`; as a worker process
+    cannot be interrupted, its slot is only freed once the task has actually finished.
+
+    Worker processes are spawned rather than forked, so they share no memory with the
+    calling process. Each of them imports the heavy modules (and warms up, if
+    configured) itself when it is started.
+
+    A worker process is replaced after it has run ``max_tasks`` tasks. If a worker
+    process uses more than ``max_rss`` bytes of memory after a task, all worker
+    processes are replaced; tasks which are already queued are still run by the old
+    worker processes.
+
+    If ``workers`` is 0, tasks are executed synchronously in the calling thread.
+
+    Parameters
+    ----------
+    workers
+        Number of worker processes.
+    queue_depth
+        Number of tasks which may wait for a free worker process.
+    timeout
+        Time (in seconds) after which a task is given up.
+    max_tasks
+        Number of tasks after which a worker process is replaced. If this is 0, worker
+        processes are not replaced after a number of tasks.
+    max_rss
+        Resident set size (in bytes) of a worker process after a task above which the
+        worker processes are replaced. If this is 0, the memory usage is not checked.
+    """
+
+    def __init__(
+        self,
+        workers: int,
+        queue_depth: int,
+        timeout: float,
+        max_tasks: int = 0,
+        max_rss: int = 0,
+    ):
+        self.workers = workers
+        self.queue_depth = queue_depth
+        self.timeout = timeout
+        self.max_tasks = max_tasks
+        self.max_rss = max_rss
+        self._pending = 0
+        self._lock = threading.Lock()
+        self._executor: ProcessPoolExecutor | None = None
+        if workers > 0:
+            self._executor = self._create_executor()
+
+    @property
+    def pending(self) -> int:
+        """The number of tasks which are running or waiting for a worker."""
+        return self._pending
+
+    def warm_up(self) -> dict[int, dict[str, float]]:
+        """
+        Start all worker processes and wait until they are ready.
+
+        The time (in seconds) taken by each warm-up step is returned for the worker
+        processes which have run a warm-up task, keyed by process id.
+        """
+        if self._executor is None:
+            return dict()
+        futures = [self._executor.submit(_warm_up) for _ in range(self.workers)]
+        wait(futures)
+        # A worker process may have run more than one of the tasks.
+        return dict(future.result() for future in futures)
+
+    async def run(self, func: Callable[..., T], *args: Any) -> T:
+        """
+        Run a function in a worker process and return its result.
+
+        The function and its arguments must be picklable.
+        """
+        if self._executor is None:
+            return func(*args)
+
+        with self._lock:
+            if self._pending >= self.workers + self.queue_depth:
+                raise RenderPoolBusyError("The server is busy. Please try again later.")
+            self._pending += 1
+
+        executor = self._executor
+        future: Future[tuple[T, int]] = executor.submit(_run_task, func, *args)
+        future.add_done_callback(self._release)
+        try:
+            result, rss = await asyncio.wait_for(
+                asyncio.wrap_future(future), self.timeout
+            )
+        except asyncio.TimeoutError:
+            future.cancel()
+            raise RenderTimeoutError(
+                f"The request could not be completed within {self.timeout:g} seconds."
+            ) from None
+        if self.max_rss > 0 and rss > self.max_rss:
+            self._replace_executor(executor, rss)
+        return result
+
+    def shutdown(self) -> None:
+        """
+        Shut down the worker processes.
+        """
+        if self._executor is not None:
+            self._executor.shutdown(wait=False, cancel_futures=True)
+
+    def _create_executor(self) -> ProcessPoolExecutor:
+        # Worker processes are spawned rather than forked, as forking a process with
+        # running threads (as in an ASGI server) is not safe.
+        return ProcessPoolExecutor(
+            max_workers=self.workers,
+            mp_context=multiprocessing.get_context("spawn"),
+            initializer=_initialize_worker,
+            max_tasks_per_child=self.max_tasks if self.max_tasks > 0 else None,
+        )
+
+    def _replace_executor(self, executor: ProcessPoolExecutor, rss: int) -> None:
+        with self._lock:
+            if self._executor is not executor:
+                # The worker processes have been replaced already.
+                return
+            self._executor = self._create_executor()
+        logging.log(
+            logging.WARNING,
+            f"A render worker process uses {rss} bytes of memory, more than the "
+            f"maximum of {self.max_rss} bytes. The render worker processes are "
+            f"replaced.",
+        )
+        # The old worker processes exit once they have run their queued tasks.
+        executor.shutdown(wait=False)
+
+    def _release(self, future: "Future[Any]") -> None:
+        with self._lock:
+            self._pending -= 1
+
+
+_render_pool: RenderPool | None = None
+
+
+def get_render_pool() -> RenderPool:
+    """
+    Return the render pool used for generating finder charts.
+
+    The pool is created with the current settings when this function is called for
+    the first time.
+    """
+    global _render_pool
+    if _render_pool is None:
+        settings = get_settings()
+        _render_pool = RenderPool(
+            workers=settings.render_workers,
+            queue_depth=settings.render_queue_depth,
+            timeout=settings.render_timeout,
+            max_tasks=settings.render_max_tasks,
+            max_rss=settings.render_max_rss,
+        )
+    return _render_pool
+
+
+def _pending_render_tasks() -> dict[tuple[str, ...], float]:
+    return {(): _render_pool.pending if _render_pool is not None else 0}
+
+
+RENDER_TASKS = Gauge(
+    "fcg_render_tasks",
+    "Number of finder charts which are being rendered or are waiting for a worker.",
+    _pending_render_tasks,
+)
+
+
+def shutdown_render_pool() -> None:
+    """
+    Shut down the render pool, if it has been created.
+    """
+    global _render_pool
+    if _render_pool is not None:
+        _render_pool.shutdown()
+        _render_pool = None
@@ -0,0 +1,99 @@
+import sys
+import threading
+from collections import Counter
+from functools import lru_cache
+from types import FrameType, TracebackType
+from typing import Any, Callable, TypeVar
+
+from fcg.infrastructure.disk_cache import DiskCache
+from fcg.infrastructure.settings import get_settings
+
+T = TypeVar("T")
+
+# Maximum total size (in bytes) of the stored profiles.
+_PROFILES_MAX_BYTES = 64 * 1024**2
+
+
+class SamplingProfiler:
+    """
+    A profiler which samples the call stack of a thread at regular intervals.
+
+    The profiler is used as a context manager, and the thread using it is profiled.
+    The result is given in the "folded stacks" format understood by flame graph tools
+    such as ``flamegraph.pl`` and speedscope: one line per call stack, with the frames
+    separated by semicolons and followed by the number of samples.
+
+    Parameters
+    ----------
+    interval
+        Time (in seconds) between samples.
+    """
+
+    def __init__(self, interval: float = 0.005):
+        self.interval = interval
+        self._thread_id = 0
+        self._stacks: Counter[str] = Counter()
+        self._stopped = threading.Event()
+        self._sampler: threading.Thread | None = None
+
+    def __enter__(self) -> "SamplingProfiler":
+        self._thread_id = threading.get_ident()
+        self._stopped.clear()
+        self._sampler = threading.Thread(
+            target=self._sample, name="sampling-profiler", daemon=True
+        )
+        self._sampler.start()
+        return self
+
+    def __exit__(
+        self,
+        exc_type: type[BaseException] | None,
+        exc_value: BaseException | None,
+        traceback: TracebackType | None,
+    ) -> None:
+        self._stopped.set()
+        if self._sampler is not None:
+            self._sampler.join()
+
+    def folded(self) -> str:
+        """
+        Return the samples in the folded stacks format.
+        """
+        return "".join(f"{stack} {count}\n" for stack, count in self._stacks.items())
+
+    def _sample(self) -> None:
+        while not self._stopped.wait(self.interval):
+            frame = sys._current_frames().get(self._thread_id)
+            if frame is not None:
+                self._stacks[_stack(frame)] += 1
+
+
+def _stack(frame: FrameType | None) -> str:
+    names: list[str] = []
+    while frame is not None:
+        module = frame.f_globals.get("__name__", "?")
+        names.append(f"{module}.{frame.f_code.co_qualname}")
+        frame = frame.f_back
+    # The folded format lists the outermost frame first.
+    return ";".join(reversed(names)).replace(" ", "_")
+
+
+def profile_call(func: Callable[..., T], *args: Any) -> tuple[T, str]:
+    """
+    Run a function with a sampling profiler, and return its result together with the
+    profile in the folded stacks format.
+    """
+    with SamplingProfiler() as profiler:
+        result = func(*args)
+    return result, profiler.folded()
+
+
+@lru_cache
+def get_profile_store() -> DiskCache:
+    """
+    Return the store for profiles of requests.
+    """
+    return DiskCache(
+        directory=get_settings().cache_dir / "profiles",
+        max_bytes=_PROFILES_MAX_BYTES,
+    )
@@ -0,0 +1,289 @@
+import dataclasses
+import hashlib
+import json
+from contextlib import contextmanager
+from io import BytesIO
+from typing import Any, BinaryIO, Callable, Iterator, NamedTuple, Sequence, Tuple
+
+import matplotlib as mpl
+import matplotlib.pyplot as plt
+import numpy as np
+from astropy import units as u
+from astropy.coordinates import SkyCoord
+from astropy.units import Quantity
+from imephu.finder_chart import FinderChart
+from imephu.salt.finder_chart import (
+    GeneralProperties,
+    hrs_finder_chart,
+    nir_finder_chart,
+    rss_longslit_finder_chart,
+    rss_mos_finder_chart,
+    rss_smi_finder_chart,
+    salticam_finder_chart,
+)
+
+from fcg.infrastructure.fits import downsample_fits
+from fcg.infrastructure.hedging import (
+    is_auto_survey,
+    load_fastest_survey_fits,
+    rank_surveys,
+    remember_survey_choice,
+    remembered_survey_choice,
+)
+from fcg.infrastructure.metrics import FINDER_CHART_STAGE_DURATION
+from fcg.infrastructure.surveys import load_survey_fits
+from fcg.infrastructure.types import OutputFormat
+
+_FINDER_CHART_BUILDERS: dict[str, Callable[..., FinderChart]] = {
+    "hrs": hrs_finder_chart,
+    "imaging": salticam_finder_chart,
+    "longslit": rss_longslit_finder_chart,
+    "mos": rss_mos_finder_chart,
+    "smi": rss_smi_finder_chart,
+    "nir": nir_finder_chart,
+    "slotmode": salticam_finder_chart,
+}
+
+
+# Width and height of the FITS images requested from image surveys.
+FITS_SIZE = 10 * u.arcmin
+
+# Width and height (in pixels) of the blocks of background image pixels which are
+# averaged for preview finder charts.
+_PREVIEW_BINNING = 3
+
+# Resolution (in dots per inch) of preview finder charts.
+_PREVIEW_DPI = 50
+
+
+class FinderChartSpec(NamedTuple):
+    """
+    Everything needed for generating a finder chart.
+
+    A spec is passed to a worker process, so all its values must be picklable.
+
+    Attributes
+    ----------
+    mode
+        The finder chart generation mode, such as "hrs" or "longslit".
+    general
+        The general finder chart properties. The survey is filled in when the finder
+        chart is generated.
+    background_image
+        The name of an image survey or the content of a custom FITS file. The survey
+        may be the automatic survey (see `resolve_auto_survey`).
+    fits_center
+        The center of the FITS image to request from the image survey.
+    output_format
+        The output format. A preview is a low-resolution PNG image rendered from a
+        downsampled background image.
+    options
+        Mode specific keyword arguments for the imephu finder chart function.
+    dpi
+        The resolution (in dots per inch) of a PNG finder chart. If this is None, the
+        default resolution is used.
+    fits
+        The FITS file of the image survey, if it has been loaded already. It is not
+        part of the finder chart's key, as it is determined by the other values.
+    """
+
+    mode: str
+    general: GeneralProperties
+    background_image: str | bytes
+    fits_center: SkyCoord
+    output_format: OutputFormat
+    options: dict[str, Any]
+    dpi: int | None = None
+    fits: bytes | None = None
+
+
+def render_finder_chart(spec: FinderChartSpec) -> bytes:
+    """
+    Load the FITS file for a finder chart, generate the finder chart and return it in
+    the requested output format.
+    """
+    return render_finder_chart_formats([spec])[0]
+
+
+def render_finder_chart_formats(specs: Sequence[FinderChartSpec]) -> list[bytes]:
+    """
+    Generate a finder chart and return it in the output formats of several specs.
+
+    The FITS file is loaded and the finder chart is built once, but its plot is drawn
+    for every output format. The specs must only differ in their output format and
+    resolution. As the
+    background image of a preview is downsampled, previews cannot be combined with
+    other output formats.
+    """
+    spec = specs[0]
+    for other in specs[1:]:
+        if other._replace(output_format=spec.output_format, dpi=spec.dpi) != spec:
+            raise ValueError("The specs must only differ in their output format.")
+        if (other.output_format == "preview") != (spec.output_format == "preview"):
+            raise ValueError("A preview cannot be combined with other output formats.")
+
+    with FINDER_CHART_STAGE_DURATION.time(mode=spec.mode, stage="fits"):
+        survey, fits = _fits_details(spec.background_image, spec.fits_center, spec.fits)
+        if spec.output_format == "preview":
+            fits = BytesIO(downsample_fits(fits.read(), _PREVIEW_BINNING))
+
+    # AstroPy uses random numbers when sampling the image for its brightness range.
+    # Seeding ensures that the same request always leads to the same finder chart.
+    with _seeded_global_random_state(0):
+        with FINDER_CHART_STAGE_DURATION.time(mode=spec.mode, stage="chart"):
+            general = dataclasses.replace(spec.general, survey=survey)
+            finder_chart = _FINDER_CHART_BUILDERS[spec.mode](
+                fits=fits, general=general, **spec.options
+            )
+
+    # The plot is drawn again for every output format, and the image is sampled
+    # again when drawing it. Reseeding for every output format ensures that each of
+    # them is the same as if it had been generated on its own.
+    contents: list[bytes] = []
+    for s in specs:
+        with FINDER_CHART_STAGE_DURATION.time(mode=spec.mode, stage="encoding"):
+            with _seeded_global_random_state(0):
+                contents.append(_encode(finder_chart, s.output_format, s.dpi))
+    return contents
+
+
+@contextmanager
+def _seeded_global_random_state(seed: int) -> Iterator[None]:
+    # AstroPy uses NumPy's global random number generator, which cannot be replaced
+    # with a local one. As finder charts may be rendered in the server process, the
+    # previous state is restored afterwards.
+    state = np.random.get_state()
+    np.random.seed(seed)
+    try:
+        yield
+    finally:
+        np.random.set_state(state)
+
+
+def _encode(
+    finder_chart: FinderChart, output_format: OutputFormat, dpi: int | None
+) -> bytes:
+    content = BytesIO()
+    if output_format == "preview":
+        # The plot is created as in FinderChart.save, but saved without a tight
+        # bounding box, as computing that requires drawing the plot twice.
+        # _create_plot is private, which is why imephu is pinned to an exact version.
+        figure = finder_chart._create_plot()
+        try:
+            figure.savefig(content, format="png", dpi=_PREVIEW_DPI)
+        finally:
+            plt.close(figure)
+        return content.getvalue()
+    if dpi is not None:
+        with mpl.rc_context({"savefig.dpi": dpi}):
+            finder_chart.save(content, format=output_format)
+    else:
+        finder_chart.save(content, format=output_format)
+    return content.getvalue()
+
+
+def resolve_auto_survey(
+    spec: FinderChartSpec,
+    is_cached: Callable[[FinderChartSpec], bool] | None = None,
+) -> FinderChartSpec:
+    """
+    Replace the automatic image survey of a spec with a survey covering its position.
+
+    The survey chosen for the same position before is used if it isn't failing.
+    Otherwise the first of the ranked surveys (see `rank_surveys`) for which
+    ``is_cached`` returns True is used, as its finder chart needs no FITS file.
+
+    Only if neither exists, the FITS file is requested from the surveys and the
+    survey delivering first is used. The FITS file is included in the returned spec,
+    so that it isn't loaded again for rendering.
+
+    Specs with any other background image are returned unchanged.
+
+    Parameters
+    ----------
+    spec
+        The finder chart spec.
+    is_cached
+        A function returning whether the finder chart for a spec is cached.
+    """
+    if not isinstance(spec.background_image, str) or not is_auto_survey(
+        spec.background_image
+    ):
+        return spec
+    survey = remembered_survey_choice(spec.fits_center, FITS_SIZE)
+    if survey is None and is_cached is not None:
+        survey = next(
+            (
+                s
+                for s in rank_surveys(spec.fits_center)
+                if is_cached(spec._replace(background_image=s))
+            ),
+            None,
+        )
+    if survey is not None:
+        remember_survey_choice(spec.fits_center, FITS_SIZE, survey)
+        return spec._replace(background_image=survey)
+
+    survey, fits = load_fastest_survey_fits(spec.fits_center, FITS_SIZE)
+    remember_survey_choice(spec.fits_center, FITS_SIZE, survey)
+    return spec._replace(background_image=survey, fits=fits.read())
+
+
+def finder_chart_key(spec: FinderChartSpec) -> str:
+    """
+    Return a key which uniquely identifies the finder chart for a spec.
+
+    The key is a hash of a canonical representation of the spec. Uploaded files enter
+    it as hashes of their content.
+    """
+    fields = spec._asdict()
+    del fields["fits"]
+    if fields["dpi"] is None:
+        # The default resolution is left out, so that the keys of finder charts
+        # cached before the resolution could be chosen remain valid.
+        del fields["dpi"]
+    canonical = json.dumps(_canonical(fields), sort_keys=True)
+    return hashlib.sha256(canonical.encode("utf-8")).hexdigest()
+
+
+def _canonical(value: Any) -> Any:
+    if value is None or isinstance(value, (str, bool, int, float)):
+        return value
+    if isinstance(value, bytes):
+        return {"sha256": hashlib.sha256(value).hexdigest()}
+    if isinstance(value, SkyCoord):
+        icrs = value.icrs
+        return {"ra": f"{icrs.ra.deg:.9f}", "dec": f"{icrs.dec.deg:.9f}"}
+    if isinstance(value, Quantity):
+        if value.unit.physical_type == "angle":
+            return f"{value.to_value(u.deg):.9f}deg"
+        return f"{value.value:.9g}{value.unit}"
+    if isinstance(value, dict):
+        return {str(k): _canonical(v) for k, v in value.items()}
+    if isinstance(value, (list, tuple)):
+        return [_canonical(v) for v in value]
+    if dataclasses.is_dataclass(value) and not isinstance(value, type):
+        return _canonical(
+            {f.name: getattr(value, f.name) for f in dataclasses.fields(value)}
+        )
+    if hasattr(value, "__dict__"):
+        # Other objects (such as MOS masks) are represented by their content.
+        return {type(value).__name__: _canonical(vars(value))}
+    raise ValueError(f"Unsupported value in finder chart spec: {value!r}")
+
+
+def _fits_details(
+    background_image: str | bytes, fits_center: SkyCoord, fits: bytes | None
+) -> Tuple[str, BinaryIO]:
+    if isinstance(background_image, str) and fits is not None:
+        return background_image, BytesIO(fits)
+    elif isinstance(background_image, str) and is_auto_survey(background_image):
+        return load_fastest_survey_fits(fits_center, FITS_SIZE)
+    elif isinstance(background_image, str):
+        survey = background_image
+        return survey, load_survey_fits(
+            survey=survey, fits_center=fits_center, size=FITS_SIZE
+        )
+    else:
+        survey = ""
+        return survey, BytesIO(background_image)
@@ -0,0 +1,57 @@
+import time
+from typing import Sequence
+
+from starlette.datastructures import MutableHeaders
+from starlette.types import ASGIApp, Message, Receive, Scope, Send
+
+from fcg.infrastructure.metrics import collect_timings
+
+
+class ServerTimingMiddleware:
+    """
+    ASGI middleware adding a ``Server-Timing`` header with the durations of the
+    request stages to responses.
+
+    The stages are those observed by histograms with a timing label (see
+    `fcg.infrastructure.metrics.Histogram`) while the request is handled. The time
+    until the response is started is given as ``total``.
+
+    Parameters
+    ----------
+    app
+        The ASGI application.
+    paths
+        Prefixes of the paths of the requests to time.
+    """
+
+    def __init__(self, app: ASGIApp, paths: Sequence[str]):
+        self.app = app
+        self.paths = tuple(paths)
+
+    async def __call__(self, scope: Scope, receive: Receive, send: Send) -> None:
+        if scope["type"] != "http" or not scope["path"].startswith(self.paths):
+            await self.app(scope, receive, send)
+            return
+
+        started = time.perf_counter()
+        with collect_timings() as timings:
+
+            async def send_with_timings(message: Message) -> None:
+                if message["type"] == "http.response.start":
+                    headers = MutableHeaders(scope=message)
+                    headers.append(
+                        "Server-Timing",
+                        server_timing(timings, time.perf_counter() - started),
+                    )
+                await send(message)
+
+            await self.app(scope, receive, send_with_timings)
+
+
+def server_timing(timings: dict[str, float], total: float) -> str:
+    """
+    Return the value of a ``Server-Timing`` header for stage durations and the total
+    duration (all in seconds).
+    """
+    metrics = [*timings.items(), ("total", total)]
+    return ", ".join(f"{name};dur={1000 * duration:.1f}" for name, duration in metrics)
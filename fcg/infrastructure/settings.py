@@ -0,0 +1,199 @@
+import os
+import pathlib
+from functools import lru_cache
+from typing import NamedTuple
+
+
+class Settings(NamedTuple):
+    """
+    Settings for the Finder Chart Generator.
+
+    All settings are read from environment variables with the prefix ``FCG_``.
+    """
+
+    # Number of worker processes for rendering finder charts. If this is 0, finder
+    # charts are rendered in the request handler. This should only be used for
+    # development and testing.
+    render_workers: int
+
+    # Number of finder charts which may wait for a free worker process. Any further
+    # request is rejected.
+    render_queue_depth: int
+
+    # Time (in seconds) after which a finder chart request is given up.
+    render_timeout: float
+
+    # Number of tasks after which a render worker process is replaced. If this is 0,
+    # render worker processes are not replaced after a number of tasks.
+    render_max_tasks: int
+
+    # Resident set size (in bytes) of a render worker process after a task above which
+    # the render worker processes are replaced. If this is 0, the memory usage of
+    # render worker processes is not checked.
+    render_max_rss: int
+
+    # Whether to warm up the server and its worker processes at startup by importing
+    # modules, loading caches and rendering a throwaway finder chart.
+    warm_up: bool
+
+    # Number of server worker processes when the server is run with Gunicorn.
+    server_workers: int
+
+    # Number of requests after which a server worker process is replaced. If this is
+    # 0, server worker processes are not replaced after a number of requests.
+    server_max_requests: int
+
+    # Resident set size (in bytes) above which a server worker process is replaced. If
+    # this is 0, the memory usage of server worker processes is not checked.
+    server_max_rss: int
+
+    # Token which must be passed in the X-Admin-Token header of requests for admin
+    # features such as profiling. If this is empty, admin features are disabled.
+    admin_token: str
+
+    # Directory for cached files.
+    cache_dir: pathlib.Path
+
+    # Maximum total size (in bytes) of the cached survey FITS files. If this is 0,
+    # survey FITS files are not cached.
+    fits_cache_max_bytes: int
+
+    # Grid spacing (in arcseconds) to which FITS centers are snapped before a survey
+    # FITS file is requested.
+    fits_cache_resolution: float
+
+    # Maximum total size (in bytes) of the cached finder charts. If this is 0, finder
+    # charts are not cached.
+    chart_cache_max_bytes: int
+
+    # Base URL of a survey server to request survey FITS files from, such as the local
+    # stand-in server in benchmarks.survey_server. If this is empty, the image surveys
+    # are queried directly.
+    survey_url: str
+
+    # Whether responses from JPL Horizons and the image surveys are recorded
+    # ("record"), replayed from earlier recordings ("replay") or neither ("off").
+    cassette_mode: str
+
+    # Directory for the recorded responses.
+    cassette_dir: pathlib.Path
+
+    # Factor by which the recorded response times are multiplied when responses are
+    # replayed. If this is 0, replayed responses are returned immediately.
+    cassette_time_scale: float
+
+    # Width and height (in arcminutes) of the survey tiles from which survey FITS files
+    # are cropped. If this is 0, survey FITS files are requested directly.
+    survey_tile_size: float
+
+    # Time (in seconds) after which a request to an image survey is given up. Slower
+    # requests count as failures for the survey's circuit breaker.
+    survey_timeout: float
+
+    # Number of consecutive failed requests to an image survey after which further
+    # requests fail immediately. If this is 0, requests never fail immediately.
+    survey_breaker_failures: int
+
+    # Time (in seconds) for which requests to a failing image survey fail
+    # immediately, before a probe request is made.
+    survey_breaker_reset: float
+
+    # Time (in seconds) after which a second survey is requested for the automatic
+    # image survey, as long as there are too few requests to the first survey for
+    # using its 90th latency percentile instead.
+    survey_hedge_delay: float
+
+    # Maximum number of targets in a batch of finder charts.
+    batch_max_targets: int
+
+    # Maximum number of targets in a target list which is validated.
+    target_list_max_targets: int
+
+    # Maximum number of finder chart generation jobs run at the same time by a
+    # process.
+    job_workers: int
+
+    # Time (in seconds) after which finder chart generation jobs and their results
+    # are deleted.
+    job_retention: float
+
+    # Time (in seconds) after which a JPL Horizons query is given up.
+    horizons_timeout: float
+
+    # Maximum number of ephemerides requested in a single JPL Horizons query. Longer
+    # time spans are split into several queries.
+    horizons_chunk_size: int
+
+    # Maximum number of JPL Horizons queries made at the same time for a request.
+    horizons_concurrency: int
+
+    # Time (in minutes) between the ephemerides queried from JPL Horizons if
+    # ephemerides are interpolated.
+    horizons_interpolation_interval: int
+
+    # Time (in seconds) for which ephemerides queried from JPL Horizons are cached. If
+    # this is 0, ephemerides are not cached.
+    horizons_cache_ttl: float
+
+
+def _int_env(name: str, default: int) -> int:
+    return int(os.environ.get(name, default))
+
+
+def _bool_env(name: str, default: bool) -> bool:
+    return os.environ.get(name, str(default)).lower() in ("1", "true", "yes")
+
+
+def _float_env(name: str, default: float) -> float:
+    return float(os.environ.get(name, default))
+
+
+@lru_cache
+def get_settings() -> Settings:
+    """
+    Return the settings.
+
+    The environment variables are only read when this function is called for the
+    first time.
+    """
+    cache_dir = pathlib.Path(
+        os.environ.get("FCG_CACHE_DIR", pathlib.Path.home() / ".cache" / "fcg")
+    )
+    return Settings(
+        render_workers=_int_env("FCG_RENDER_WORKERS", os.cpu_count() or 1),
+        render_queue_depth=_int_env("FCG_RENDER_QUEUE_DEPTH", 32),
+        render_timeout=_float_env("FCG_RENDER_TIMEOUT", 120),
+        render_max_tasks=_int_env("FCG_RENDER_MAX_TASKS", 500),
+        render_max_rss=_int_env("FCG_RENDER_MAX_RSS", 1024**3),
+        warm_up=_bool_env("FCG_WARM_UP", True),
+        server_workers=_int_env("FCG_SERVER_WORKERS", 2),
+        server_max_requests=_int_env("FCG_SERVER_MAX_REQUESTS", 1000),
+        server_max_rss=_int_env("FCG_SERVER_MAX_RSS", 1024**3),
+        admin_token=os.environ.get("FCG_ADMIN_TOKEN", ""),
+        cache_dir=cache_dir,
+        fits_cache_max_bytes=_int_env("FCG_FITS_CACHE_MAX_BYTES", 1024**3),
+        fits_cache_resolution=_float_env("FCG_FITS_CACHE_RESOLUTION", 0.1),
+        chart_cache_max_bytes=_int_env("FCG_CHART_CACHE_MAX_BYTES", 256 * 1024**2),
+        survey_url=os.environ.get("FCG_SURVEY_URL", ""),
+        cassette_mode=os.environ.get("FCG_CASSETTE_MODE", "off").lower(),
+        cassette_dir=pathlib.Path(
+            os.environ.get("FCG_CASSETTE_DIR", cache_dir / "cassettes")
+        ),
+        cassette_time_scale=_float_env("FCG_CASSETTE_TIME_SCALE", 1),
+        survey_tile_size=_float_env("FCG_SURVEY_TILE_SIZE", 30),
+        survey_timeout=_float_env("FCG_SURVEY_TIMEOUT", 60),
+        survey_breaker_failures=_int_env("FCG_SURVEY_BREAKER_FAILURES", 5),
+        survey_breaker_reset=_float_env("FCG_SURVEY_BREAKER_RESET", 30),
+        survey_hedge_delay=_float_env("FCG_SURVEY_HEDGE_DELAY", 5),
+        batch_max_targets=_int_env("FCG_BATCH_MAX_TARGETS", 200),
+        target_list_max_targets=_int_env("FCG_TARGET_LIST_MAX_TARGETS", 10000),
+        job_workers=_int_env("FCG_JOB_WORKERS", os.cpu_count() or 1),
+        job_retention=_float_env("FCG_JOB_RETENTION", 24 * 3600),
+        horizons_timeout=_float_env("FCG_HORIZONS_TIMEOUT", 60),
+        horizons_chunk_size=_int_env("FCG_HORIZONS_CHUNK_SIZE", 1000),
+        horizons_concurrency=_int_env("FCG_HORIZONS_CONCURRENCY", 4),
+        horizons_interpolation_interval=_int_env(
+            "FCG_HORIZONS_INTERPOLATION_INTERVAL", 60
+        ),
+        horizons_cache_ttl=_float_env("FCG_HORIZONS_CACHE_TTL", 24 * 3600),
+    )
@@ -0,0 +1,156 @@
+import asyncio
+import fcntl
+import hashlib
+import os
+import pathlib
+from contextlib import asynccontextmanager, contextmanager
+from typing import (
+    IO,
+    AsyncIterator,
+    Awaitable,
+    Callable,
+    Generic,
+    Iterator,
+    TypeVar,
+)
+
+T = TypeVar("T")
+
+# Number of lock files per directory for striped locks. Keys are mapped to lock files
+# by their hash, so that the number of files is bounded.
+_LOCK_STRIPES = 1024
+
+
+class SingleFlight(Generic[T]):
+    """
+    A registry of in-flight calls, which lets concurrent calls for the same key share
+    a single execution.
+
+    The registry only coalesces calls within an event loop. Use `file_lock` or
+    `async_file_lock` (together with a cache) for coalescing calls across processes.
+    """
+
+    def __init__(self) -> None:
+        self._calls: dict[str, asyncio.Future[T]] = dict()
+        self.coalesced = 0
+
+    async def do(self, key: str, func: Callable[[], Awaitable[T]]) -> T:
+        """
+        Return the result of calling ``func``, unless a call for the same key is in
+        flight already. In the latter case the result of that call is returned.
+
+        A call continues if the caller which started it is cancelled, as other callers
+        may be waiting for it.
+        """
+        future = self._calls.get(key)
+        if future is not None and future.get_loop() is asyncio.get_running_loop():
+            self.coalesced += 1
+            return await asyncio.shield(future)
+
+        task = asyncio.ensure_future(func())
+        self._calls[key] = task
+
+        def _remove(t: "asyncio.Future[T]") -> None:
+            if self._calls.get(key) is t:
+                del self._calls[key]
+
+        task.add_done_callback(_remove)
+        return await asyncio.shield(task)
+
+    def __len__(self) -> int:
+        return len(self._calls)
+
+
+def _lock_path(directory: pathlib.Path, key: str, striped: bool) -> pathlib.Path:
+    digest = hashlib.sha256(key.encode("utf-8")).hexdigest()
+    if not striped:
+        return directory / f".lock-{digest}"
+    stripe = int(digest[:8], 16) % _LOCK_STRIPES
+    return directory / f".lock-{stripe:04d}"
+
+
+@contextmanager
+def file_lock(
+    directory: pathlib.Path, key: str, striped: bool = True
+) -> Iterator[None]:
+    """
+    Hold an exclusive lock for a key, which is shared by all processes using the same
+    directory.
+
+    By default keys share a bounded number of lock files, so that a lock may hold up
+    other keys than its own. If ``striped`` is False, the key gets a lock file of its
+    own instead, which is removed when the lock is released. This should be used for
+    locks which are held while waiting for a slow service.
+    """
+    directory.mkdir(parents=True, exist_ok=True)
+    path = _lock_path(directory, key, striped)
+    while True:
+        f = open(path, "a")
+        try:
+            fcntl.flock(f, fcntl.LOCK_EX)
+        except BaseException:
+            f.close()
+            raise
+        if striped or _is_lock_file(f, path):
+            break
+        f.close()
+    try:
+        yield
+    finally:
+        _release(f, path, striped)
+
+
+@asynccontextmanager
+async def async_file_lock(
+    directory: pathlib.Path,
+    key: str,
+    poll_interval: float = 0.05,
+    striped: bool = True,
+) -> AsyncIterator[None]:
+    """
+    Hold an exclusive lock for a key, like `file_lock`, without blocking the event
+    loop while waiting for the lock.
+    """
+    directory.mkdir(parents=True, exist_ok=True)
+    path = _lock_path(directory, key, striped)
+    while True:
+        f = open(path, "a")
+        try:
+            while True:
+                try:
+                    fcntl.flock(f, fcntl.LOCK_EX | fcntl.LOCK_NB)
+                    break
+                except BlockingIOError:
+                    await asyncio.sleep(poll_interval)
+        except BaseException:
+            f.close()
+            raise
+        if striped or _is_lock_file(f, path):
+            break
+        f.close()
+    try:
+        yield
+    finally:
+        _release(f, path, striped)
+
+
+def _is_lock_file(f: IO[str], path: pathlib.Path) -> bool:
+    # A lock file of its own is removed by the process releasing the lock. A process
+    # which has opened the file before must then lock the new file instead.
+    try:
+        current = path.stat()
+    except FileNotFoundError:
+        return False
+    opened = os.fstat(f.fileno())
+    return (opened.st_dev, opened.st_ino) == (current.st_dev, current.st_ino)
+
+
+def _release(f: IO[str], path: pathlib.Path, striped: bool) -> None:
+    try:
+        if not striped:
+            # The file is removed while the lock is still held, so that no other
+            # process can lock it in the meantime.
+            path.unlink(missing_ok=True)
+        fcntl.flock(f, fcntl.LOCK_UN)
+    finally:
+        f.close()
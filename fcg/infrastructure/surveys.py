@@ -0,0 +1,503 @@
+import threading
+import time
+import urllib.parse
+import urllib.request
+from collections import deque
+from concurrent.futures import Future
+from functools import lru_cache
+from io import BytesIO
+from typing import BinaryIO, Callable, Sequence, TypeVar
+
+import numpy as np
+from astropy import units as u
+from astropy.coordinates import Angle, SkyCoord
+from imephu.service.survey import load_fits
+
+from fcg.infrastructure.cassettes import fetch_or_replay
+from fcg.infrastructure.circuit_breaker import CircuitBreaker
+from fcg.infrastructure.coverage import SURVEYS
+from fcg.infrastructure.disk_cache import DiskCache
+from fcg.infrastructure.fits import crop_fits
+from fcg.infrastructure.footprints import Footprint, FootprintIndex
+from fcg.infrastructure.metrics import (
+    CACHE_REQUESTS,
+    SURVEY_REJECTED_REQUESTS,
+    UPSTREAM_DURATION,
+)
+from fcg.infrastructure.settings import get_settings
+from fcg.infrastructure.single_flight import file_lock
+
+T = TypeVar("T")
+
+# Surveys which return the scanned plate pixels for any requested region. A region
+# cropped from a larger image is thus the same as the region requested directly.
+# (SkyView, on the other hand, resamples to a fixed number of pixels.)
+_TILED_SURVEYS = {
+    "poss2/ukstu red",
+    "poss2/ukstu blue",
+    "poss2/ukstu ir",
+    "poss1 red",
+    "poss1 blue",
+    "quick-v",
+    "hst phase2 (gsc2)",
+    "hst phase2 (gsc1)",
+}
+
+
+# Number of recent requests to a survey which its statistics are based on.
+_STATS_WINDOW = 100
+
+# Minimum number of successful requests to a survey for its latency percentiles.
+_STATS_MIN_SAMPLES = 5
+
+
+class SurveyStats:
+    """
+    Rolling latency and error statistics for the image surveys.
+
+    The duration and outcome of the last ``window`` requests to every survey are
+    kept. Survey names are case-insensitive. The statistics are kept per process, so
+    that every render worker has statistics of its own.
+
+    Parameters
+    ----------
+    window
+        The number of recent requests to keep per survey.
+    """
+
+    def __init__(self, window: int = _STATS_WINDOW):
+        self.window = window
+        self._lock = threading.Lock()
+        self._requests: dict[str, deque[tuple[float, bool]]] = dict()
+
+    def record(self, survey: str, duration: float, success: bool) -> None:
+        """
+        Record a request to a survey.
+
+        Parameters
+        ----------
+        survey
+            The name of the survey.
+        duration
+            The time (in seconds) the request took.
+        success
+            Whether the request has been successful.
+        """
+        with self._lock:
+            requests = self._requests.setdefault(
+                survey.lower(), deque(maxlen=self.window)
+            )
+            requests.append((duration, success))
+
+    def latency(self, survey: str, percentile: float) -> float | None:
+        """
+        Return a percentile of the durations of the successful requests to a survey,
+        or None if there have been too few of them.
+
+        Parameters
+        ----------
+        survey
+            The name of the survey.
+        percentile
+            The percentile, between 0 and 100.
+        """
+        with self._lock:
+            durations = [
+                duration
+                for duration, success in self._requests.get(survey.lower(), [])
+                if success
+            ]
+        if len(durations) < _STATS_MIN_SAMPLES:
+            return None
+        return float(np.percentile(durations, percentile))
+
+    def error_rate(self, survey: str) -> float:
+        """
+        Return the fraction of recent requests to a survey which have failed.
+        """
+        with self._lock:
+            requests = list(self._requests.get(survey.lower(), []))
+        if not requests:
+            return 0
+        return sum(1 for _, success in requests if not success) / len(requests)
+
+    def rank(self, surveys: Sequence[str], default_latency: float) -> list[str]:
+        """
+        Sort surveys by their expected time for a successful request.
+
+        The expected time is the median latency divided by the success rate. Surveys
+        with too few successful requests are assumed to have the default latency.
+        Surveys with the same expected time keep their order.
+
+        Parameters
+        ----------
+        surveys
+            The surveys to sort.
+        default_latency
+            The latency (in seconds) assumed for surveys without statistics.
+        """
+
+        def expected_time(survey: str) -> float:
+            latency = self.latency(survey, 50)
+            if latency is None:
+                latency = default_latency
+            return latency / max(1 - self.error_rate(survey), 0.01)
+
+        return sorted(surveys, key=expected_time)
+
+
+@lru_cache
+def get_survey_stats() -> SurveyStats:
+    """
+    Return the latency and error statistics for the image surveys.
+    """
+    return SurveyStats()
+
+
+def get_survey_breaker(survey: str) -> CircuitBreaker | None:
+    """
+    Return the circuit breaker for an image survey, or None if circuit breakers are
+    disabled.
+
+    The circuit breakers are shared by all processes using the same cache directory.
+    """
+    return _survey_breaker(survey.lower())
+
+
+@lru_cache
+def _survey_breaker(survey: str) -> CircuitBreaker | None:
+    settings = get_settings()
+    if settings.survey_breaker_failures <= 0:
+        return None
+    return CircuitBreaker(
+        survey,
+        failure_threshold=settings.survey_breaker_failures,
+        reset_timeout=settings.survey_breaker_reset,
+        directory=settings.cache_dir / "circuit-breakers",
+    )
+
+
+def get_survey_breakers() -> dict[str, CircuitBreaker]:
+    """
+    Return the circuit breakers of all image surveys, keyed by survey name.
+    """
+    breakers = {survey: get_survey_breaker(survey) for survey in SURVEYS}
+    return {
+        survey: breaker for survey, breaker in breakers.items() if breaker is not None
+    }
+
+
+class SurveyUnavailableError(Exception):
+    """
+    Raised if an image survey is not requested because it has been failing.
+    """
+
+    def __init__(self, survey: str):
+        super().__init__(survey)
+        self.survey = survey
+
+    def __str__(self) -> str:
+        return (
+            f"The {self.survey} image survey is currently unavailable. Please try "
+            f"again later or choose another image survey."
+        )
+
+
+class SurveyTimeoutError(Exception):
+    """
+    Raised if an image survey does not respond within the survey timeout.
+    """
+
+    def __init__(self, survey: str, timeout: float):
+        super().__init__(survey, timeout)
+        self.survey = survey
+        self.timeout = timeout
+
+    def __str__(self) -> str:
+        return (
+            f"The {self.survey} image survey did not respond within "
+            f"{self.timeout:g} seconds. Please try again later or choose another "
+            f"image survey."
+        )
+
+
+@lru_cache
+def get_fits_cache() -> DiskCache | None:
+    """
+    Return the cache for survey FITS files, or None if caching is disabled.
+    """
+    settings = get_settings()
+    if settings.fits_cache_max_bytes <= 0:
+        return None
+    return DiskCache(
+        directory=settings.cache_dir / "fits",
+        max_bytes=settings.fits_cache_max_bytes,
+    )
+
+
+@lru_cache
+def get_footprint_index() -> FootprintIndex:
+    """
+    Return the index of the survey tiles in the FITS cache.
+    """
+    settings = get_settings()
+    cache = get_fits_cache()
+    return FootprintIndex(
+        cell_size=settings.survey_tile_size / 60,
+        path=settings.cache_dir / "fits" / ".footprints",
+        # Footprints of tiles evicted from the cache are dropped when the file of
+        # footprints is compacted.
+        is_live=(lambda footprint: footprint.key in cache) if cache else None,
+    )
+
+
+def load_survey_fits(
+    survey: str,
+    fits_center: SkyCoord,
+    size: Angle,
+    is_valid: Callable[[bytes], bool] | None = None,
+) -> BinaryIO:
+    """
+    Load a FITS file from an image survey.
+
+    The FITS center is snapped to a grid with the spacing given by the
+    ``fits_cache_resolution`` setting, and the FITS file is cached for the snapped
+    center. So requests for (almost) the same position share a FITS file.
+
+    For surveys which don't resample their images, a larger tile (with the size given
+    by the ``survey_tile_size`` setting) is requested instead, and the FITS file is
+    cropped from it. Later requests for regions inside a cached tile are served from
+    that tile.
+
+    Concurrent requests (in any process) for regions which can be cropped from the
+    same tile only lead to a single survey query.
+
+    If ``is_valid`` is given, a survey response for which it returns False is
+    recorded as a failed request in the survey statistics, is not cached, and leads
+    to a `ValueError`. Cached FITS files are not checked.
+    """
+    cache = get_fits_cache()
+    if cache is None:
+        return _query_survey(survey, fits_center, size, is_valid)
+
+    fits_center = canonical_fits_center(fits_center)
+    key = fits_cache_key(survey, fits_center, size)
+    tile_size = get_settings().survey_tile_size * u.arcmin
+
+    if survey.lower() in _TILED_SURVEYS and tile_size > size:
+        content = _load_from_tile(cache, survey, fits_center, size, tile_size, is_valid)
+        if content is not None:
+            return BytesIO(content)
+
+    # The lock is not held while the survey is queried, so that a slow survey does not
+    # hold up requests whose keys share the lock.
+    with file_lock(cache.directory, key):
+        content = cache.get(key)
+    CACHE_REQUESTS.inc(cache="fits", result="hit" if content is not None else "miss")
+    if content is None:
+        content = _query_survey(survey, fits_center, size, is_valid).read()
+        with file_lock(cache.directory, key):
+            cache.put(key, content)
+    return BytesIO(content)
+
+
+def shared_tiles(
+    fields: Sequence[tuple[str, SkyCoord] | None], size: Angle
+) -> list[int]:
+    """
+    Group FITS requests by the survey tile they can be cropped from.
+
+    Each field is given as a survey and a FITS center, or as None if it doesn't
+    require a survey FITS file. For every field the index of the first field whose
+    tile contains it is returned. Loading the FITS files for the first field of every
+    group before those for the others lets the others be served from the cached tile.
+
+    Fields which cannot be cropped from a tile form a group of their own.
+    """
+    groups = list(range(len(fields)))
+    tile_size = get_settings().survey_tile_size * u.arcmin
+    if get_fits_cache() is None or tile_size <= size:
+        return groups
+
+    index = FootprintIndex(cell_size=tile_size.to_value(u.deg))
+    for i, field in enumerate(fields):
+        if field is None or field[0].lower() not in _TILED_SURVEYS:
+            continue
+        survey, fits_center = field
+        fits_center = canonical_fits_center(fits_center)
+        ra = fits_center.ra.to_value(u.deg)
+        dec = fits_center.dec.to_value(u.deg)
+        footprints = index.find(survey, ra, dec, size.to_value(u.deg))
+        if footprints:
+            groups[i] = min(int(footprint.key) for footprint in footprints)
+        else:
+            index.add(
+                Footprint(
+                    survey=survey.lower(),
+                    ra=ra,
+                    dec=dec,
+                    size=tile_size.to_value(u.deg),
+                    key=str(i),
+                )
+            )
+    return groups
+
+
+def canonical_fits_center(fits_center: SkyCoord) -> SkyCoord:
+    """
+    Return the FITS center snapped to the grid used by the FITS cache.
+    """
+    resolution = get_settings().fits_cache_resolution
+    ra = round(fits_center.ra.to_value(u.arcsec) / resolution) * resolution
+    dec = round(fits_center.dec.to_value(u.arcsec) / resolution) * resolution
+    return SkyCoord(ra=(ra % (360 * 3600)) * u.arcsec, dec=dec * u.arcsec)
+
+
+def fits_cache_key(survey: str, fits_center: SkyCoord, size: Angle) -> str:
+    """
+    Return the cache key for a FITS file.
+    """
+    return (
+        f"{survey.lower()}|{fits_center.ra.to_value(u.arcsec):.3f}"
+        f"|{fits_center.dec.to_value(u.arcsec):.3f}|{size.to_value(u.arcsec):.3f}"
+    )
+
+
+def _load_from_tile(
+    cache: DiskCache,
+    survey: str,
+    fits_center: SkyCoord,
+    size: Angle,
+    tile_size: Angle,
+    is_valid: Callable[[bytes], bool] | None,
+) -> bytes | None:
+    index = get_footprint_index()
+    ra = fits_center.ra.to_value(u.deg)
+    dec = fits_center.dec.to_value(u.deg)
+    content = _crop_from_cached_tile(cache, index, survey, fits_center, size)
+    if content is not None:
+        return content
+
+    # Concurrent requests for regions in the same part of the sky wait for the first
+    # one to load its tile, and then crop their region from that tile if possible. As
+    # the lock is held while the survey is queried, it isn't shared with other keys.
+    tile_lock_key = f"tile|{survey.lower()}|{index.cell(ra, dec)}"
+    with file_lock(cache.directory, tile_lock_key, striped=False):
+        content = _crop_from_cached_tile(cache, index, survey, fits_center, size)
+        if content is not None:
+            return content
+
+        key = fits_cache_key(survey, fits_center, tile_size)
+        tile = _query_survey(survey, fits_center, tile_size, is_valid).read()
+        cache.put(key, tile)
+        index.add(
+            Footprint(
+                survey=survey.lower(),
+                ra=ra,
+                dec=dec,
+                size=tile_size.to_value(u.deg),
+                key=key,
+            )
+        )
+
+    # The survey may have returned a smaller image, for example at the edge of a
+    # plate. In this case None is returned, and the region is requested directly.
+    return crop_fits(tile, fits_center, size)
+
+
+def _crop_from_cached_tile(
+    cache: DiskCache,
+    index: FootprintIndex,
+    survey: str,
+    fits_center: SkyCoord,
+    size: Angle,
+) -> bytes | None:
+    ra = fits_center.ra.to_value(u.deg)
+    dec = fits_center.dec.to_value(u.deg)
+    for footprint in index.find(survey, ra, dec, size.to_value(u.deg)):
+        tile = cache.get(footprint.key)
+        if tile is None:
+            # The tile has been evicted from the cache.
+            index.discard(footprint)
+            continue
+        content = crop_fits(tile, fits_center, size)
+        if content is not None:
+            CACHE_REQUESTS.inc(cache="fits", result="hit")
+            return content
+    return None
+
+
+def _query_survey(
+    survey: str,
+    fits_center: SkyCoord,
+    size: Angle,
+    is_valid: Callable[[bytes], bool] | None = None,
+) -> BinaryIO:
+    survey_url = get_settings().survey_url
+    request = {
+        "survey": survey,
+        "ra": f"{fits_center.ra.to_value(u.deg):.9f}",
+        "dec": f"{fits_center.dec.to_value(u.deg):.9f}",
+        "size": f"{size.to_value(u.arcmin):.6f}",
+    }
+
+    def fetch() -> bytes:
+        if survey_url:
+            return _query_survey_server(survey_url, request)
+        return load_fits(survey=survey, fits_center=fits_center, size=size).read()
+
+    # Requests to a failing survey fail immediately rather than waiting for a timeout.
+    breaker = get_survey_breaker(survey)
+    if breaker is not None and not breaker.allow_request():
+        SURVEY_REJECTED_REQUESTS.inc(survey=survey.lower())
+        raise SurveyUnavailableError(survey)
+
+    timeout = get_settings().survey_timeout
+    started = time.perf_counter()
+    try:
+        with UPSTREAM_DURATION.time(service="survey"):
+            content = _call_with_timeout(
+                lambda: fetch_or_replay("survey", request, fetch), timeout
+            )
+        # An invalid response counts as a failed request rather than a successful
+        # one.
+        if is_valid is not None and not is_valid(content):
+            raise ValueError(f"The {survey} survey has returned an invalid FITS file.")
+    except Exception as e:
+        get_survey_stats().record(survey, time.perf_counter() - started, False)
+        if breaker is not None:
+            breaker.record_failure()
+        if isinstance(e, TimeoutError):
+            raise SurveyTimeoutError(survey, timeout) from None
+        raise
+    get_survey_stats().record(survey, time.perf_counter() - started, True)
+    if breaker is not None:
+        breaker.record_success()
+    return BytesIO(content)
+
+
+def _call_with_timeout(func: Callable[[], T], timeout: float) -> T:
+    # imephu doesn't time out survey requests. So the call is made in a daemon
+    # thread, which is abandoned if it doesn't finish in time. A TimeoutError is
+    # raised in this case.
+    future: Future[T] = Future()
+
+    def run() -> None:
+        try:
+            future.set_result(func())
+        except BaseException as e:
+            future.set_exception(e)
+
+    threading.Thread(target=run, daemon=True).start()
+    return future.result(timeout=timeout)
+
+
+def _query_survey_server(url: str, request: dict[str, str]) -> bytes:
+    if urllib.parse.urlparse(url).scheme not in ("http", "https"):
+        raise ValueError(f"Unsupported survey server URL: {url}")
+    query = urllib.parse.urlencode(request)
+    # The URL scheme has been checked above.
+    with urllib.request.urlopen(  # nosec B310
+        f"{url}?{query}", timeout=get_settings().survey_timeout
+    ) as response:
+        return bytes(response.read())
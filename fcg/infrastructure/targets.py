@@ -0,0 +1,126 @@
+from typing import Mapping, NamedTuple, Sequence
+
+import numpy as np
+import numpy.typing as npt
+
+from fcg.infrastructure.coverage import get_coverage_index
+from fcg.infrastructure.hedging import AUTO_SURVEY
+from fcg.infrastructure.parse import parse_angle_column
+
+# Error messages for missing values, which are the same as for the form fields.
+_MISSING_MESSAGES = {
+    "target": "The target is missing.",
+    "right_ascension": "The right ascension is missing.",
+    "declination": "The declination is missing.",
+}
+
+
+class TargetColumns(NamedTuple):
+    """
+    The columns of a validated target list.
+
+    Angles are given in degrees. Invalid values and missing position angles are NaN.
+
+    Attributes
+    ----------
+    target
+        The target names.
+    right_ascension
+        The right ascensions.
+    declination
+        The declinations.
+    position_angle
+        The position angles.
+    """
+
+    target: list[str]
+    right_ascension: npt.NDArray[np.float64]
+    declination: npt.NDArray[np.float64]
+    position_angle: npt.NDArray[np.float64]
+
+
+def validate_target_list(
+    targets: Sequence[Mapping[str, str]], shared: Mapping[str, str]
+) -> tuple[TargetColumns, dict[str, str]]:
+    """
+    Validate the names, positions and position angles of a list of targets, and check
+    whether the targets are covered by the image survey.
+
+    Each column is parsed as a whole rather than target by target. Target fields take
+    precedence over the shared ones. The position angle is optional, and the coverage
+    is only checked if there is an image survey.
+
+    The validated columns are returned together with the errors. An error for a
+    target's own field is keyed by the target's index (such as
+    ``targets[3].declination``), whereas an error for a shared field is keyed by the
+    field name. Survey coverage errors are always keyed by the target's index. The
+    error messages are the same as for the finder chart form.
+
+    Parameters
+    ----------
+    targets
+        The targets, as dictionaries of field names and values.
+    shared
+        The fields shared by all targets.
+    """
+    errors: dict[str, str] = dict()
+
+    def column(field: str) -> list[str]:
+        return [target.get(field, shared.get(field, "")).strip() for target in targets]
+
+    def error_key(index: int, field: str) -> str:
+        return f"targets[{index}].{field}" if field in targets[index] else field
+
+    def add_errors(field: str, texts: list[str], row_errors: list[str | None]) -> None:
+        for i, error in enumerate(row_errors):
+            if not texts[i] and field in _MISSING_MESSAGES:
+                errors[error_key(i, field)] = _MISSING_MESSAGES[field]
+            elif error is not None and texts[i]:
+                errors[error_key(i, field)] = error
+
+    names = column("target")
+    add_errors("target", names, [None] * len(names))
+
+    angles: dict[str, npt.NDArray[np.float64]] = dict()
+    for field in ("right_ascension", "declination", "position_angle"):
+        texts = column(field)
+        angles[field], row_errors = parse_angle_column(texts, field)
+        add_errors(field, texts, row_errors)
+
+    # The coverage is checked for all targets with the same survey at once. As it
+    # depends on the target position, coverage errors are always keyed by the index.
+    # The automatic survey is chosen among the surveys covering the target.
+    survey_texts = column("image_survey")
+    surveys = np.array([survey.lower() for survey in survey_texts], dtype=str)
+    has_position = ~(
+        np.isnan(angles["right_ascension"]) | np.isnan(angles["declination"])
+    )
+    for survey in np.unique(surveys[(surveys != "") & (surveys != AUTO_SURVEY)]):
+        rows = np.flatnonzero(surveys == survey)
+        try:
+            index = get_coverage_index(str(survey))
+        except ValueError:
+            for i in rows:
+                errors[error_key(i, "image_survey")] = (
+                    f"Unknown image survey: {survey_texts[i]}"
+                )
+            continue
+        rows = rows[has_position[rows]]
+        covered = index.covers_many(
+            angles["right_ascension"][rows], angles["declination"][rows]
+        )
+        for i in rows[~covered]:
+            errors[f"targets[{i}].image_survey"] = (
+                "The image survey does not cover the selected right ascension and "
+                "declination."
+            )
+
+    return (
+        TargetColumns(
+            target=names,
+            right_ascension=angles["right_ascension"],
+            declination=angles["declination"],
+            position_angle=angles["position_angle"],
+        ),
+        errors,
+    )
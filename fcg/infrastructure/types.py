@@ -1,6 +1,21 @@
 from typing import Literal, NamedTuple
 
-OutputFormat = Literal["pdf", "png"]
+OutputFormat = Literal["pdf", "png", "preview"]
+
+
+class ChartFormat(NamedTuple):
+    """
+    An output format of a finder chart, with the resolution (in dots per inch) for
+    raster images. A resolution of None means the default resolution.
+    """
+
+    output_format: OutputFormat
+    dpi: int | None = None
+
+
+BatchFormat = Literal["zip", "pdf"]
+
+EphemeridesFormat = Literal["json", "ndjson", "columns", "npz"]
 
 
 class MagnitudeRange(NamedTuple):
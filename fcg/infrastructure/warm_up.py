@@ -0,0 +1,99 @@
+import importlib
+import time
+from typing import Callable
+
+from fcg.infrastructure.coverage import build_coverage_indexes
+
+# The modules which are needed for generating finder charts.
+_MODULES = (
+    "astropy.coordinates",
+    "astropy.io.fits",
+    "astropy.wcs",
+    "matplotlib.pyplot",
+    "imephu.salt.finder_chart",
+)
+
+# Width and height (in pixels) of the FITS image used for the throwaway finder chart.
+_FITS_PIXELS = 64
+
+
+def warm_up(render: bool = True, coverage: bool = False) -> dict[str, float]:
+    """
+    Do the work which otherwise would slow down the first finder chart request, and
+    return the time (in seconds) taken by each step.
+
+    The steps are importing the modules needed for generating finder charts, parsing
+    angles and coordinates with AstroPy, building the sky coverage indexes of the image
+    surveys, loading the Matplotlib font cache and rendering a throwaway finder chart
+    from a tiny FITS image. The coverage indexes are only built if ``coverage`` is
+    True, and the last two steps are skipped if ``render`` is False.
+    """
+    steps: list[tuple[str, Callable[[], object]]] = [
+        ("imports", _import_modules),
+        ("astropy", _parse_coordinates),
+    ]
+    if coverage:
+        steps.append(("coverage", build_coverage_indexes))
+    if render:
+        steps += [("fonts", _load_fonts), ("render", _render_finder_chart)]
+
+    durations: dict[str, float] = dict()
+    for name, step in steps:
+        started = time.perf_counter()
+        step()
+        durations[name] = time.perf_counter() - started
+    return durations
+
+
+def _import_modules() -> None:
+    for module in _MODULES:
+        importlib.import_module(module)
+
+
+def _parse_coordinates() -> None:
+    from astropy.coordinates import Angle, SkyCoord
+
+    # Parsing the first angle builds AstroPy's parser tables.
+    ra = Angle("11:20:24 hours")
+    dec = Angle("-55d30m")
+    SkyCoord(ra=ra, dec=dec).transform_to("galactic")
+
+
+def _load_fonts() -> None:
+    from matplotlib import font_manager
+
+    # This builds the font cache if it doesn't exist yet.
+    font_manager.findfont(font_manager.FontProperties())
+
+
+def _render_finder_chart() -> None:
+    from astropy import units as u
+    from astropy.coordinates import Angle, SkyCoord
+    from imephu.salt.finder_chart import GeneralProperties, Target
+
+    from fcg.infrastructure.fits import synthetic_fits
+    from fcg.infrastructure.rendering import (
+        FITS_SIZE,
+        FinderChartSpec,
+        render_finder_chart,
+    )
+
+    position = SkyCoord(ra=170.1 * u.deg, dec=-55.5 * u.deg)
+    general = GeneralProperties(
+        target=Target(name="Warm-up", position=position, magnitude_range=None),
+        position_angle=Angle(0 * u.deg),
+        automated_position_angle=False,
+        proposal_code="Warm-up",
+        pi_family_name="Warm-up",
+    )
+    spec = FinderChartSpec(
+        mode="imaging",
+        general=general,
+        background_image=synthetic_fits(
+            position, FITS_SIZE, pixels=_FITS_PIXELS, stars=5
+        ),
+        fits_center=position,
+        output_format="png",
+        options={"is_slot_mode": False},
+    )
+    render_finder_chart(spec)
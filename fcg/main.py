@@ -1,10 +1,29 @@
+import asyncio
+import json
+import logging
 import platform
+import time
+from contextlib import asynccontextmanager
+from typing import Any, AsyncIterator
 
 import matplotlib as mpl
 from fastapi import FastAPI
 from fastapi.staticfiles import StaticFiles
 
-from fcg.views import ephemerides, finder_charts, index
+from fcg.infrastructure.pool import get_render_pool, shutdown_render_pool
+from fcg.infrastructure.server_timing import ServerTimingMiddleware
+from fcg.infrastructure.settings import get_settings
+from fcg.infrastructure.warm_up import warm_up
+from fcg.views import (
+    coverage,
+    ephemerides,
+    finder_charts,
+    health,
+    index,
+    metrics,
+    profiles,
+    target_lists,
+)
 
 # The default macOS backend for Matplotlib leads to crashes, hence we specifically
 # choose the pdf one
@@ -12,10 +31,42 @@ if "darwin" in platform.system().lower():
     mpl.use("pdf")
 
 
-app = FastAPI()
+@asynccontextmanager
+async def lifespan(app: FastAPI) -> AsyncIterator[None]:
+    # Warm up the server and start the worker processes for rendering finder charts
+    # before accepting requests, so that the first requests don't have to wait.
+    settings = get_settings()
+    started = time.perf_counter()
+    startup_report: dict[str, Any] = dict()
+    if settings.warm_up:
+        # Without worker processes finder charts are rendered in this process.
+        startup_report["server"] = await asyncio.to_thread(
+            warm_up, render=settings.render_workers == 0, coverage=True
+        )
+    startup_report["workers"] = await asyncio.to_thread(get_render_pool().warm_up)
+    startup_report["total"] = time.perf_counter() - started
+    logging.log(logging.INFO, f"Startup time: {json.dumps(startup_report)}")
+
+    if settings.job_workers > 0:
+        finder_charts.get_job_runner().start()
+    app.state.startup_report = startup_report
+    yield
+    app.state.startup_report = None
+    await finder_charts.get_job_runner().stop()
+    shutdown_render_pool()
+
+
+app = FastAPI(lifespan=lifespan)
 
 app.mount("/static", StaticFiles(directory="static"), name="static")
 
 app.include_router(index.router)
+app.include_router(health.router)
+app.include_router(metrics.router)
+app.include_router(profiles.router)
+app.include_router(coverage.router)
+app.include_router(target_lists.router)
+
+app.add_middleware(ServerTimingMiddleware, paths=["/finder-charts", "/ephemerides"])
 app.include_router(finder_charts.router)
 app.include_router(ephemerides.router)
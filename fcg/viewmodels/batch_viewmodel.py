@@ -0,0 +1,52 @@
+from fastapi import Request
+from starlette.datastructures import FormData, UploadFile
+
+from fcg.infrastructure.settings import get_settings
+from fcg.infrastructure.types import BatchFormat
+from fcg.viewmodels import parse
+from fcg.viewmodels.base_viewmodel import BaseViewModel
+
+_BATCH_FIELDS = {"targets", "batch_format"}
+
+
+class BatchViewModel(BaseViewModel):
+    def __init__(self, request: Request):
+        super().__init__(request)
+        self.batch_format: BatchFormat = "zip"
+        self.targets: list[dict[str, str]] = []
+        self.shared_form: list[tuple[str, str | UploadFile]] = []
+        self.errors: dict[str, str] = dict()
+
+    async def load(self) -> None:
+        form = await self.request.form()
+
+        # batch format
+        self.batch_format = parse.parse_batch_format(form, self.errors)
+
+        # target list
+        targets = form.get("targets")
+        if isinstance(targets, UploadFile):
+            text = (await targets.read()).decode("utf-8-sig", errors="replace")
+        else:
+            text = targets or ""
+        self.targets = parse.parse_targets(
+            text, get_settings().batch_max_targets, self.errors
+        )
+
+        # fields shared by all targets
+        self.shared_form = [
+            (field, value)
+            for field, value in form.multi_items()
+            if field not in _BATCH_FIELDS
+        ]
+
+    def target_form(self, index: int) -> FormData:
+        """
+        Return the form for a target, which consists of the shared fields and the
+        target's own fields. The latter take precedence.
+        """
+        target = self.targets[index]
+        return FormData(
+            [(field, value) for field, value in self.shared_form if field not in target]
+            + list(target.items())
+        )
@@ -2,6 +2,7 @@ from datetime import datetime, timezone
 
 from starlette.requests import Request
 
+from fcg.infrastructure.types import EphemeridesFormat
 from fcg.viewmodels import parse
 from fcg.viewmodels.base_viewmodel import BaseViewModel
 from fcg.viewmodels.parse import (
@@ -18,6 +19,8 @@ class EphemeridesViewModel(BaseViewModel):
         self.output_interval = 0
         self.identifier = ""
         self.start = datetime.fromtimestamp(0, timezone.utc)
+        self.format: EphemeridesFormat = "json"
+        self.interpolate = False
 
     async def load(self) -> None:
         form = await self.request.form()
@@ -34,6 +37,12 @@ class EphemeridesViewModel(BaseViewModel):
         # start time
         self.start = parse_start_time(form, self.errors)
 
+        # format
+        self.format = parse.parse_ephemerides_format(form, self.errors)
+
+        # interpolate the ephemerides?
+        self.interpolate = parse.parse_interpolate(form, self.errors)
+
         # the start time must be earlier than the end time
         if "start" not in self.errors and "end" not in self.errors:
             if self.start >= self.end:
@@ -1,6 +1,6 @@
 from astropy.coordinates import Angle
 from fastapi import Request
-from starlette.datastructures import UploadFile
+from starlette.datastructures import FormData, UploadFile
 
 from fcg.infrastructure.types import OutputFormat
 from fcg.viewmodels import parse
@@ -18,8 +18,9 @@ class HrsViewModel(FormBaseViewModel):
         self.errors: dict[str, str] = dict()
 
     async def load(self) -> None:
-        form = await self.request.form()
+        self.load_form(await self.request.form())
 
+    def load_form(self, form: FormData) -> None:
         super().load_common_data(form)
 
         # right ascension
@@ -32,7 +33,9 @@ class HrsViewModel(FormBaseViewModel):
         self.position_angle = parse.parse_position_angle(form, self.errors)
 
         # background image
-        self.background_image = parse.parse_background_image(form, self.errors)
+        self.background_image = parse.parse_background_image(
+            form, self.errors, mode="hrs"
+        )
 
         # output format
         self.output_format = parse.parse_output_format(form, self.errors)
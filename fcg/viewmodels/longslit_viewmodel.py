@@ -2,7 +2,7 @@ from typing import cast
 
 from astropy.coordinates import Angle
 from fastapi import Request
-from starlette.datastructures import UploadFile
+from starlette.datastructures import FormData, UploadFile
 
 from fcg.infrastructure.types import OutputFormat
 from fcg.viewmodels import parse
@@ -24,8 +24,9 @@ class LongslitViewModel(FormBaseViewModel):
         self.errors: dict[str, str] = dict()
 
     async def load(self) -> None:
-        form = await self.request.form()
+        self.load_form(await self.request.form())
 
+    def load_form(self, form: FormData) -> None:
         super().load_common_data(form)
 
         # right ascension
@@ -57,7 +58,9 @@ class LongslitViewModel(FormBaseViewModel):
         self.slit_width = parse.parse_slit_width(form, self.errors)
 
         # background image
-        self.background_image = parse.parse_background_image(form, self.errors)
+        self.background_image = parse.parse_background_image(
+            form, self.errors, mode="longslit"
+        )
 
         # output format
         self.output_format = parse.parse_output_format(form, self.errors)
@@ -1,7 +1,7 @@
 from typing import cast
 
 from fastapi import Request
-from starlette.datastructures import UploadFile
+from starlette.datastructures import FormData, UploadFile
 
 from fcg.infrastructure.types import OutputFormat
 from fcg.viewmodels import parse
@@ -17,8 +17,9 @@ class MosViewModel(FormBaseViewModel):
         self.errors: dict[str, str] = dict()
 
     async def load(self) -> None:
-        form = await self.request.form()
+        self.load_form(await self.request.form())
 
+    def load_form(self, form: FormData) -> None:
         super().load_common_data(form)
 
         # MOS mask file
@@ -27,7 +28,9 @@ class MosViewModel(FormBaseViewModel):
         )
 
         # background image
-        self.background_image = parse.parse_background_image(form, self.errors)
+        self.background_image = parse.parse_background_image(
+            form, self.errors, mode="mos"
+        )
 
         # output format
         self.output_format = parse.parse_output_format(form, self.errors)
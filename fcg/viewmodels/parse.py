@@ -1,12 +1,24 @@
 from datetime import datetime, timezone
 from typing import cast
 
-from astropy.coordinates import Angle, SkyCoord
-from imephu.service.survey import is_covering_position
+from astropy.coordinates import Angle
 from starlette.datastructures import FormData, UploadFile
 
 from fcg.infrastructure import parse
-from fcg.infrastructure.types import MagnitudeRange, OutputFormat
+from fcg.infrastructure.coverage import get_coverage_index
+from fcg.infrastructure.hedging import AUTO_SURVEY, is_auto_survey
+from fcg.infrastructure.metrics import FINDER_CHART_STAGE_DURATION
+from fcg.infrastructure.types import (
+    BatchFormat,
+    ChartFormat,
+    EphemeridesFormat,
+    MagnitudeRange,
+    OutputFormat,
+)
+
+# Minimum and maximum resolution (in dots per inch) of PNG finder charts.
+_MIN_DPI = 20
+_MAX_DPI = 600
 
 
 def parse_proposal_code(form: FormData, errors: dict[str, str]) -> str:
@@ -231,7 +243,9 @@ def parse_nir_bundle_separation(form: FormData, errors: dict[str, str]) -> Angle
     )
 
 
-def parse_background_image(form: FormData, errors: dict[str, str]) -> str | UploadFile:
+def parse_background_image(
+    form: FormData, errors: dict[str, str], mode: str
+) -> str | UploadFile:
     if "image_survey" in form and "custom_fits" in form:
         errors["__general"] = (
             "The image survey and custom FITS file are mutually exclusive."
@@ -240,7 +254,14 @@ def parse_background_image(form: FormData, errors: dict[str, str]) -> str | Uplo
     elif "image_survey" in form:
         if form.get("image_survey"):
             survey = cast(str, form.get("image_survey"))
-            if _is_position_covered_by_survey(form, survey):
+            if is_auto_survey(survey):
+                # The survey is chosen among those covering the position.
+                return AUTO_SURVEY
+            # The coverage check is part of the form stage, but is timed on its own
+            # as well.
+            with FINDER_CHART_STAGE_DURATION.time(mode=mode, stage="coverage"):
+                is_covered = _is_position_covered_by_survey(form, survey)
+            if is_covered:
                 return survey
             else:
                 errors["image_survey"] = (
@@ -269,11 +290,76 @@ def parse_output_format(form: FormData, errors: dict[str, str]) -> OutputFormat:
             return "pdf"
         case "png":
             return "png"
+        case "preview":
+            return "preview"
         case _:
             errors["output_format"] = f"Unsupported output format: {output_format}"
             return "pdf"
 
 
+def parse_output_formats(form: FormData, errors: dict[str, str]) -> list[ChartFormat]:
+    # The formats are comma-separated values such as "pdf,png,png:300", where the
+    # number is the resolution of a PNG image in dots per inch. The field may be given
+    # more than once, and duplicate formats are ignored.
+    texts = [
+        text.strip()
+        for value in form.getlist("output_formats")
+        for text in cast(str, value).split(",")
+        if text.strip()
+    ]
+    formats: list[ChartFormat] = []
+    for text in texts:
+        name, separator, dpi_text = text.partition(":")
+        match name.strip().lower(), separator:
+            case "pdf", "":
+                chart_format = ChartFormat("pdf")
+            case "png", "":
+                chart_format = ChartFormat("png")
+            case "png", ":":
+                dpi = int(dpi_text) if dpi_text.strip().isdigit() else 0
+                if not _MIN_DPI <= dpi <= _MAX_DPI:
+                    errors["output_formats"] = (
+                        f"The resolution must be an integer between {_MIN_DPI} and "
+                        f"{_MAX_DPI}: {text}"
+                    )
+                    return []
+                chart_format = ChartFormat("png", dpi)
+            case _:
+                errors["output_formats"] = f"Unsupported output format: {text}"
+                return []
+        if chart_format not in formats:
+            formats.append(chart_format)
+    return formats
+
+
+def parse_batch_format(form: FormData, errors: dict[str, str]) -> BatchFormat:
+    batch_format = cast(str, form.get("batch_format", "zip")).strip()
+    match batch_format.lower():
+        case "zip":
+            return "zip"
+        case "pdf":
+            return "pdf"
+        case _:
+            errors["batch_format"] = f"Unsupported batch format: {batch_format}"
+            return "zip"
+
+
+def parse_targets(
+    text: str, max_targets: int, errors: dict[str, str]
+) -> list[dict[str, str]]:
+    try:
+        targets = parse.parse_target_list(text)
+    except ValueError as e:
+        errors["targets"] = str(e)
+        return []
+    if len(targets) > max_targets:
+        errors["targets"] = (
+            f"The target list must not contain more than {max_targets} targets."
+        )
+        return []
+    return targets
+
+
 def parse_end_time(form: FormData, errors: dict[str, str]) -> datetime:
     return parse.parse_generic_form_field(
         form=form,
@@ -298,6 +384,31 @@ def parse_horizons_identifier(form: FormData, errors: dict[str, str]) -> str:
     )
 
 
+def parse_ephemerides_format(
+    form: FormData, errors: dict[str, str]
+) -> EphemeridesFormat:
+    ephemerides_format = cast(str, form.get("format", "json")).strip()
+    match ephemerides_format.lower():
+        case "json":
+            return "json"
+        case "ndjson":
+            return "ndjson"
+        case "columns":
+            return "columns"
+        case "npz":
+            return "npz"
+        case _:
+            errors["format"] = f"Unsupported format: {ephemerides_format}"
+            return "json"
+
+
+def parse_interpolate(form: FormData, errors: dict[str, str]) -> bool:
+    if "interpolate" not in form:
+        return False
+    else:
+        return parse.parse_bool(cast(str, form["interpolate"]))
+
+
 def parse_output_interval(form: FormData, errors: dict[str, str]) -> int:
     return parse.parse_generic_form_field(
         form=form,
@@ -330,4 +441,4 @@ def _is_position_covered_by_survey(form: FormData, survey: str) -> bool:
         declination = parse.parse_declination(cast(str, form.get("declination", "")))
     except ValueError:
         return True
-    return is_covering_position(survey, SkyCoord(ra=right_ascension, dec=declination))
+    return get_coverage_index(survey).covers(right_ascension.degree, declination.degree)
@@ -2,7 +2,7 @@ from typing import cast
 
 from astropy.coordinates import Angle
 from fastapi import Request
-from starlette.datastructures import UploadFile
+from starlette.datastructures import FormData, UploadFile
 
 from fcg.infrastructure.types import OutputFormat
 from fcg.viewmodels import parse
@@ -25,8 +25,9 @@ class SmiViewModel(FormBaseViewModel):
         self.errors: dict[str, str] = dict()
 
     async def load(self) -> None:
-        form = await self.request.form()
+        self.load_form(await self.request.form())
 
+    def load_form(self, form: FormData) -> None:
         super().load_common_data(form)
 
         # right ascension
@@ -61,7 +62,9 @@ class SmiViewModel(FormBaseViewModel):
         self.include_fibers = parse.parse_include_fibers(form, self.errors)
 
         # background image
-        self.background_image = parse.parse_background_image(form, self.errors)
+        self.background_image = parse.parse_background_image(
+            form, self.errors, mode="smi"
+        )
 
         # output format
         self.output_format = parse.parse_output_format(form, self.errors)
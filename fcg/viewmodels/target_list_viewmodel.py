@@ -0,0 +1,34 @@
+from fastapi import Request
+from starlette.datastructures import UploadFile
+
+from fcg.infrastructure.settings import get_settings
+from fcg.viewmodels import parse
+from fcg.viewmodels.base_viewmodel import BaseViewModel
+
+
+class TargetListViewModel(BaseViewModel):
+    def __init__(self, request: Request):
+        super().__init__(request)
+        self.targets: list[dict[str, str]] = []
+        self.shared: dict[str, str] = dict()
+        self.errors: dict[str, str] = dict()
+
+    async def load(self) -> None:
+        form = await self.request.form()
+
+        # target list
+        targets = form.get("targets")
+        if isinstance(targets, UploadFile):
+            text = (await targets.read()).decode("utf-8-sig", errors="replace")
+        else:
+            text = targets or ""
+        self.targets = parse.parse_targets(
+            text, get_settings().target_list_max_targets, self.errors
+        )
+
+        # fields shared by all targets
+        self.shared = {
+            field: value
+            for field, value in form.items()
+            if field != "targets" and isinstance(value, str)
+        }
@@ -0,0 +1,38 @@
+from typing import cast
+
+from fastapi import APIRouter, Request, Response
+from fastapi.responses import JSONResponse
+from starlette import status
+from starlette.datastructures import FormData
+
+from fcg.infrastructure.coverage import SURVEYS, get_coverage_index
+from fcg.viewmodels import parse
+
+router = APIRouter()
+
+
+@router.get("/survey-coverage")
+def survey_coverage(request: Request) -> Response:
+    # This is called by the form while the user is typing, so it must be cheap.
+    query = cast(FormData, request.query_params)
+    errors: dict[str, str] = dict()
+    right_ascension = parse.parse_right_ascension(query, errors)
+    declination = parse.parse_declination(query, errors)
+    surveys = request.query_params.getlist("image_survey") or SURVEYS
+    indexes = []
+    for survey in surveys:
+        try:
+            indexes.append(get_coverage_index(survey))
+        except ValueError:
+            errors["image_survey"] = f"Unknown image survey: {survey}"
+    if errors:
+        return JSONResponse({"errors": errors}, status_code=status.HTTP_400_BAD_REQUEST)
+
+    return JSONResponse(
+        {
+            "covered": {
+                index.survey: index.covers(right_ascension.degree, declination.degree)
+                for index in indexes
+            }
+        }
+    )
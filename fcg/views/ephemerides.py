@@ -1,10 +1,31 @@
+import asyncio
+import json
+import math
+from datetime import datetime, timezone
+from io import BytesIO
+from typing import Any, AsyncIterator
+
 import astropy.units as u
+import numpy as np
 from fastapi import APIRouter
 from fastapi.responses import JSONResponse, Response
 from imephu.service.horizons import HorizonsService
 from starlette import status
 from starlette.requests import Request
+from starlette.responses import StreamingResponse
 
+from fcg.infrastructure.cassettes import fetch_or_replay
+from fcg.infrastructure.horizons import get_ephemeris_cache
+from fcg.infrastructure.interpolation import (
+    FIELDS,
+    ephemeris_columns,
+    ephemeris_rows,
+    estimate_interpolation_error,
+    interpolate_ephemeris_columns,
+)
+from fcg.infrastructure.metrics import CACHE_REQUESTS, UPSTREAM_DURATION
+from fcg.infrastructure.settings import get_settings
+from fcg.infrastructure.single_flight import SingleFlight
 from fcg.viewmodels.ephemerides_viewmodel import EphemeridesViewModel
 
 router = APIRouter()
@@ -12,6 +33,14 @@ router = APIRouter()
 
 SALT_OBSERVATORY_ID = "B31"
 
+_horizons_flights: SingleFlight[list[dict[str, Any]]] = SingleFlight()
+
+
+class HorizonsTimeoutError(Exception):
+    """Raised if a JPL Horizons query does not finish in time."""
+
+    pass
+
 
 @router.post("/ephemerides")
 async def ephemerides(request: Request) -> Response:
@@ -23,26 +52,278 @@ async def ephemerides(request: Request) -> Response:
             {"errors": vm.errors}, status_code=status.HTTP_400_BAD_REQUEST
         )
 
+    start = vm.start.timestamp()
+    end = vm.end.timestamp()
+    step = 60.0 * vm.output_interval
+    interpolation_step = 60.0 * get_settings().horizons_interpolation_interval
+    try:
+        # Interpolated ephemerides are computed as columns, which are only turned into
+        # rows if the format requires them.
+        columns: dict[str, np.ndarray] | None = None
+        if vm.interpolate and step < interpolation_step:
+            columns, headers = await _interpolated_ephemeris_columns(
+                vm.identifier, start, end, step, interpolation_step
+            )
+            rows = _rows(columns)
+        else:
+            rows, headers = _ephemeris_rows(vm.identifier, start, end, step), {}
+
+        match vm.format:
+            case "json":
+                return JSONResponse([row async for row in rows], headers=headers)
+            case "ndjson":
+                # Errors are only reported with a status code if they happen before
+                # the first row has been sent.
+                first_row = await anext(rows, None)
+                return StreamingResponse(
+                    _ndjson_stream(first_row, rows),
+                    media_type="application/x-ndjson",
+                    headers=headers,
+                )
+            case "columns":
+                return JSONResponse(
+                    _json_columns(await _columns(columns, rows)), headers=headers
+                )
+            case "npz":
+                content = _npz(await _columns(columns, rows))
+                return Response(
+                    content,
+                    media_type="application/octet-stream",
+                    headers={
+                        **headers,
+                        "Content-Disposition": 'attachment; filename="ephemerides.npz"',
+                    },
+                )
+            case _:
+                # should never happen
+                raise ValueError(f"Unsupported format: {vm.format}")
+    except HorizonsTimeoutError as e:
+        return JSONResponse(
+            {"errors": {"__general": str(e)}},
+            status_code=status.HTTP_504_GATEWAY_TIMEOUT,
+        )
+
+
+async def _columns(
+    columns: dict[str, np.ndarray] | None, rows: AsyncIterator[dict[str, Any]]
+) -> dict[str, np.ndarray]:
+    if columns is not None:
+        return columns
+    return ephemeris_columns([row async for row in rows])
+
+
+def _json_columns(columns: dict[str, np.ndarray]) -> dict[str, list[Any]]:
+    # NaN is not valid JSON.
+    return {
+        field: [None if math.isnan(v) else v for v in values.tolist()]
+        for field, values in columns.items()
+    }
+
+
+def _npz(columns: dict[str, np.ndarray]) -> bytes:
+    # Missing rates and magnitudes are stored as NaN.
+    content = BytesIO()
+    np.savez(content, **columns)  # type: ignore[arg-type]
+    return content.getvalue()
+
+
+async def _ndjson_stream(
+    first_row: dict[str, Any] | None, rows: AsyncIterator[dict[str, Any]]
+) -> AsyncIterator[str]:
+    if first_row is None:
+        return
+    yield json.dumps(first_row) + "\n"
+    try:
+        async for row in rows:
+            yield json.dumps(row) + "\n"
+    except HorizonsTimeoutError as e:
+        yield json.dumps({"errors": {"__general": str(e)}}) + "\n"
+
+
+async def _interpolated_ephemeris_columns(
+    identifier: str, start: float, end: float, step: float, interpolation_step: float
+) -> tuple[dict[str, np.ndarray], dict[str, str]]:
+    """
+    Return the ephemerides interpolated from ephemerides ``interpolation_step``
+    seconds apart as columns, as well as headers with an estimate of the
+    interpolation error.
+    """
+    # The queried ephemerides extend beyond the time span, so that the derivatives at
+    # its boundaries can be estimated.
+    coarse_ephemerides = [
+        row
+        async for row in _ephemeris_rows(
+            identifier,
+            start - interpolation_step,
+            end + interpolation_step,
+            interpolation_step,
+        )
+    ]
+    # The last epoch is the end of the time span, even if it is less than a step
+    # after the previous epoch.
+    epochs = np.minimum(
+        start + step * np.arange(math.ceil((end - start) / step) + 1), end
+    )
+    columns = await asyncio.to_thread(
+        interpolate_ephemeris_columns, coarse_ephemerides, epochs
+    )
+    error = await asyncio.to_thread(estimate_interpolation_error, coarse_ephemerides)
+
+    headers = {"X-Interpolation-Position-Error": f"{error.position:.3g}"}
+    if error.magnitude is not None:
+        headers["X-Interpolation-Magnitude-Error"] = f"{error.magnitude:.3g}"
+    return columns, headers
+
+
+async def _rows(columns: dict[str, np.ndarray]) -> AsyncIterator[dict[str, Any]]:
+    for row in ephemeris_rows(columns):
+        yield row
+
+
+async def _ephemeris_rows(
+    identifier: str, start: float, end: float, step: float
+) -> AsyncIterator[dict[str, Any]]:
+    """
+    Yield the ephemerides for a time span in epoch order.
+
+    The time span is split into chunks, which are queried concurrently. The
+    ephemerides of a chunk are yielded as soon as the chunk and all the chunks before
+    it are available.
+    """
+    settings = get_settings()
+    semaphore = asyncio.Semaphore(settings.horizons_concurrency)
+
+    async def fetch(chunk_start: float, chunk_end: float) -> list[dict[str, Any]]:
+        async with semaphore:
+            key = f"{identifier}|{chunk_start}|{chunk_end}|{step}"
+            try:
+                return await asyncio.wait_for(
+                    _horizons_flights.do(
+                        key,
+                        lambda: _load_or_query_ephemerides(
+                            identifier, chunk_start, chunk_end, step
+                        ),
+                    ),
+                    settings.horizons_timeout,
+                )
+            except asyncio.TimeoutError:
+                raise HorizonsTimeoutError(
+                    "JPL Horizons did not respond within "
+                    f"{settings.horizons_timeout:g} seconds."
+                ) from None
+
+    tasks = [
+        asyncio.create_task(fetch(chunk_start, chunk_end))
+        for chunk_start, chunk_end in _chunks(
+            start, end, step, settings.horizons_chunk_size
+        )
+    ]
+    try:
+        # Consecutive chunks share the epoch at their boundary.
+        last_epoch = -float("inf")
+        for task in tasks:
+            for row in await task:
+                if row["epoch"] > last_epoch:
+                    last_epoch = row["epoch"]
+                    yield row
+    finally:
+        for task in tasks:
+            task.cancel()
+
+
+def _chunks(
+    start: float, end: float, step: float, max_epochs: int
+) -> list[tuple[float, float]]:
+    # The chunk boundaries lie on the grid of requested epochs.
+    span = step * max(max_epochs - 1, 1)
+    chunks: list[tuple[float, float]] = []
+    chunk_start = start
+    while True:
+        chunk_end = min(chunk_start + span, end)
+        chunks.append((chunk_start, chunk_end))
+        if chunk_end >= end:
+            return chunks
+        chunk_start = chunk_end
+
+
+async def _load_or_query_ephemerides(
+    identifier: str, start: float, end: float, step: float
+) -> list[dict[str, Any]]:
+    query = (identifier, SALT_OBSERVATORY_ID, start, end, step)
+    cache = get_ephemeris_cache()
+    if cache is not None:
+        cached = await asyncio.to_thread(cache.get, *query)
+        CACHE_REQUESTS.inc(
+            cache="horizons", result="hit" if cached is not None else "miss"
+        )
+        if cached is not None:
+            return cached
+
+    # The Horizons query blocks, so it must not be made on the event loop.
+    ephemerides_ = await asyncio.to_thread(
+        _query_horizons, identifier, start, end, step
+    )
+    if cache is not None:
+        await asyncio.to_thread(cache.put, *query, ephemerides_)
+    return ephemerides_
+
+
+def _query_horizons(
+    identifier: str, start: float, end: float, step: float
+) -> list[dict[str, Any]]:
+    def fetch() -> bytes:
+        rows = _fetch_horizons_ephemerides(identifier, start, end, step)
+        return json.dumps(rows).encode()
+
+    request = {
+        "identifier": identifier,
+        "location": SALT_OBSERVATORY_ID,
+        "start": start,
+        "end": end,
+        "step": step,
+    }
+    with UPSTREAM_DURATION.time(service="horizons"):
+        ephemerides_: list[dict[str, Any]] = json.loads(
+            fetch_or_replay("horizons", request, fetch)
+        )
+    return ephemerides_
+
+
+def _fetch_horizons_ephemerides(
+    identifier: str, start: float, end: float, step: float
+) -> list[dict[str, Any]]:
     horizons_service = HorizonsService(
-        vm.identifier,
+        identifier,
         location=SALT_OBSERVATORY_ID,
-        start=vm.start,
-        end=vm.end,
-        stepsize=vm.output_interval * u.min,
+        start=datetime.fromtimestamp(start, timezone.utc),
+        end=datetime.fromtimestamp(end, timezone.utc),
+        stepsize=step * u.s,
     )
     ephemerides_ = horizons_service.ephemerides()
-    return JSONResponse(
-        [
-            {
-                "epoch": e.epoch.timestamp(),
-                "ra": e.position.ra.to_value(u.deg),
-                "dec": e.position.dec.to_value(u.deg),
-                "ra_rate": e.position_rate.ra.to_value(u.arcsec / u.hour),
-                "dec_rate": e.position_rate.dec.to_value(u.arcsec / u.hour),
-                "magnitude": (
-                    e.magnitude_range.max_magnitude if e.magnitude_range else None
-                ),
-            }
+    if not ephemerides_:
+        return []
+
+    # Units are converted for whole columns rather than for individual values.
+    columns = {
+        "epoch": [e.epoch.timestamp() for e in ephemerides_],
+        "ra": u.Quantity([e.position.ra for e in ephemerides_])
+        .to_value(u.deg)
+        .tolist(),
+        "dec": u.Quantity([e.position.dec for e in ephemerides_])
+        .to_value(u.deg)
+        .tolist(),
+        "ra_rate": u.Quantity([e.position_rate.ra for e in ephemerides_])
+        .to_value(u.arcsec / u.hour)
+        .tolist(),
+        "dec_rate": u.Quantity([e.position_rate.dec for e in ephemerides_])
+        .to_value(u.arcsec / u.hour)
+        .tolist(),
+        "magnitude": [
+            e.magnitude_range.max_magnitude if e.magnitude_range else None
             for e in ephemerides_
-        ]
-    )
+        ],
+    }
+    return [
+        dict(zip(FIELDS, row, strict=True))
+        for row in zip(*(columns[field] for field in FIELDS), strict=True)
+    ]
@@ -1,32 +1,64 @@
+import asyncio
+import hashlib
+import json
 import logging
 import pathlib
+import re
 import tempfile
+import time
+import uuid
+from functools import lru_cache
 from io import BytesIO
-from typing import BinaryIO, Tuple, cast
+from typing import Any, AsyncIterator, Awaitable, Callable, cast
 
 from astropy import units as u
 from astropy.coordinates import Angle, SkyCoord
 from astropy.coordinates import position_angle as position_angle_
 from fastapi import APIRouter, Request, Response
 from fastapi.responses import JSONResponse
-from imephu.finder_chart import FinderChart
-from imephu.salt.finder_chart import (
-    GeneralProperties,
-    Target,
-    hrs_finder_chart,
-    nir_finder_chart,
-    rss_longslit_finder_chart,
-    rss_mos_finder_chart,
-    rss_smi_finder_chart,
-    salticam_finder_chart,
-)
+from imephu.salt.finder_chart import GeneralProperties, Target
 from imephu.salt.utils import MosMask
-from imephu.service.survey import load_fits
 from starlette import status
 from starlette.datastructures import UploadFile
 from starlette.responses import StreamingResponse
 
-from fcg.infrastructure.types import OutputFormat
+from fcg.infrastructure.archives import ZipStream, merge_pdfs
+from fcg.infrastructure.disk_cache import DiskCache
+from fcg.infrastructure.hedging import auto_survey_key, is_auto_survey
+from fcg.infrastructure.jobs import Job, JobRunner, get_job_store
+from fcg.infrastructure.metrics import (
+    CACHE_REQUESTS,
+    FINDER_CHART_REQUEST_DURATION,
+    FINDER_CHART_REQUESTS,
+    FINDER_CHART_STAGE_DURATION,
+    Observation,
+    replay,
+    run_recorded,
+)
+from fcg.infrastructure.pool import (
+    RenderPoolBusyError,
+    RenderTimeoutError,
+    get_render_pool,
+)
+from fcg.infrastructure.profiling import get_profile_store, profile_call
+from fcg.infrastructure.rendering import (
+    FITS_SIZE,
+    FinderChartSpec,
+    finder_chart_key,
+    render_finder_chart,
+    render_finder_chart_formats,
+    resolve_auto_survey,
+)
+from fcg.infrastructure.settings import get_settings
+from fcg.infrastructure.single_flight import SingleFlight, async_file_lock
+from fcg.infrastructure.surveys import (
+    SurveyTimeoutError,
+    SurveyUnavailableError,
+    shared_tiles,
+)
+from fcg.infrastructure.types import ChartFormat, OutputFormat
+from fcg.viewmodels import parse
+from fcg.viewmodels.batch_viewmodel import BatchViewModel
 from fcg.viewmodels.hrs_viewmodel import HrsViewModel
 from fcg.viewmodels.imaging_viewmodel import ImagingViewModel
 from fcg.viewmodels.longslit_viewmodel import LongslitViewModel
@@ -34,12 +66,30 @@ from fcg.viewmodels.mos_viewmodel import MosViewModel
 from fcg.viewmodels.nir_viewmodel import NirViewModel
 from fcg.viewmodels.slotmode_viewmodel import SlotmodeViewModel
 from fcg.viewmodels.smi_viewmodel import SmiViewModel
+from fcg.views.profiles import is_profiling_requested
 
 router = APIRouter()
 
+_chart_flights: SingleFlight[bytes] = SingleFlight()
+
+_chart_format_flights: SingleFlight[list[bytes]] = SingleFlight()
+
+_auto_survey_flights: SingleFlight[FinderChartSpec] = SingleFlight()
+
 
 @router.post("/finder-charts")
 async def generate_finder_chart(request: Request, mode: str) -> Response:
+    mode_label = mode.lower() if mode.lower() in _MODES else "unsupported"
+    started = time.perf_counter()
+    response = await _generate_finder_chart(request, mode)
+    FINDER_CHART_REQUEST_DURATION.observe(
+        time.perf_counter() - started, mode=mode_label
+    )
+    FINDER_CHART_REQUESTS.inc(mode=mode_label, status=str(response.status_code))
+    return response
+
+
+async def _generate_finder_chart(request: Request, mode: str) -> Response:
     try:
         match mode.lower():
             case "hrs":
@@ -64,77 +114,155 @@ async def generate_finder_chart(request: Request, mode: str) -> Response:
                     {"errors": errors}, status_code=status.HTTP_400_BAD_REQUEST
                 )
     except Exception as e:
-        logging.log(logging.ERROR, str(e))
-        import traceback
+        return _exception_response(e)
+
+
+@router.post("/finder-charts/batch")
+async def generate_finder_charts(request: Request, mode: str) -> Response:
+    try:
+        return await _batch(request, mode.lower())
+    except Exception as e:
+        return _exception_response(e)
 
-        traceback.print_exc()
+
+@router.post("/finder-chart-jobs")
+async def submit_finder_chart_job(request: Request, mode: str) -> Response:
+    try:
+        return await _submit_job(request, mode.lower())
+    except Exception as e:
+        return _exception_response(e)
+
+
+@router.get("/finder-chart-jobs/{job_id}")
+async def get_finder_chart_job(job_id: str) -> Response:
+    job = await asyncio.to_thread(get_job_store().get, job_id)
+    if job is None:
+        return _job_not_found_response(job_id)
+    return JSONResponse(_job_dict(job))
+
+
+@router.get("/finder-chart-jobs/{job_id}/result")
+async def get_finder_chart_job_result(job_id: str) -> Response:
+    store = get_job_store()
+    job = await asyncio.to_thread(store.get, job_id)
+    if job is None:
+        return _job_not_found_response(job_id)
+    content = await asyncio.to_thread(store.result, job_id)
+    if content is None:
+        if job.status == "failed":
+            error = f"The finder chart could not be generated: {job.error}"
+        else:
+            error = "The finder chart has not been generated yet."
+        return JSONResponse(
+            {"errors": {"__general": error}}, status_code=status.HTTP_409_CONFLICT
+        )
+    return _finder_chart_stream(content, job.output_format)
+
+
+def _exception_response(e: Exception) -> Response:
+    if isinstance(e, RenderPoolBusyError):
+        return JSONResponse(
+            {"errors": {"__general": str(e)}},
+            status_code=status.HTTP_503_SERVICE_UNAVAILABLE,
+        )
+    if isinstance(e, SurveyUnavailableError):
         return JSONResponse(
             {"errors": {"__general": str(e)}},
-            status_code=status.HTTP_500_INTERNAL_SERVER_ERROR,
+            status_code=status.HTTP_503_SERVICE_UNAVAILABLE,
         )
+    if isinstance(e, (RenderTimeoutError, SurveyTimeoutError)):
+        return JSONResponse(
+            {"errors": {"__general": str(e)}},
+            status_code=status.HTTP_504_GATEWAY_TIMEOUT,
+        )
+    logging.exception(str(e))
+    return JSONResponse(
+        {"errors": {"__general": str(e)}},
+        status_code=status.HTTP_500_INTERNAL_SERVER_ERROR,
+    )
 
 
 async def _hrs(request: Request) -> Response:
     vm = HrsViewModel(request)
 
-    await vm.load()
+    with FINDER_CHART_STAGE_DURATION.time(mode="hrs", stage="form"):
+        await vm.load()
 
     if len(vm.errors) > 0:
         return JSONResponse(
             {"errors": vm.errors}, status_code=status.HTTP_400_BAD_REQUEST
         )
 
+    return await _finder_chart_response(request, await _hrs_spec(vm))
+
+
+async def _hrs_spec(vm: HrsViewModel) -> FinderChartSpec:
     position = SkyCoord(ra=vm.right_ascension, dec=vm.declination)
-    survey, fits = _fits_details(vm.background_image, position)
     general_properties = _general_properties(
         principal_investigator=vm.principal_investigator,
         proposal_code=vm.proposal_code,
         target=vm.target,
         position=position,
         position_angle=vm.position_angle,
-        survey=survey,
     )
-    finder_chart = hrs_finder_chart(fits=fits, general=general_properties)
-
-    return _finder_chart_stream(finder_chart, vm.output_format)
+    return FinderChartSpec(
+        mode="hrs",
+        general=general_properties,
+        background_image=await _background_image(vm.background_image),
+        fits_center=position,
+        output_format=vm.output_format,
+        options={},
+    )
 
 
 async def _imaging(request: Request) -> Response:
     vm = ImagingViewModel(request)
 
-    await vm.load()
+    with FINDER_CHART_STAGE_DURATION.time(mode="imaging", stage="form"):
+        await vm.load()
 
     if len(vm.errors) > 0:
         return JSONResponse(
             {"errors": vm.errors}, status_code=status.HTTP_400_BAD_REQUEST
         )
 
+    return await _finder_chart_response(request, await _imaging_spec(vm))
+
+
+async def _imaging_spec(vm: ImagingViewModel) -> FinderChartSpec:
     position = SkyCoord(ra=vm.right_ascension, dec=vm.declination)
-    survey, fits = _fits_details(vm.background_image, position)
     general_properties = _general_properties(
         principal_investigator=vm.principal_investigator,
         proposal_code=vm.proposal_code,
         target=vm.target,
         position=position,
         position_angle=vm.position_angle,
-        survey=survey,
     )
-    finder_chart = salticam_finder_chart(
-        fits=fits, general=general_properties, is_slot_mode=False
+    return FinderChartSpec(
+        mode="imaging",
+        general=general_properties,
+        background_image=await _background_image(vm.background_image),
+        fits_center=position,
+        output_format=vm.output_format,
+        options={"is_slot_mode": False},
     )
-    return _finder_chart_stream(finder_chart, vm.output_format)
 
 
 async def _longslit(request: Request) -> Response:
     vm = LongslitViewModel(request)
 
-    await vm.load()
+    with FINDER_CHART_STAGE_DURATION.time(mode="longslit", stage="form"):
+        await vm.load()
 
     if len(vm.errors) > 0:
         return JSONResponse(
             {"errors": vm.errors}, status_code=status.HTTP_400_BAD_REQUEST
         )
 
+    return await _finder_chart_response(request, await _longslit_spec(vm))
+
+
+async def _longslit_spec(vm: LongslitViewModel) -> FinderChartSpec:
     # Get the position angle
     if (
         vm.calculate_position_angle
@@ -153,7 +281,6 @@ async def _longslit(request: Request) -> Response:
         automated_position_angle = False
 
     position = SkyCoord(ra=vm.right_ascension, dec=vm.declination)
-    survey, fits = _fits_details(vm.background_image, position)
     general_properties = _general_properties(
         principal_investigator=vm.principal_investigator,
         proposal_code=vm.proposal_code,
@@ -161,7 +288,6 @@ async def _longslit(request: Request) -> Response:
         position=position,
         position_angle=position_angle,
         automated_position_angle=automated_position_angle,
-        survey=survey,
     )
     reference_star = (
         SkyCoord(
@@ -170,53 +296,69 @@ async def _longslit(request: Request) -> Response:
         if vm.reference_star_right_ascension is not None
         else None
     )
-    finder_chart = rss_longslit_finder_chart(
-        fits=fits,
+    return FinderChartSpec(
+        mode="longslit",
         general=general_properties,
-        reference_star=reference_star,
-        slit_width=vm.slit_width,
-        slit_height=8 * u.arcmin,
+        background_image=await _background_image(vm.background_image),
+        fits_center=position,
+        output_format=vm.output_format,
+        options={
+            "reference_star": reference_star,
+            "slit_width": vm.slit_width,
+            "slit_height": 8 * u.arcmin,
+        },
     )
-    return _finder_chart_stream(finder_chart, vm.output_format)
 
 
 async def _mos(request: Request) -> Response:
     vm = MosViewModel(request)
 
-    await vm.load()
+    with FINDER_CHART_STAGE_DURATION.time(mode="mos", stage="form"):
+        await vm.load()
 
     if len(vm.errors) > 0:
         return JSONResponse(
             {"errors": vm.errors}, status_code=status.HTTP_400_BAD_REQUEST
         )
 
+    return await _finder_chart_response(request, await _mos_spec(vm))
+
+
+async def _mos_spec(vm: MosViewModel) -> FinderChartSpec:
     mos_mask = await _mos_mask(cast(UploadFile, vm.mos_mask_file))
     position = mos_mask.center
-    survey, fits = _fits_details(vm.background_image, position)
     general_properties = _general_properties(
         principal_investigator=vm.principal_investigator,
         proposal_code=vm.proposal_code,
         target=vm.target,
         position=position,
         position_angle=mos_mask.position_angle,
-        survey=survey,
     )
-    finder_chart = rss_mos_finder_chart(
-        fits=fits, general=general_properties, mos_mask=mos_mask
+    return FinderChartSpec(
+        mode="mos",
+        general=general_properties,
+        background_image=await _background_image(vm.background_image),
+        fits_center=position,
+        output_format=vm.output_format,
+        options={"mos_mask": mos_mask},
     )
-    return _finder_chart_stream(finder_chart, vm.output_format)
 
 
 async def _smi(request: Request) -> Response:
     vm = SmiViewModel(request)
 
-    await vm.load()
+    with FINDER_CHART_STAGE_DURATION.time(mode="smi", stage="form"):
+        await vm.load()
 
     if len(vm.errors) > 0:
         return JSONResponse(
             {"errors": vm.errors}, status_code=status.HTTP_400_BAD_REQUEST
         )
 
+    return await _finder_chart_response(request, await _smi_spec(vm))
+
+
+async def _smi_spec(vm: SmiViewModel) -> FinderChartSpec:
     # Get the position angle
     if (
         vm.calculate_position_angle
@@ -235,7 +377,6 @@ async def _smi(request: Request) -> Response:
         automated_position_angle = False
 
     position = SkyCoord(ra=vm.right_ascension, dec=vm.declination)
-    survey, fits = _fits_details(vm.background_image, position)
     general_properties = _general_properties(
         principal_investigator=vm.principal_investigator,
         proposal_code=vm.proposal_code,
@@ -243,7 +384,6 @@ async def _smi(request: Request) -> Response:
         position=position,
         position_angle=position_angle,
         automated_position_angle=automated_position_angle,
-        survey=survey,
     )
     reference_star = (
         SkyCoord(
@@ -254,26 +394,35 @@ async def _smi(request: Request) -> Response:
     )
     smi_barcode = vm.smi_barcode
     include_fibers = vm.include_fibers
-    finder_chart = rss_smi_finder_chart(
-        fits=fits,
+    return FinderChartSpec(
+        mode="smi",
         general=general_properties,
-        smi_barcode=smi_barcode,
-        reference_star=reference_star,
-        include_fibers=include_fibers,
+        background_image=await _background_image(vm.background_image),
+        fits_center=position,
+        output_format=vm.output_format,
+        options={
+            "smi_barcode": smi_barcode,
+            "reference_star": reference_star,
+            "include_fibers": include_fibers,
+        },
     )
-    return _finder_chart_stream(finder_chart, vm.output_format)
 
 
 async def _nir(request: Request) -> Response:
     vm = NirViewModel(request)
 
-    await vm.load()
+    with FINDER_CHART_STAGE_DURATION.time(mode="nir", stage="form"):
+        await vm.load()
 
     if len(vm.errors) > 0:
         return JSONResponse(
             {"errors": vm.errors}, status_code=status.HTTP_400_BAD_REQUEST
         )
 
+    return await _finder_chart_response(request, await _nir_spec(vm))
+
+
+async def _nir_spec(vm: NirViewModel) -> FinderChartSpec:
     reference_star = (
         SkyCoord(
             ra=vm.reference_star_right_ascension, dec=vm.reference_star_declination
@@ -286,48 +435,57 @@ async def _nir(request: Request) -> Response:
         fits_center = reference_star
     else:
         fits_center = position
-    survey, fits = _fits_details(vm.background_image, fits_center)
     general_properties = _general_properties(
         principal_investigator=vm.principal_investigator,
         proposal_code=vm.proposal_code,
         target=vm.target,
         position=position,
         position_angle=vm.position_angle,
-        survey=survey,
     )
-    finder_chart = nir_finder_chart(
-        fits=fits,
+    return FinderChartSpec(
+        mode="nir",
         general=general_properties,
-        reference_star=reference_star,
-        bundle_separation=vm.nir_bundle_separation,
+        background_image=await _background_image(vm.background_image),
+        fits_center=fits_center,
+        output_format=vm.output_format,
+        options={
+            "reference_star": reference_star,
+            "bundle_separation": vm.nir_bundle_separation,
+        },
     )
-    return _finder_chart_stream(finder_chart, vm.output_format)
 
 
 async def _slotmode(request: Request) -> Response:
     vm = SlotmodeViewModel(request)
 
-    await vm.load()
+    with FINDER_CHART_STAGE_DURATION.time(mode="slotmode", stage="form"):
+        await vm.load()
 
     if len(vm.errors) > 0:
         return JSONResponse(
             {"errors": vm.errors}, status_code=status.HTTP_400_BAD_REQUEST
         )
 
+    return await _finder_chart_response(request, await _slotmode_spec(vm))
+
+
+async def _slotmode_spec(vm: SlotmodeViewModel) -> FinderChartSpec:
     position = SkyCoord(ra=vm.right_ascension, dec=vm.declination)
-    survey, fits = _fits_details(vm.background_image, position)
     general_properties = _general_properties(
         principal_investigator=vm.principal_investigator,
         proposal_code=vm.proposal_code,
         target=vm.target,
         position=position,
         position_angle=vm.position_angle,
-        survey=survey,
     )
-    finder_chart = salticam_finder_chart(
-        fits=fits, general=general_properties, is_slot_mode=True
+    return FinderChartSpec(
+        mode="slotmode",
+        general=general_properties,
+        background_image=await _background_image(vm.background_image),
+        fits_center=position,
+        output_format=vm.output_format,
+        options={"is_slot_mode": True},
     )
-    return _finder_chart_stream(finder_chart, vm.output_format)
 
 
 def _general_properties(
@@ -337,7 +495,6 @@ def _general_properties(
     position: SkyCoord,
     position_angle: Angle,
     automated_position_angle: bool = False,
-    survey: str = "",
 ) -> GeneralProperties:
     return GeneralProperties(
         target=Target(
@@ -349,21 +506,16 @@ def _general_properties(
         automated_position_angle=automated_position_angle,
         proposal_code=proposal_code,
         pi_family_name=principal_investigator,
-        survey=survey,
     )
 
 
-def _fits_details(
-    background_image: str | UploadFile, fits_center: SkyCoord
-) -> Tuple[str, BinaryIO]:
+async def _background_image(background_image: str | UploadFile) -> str | bytes:
     if type(background_image) is str:
-        survey = background_image
-        return survey, load_fits(
-            survey=survey, fits_center=fits_center, size=10 * u.arcmin
-        )
+        return background_image
     elif hasattr(background_image, "file"):
-        survey = ""
-        return survey, cast(UploadFile, background_image).file
+        # The same file may be used for several finder charts.
+        await cast(UploadFile, background_image).seek(0)
+        return await cast(UploadFile, background_image).read()
     else:
         # Should never happen...
         raise ValueError("Either a survey or a FITS file is required")
@@ -376,20 +528,453 @@ async def _mos_mask(mos_mask_file: UploadFile) -> MosMask:
         return MosMask.from_file(pathlib.Path(fp.name))
 
 
+@lru_cache
+def _chart_cache() -> DiskCache | None:
+    settings = get_settings()
+    if settings.chart_cache_max_bytes <= 0:
+        return None
+    return DiskCache(
+        directory=settings.cache_dir / "charts",
+        max_bytes=settings.chart_cache_max_bytes,
+    )
+
+
+async def _finder_chart_response(request: Request, spec: FinderChartSpec) -> Response:
+    errors: dict[str, str] = dict()
+    chart_formats = parse.parse_output_formats(await request.form(), errors)
+    if len(errors) > 0:
+        return JSONResponse({"errors": errors}, status_code=status.HTTP_400_BAD_REQUEST)
+
+    spec = await _resolve_auto_survey(spec)
+
+    headers: dict[str, str] = dict()
+    if isinstance(spec.background_image, str):
+        headers["X-Image-Survey"] = spec.background_image
+    if len(chart_formats) > 0:
+        return await _chart_formats_response(request, spec, chart_formats, headers)
+
+    # Identical requests lead to identical finder charts, so that the spec's key can
+    # serve as a strong ETag.
+    key = finder_chart_key(spec)
+    etag = f'"{key}"'
+    headers["ETag"] = etag
+    if is_profiling_requested(request):
+        # The finder chart is rendered even if it is cached, as otherwise there would
+        # be nothing to profile.
+        content, profile = await _render_profiled(spec)
+        profile_id = uuid.uuid4().hex
+        await asyncio.to_thread(
+            get_profile_store().put, profile_id, profile.encode("utf-8")
+        )
+        return _finder_chart_stream(
+            content,
+            spec.output_format,
+            headers={**headers, "X-Profile": f"/profiles/{profile_id}"},
+        )
+
+    if _is_etag_matching(request, etag):
+        return Response(status_code=status.HTTP_304_NOT_MODIFIED, headers=headers)
+
+    content = await _chart_flights.do(key, lambda: _load_or_render(spec, key))
+    return _finder_chart_stream(content, spec.output_format, headers=headers)
+
+
+async def _chart_formats_response(
+    request: Request,
+    spec: FinderChartSpec,
+    chart_formats: list[ChartFormat],
+    headers: dict[str, str],
+) -> Response:
+    # The finder chart is generated once and returned in all requested formats, as a
+    # ZIP file. Every format is cached on its own, so that it can later be requested
+    # individually.
+    specs = [
+        spec._replace(output_format=f.output_format, dpi=f.dpi) for f in chart_formats
+    ]
+    keys = [finder_chart_key(s) for s in specs]
+    key = hashlib.sha256("|".join(keys).encode("utf-8")).hexdigest()
+    etag = f'"{key}"'
+    headers = {
+        **headers,
+        "ETag": etag,
+        "Content-Disposition": 'attachment; filename="finder-charts.zip"',
+    }
+    if _is_etag_matching(request, etag):
+        return Response(status_code=status.HTTP_304_NOT_MODIFIED, headers=headers)
+
+    contents = await _chart_format_flights.do(
+        key, lambda: _load_or_render_formats(specs, keys)
+    )
+    return StreamingResponse(
+        _chart_formats_zip_stream(specs, contents),
+        media_type="application/zip",
+        headers=headers,
+    )
+
+
+async def _chart_formats_zip_stream(
+    specs: list[FinderChartSpec], contents: list[bytes]
+) -> AsyncIterator[bytes]:
+    archive = ZipStream()
+    for spec, content in zip(specs, contents, strict=True):
+        yield archive.add(_chart_format_entry_name(spec), content)
+    yield archive.close()
+
+
+async def _resolve_auto_survey(spec: FinderChartSpec) -> FinderChartSpec:
+    # The survey must be known before the finder chart is looked up in the cache.
+    # Surveys are only requested if no finder chart for a covering survey is cached.
+    if not isinstance(spec.background_image, str) or not is_auto_survey(
+        spec.background_image
+    ):
+        return spec
+    cache = _chart_cache()
+
+    def is_cached(s: FinderChartSpec) -> bool:
+        return cache is not None and finder_chart_key(s) in cache
+
+    # Concurrent requests for the same position share the survey requests. Requests
+    # handled by other processes wait for the first one to finish, and then find its
+    # FITS file in the cache.
+    key = auto_survey_key(spec.fits_center, FITS_SIZE)
+
+    async def resolve() -> FinderChartSpec:
+        if cache is None:
+            return await asyncio.to_thread(resolve_auto_survey, spec, is_cached)
+        async with async_file_lock(
+            cache.directory, f"auto-survey|{key}", striped=False
+        ):
+            return await asyncio.to_thread(resolve_auto_survey, spec, is_cached)
+
+    with FINDER_CHART_STAGE_DURATION.time(mode=spec.mode, stage="fits"):
+        resolved = await _auto_survey_flights.do(key, resolve)
+    # The requests may differ in anything but their position.
+    return spec._replace(background_image=resolved.background_image, fits=resolved.fits)
+
+
+async def _load_or_render(spec: FinderChartSpec, key: str) -> bytes:
+    cache = _chart_cache()
+    if cache is None:
+        return await _render(spec)
+
+    # Identical requests handled by other processes wait for the first one to finish
+    # and then find the finder chart in the cache.
+    async with async_file_lock(cache.directory, _lock_key(spec)):
+        content = await asyncio.to_thread(cache.get, key)
+        CACHE_REQUESTS.inc(
+            cache="chart", result="hit" if content is not None else "miss"
+        )
+        if content is None:
+            content = await _render(spec)
+            await asyncio.to_thread(cache.put, key, content)
+        return content
+
+
+async def _load_or_render_formats(
+    specs: list[FinderChartSpec], keys: list[str]
+) -> list[bytes]:
+    cache = _chart_cache()
+    if cache is None:
+        return await _render_formats(specs)
+
+    # Only the formats which are not cached yet are rendered.
+    async with async_file_lock(cache.directory, _lock_key(specs[0])):
+        contents: list[bytes | None] = []
+        for key in keys:
+            content = await asyncio.to_thread(cache.get, key)
+            CACHE_REQUESTS.inc(
+                cache="chart", result="hit" if content is not None else "miss"
+            )
+            contents.append(content)
+        missing = [i for i, content in enumerate(contents) if content is None]
+        if len(missing) > 0:
+            rendered = await _render_formats([specs[i] for i in missing])
+            for i, content in zip(missing, rendered, strict=True):
+                await asyncio.to_thread(cache.put, keys[i], content)
+                contents[i] = content
+        return cast(list[bytes], contents)
+
+
+def _lock_key(spec: FinderChartSpec) -> str:
+    # All output formats of a finder chart share a lock, so that a finder chart which
+    # is being rendered in several formats is not rendered again for one of them.
+    return finder_chart_key(spec._replace(output_format="pdf", dpi=None))
+
+
+async def _render(spec: FinderChartSpec) -> bytes:
+    # The metrics are collected in the worker process and applied in this one.
+    result: tuple[bytes, list[Observation]] = await get_render_pool().run(
+        run_recorded, render_finder_chart, spec
+    )
+    content, observations = result
+    replay(observations)
+    return content
+
+
+async def _render_formats(specs: list[FinderChartSpec]) -> list[bytes]:
+    result: tuple[list[bytes], list[Observation]] = await get_render_pool().run(
+        run_recorded, render_finder_chart_formats, specs
+    )
+    contents, observations = result
+    replay(observations)
+    return contents
+
+
+async def _render_profiled(spec: FinderChartSpec) -> tuple[bytes, str]:
+    # The finder chart is rendered and profiled in the worker process.
+    result: tuple[tuple[bytes, str], list[Observation]] = await get_render_pool().run(
+        run_recorded, profile_call, render_finder_chart, spec
+    )
+    content_and_profile, observations = result
+    replay(observations)
+    return content_and_profile
+
+
+def _is_etag_matching(request: Request, etag: str) -> bool:
+    if_none_match = request.headers.get("if-none-match")
+    if not if_none_match:
+        return False
+    if if_none_match.strip() == "*":
+        return True
+    return etag in (tag.strip().removeprefix("W/") for tag in if_none_match.split(","))
+
+
 def _finder_chart_stream(
-    finder_chart: FinderChart, output_format: OutputFormat
+    content: bytes, output_format: OutputFormat, headers: dict[str, str] | None = None
 ) -> StreamingResponse:
-    content = BytesIO()
-    finder_chart.save(content, format=output_format)
-    content.seek(0)
-
     match output_format:
         case "pdf":
             media_type = "application/pdf"
-        case "png":
+        case "png" | "preview":
             media_type = "image/png"
         case _:
             # should never happen
             raise ValueError(f"Unsupported output format: {output_format}")
 
-    return StreamingResponse(content, media_type=media_type)
+    return StreamingResponse(BytesIO(content), media_type=media_type, headers=headers)
+
+
+async def load_or_render_finder_chart(spec: FinderChartSpec) -> bytes:
+    """
+    Return the finder chart for a spec, from the cache if possible.
+    """
+    spec = await _resolve_auto_survey(spec)
+    key = finder_chart_key(spec)
+    return await _chart_flights.do(key, lambda: _load_or_render(spec, key))
+
+
+# View models and spec functions for the finder chart generation modes.
+_MODES: dict[
+    str, tuple[Callable[[Request], Any], Callable[[Any], Awaitable[FinderChartSpec]]]
+] = {
+    "hrs": (HrsViewModel, _hrs_spec),
+    "imaging": (ImagingViewModel, _imaging_spec),
+    "longslit": (LongslitViewModel, _longslit_spec),
+    "mos": (MosViewModel, _mos_spec),
+    "smi": (SmiViewModel, _smi_spec),
+    "nir": (NirViewModel, _nir_spec),
+    "slotmode": (SlotmodeViewModel, _slotmode_spec),
+}
+
+
+@lru_cache
+def get_job_runner() -> JobRunner:
+    """
+    Return the runner for finder chart generation jobs.
+    """
+    return JobRunner(
+        store=get_job_store(),
+        render=load_or_render_finder_chart,
+        concurrency=get_settings().job_workers,
+    )
+
+
+async def _submit_job(request: Request, mode: str) -> Response:
+    if mode not in _MODES:
+        errors = {"__general": f"Unsupported finder chart generation mode: {mode}"}
+        return JSONResponse({"errors": errors}, status_code=status.HTTP_400_BAD_REQUEST)
+
+    view_model_class, spec_func = _MODES[mode]
+    vm = view_model_class(request)
+
+    await vm.load()
+
+    if len(vm.errors) > 0:
+        return JSONResponse(
+            {"errors": vm.errors}, status_code=status.HTTP_400_BAD_REQUEST
+        )
+
+    spec = await spec_func(vm)
+    job = await asyncio.to_thread(get_job_store().submit, spec)
+    get_job_runner().notify()
+    return JSONResponse(
+        _job_dict(job),
+        status_code=status.HTTP_202_ACCEPTED,
+        headers={"Location": f"/finder-chart-jobs/{job.id}"},
+    )
+
+
+def _job_dict(job: Job) -> dict[str, Any]:
+    return {
+        "job_id": job.id,
+        "status": job.status,
+        "error": job.error,
+        "created": job.created,
+        "updated": job.updated,
+        "result": (
+            f"/finder-chart-jobs/{job.id}/result" if job.status == "finished" else None
+        ),
+    }
+
+
+def _job_not_found_response(job_id: str) -> Response:
+    return JSONResponse(
+        {"errors": {"__general": f"There is no job with the id {job_id}."}},
+        status_code=status.HTTP_404_NOT_FOUND,
+    )
+
+
+async def _batch(request: Request, mode: str) -> Response:
+    # Every MOS finder chart requires its own mask file, so that MOS finder charts
+    # cannot be generated in batches.
+    if mode not in _MODES or mode == "mos":
+        errors = {
+            "__general": f"Unsupported batch finder chart generation mode: {mode}"
+        }
+        return JSONResponse({"errors": errors}, status_code=status.HTTP_400_BAD_REQUEST)
+
+    vm = BatchViewModel(request)
+
+    await vm.load()
+
+    if len(vm.errors) > 0:
+        return JSONResponse(
+            {"errors": vm.errors}, status_code=status.HTTP_400_BAD_REQUEST
+        )
+
+    # Errors for shared fields are reported once, errors for a target's own fields
+    # are reported with the target's index.
+    view_model_class, spec_func = _MODES[mode]
+    errors: dict[str, str] = dict()
+    specs: list[FinderChartSpec] = []
+    for i, target in enumerate(vm.targets):
+        target_vm = view_model_class(request)
+        target_vm.load_form(vm.target_form(i))
+        for field, error in target_vm.errors.items():
+            errors[f"targets[{i}].{field}" if field in target else field] = error
+        if len(target_vm.errors) == 0:
+            specs.append(await spec_func(target_vm))
+    if vm.batch_format == "pdf" and any(s.output_format != "pdf" for s in specs):
+        errors["output_format"] = "A multi-page PDF requires the PDF output format."
+
+    if len(errors) > 0:
+        return JSONResponse({"errors": errors}, status_code=status.HTTP_400_BAD_REQUEST)
+
+    match vm.batch_format:
+        case "zip":
+            return StreamingResponse(
+                _zip_stream(specs),
+                media_type="application/zip",
+                headers={
+                    "Content-Disposition": 'attachment; filename="finder-charts.zip"'
+                },
+            )
+        case "pdf":
+            charts: list[bytes] = [b""] * len(specs)
+            async for i, result in _render_batch(specs):
+                if isinstance(result, Exception):
+                    raise result
+                charts[i] = result
+            content = await asyncio.to_thread(merge_pdfs, charts)
+            return _finder_chart_stream(
+                content,
+                "pdf",
+                headers={
+                    "Content-Disposition": 'attachment; filename="finder-charts.pdf"'
+                },
+            )
+        case _:
+            # should never happen
+            raise ValueError(f"Unsupported batch format: {vm.batch_format}")
+
+
+async def _render_batch(
+    specs: list[FinderChartSpec],
+) -> AsyncIterator[tuple[int, bytes | Exception]]:
+    """
+    Render finder charts in parallel, and yield their indices and contents (or the
+    errors raised) in the order in which they are finished.
+    """
+    # A finder chart whose survey FITS file can be cropped from the tile of another
+    # finder chart is only rendered once that tile has been loaded.
+    groups = shared_tiles(
+        [
+            (
+                (s.background_image, s.fits_center)
+                if isinstance(s.background_image, str)
+                else None
+            )
+            for s in specs
+        ],
+        FITS_SIZE,
+    )
+
+    # The batch must leave room in the render pool queue for other requests.
+    semaphore = asyncio.Semaphore(max(get_settings().render_workers, 1))
+    tasks: list[asyncio.Task[bytes]] = []
+
+    async def render(i: int) -> bytes:
+        if groups[i] != i:
+            await asyncio.wait([tasks[groups[i]]])
+        async with semaphore:
+            return await load_or_render_finder_chart(specs[i])
+
+    tasks.extend(asyncio.create_task(render(i)) for i in range(len(specs)))
+    indices = {task: i for i, task in enumerate(tasks)}
+    try:
+        pending: set[asyncio.Task[bytes]] = set(tasks)
+        while pending:
+            done, pending = await asyncio.wait(
+                pending, return_when=asyncio.FIRST_COMPLETED
+            )
+            for task in sorted(done, key=indices.__getitem__):
+                exception = task.exception()
+                yield indices[task], (
+                    exception if isinstance(exception, Exception) else task.result()
+                )
+    finally:
+        # The client may have gone away.
+        for task in tasks:
+            task.cancel()
+
+
+async def _zip_stream(specs: list[FinderChartSpec]) -> AsyncIterator[bytes]:
+    archive = ZipStream()
+    errors: dict[str, str] = dict()
+    async for i, result in _render_batch(specs):
+        if isinstance(result, Exception):
+            logging.log(logging.ERROR, str(result))
+            errors[f"targets[{i}]"] = str(result)
+            continue
+        yield archive.add(_batch_entry_name(i, specs[i]), result)
+
+    # The response status has been sent already, so errors can only be reported in
+    # the archive itself.
+    if len(errors) > 0:
+        yield archive.add("errors.json", json.dumps({"errors": errors}).encode())
+    yield archive.close()
+
+
+def _batch_entry_name(index: int, spec: FinderChartSpec) -> str:
+    extension = "png" if spec.output_format == "preview" else spec.output_format
+    return f"{index + 1:03d}_{_file_name(spec)}.{extension}"
+
+
+def _chart_format_entry_name(spec: FinderChartSpec) -> str:
+    resolution = f"_{spec.dpi}dpi" if spec.dpi is not None else ""
+    return f"{_file_name(spec)}{resolution}.{spec.output_format}"
+
+
+def _file_name(spec: FinderChartSpec) -> str:
+    name = re.sub(r"[^A-Za-z0-9._-]+", "_", spec.general.target.name).strip("._")
+    return name or "target"
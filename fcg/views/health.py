@@ -0,0 +1,32 @@
+from fastapi import APIRouter, Request, Response
+from fastapi.responses import JSONResponse
+from starlette import status
+
+from fcg.infrastructure.surveys import get_survey_breakers
+
+router = APIRouter()
+
+
+@router.get("/ready")
+def ready(request: Request) -> Response:
+    # The startup report is only available once the server has been warmed up.
+    startup_report = getattr(request.app.state, "startup_report", None)
+    if startup_report is None:
+        return JSONResponse(
+            {"status": "starting"}, status_code=status.HTTP_503_SERVICE_UNAVAILABLE
+        )
+    return JSONResponse({"status": "ready", "startup": startup_report})
+
+
+@router.get("/health/surveys")
+def survey_health() -> Response:
+    # A failing survey doesn't make the server unready, as other surveys may be used.
+    surveys = dict()
+    for survey, breaker in get_survey_breakers().items():
+        circuit = breaker.status()
+        surveys[survey] = {
+            "state": breaker.state(),
+            "consecutive_failures": circuit.failures,
+            "opened_at": circuit.opened_at,
+        }
+    return JSONResponse({"surveys": surveys})
@@ -0,0 +1,13 @@
+from fastapi import APIRouter, Response
+from fastapi.responses import PlainTextResponse
+
+from fcg.infrastructure.metrics import REGISTRY
+
+router = APIRouter()
+
+
+@router.get("/metrics")
+def metrics() -> Response:
+    return PlainTextResponse(
+        REGISTRY.expose(), media_type="text/plain; version=0.0.4; charset=utf-8"
+    )
@@ -0,0 +1,48 @@
+import asyncio
+import secrets
+
+from fastapi import APIRouter, Request, Response
+from fastapi.responses import JSONResponse, PlainTextResponse
+from starlette import status
+
+from fcg.infrastructure.parse import parse_bool
+from fcg.infrastructure.profiling import get_profile_store
+from fcg.infrastructure.settings import get_settings
+
+router = APIRouter()
+
+
+@router.get("/profiles/{profile_id}")
+async def get_profile(request: Request, profile_id: str) -> Response:
+    if not is_admin(request):
+        return JSONResponse(
+            {"errors": {"__general": "Profiles are only available for admins."}},
+            status_code=status.HTTP_403_FORBIDDEN,
+        )
+    content = await asyncio.to_thread(get_profile_store().get, profile_id)
+    if content is None:
+        return JSONResponse(
+            {"errors": {"__general": f"There is no profile {profile_id}."}},
+            status_code=status.HTTP_404_NOT_FOUND,
+        )
+    return PlainTextResponse(content.decode("utf-8"))
+
+
+def is_admin(request: Request) -> bool:
+    """
+    Check whether a request carries the admin token.
+    """
+    admin_token = get_settings().admin_token
+    if not admin_token:
+        return False
+    token = request.headers.get("x-admin-token", "")
+    return secrets.compare_digest(token.encode("utf-8"), admin_token.encode("utf-8"))
+
+
+def is_profiling_requested(request: Request) -> bool:
+    """
+    Check whether an admin has requested a request to be profiled with the
+    ``profile`` query parameter.
+    """
+    profile = parse_bool(request.query_params.get("profile", "false"))
+    return profile and is_admin(request)
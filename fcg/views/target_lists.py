@@ -0,0 +1,48 @@
+import asyncio
+
+from fastapi import APIRouter, Request, Response
+from fastapi.responses import JSONResponse
+from starlette import status
+
+from fcg.infrastructure.targets import validate_target_list
+from fcg.viewmodels.target_list_viewmodel import TargetListViewModel
+
+router = APIRouter()
+
+
+@router.post("/target-lists/validate")
+async def validate(request: Request) -> Response:
+    vm = TargetListViewModel(request)
+    await vm.load()
+
+    if len(vm.errors) > 0:
+        return JSONResponse(
+            {"errors": vm.errors}, status_code=status.HTTP_400_BAD_REQUEST
+        )
+
+    # Long target lists take a while to validate, which must not block the event loop.
+    columns, errors = await asyncio.to_thread(
+        validate_target_list, vm.targets, vm.shared
+    )
+    if len(errors) > 0:
+        return JSONResponse({"errors": errors}, status_code=status.HTTP_400_BAD_REQUEST)
+
+    return JSONResponse(
+        {
+            "targets": [
+                {
+                    "target": target,
+                    "right_ascension": ra,
+                    "declination": dec,
+                    "position_angle": None if pa != pa else pa,
+                }
+                for target, ra, dec, pa in zip(
+                    columns.target,
+                    columns.right_ascension.tolist(),
+                    columns.declination.tolist(),
+                    columns.position_angle.tolist(),
+                    strict=True,
+                )
+            ]
+        }
+    )
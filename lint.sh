@@ -1,5 +1,5 @@
-black --target-version py311 fcg tests && \
+black --target-version py311 fcg tests benchmarks && \
 bandit -r fcg && \
-ruff check fcg tests && \
-mypy fcg tests && \
+ruff check fcg tests benchmarks && \
+mypy fcg tests benchmarks && \
 pytest
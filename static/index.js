@@ -15,6 +15,14 @@ let errors = {}
 
 let previousDataUrl = null;
 
+let coverageTimeout = null;
+
+let previewTimeout = null;
+
+let previewRequests = 0;
+
+let previousPreviewUrl = null;
+
 
 function switchTab(event) {
   // Store the form data
@@ -47,6 +55,9 @@ function selectTab(selectedTab) {
 
   // Display the content of the selected tab
   displayTabContent(selectedTab);
+
+  // The preview depends on the mode
+  schedulePreview();
 }
 
 function displayTabContent(selectedTab) {
@@ -97,6 +108,106 @@ function togglePositionAngleInput(event) {
   positionAngleInput.disabled = event.target.checked;
 }
 
+function checkSurveyCoverage(event) {
+  // Only the position and the image survey affect the survey coverage.
+  const name = event.target.getAttribute("name");
+  if (!["right_ascension", "declination", "image_survey"].includes(name)) {
+    return;
+  }
+
+  // Wait until the user has stopped typing.
+  clearTimeout(coverageTimeout);
+  coverageTimeout = setTimeout(updateSurveyCoverage, 300);
+}
+
+async function updateSurveyCoverage() {
+  const rightAscension = document.querySelector("#right_ascension");
+  const declination = document.querySelector("#declination");
+  const survey = document.querySelector("#image_survey");
+  if (!rightAscension || !declination || !survey || !rightAscension.value || !declination.value) {
+    return;
+  }
+  if (survey.value === "auto") {
+    // The automatic survey is chosen among the surveys covering the position.
+    delete errors["image_survey"];
+    displayErrors();
+    return;
+  }
+
+  const params = new URLSearchParams({
+    right_ascension: rightAscension.value,
+    declination: declination.value,
+    image_survey: survey.value
+  });
+  try {
+    const response = await fetch(`/survey-coverage?${params}`);
+    if (response.status !== 200) {
+      // Invalid values are reported when the form is submitted.
+      return;
+    }
+    const json = await response.json();
+    if (json["covered"][survey.value]) {
+      delete errors["image_survey"];
+    } else {
+      errors["image_survey"] = "The image survey does not cover the selected right ascension and declination.";
+    }
+    displayErrors();
+  } catch (e) {
+    // The coverage is checked again when the form is submitted.
+  }
+}
+
+function schedulePreview() {
+  // Wait until the user has stopped typing.
+  clearTimeout(previewTimeout);
+  previewTimeout = setTimeout(updatePreview, 500);
+}
+
+function hasUploadedFiles(form) {
+  return Array.from(form.querySelectorAll("input[type=file]")).some(input => input.files.length > 0);
+}
+
+async function updatePreview() {
+  // A low-resolution finder chart is generated for live feedback. The full finder
+  // chart is only generated when the form is submitted.
+  const preview = document.querySelector("#preview");
+  const form = document.querySelector("form");
+  if (hasUploadedFiles(form)) {
+    // Uploaded files would be sent again for every edit, so there is no preview
+    // for them. Responses to earlier preview requests are ignored.
+    ++previewRequests;
+    preview.style.display = "none";
+    return;
+  }
+  const formData = new FormData(form);
+  formData.set("output_format", "preview");
+  const request = ++previewRequests;
+  try {
+    const response = await fetch(`/finder-charts?mode=${selectedMode()}`, { method: "POST", body: formData });
+    if (response.status !== 200) {
+      // Invalid values are reported when the form is submitted.
+      if (request === previewRequests) {
+        preview.classList.add("is-stale");
+      }
+      return;
+    }
+    const blob = await response.blob();
+    if (request !== previewRequests) {
+      // A newer preview has been requested in the meantime.
+      return;
+    }
+    if (previousPreviewUrl) {
+      URL.revokeObjectURL(previousPreviewUrl);
+    }
+    previousPreviewUrl = URL.createObjectURL(blob);
+    document.querySelector("#preview-image").src = previousPreviewUrl;
+    preview.classList.remove("is-stale");
+    preview.style.display = "block";
+  } catch (e) {
+    preview.classList.add("is-stale");
+  }
+}
+
 async function generateFinderChart(event) {
   event.preventDefault();
 
@@ -138,11 +249,14 @@ function indicateLoading(loading) {
   }
 }
 
-async function makeGenerationRequest() {
+function selectedMode() {
   const selectedTab = tabs.find(tab => tab.classList.contains("is-active"));
   const target = selectedTab.dataset.target;
-  const mode = target.split("_form")[0];
-  const url = `/finder-charts?mode=${mode}`;
+  return target.split("_form")[0];
+}
+
+async function makeGenerationRequest() {
+  const url = `/finder-charts?mode=${selectedMode()}`;
   const formData = new FormData(event.target);
   return fetch(url, { method: "POST", body: formData });
 }
@@ -220,6 +334,14 @@ function init() {
   document.querySelectorAll("#fits_controls input")
           .forEach(input => input.addEventListener("click", switchFitsOption));
 
+  // Add event listeners for checking whether the image survey covers the position
+  document.querySelector("form").addEventListener("input", checkSurveyCoverage);
+  document.querySelector("form").addEventListener("change", checkSurveyCoverage);
+
+  // Add event listeners for updating the preview
+  document.querySelector("form").addEventListener("input", schedulePreview);
+  document.querySelector("form").addEventListener("change", schedulePreview);
+
   // Add the event listener for generating the finder chart
   document.querySelector("form").addEventListener("submit", generateFinderChart);
 
@@ -1,3 +1,5 @@
+import os
+import tempfile
 import warnings
 from pathlib import Path
 from typing import Callable, Generator
@@ -8,7 +10,18 @@ from PIL import Image
 from pytest_regressions.file_regression import FileRegressionFixture
 from starlette.testclient import TestClient
 
-from fcg.main import app
+# Finder charts are rendered in the request handler, so that tests can patch the
+# functions involved.
+os.environ.setdefault("FCG_RENDER_WORKERS", "0")
+
+# Warming up renders a throwaway finder chart, which would slow down every test
+# starting the application.
+os.environ.setdefault("FCG_WARM_UP", "0")
+
+# Cached files must not leak from one test run into another.
+os.environ.setdefault("FCG_CACHE_DIR", tempfile.mkdtemp(prefix="fcg-tests-"))
+
+from fcg.main import app  # noqa: E402
 
 
 @pytest.fixture(scope="function", autouse=True)
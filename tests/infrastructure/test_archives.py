@@ -0,0 +1,39 @@
+import zipfile
+from io import BytesIO
+
+from matplotlib import pyplot as plt
+from pypdf import PdfReader
+
+from fcg.infrastructure.archives import ZipStream, merge_pdfs
+
+
+def _pdf(text: str) -> bytes:
+    figure = plt.figure()
+    figure.text(0.5, 0.5, text)
+    content = BytesIO()
+    figure.savefig(content, format="pdf")
+    plt.close(figure)
+    return content.getvalue()
+
+
+def test_zip_stream_writes_entries_as_they_are_added() -> None:
+    archive = ZipStream()
+    chunks = [archive.add("a.txt", b"first"), archive.add("b.txt", b"second")]
+    assert b"first" in chunks[0]
+    assert b"second" in chunks[1]
+
+    chunks.append(archive.close())
+
+    with zipfile.ZipFile(BytesIO(b"".join(chunks))) as z:
+        assert z.namelist() == ["a.txt", "b.txt"]
+        assert z.read("a.txt") == b"first"
+        assert z.read("b.txt") == b"second"
+
+
+def test_merge_pdfs_keeps_order() -> None:
+    merged = merge_pdfs([_pdf("first"), _pdf("second"), _pdf("third")])
+
+    pages = PdfReader(BytesIO(merged)).pages
+    assert len(pages) == 3
+    assert "first" in pages[0].extract_text()
+    assert "third" in pages[2].extract_text()
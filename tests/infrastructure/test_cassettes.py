@@ -0,0 +1,74 @@
+import pathlib
+import time
+from unittest import mock
+
+import pytest
+
+from fcg.infrastructure.cassettes import Cassette, MissingRecordingError
+
+
+def _slow_fetch(body: bytes, duration: float) -> mock.MagicMock:
+    def fetch() -> bytes:
+        time.sleep(duration)
+        return body
+
+    return mock.MagicMock(side_effect=fetch)
+
+
+def test_cassette_records_and_replays(tmp_path: pathlib.Path) -> None:
+    request = {"identifier": "567", "start": 0.0}
+    fetch = _slow_fetch(b"response", 0.05)
+
+    recorder = Cassette(tmp_path, "record")
+    assert recorder.play("horizons", request, fetch) == b"response"
+    assert fetch.call_count == 1
+
+    player = Cassette(tmp_path, "replay")
+    started = time.perf_counter()
+    assert player.play("horizons", request, fetch) == b"response"
+    assert time.perf_counter() - started >= 0.05
+    assert fetch.call_count == 1
+
+
+def test_cassette_scales_replayed_timing(tmp_path: pathlib.Path) -> None:
+    request = {"survey": "2MASS-J"}
+    Cassette(tmp_path, "record").play("survey", request, _slow_fetch(b"FITS", 0.1))
+
+    player = Cassette(tmp_path, "replay", time_scale=0)
+    started = time.perf_counter()
+    assert player.play("survey", request, _slow_fetch(b"other", 0)) == b"FITS"
+    assert time.perf_counter() - started < 0.05
+
+
+def test_cassette_distinguishes_services_and_requests(tmp_path: pathlib.Path) -> None:
+    recorder = Cassette(tmp_path, "record")
+    recorder.play("survey", {"ra": "1", "dec": "2"}, lambda: b"first")
+    recorder.play("survey", {"ra": "1", "dec": "3"}, lambda: b"second")
+    recorder.play("horizons", {"ra": "1", "dec": "2"}, lambda: b"third")
+
+    player = Cassette(tmp_path, "replay", time_scale=0)
+    fetch = mock.MagicMock()
+    # the order of the request parameters doesn't matter
+    assert player.play("survey", {"dec": "2", "ra": "1"}, fetch) == b"first"
+    assert player.play("survey", {"ra": "1", "dec": "3"}, fetch) == b"second"
+    assert player.play("horizons", {"ra": "1", "dec": "2"}, fetch) == b"third"
+    with pytest.raises(MissingRecordingError):
+        player.play("horizons", {"ra": "1", "dec": "3"}, fetch)
+    fetch.assert_not_called()
+
+
+def test_cassette_does_not_record_failures(tmp_path: pathlib.Path) -> None:
+    recorder = Cassette(tmp_path, "record")
+    with pytest.raises(ConnectionError):
+        recorder.play("survey", {}, mock.MagicMock(side_effect=ConnectionError))
+
+    with pytest.raises(MissingRecordingError):
+        Cassette(tmp_path, "replay").play("survey", {}, mock.MagicMock())
+
+
+@pytest.mark.parametrize("mode, time_scale", [("rewind", 1), ("replay", -1)])
+def test_cassette_rejects_invalid_arguments(
+    mode: str, time_scale: float, tmp_path: pathlib.Path
+) -> None:
+    with pytest.raises(ValueError):
+        Cassette(tmp_path, mode, time_scale)  # type: ignore
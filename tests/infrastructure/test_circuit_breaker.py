@@ -0,0 +1,81 @@
+import pathlib
+import time
+
+import pytest
+
+from fcg.infrastructure.circuit_breaker import CircuitBreaker
+
+
+def test_circuit_breaker_opens_after_consecutive_failures() -> None:
+    breaker = CircuitBreaker("POSS1 Red", failure_threshold=3, reset_timeout=60)
+
+    breaker.record_failure()
+    breaker.record_failure()
+    breaker.record_success()
+    breaker.record_failure()
+    breaker.record_failure()
+    assert breaker.state() == "closed"
+    assert breaker.allow_request()
+
+    breaker.record_failure()
+    assert breaker.state() == "open"
+    assert breaker.status().failures == 3
+    assert not breaker.allow_request()
+
+
+@pytest.mark.parametrize("probe_succeeds", [True, False])
+def test_circuit_breaker_lets_probe_through(probe_succeeds: bool) -> None:
+    breaker = CircuitBreaker("POSS1 Red", failure_threshold=1, reset_timeout=0.05)
+    breaker.record_failure()
+    assert not breaker.allow_request()
+
+    time.sleep(0.06)
+    assert breaker.allow_request()
+    assert breaker.state() == "half_open"
+    # Only a single probe is made at a time.
+    assert not breaker.allow_request()
+
+    if probe_succeeds:
+        breaker.record_success()
+        assert breaker.state() == "closed"
+        assert breaker.allow_request()
+    else:
+        breaker.record_failure()
+        assert breaker.state() == "open"
+        assert not breaker.allow_request()
+
+
+def test_circuit_breaker_gives_up_unfinished_probe() -> None:
+    breaker = CircuitBreaker("POSS1 Red", failure_threshold=1, reset_timeout=0.05)
+    breaker.record_failure()
+    time.sleep(0.06)
+    assert breaker.allow_request()
+
+    time.sleep(0.06)
+    assert breaker.state() == "open"
+    assert breaker.allow_request()
+
+
+def test_circuit_breaker_is_shared_by_directory(tmp_path: pathlib.Path) -> None:
+    breaker = CircuitBreaker(
+        "POSS2/UKSTU Red", failure_threshold=2, reset_timeout=60, directory=tmp_path
+    )
+    # a circuit breaker for the same survey in another process
+    other_breaker = CircuitBreaker(
+        "POSS2/UKSTU Red", failure_threshold=2, reset_timeout=60, directory=tmp_path
+    )
+
+    breaker.record_failure()
+    other_breaker.record_failure()
+
+    assert breaker.state() == "open"
+    assert not other_breaker.allow_request()
+    assert (tmp_path / "poss2-ukstu-red.json").exists()
+
+    other_breaker.record_success()
+    assert breaker.state() == "closed"
+
+
+def test_circuit_breaker_requires_positive_threshold() -> None:
+    with pytest.raises(ValueError):
+        CircuitBreaker("POSS1 Red", failure_threshold=0, reset_timeout=60)
@@ -0,0 +1,57 @@
+from unittest import mock
+
+import numpy as np
+import pytest
+from astropy import units as u
+from astropy.coordinates import SkyCoord
+from imephu.service.survey import is_covering_position
+
+from fcg.infrastructure.coverage import SURVEYS, CoverageIndex, get_coverage_index
+
+
+@pytest.mark.parametrize("survey", SURVEYS)
+def test_coverage_index_agrees_with_imephu(survey: str) -> None:
+    rng = np.random.default_rng(0)
+    ra = rng.uniform(0, 360, 200)
+    dec = np.degrees(np.arcsin(rng.uniform(-1, 1, 200)))
+    # positions on the boundaries of the survey coverage and at the poles
+    ra = np.append(ra, [0, 10, 20, 30, 40, 50, 360, 0])
+    dec = np.append(dec, [-30, -30.0001, 6, 6.0001, -20, -20.0001, 90, -90])
+    expected = [
+        is_covering_position(survey, SkyCoord(ra=r * u.deg, dec=d * u.deg))
+        for r, d in zip(ra, dec, strict=True)
+    ]
+
+    index = get_coverage_index(survey)
+
+    assert index.covers_many(ra, dec).tolist() == expected
+    assert [index.covers(r, d) for r, d in zip(ra, dec, strict=True)] == expected
+
+
+def test_coverage_index_only_checks_boundary_cells() -> None:
+    index = CoverageIndex("POSS1 Red", cell_size=10)
+
+    with mock.patch.object(
+        index, "_is_covering", wraps=index._is_covering
+    ) as is_covering:
+        # only the cells between -30 and -20 degrees are boundary cells
+        assert index.covers_many([0, 10, 20], [-31, -19, 85]).tolist() == [
+            False,
+            True,
+            True,
+        ]
+        assert index.covers(30, -45) is False
+        assert index.covers(30, 45) is True
+        is_covering.assert_not_called()
+
+        assert index.covers(30, -25) is True
+        assert is_covering.call_count == 1
+
+
+def test_get_coverage_index_ignores_case() -> None:
+    assert get_coverage_index("poss1 red") is get_coverage_index("POSS1 Red")
+
+
+def test_get_coverage_index_for_unknown_survey() -> None:
+    with pytest.raises(ValueError, match="Unknown survey"):
+        get_coverage_index("Hitchhiker's Sky Survey")
@@ -0,0 +1,57 @@
+import os
+import pathlib
+
+from fcg.infrastructure.disk_cache import DiskCache
+
+
+def test_get_returns_stored_entry(tmp_path: pathlib.Path) -> None:
+    cache = DiskCache(tmp_path / "cache", max_bytes=1000)
+    cache.put("a", b"content")
+    assert cache.get("a") == b"content"
+    assert "a" in cache
+
+
+def test_get_returns_none_for_missing_entry(tmp_path: pathlib.Path) -> None:
+    cache = DiskCache(tmp_path, max_bytes=1000)
+    assert cache.get("a") is None
+    assert "a" not in cache
+
+
+def test_put_replaces_entry(tmp_path: pathlib.Path) -> None:
+    cache = DiskCache(tmp_path, max_bytes=1000)
+    cache.put("a", b"old")
+    cache.put("a", b"new")
+    assert cache.get("a") == b"new"
+
+
+def test_cache_is_shared_between_instances(tmp_path: pathlib.Path) -> None:
+    DiskCache(tmp_path, max_bytes=1000).put("a", b"content")
+    assert DiskCache(tmp_path, max_bytes=1000).get("a") == b"content"
+
+
+def test_hits_and_misses_are_counted(tmp_path: pathlib.Path) -> None:
+    cache = DiskCache(tmp_path, max_bytes=1000)
+    cache.get("a")
+    cache.put("a", b"content")
+    cache.get("a")
+    cache.get("a")
+    assert cache.hits == 2
+    assert cache.misses == 1
+    assert cache.hit_ratio == 2 / 3
+
+
+def test_least_recently_used_entries_are_evicted(tmp_path: pathlib.Path) -> None:
+    cache = DiskCache(tmp_path, max_bytes=35)
+    for i, key in enumerate(["a", "b", "c"]):
+        cache.put(key, 10 * key.encode())
+        os.utime(cache._path(key), (i, i))
+
+    # Using "a" makes "b" the least recently used entry
+    cache.get("a")
+    cache.put("d", b"dddddddddd")
+
+    assert "a" in cache
+    assert "b" not in cache
+    assert "c" in cache
+    assert "d" in cache
+    assert not [p for p in tmp_path.iterdir() if p.name.startswith(".")]
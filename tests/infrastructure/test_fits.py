@@ -0,0 +1,87 @@
+from io import BytesIO
+
+import numpy as np
+import pytest
+from astropy import units as u
+from astropy.coordinates import SkyCoord
+from astropy.io import fits
+from astropy.wcs import WCS
+
+from fcg.infrastructure.fits import crop_fits, downsample_fits, synthetic_fits
+
+_FITS_FILE = "tests/data/ra170.1_dec-55.5.fits"
+
+
+def test_crop_fits() -> None:
+    with open(_FITS_FILE, "rb") as f:
+        content = f.read()
+    center = SkyCoord(ra=170.12 * u.deg, dec=-55.49 * u.deg)
+
+    cropped = crop_fits(content, center, 4 * u.arcmin)
+
+    assert cropped is not None
+    original_hdu = fits.open(_FITS_FILE)[0]
+    hdu = fits.open(BytesIO(cropped))[0]
+    assert hdu.data.shape[0] < original_hdu.data.shape[0]
+    height, width = hdu.data.shape
+    cropped_center = WCS(hdu.header).pixel_to_world((width - 1) / 2, (height - 1) / 2)
+    assert cropped_center.separation(center).to_value(u.arcsec) < 2
+    # the pixels are the same as in the original file
+    position = WCS(hdu.header).pixel_to_world(5, 3)
+    x, y = WCS(original_hdu.header).world_to_pixel(position)
+    assert (
+        hdu.data[3, 5] == original_hdu.data[int(round(float(y))), int(round(float(x)))]
+    )
+
+
+def test_crop_fits_returns_none_for_region_outside_image() -> None:
+    with open(_FITS_FILE, "rb") as f:
+        content = f.read()
+    center = SkyCoord(ra=170.1 * u.deg, dec=-55.5 * u.deg)
+    assert crop_fits(content, center, 60 * u.arcmin) is None
+
+
+def test_downsample_fits() -> None:
+    with open(_FITS_FILE, "rb") as f:
+        content = f.read()
+    original = fits.open(BytesIO(content))[0]
+
+    downsampled = fits.open(BytesIO(downsample_fits(content, 3)))[0]
+
+    # the image has 595 rows and 594 columns
+    assert downsampled.data.shape == (198, 198)
+    assert downsampled.data[10, 20] == pytest.approx(original.data[30:33, 60:63].mean())
+    # the world coordinates agree with those of the original plate solution
+    rng = np.random.default_rng(0)
+    x, y = rng.uniform(-0.5, 197.5, (2, 100))
+    separations = (
+        WCS(original.header)
+        .pixel_to_world(3 * x + 1, 3 * y + 1)
+        .separation(WCS(downsampled.header).pixel_to_world(x, y))
+    )
+    assert separations.to_value(u.arcsec).max() < 0.1
+
+
+@pytest.mark.parametrize("factor", [0, 1, 1000])
+def test_downsample_fits_returns_unsuitable_images_unchanged(factor: int) -> None:
+    with open(_FITS_FILE, "rb") as f:
+        content = f.read()
+    assert downsample_fits(content, factor) == content
+
+
+def test_synthetic_fits() -> None:
+    center = SkyCoord(ra=170.1 * u.deg, dec=-55.5 * u.deg)
+
+    content = synthetic_fits(center, 10 * u.arcmin, pixels=100, stars=10)
+
+    hdu = fits.open(BytesIO(content))[0]
+    assert hdu.data.shape == (100, 100)
+    image_center = WCS(hdu.header).pixel_to_world(49.5, 49.5)
+    assert image_center.separation(center).to_value(u.arcsec) < 1
+    corner = WCS(hdu.header).pixel_to_world(-0.5, -0.5)
+    assert corner.separation(center).to_value(u.arcmin) == (
+        pytest.approx(5 * 2**0.5, rel=0.01)
+    )
+    # the same arguments lead to the same image
+    assert synthetic_fits(center, 10 * u.arcmin, pixels=100, stars=10) == content
+    assert synthetic_fits(center, 10 * u.arcmin, 100, stars=10, seed=1) != content
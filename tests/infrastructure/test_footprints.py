@@ -0,0 +1,109 @@
+import pathlib
+
+import pytest
+
+from fcg.infrastructure.footprints import Footprint, FootprintIndex
+
+
+def _footprint(ra: float, dec: float, survey: str = "poss2/ukstu red") -> Footprint:
+    return Footprint(survey=survey, ra=ra, dec=dec, size=0.5, key=f"{ra}|{dec}")
+
+
+@pytest.mark.parametrize(
+    "ra, dec, expected",
+    [
+        (10, -20, True),
+        (10.08, -20.08, True),
+        (10.2, -20, False),
+        (10, -19.8, False),
+        (190, 20, False),
+    ],
+)
+def test_find_checks_containment(ra: float, dec: float, expected: bool) -> None:
+    index = FootprintIndex(cell_size=0.5)
+    footprint = _footprint(10, -20)
+    index.add(footprint)
+    assert (index.find("POSS2/UKSTU Red", ra, dec, 1 / 6) == [footprint]) is expected
+
+
+@pytest.mark.parametrize("ra, dec", [(0.05, 0), (359.95, 0), (123, 89.95), (0, -90)])
+def test_find_handles_coordinate_singularities(ra: float, dec: float) -> None:
+    index = FootprintIndex(cell_size=0.5)
+    index.add(_footprint(0, 0))
+    index.add(_footprint(0, 89.9))
+    index.add(_footprint(0, -90))
+    assert len(index.find("POSS2/UKSTU Red", ra, dec, 1 / 60)) == 1
+
+
+def test_find_distinguishes_surveys() -> None:
+    index = FootprintIndex(cell_size=0.5)
+    index.add(_footprint(10, -20, survey="poss1 red"))
+    assert index.find("POSS2/UKSTU Red", 10, -20, 1 / 6) == []
+
+
+def test_discard_removes_footprint() -> None:
+    index = FootprintIndex(cell_size=0.5)
+    footprint = _footprint(10, -20)
+    index.add(footprint)
+    index.discard(footprint)
+    assert index.find("POSS2/UKSTU Red", 10, -20, 1 / 6) == []
+    assert len(index) == 0
+
+
+def test_footprints_are_shared_via_file(tmp_path: pathlib.Path) -> None:
+    path = tmp_path / "footprints"
+    index = FootprintIndex(cell_size=0.5, path=path)
+    other_index = FootprintIndex(cell_size=0.5, path=path)
+    footprint = _footprint(10, -20)
+    index.add(footprint)
+    assert other_index.find("POSS2/UKSTU Red", 10, -20, 1 / 6) == [footprint]
+
+
+def test_discarded_footprints_are_removed_from_file(tmp_path: pathlib.Path) -> None:
+    path = tmp_path / "footprints"
+    index = FootprintIndex(cell_size=0.5, path=path)
+    footprint = _footprint(10, -20)
+    index.add(footprint)
+    index.add(_footprint(30, -20))
+    index.discard(footprint)
+    index.compact()
+
+    assert len(path.read_text().splitlines()) == 1
+    reloaded_index = FootprintIndex(cell_size=0.5, path=path)
+    assert reloaded_index.find("POSS2/UKSTU Red", 10, -20, 1 / 6) == []
+    assert len(reloaded_index.find("POSS2/UKSTU Red", 30, -20, 1 / 6)) == 1
+
+
+def test_file_is_compacted_when_it_grows(tmp_path: pathlib.Path) -> None:
+    path = tmp_path / "footprints"
+    index = FootprintIndex(
+        cell_size=0.5, path=path, is_live=lambda footprint: footprint.ra >= 100
+    )
+    other_index = FootprintIndex(cell_size=0.5, path=path)
+    index.add(_footprint(0, -20))
+    assert len(index.find("POSS2/UKSTU Red", 0, -20, 1 / 6)) == 1
+    assert len(other_index.find("POSS2/UKSTU Red", 0, -20, 1 / 6)) == 1
+    for ra in range(1, 200):
+        index.add(_footprint(ra, -20))
+    index.find("POSS2/UKSTU Red", 150, -20, 1 / 6)
+
+    # Only the footprints with live images are kept, and other processes reload the
+    # compacted file.
+    assert len(path.read_text().splitlines()) == 100
+    assert len(index) == 100
+    assert other_index.find("POSS2/UKSTU Red", 0, -20, 1 / 6) == []
+    assert len(other_index.find("POSS2/UKSTU Red", 150, -20, 1 / 6)) == 1
+    assert len(other_index) == 100
+
+
+def test_many_discarded_footprints_lead_to_compaction(tmp_path: pathlib.Path) -> None:
+    path = tmp_path / "footprints"
+    index = FootprintIndex(cell_size=0.5, path=path)
+    footprints = [_footprint(ra, -20) for ra in range(150)]
+    for footprint in footprints:
+        index.add(footprint)
+    index.compact()
+    for footprint in footprints[:75]:
+        index.discard(footprint)
+
+    assert len(path.read_text().splitlines()) == 75
@@ -0,0 +1,210 @@
+import threading
+import time
+from collections import OrderedDict
+from contextlib import contextmanager
+from io import BytesIO
+from typing import AbstractSet, BinaryIO, Callable, Generator, Iterator
+from unittest import mock
+
+import pytest
+from astropy import units as u
+from astropy.coordinates import Angle, SkyCoord
+
+import fcg.infrastructure.hedging
+from fcg.infrastructure.circuit_breaker import CircuitBreaker
+from fcg.infrastructure.fits import synthetic_fits
+from fcg.infrastructure.hedging import (
+    load_fastest_survey_fits,
+    rank_surveys,
+    remember_survey_choice,
+    remembered_survey_choice,
+)
+from fcg.infrastructure.metrics import SURVEY_HEDGES
+from fcg.infrastructure.settings import get_settings
+from fcg.infrastructure.surveys import SurveyStats
+
+# A position covered by all surveys the automatic survey chooses from.
+_POSITION = SkyCoord(ra=10 * u.deg, dec=0 * u.deg)
+
+_SIZE = 1 * u.arcmin
+
+
+@pytest.fixture()
+def stats() -> Generator[SurveyStats, None, None]:
+    stats = SurveyStats()
+    settings = get_settings()._replace(survey_hedge_delay=0.1)
+    with (
+        mock.patch.object(
+            fcg.infrastructure.hedging, "get_survey_stats", return_value=stats
+        ),
+        mock.patch.object(
+            fcg.infrastructure.hedging, "get_settings", return_value=settings
+        ),
+    ):
+        yield stats
+
+
+@contextmanager
+def _mock_surveys(
+    delays: dict[str, float],
+    failing: AbstractSet[str] = frozenset(),
+    invalid: AbstractSet[str] = frozenset(),
+) -> Iterator[mock.MagicMock]:
+    def load_survey_fits(
+        survey: str,
+        fits_center: SkyCoord,
+        size: Angle,
+        is_valid: Callable[[bytes], bool] | None = None,
+    ) -> BinaryIO:
+        time.sleep(delays.get(survey, 0))
+        if survey in failing:
+            raise OSError(f"{survey} is down.")
+        if survey in invalid:
+            return BytesIO(b"<html>Service unavailable</html>")
+        return BytesIO(synthetic_fits(fits_center, size, pixels=10))
+
+    with mock.patch.object(
+        fcg.infrastructure.hedging, "load_survey_fits", side_effect=load_survey_fits
+    ) as m:
+        yield m
+
+
+def test_rank_surveys_prefers_fast_surveys(stats: SurveyStats) -> None:
+    for duration in [0.01] * 5:
+        stats.record("POSS1 Blue", duration, True)
+
+    assert rank_surveys(_POSITION) == [
+        "POSS1 Blue",
+        "POSS2/UKSTU Red",
+        "POSS2/UKSTU Blue",
+        "POSS1 Red",
+    ]
+
+
+def test_rank_surveys_only_includes_covering_surveys(stats: SurveyStats) -> None:
+    position = SkyCoord(ra=10 * u.deg, dec=-60 * u.deg)
+    assert rank_surveys(position) == ["POSS2/UKSTU Red", "POSS2/UKSTU Blue"]
+
+
+def test_load_fastest_survey_fits_uses_best_survey(stats: SurveyStats) -> None:
+    with _mock_surveys({}) as load_survey_fits:
+        survey, fits = load_fastest_survey_fits(_POSITION, _SIZE)
+
+    assert survey == "POSS2/UKSTU Red"
+    assert fits.read(6) == b"SIMPLE"
+    assert load_survey_fits.call_count == 1
+
+
+def test_load_fastest_survey_fits_hedges_slow_requests(stats: SurveyStats) -> None:
+    hedges = SURVEY_HEDGES.values().get(("hedge",), 0)
+    started = time.perf_counter()
+    with _mock_surveys({"POSS2/UKSTU Red": 2}) as load_survey_fits:
+        survey, _ = load_fastest_survey_fits(_POSITION, _SIZE)
+
+    assert survey == "POSS2/UKSTU Blue"
+    assert time.perf_counter() - started < 1
+    assert load_survey_fits.call_count == 2
+    assert SURVEY_HEDGES.values()[("hedge",)] == hedges + 1
+
+
+def test_load_fastest_survey_fits_uses_latency_percentile(
+    stats: SurveyStats,
+) -> None:
+    # With a 90th percentile of 1 second the slow request is not hedged.
+    for survey in fcg.infrastructure.hedging.AUTO_SURVEYS:
+        for duration in [1] * 10:
+            stats.record(survey, duration, True)
+    with _mock_surveys({"POSS2/UKSTU Red": 0.3}) as load_survey_fits:
+        survey, _ = load_fastest_survey_fits(_POSITION, _SIZE)
+
+    assert survey == "POSS2/UKSTU Red"
+    assert load_survey_fits.call_count == 1
+
+
+@pytest.mark.parametrize("failure", ["failing", "invalid"])
+def test_load_fastest_survey_fits_falls_back_to_next_survey(
+    failure: str, stats: SurveyStats
+) -> None:
+    broken = {"POSS2/UKSTU Red", "POSS2/UKSTU Blue"}
+    with _mock_surveys({}, **{failure: broken}) as load_survey_fits:
+        survey, _ = load_fastest_survey_fits(_POSITION, _SIZE)
+
+    assert survey == "POSS1 Red"
+    assert load_survey_fits.call_count == 3
+
+
+def test_load_fastest_survey_fits_fails_if_all_surveys_fail(
+    stats: SurveyStats,
+) -> None:
+    position = SkyCoord(ra=10 * u.deg, dec=-60 * u.deg)
+    with _mock_surveys({}, failing={"POSS2/UKSTU Red", "POSS2/UKSTU Blue"}):
+        with pytest.raises(OSError, match="down"):
+            load_fastest_survey_fits(position, _SIZE)
+
+
+def test_load_fastest_survey_fits_does_not_wait_for_loser(
+    stats: SurveyStats,
+) -> None:
+    finished = threading.Event()
+
+    def slow_survey(
+        survey: str,
+        fits_center: SkyCoord,
+        size: Angle,
+        is_valid: Callable[[bytes], bool] | None = None,
+    ) -> BinaryIO:
+        if survey == "POSS2/UKSTU Red":
+            time.sleep(1)
+            finished.set()
+        return BytesIO(synthetic_fits(fits_center, size, pixels=10))
+
+    with mock.patch.object(
+        fcg.infrastructure.hedging, "load_survey_fits", side_effect=slow_survey
+    ):
+        survey, _ = load_fastest_survey_fits(_POSITION, _SIZE)
+        assert survey == "POSS2/UKSTU Blue"
+        assert not finished.is_set()
+        # The losing request finishes in the background.
+        assert finished.wait(5)
+
+
+@pytest.fixture()
+def choices() -> Generator[OrderedDict[str, str], None, None]:
+    choices: OrderedDict[str, str] = OrderedDict()
+    with mock.patch.object(fcg.infrastructure.hedging, "_choices", choices):
+        yield choices
+
+
+def test_remembered_survey_choice(choices: OrderedDict[str, str]) -> None:
+    nearby_position = SkyCoord(ra=10.000001 * u.deg, dec=0.000001 * u.deg)
+    assert remembered_survey_choice(_POSITION, _SIZE) is None
+
+    remember_survey_choice(_POSITION, _SIZE, "POSS1 Red")
+
+    assert remembered_survey_choice(nearby_position, _SIZE) == "POSS1 Red"
+    assert remembered_survey_choice(_POSITION, 2 * _SIZE) is None
+
+
+def test_remembered_survey_choice_ignores_failing_surveys(
+    choices: OrderedDict[str, str],
+) -> None:
+    breaker = CircuitBreaker("POSS1 Red", failure_threshold=1, reset_timeout=60)
+    breaker.record_failure()
+    remember_survey_choice(_POSITION, _SIZE, "POSS1 Red")
+
+    with mock.patch.object(
+        fcg.infrastructure.hedging, "get_survey_breaker", return_value=breaker
+    ):
+        assert remembered_survey_choice(_POSITION, _SIZE) is None
+
+
+def test_remembered_survey_choices_are_bounded(
+    choices: OrderedDict[str, str],
+) -> None:
+    with mock.patch.object(fcg.infrastructure.hedging, "_MAX_CHOICES", 2):
+        for ra in [10, 20, 30]:
+            position = SkyCoord(ra=ra * u.deg, dec=0 * u.deg)
+            remember_survey_choice(position, _SIZE, "POSS1 Red")
+
+    assert len(choices) == 2
+    assert remembered_survey_choice(_POSITION, _SIZE) is None
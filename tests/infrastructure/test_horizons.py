@@ -0,0 +1,90 @@
+import math
+import pathlib
+import time
+from typing import Any
+
+import pytest
+
+from fcg.infrastructure.horizons import EphemerisCache
+
+_START = 1689595200.0
+_HOUR = 3600.0
+
+
+def _ephemerides(start: float, end: float, step: float) -> list[dict[str, Any]]:
+    # Like the Horizons service, end with the first epoch at or after the end time.
+    count = math.ceil((end - start) / step) + 1
+    return [{"epoch": start + i * step, "ra": float(i)} for i in range(count)]
+
+
+@pytest.fixture()
+def cache(tmp_path: pathlib.Path) -> EphemerisCache:
+    cache = EphemerisCache(tmp_path / "horizons.sqlite3", ttl=3600)
+    cache.put(
+        "567",
+        "B31",
+        _START,
+        _START + 24 * _HOUR,
+        0.5 * _HOUR,
+        _ephemerides(_START, _START + 24 * _HOUR, 0.5 * _HOUR),
+    )
+    return cache
+
+
+def test_get_returns_cached_ephemerides(cache: EphemerisCache) -> None:
+    ephemerides = cache.get("567", "B31", _START, _START + 24 * _HOUR, 0.5 * _HOUR)
+    assert ephemerides == _ephemerides(_START, _START + 24 * _HOUR, 0.5 * _HOUR)
+
+
+@pytest.mark.parametrize(
+    "start, end, step",
+    [
+        (_START + 2 * _HOUR, _START + 5 * _HOUR, 0.5 * _HOUR),
+        (_START, _START + 24 * _HOUR, 2 * _HOUR),
+        (_START + 1.5 * _HOUR, _START + 10.2 * _HOUR, 1.5 * _HOUR),
+    ],
+)
+def test_get_answers_from_superset(
+    start: float, end: float, step: float, cache: EphemerisCache
+) -> None:
+    ephemerides = cache.get("567", "B31", start, end, step)
+
+    assert ephemerides is not None
+    epochs = [e["epoch"] for e in ephemerides]
+    assert epochs[0] == start
+    assert all(b - a == step for a, b in zip(epochs[:-1], epochs[1:], strict=True))
+    assert epochs[-2] < end <= epochs[-1]
+
+
+@pytest.mark.parametrize(
+    "identifier, location, start, end, step",
+    [
+        ("568", "B31", _START, _START + 24 * _HOUR, 0.5 * _HOUR),
+        ("567", "500", _START, _START + 24 * _HOUR, 0.5 * _HOUR),
+        ("567", "B31", _START - _HOUR, _START + 5 * _HOUR, 0.5 * _HOUR),
+        ("567", "B31", _START, _START + 25 * _HOUR, 0.5 * _HOUR),
+        ("567", "B31", _START, _START + 5 * _HOUR, 0.25 * _HOUR),
+        ("567", "B31", _START, _START + 5 * _HOUR, 0.75 * _HOUR),
+        ("567", "B31", _START + 600, _START + 5 * _HOUR, 0.5 * _HOUR),
+    ],
+)
+def test_get_returns_none_for_uncovered_query(
+    identifier: str,
+    location: str,
+    start: float,
+    end: float,
+    step: float,
+    cache: EphemerisCache,
+) -> None:
+    assert cache.get(identifier, location, start, end, step) is None
+
+
+def test_ephemerides_expire(tmp_path: pathlib.Path) -> None:
+    cache = EphemerisCache(tmp_path / "horizons.sqlite3", ttl=0.05)
+    ephemerides = _ephemerides(_START, _START + _HOUR, 600)
+    cache.put("567", "B31", _START, _START + _HOUR, 600, ephemerides)
+    assert cache.get("567", "B31", _START, _START + _HOUR, 600) == ephemerides
+
+    time.sleep(0.1)
+
+    assert cache.get("567", "B31", _START, _START + _HOUR, 600) is None
@@ -0,0 +1,136 @@
+from typing import Any
+
+import numpy as np
+import pytest
+
+from fcg.infrastructure.interpolation import (
+    FIELDS,
+    ephemeris_columns,
+    ephemeris_rows,
+    estimate_interpolation_error,
+    interpolate_ephemerides,
+    interpolate_ephemeris_columns,
+)
+
+_HOUR = 3600.0
+
+
+def _ra(t: np.ndarray, ra0: float) -> np.ndarray:
+    hours = t / _HOUR
+    return np.mod(ra0 + 0.05 * hours + 0.01 * np.sin(hours / 5), 360)
+
+
+def _dec(t: np.ndarray) -> np.ndarray:
+    hours = t / _HOUR
+    return -20 + 0.02 * hours - 0.005 * np.cos(hours / 3)
+
+
+def _ra_rate(t: np.ndarray) -> np.ndarray:
+    # in arcseconds per hour, including the cosine of the declination
+    hours = t / _HOUR
+    rate: np.ndarray = (
+        3600 * (0.05 + 0.002 * np.cos(hours / 5)) * np.cos(np.radians(_dec(t)))
+    )
+    return rate
+
+
+def _dec_rate(t: np.ndarray) -> np.ndarray:
+    # in arcseconds per hour
+    hours = t / _HOUR
+    return 3600 * (0.02 + 0.005 / 3 * np.sin(hours / 3))
+
+
+def _ephemerides(
+    t: np.ndarray, ra0: float = 100, with_magnitudes: bool = True
+) -> list[dict[str, Any]]:
+    return [
+        {
+            "epoch": float(epoch),
+            "ra": float(ra),
+            "dec": float(dec),
+            "ra_rate": float(ra_rate),
+            "dec_rate": float(dec_rate),
+            "magnitude": 16 + epoch / (100 * _HOUR) if with_magnitudes else None,
+        }
+        for epoch, ra, dec, ra_rate, dec_rate in zip(
+            t, _ra(t, ra0), _dec(t), _ra_rate(t), _dec_rate(t), strict=True
+        )
+    ]
+
+
+@pytest.mark.parametrize("ra0", [100, 359.5])
+def test_interpolate_ephemerides(ra0: float) -> None:
+    coarse = _ephemerides(np.arange(-1, 50) * _HOUR, ra0)
+    epochs = np.arange(0, 48 * 60 + 1) * 60.0
+
+    interpolated = interpolate_ephemerides(coarse, epochs)
+
+    assert [e["epoch"] for e in interpolated] == list(epochs)
+    ra = np.array([e["ra"] for e in interpolated])
+    dec = np.array([e["dec"] for e in interpolated])
+    ra_error = np.mod(ra - _ra(epochs, ra0) + 180, 360) - 180
+    assert np.all((ra >= 0) & (ra < 360))
+    assert np.max(np.abs(ra_error)) * 3600 < 0.1
+    assert np.max(np.abs(dec - _dec(epochs))) * 3600 < 0.1
+    assert interpolated[30]["magnitude"] == pytest.approx(16 + 1800 / (100 * _HOUR))
+    assert interpolated[30]["ra_rate"] == pytest.approx(_ra_rate(epochs[30]), rel=1e-5)
+
+
+def test_interpolate_ephemerides_uses_rates() -> None:
+    # A fast moving target, whose motion changes considerably between ephemerides
+    coarse_t = np.arange(0, 4) * 6 * _HOUR
+    epochs = np.linspace(0, 18 * _HOUR, 181)
+    with_rates = _ephemerides(coarse_t)
+    without_rates = [dict(e, ra_rate=None, dec_rate=None) for e in with_rates]
+
+    def dec_error(ephemerides: list[dict[str, Any]]) -> float:
+        dec = np.array([e["dec"] for e in interpolate_ephemerides(ephemerides, epochs)])
+        return float(np.max(np.abs(dec - _dec(epochs))))
+
+    # Without rates the derivatives are estimated from the ephemerides.
+    assert dec_error(with_rates) < dec_error(without_rates) / 2
+    interpolated = interpolate_ephemerides(without_rates, epochs)
+    assert all(e["ra_rate"] is None and e["dec_rate"] is None for e in interpolated)
+
+
+def test_interpolate_ephemerides_without_magnitudes() -> None:
+    coarse = _ephemerides(np.arange(0, 5) * _HOUR, with_magnitudes=False)
+
+    interpolated = interpolate_ephemerides(coarse, np.array([0, 1800, 4 * _HOUR]))
+
+    assert all(e["magnitude"] is None for e in interpolated)
+
+
+def test_interpolate_ephemeris_columns() -> None:
+    coarse = _ephemerides(np.arange(0, 5) * _HOUR)
+    epochs = np.array([0, 1800, 4 * _HOUR])
+
+    columns = interpolate_ephemeris_columns(coarse, epochs)
+
+    assert list(columns) == list(FIELDS)
+    assert all(values.dtype == np.float64 for values in columns.values())
+    np.testing.assert_array_equal(columns["epoch"], epochs)
+    assert ephemeris_rows(columns) == interpolate_ephemerides(coarse, epochs)
+
+
+def test_ephemeris_columns_and_rows() -> None:
+    ephemerides = _ephemerides(np.arange(0, 3) * _HOUR)
+    ephemerides[1]["magnitude"] = None
+
+    columns = ephemeris_columns(ephemerides)
+
+    assert all(values.dtype == np.float64 for values in columns.values())
+    assert np.isnan(columns["magnitude"][1])
+    assert ephemeris_rows(columns) == ephemerides
+
+
+def test_estimate_interpolation_error() -> None:
+    t = np.arange(0, 49) * _HOUR
+    error = estimate_interpolation_error(_ephemerides(t))
+
+    assert 0 < error.position < 0.5
+    assert error.magnitude is not None
+    assert error.magnitude < 1e-6
+
+    error = estimate_interpolation_error(_ephemerides(t, with_magnitudes=False))
+    assert error.magnitude is None
@@ -0,0 +1,171 @@
+import asyncio
+import pathlib
+import time
+from typing import cast
+from unittest import mock
+
+import pytest
+from astropy import units as u
+from astropy.coordinates import SkyCoord
+from imephu.salt.finder_chart import GeneralProperties
+
+from fcg.infrastructure.jobs import JobRunner, JobStore
+from fcg.infrastructure.pool import RenderPoolBusyError
+from fcg.infrastructure.rendering import FinderChartSpec
+
+
+def _spec(survey: str = "POSS2/UKSTU Red") -> FinderChartSpec:
+    return FinderChartSpec(
+        mode="hrs",
+        general=cast(GeneralProperties, None),
+        background_image=survey,
+        fits_center=SkyCoord(ra=10 * u.deg, dec=-20 * u.deg),
+        output_format="png",
+        options={},
+    )
+
+
+def _store(tmp_path: pathlib.Path, **kwargs: float) -> JobStore:
+    return JobStore(
+        path=tmp_path / "jobs.sqlite3",
+        retention=kwargs.get("retention", 3600),
+        lease=kwargs.get("lease", 60),
+    )
+
+
+def test_jobs_are_run_in_submission_order(tmp_path: pathlib.Path) -> None:
+    store = _store(tmp_path)
+    first = store.submit(_spec("POSS1 Red"))
+    second = store.submit(_spec("POSS1 Blue"))
+
+    claimed = store.claim()
+    assert claimed is not None
+    assert claimed[0] == first.id
+    assert claimed[1].background_image == "POSS1 Red"
+    assert store.get(first.id).status == "running"  # type: ignore[union-attr]
+
+    claimed = store.claim()
+    assert claimed is not None
+    assert claimed[0] == second.id
+    assert store.claim() is None
+
+
+def test_finished_job_has_result(tmp_path: pathlib.Path) -> None:
+    store = _store(tmp_path)
+    job = store.submit(_spec())
+    assert store.result(job.id) is None
+
+    store.claim()
+    store.finish(job.id, b"chart")
+
+    assert store.get(job.id).status == "finished"  # type: ignore[union-attr]
+    assert store.result(job.id) == b"chart"
+
+
+def test_failed_job_has_error(tmp_path: pathlib.Path) -> None:
+    store = _store(tmp_path)
+    job = store.submit(_spec())
+    store.claim()
+    store.fail(job.id, "Survey unavailable")
+
+    failed_job = store.get(job.id)
+    assert failed_job is not None
+    assert failed_job.status == "failed"
+    assert failed_job.error == "Survey unavailable"
+    assert store.result(job.id) is None
+
+
+def test_jobs_survive_restart(tmp_path: pathlib.Path) -> None:
+    job = _store(tmp_path).submit(_spec())
+
+    claimed = _store(tmp_path).claim()
+    assert claimed is not None
+    assert claimed[0] == job.id
+
+
+def test_job_with_expired_lease_is_claimed_again(tmp_path: pathlib.Path) -> None:
+    store = _store(tmp_path, lease=0.05)
+    job = store.submit(_spec())
+    assert store.claim() is not None
+    assert store.claim() is None
+
+    time.sleep(0.1)
+
+    claimed = store.claim()
+    assert claimed is not None
+    assert claimed[0] == job.id
+
+
+def test_job_fails_after_max_attempts(tmp_path: pathlib.Path) -> None:
+    store = _store(tmp_path, lease=0)
+    job = store.submit(_spec())
+    for ignore_me in range(store.max_attempts):
+        assert store.claim() is not None
+        time.sleep(0.01)
+
+    assert store.claim() is None
+    assert store.get(job.id).status == "failed"  # type: ignore[union-attr]
+
+
+def test_released_job_is_queued_again(tmp_path: pathlib.Path) -> None:
+    store = _store(tmp_path)
+    job = store.submit(_spec())
+    store.claim()
+    store.release(job.id)
+
+    assert store.get(job.id).status == "queued"  # type: ignore[union-attr]
+    assert store.claim() is not None
+
+
+def test_jobs_expire(tmp_path: pathlib.Path) -> None:
+    store = _store(tmp_path, retention=0.05)
+    job = store.submit(_spec())
+    time.sleep(0.1)
+
+    assert store.get(job.id) is None
+    assert store.expire() == 1
+
+
+@pytest.mark.parametrize(
+    "error, expected_status",
+    [(None, "finished"), (ValueError("Invalid"), "failed")],
+)
+def test_job_runner_runs_jobs(
+    error: Exception | None, expected_status: str, tmp_path: pathlib.Path
+) -> None:
+    store = _store(tmp_path)
+    render = mock.AsyncMock(return_value=b"chart", side_effect=error)
+
+    async def run() -> None:
+        runner = JobRunner(store, render, concurrency=2, poll_interval=0.01)
+        runner.start()
+        job = store.submit(_spec())
+        runner.notify()
+        for ignore_me in range(100):
+            await asyncio.sleep(0.01)
+            if store.get(job.id).status == expected_status:  # type: ignore[union-attr]
+                break
+        await runner.stop()
+        assert store.get(job.id).status == expected_status  # type: ignore[union-attr]
+
+    asyncio.run(run())
+    render.assert_awaited_once()
+
+
+def test_job_runner_requeues_jobs_if_pool_is_busy(tmp_path: pathlib.Path) -> None:
+    store = _store(tmp_path)
+    render = mock.AsyncMock(side_effect=[RenderPoolBusyError(), b"chart"])
+
+    async def run() -> None:
+        runner = JobRunner(store, render, concurrency=1, poll_interval=0.01)
+        job = store.submit(_spec())
+        runner.start()
+        for ignore_me in range(100):
+            await asyncio.sleep(0.01)
+            if store.get(job.id).status == "finished":  # type: ignore[union-attr]
+                break
+        await runner.stop()
+        assert store.result(job.id) == b"chart"
+
+    asyncio.run(run())
+    assert render.await_count == 2
@@ -0,0 +1,23 @@
+import threading
+
+from fcg.infrastructure.memory import resident_set_size, watch_memory
+
+
+def test_resident_set_size() -> None:
+    # A Python process with NumPy and AstroPy uses more than a megabyte.
+    assert resident_set_size() > 1024**2
+
+
+def test_watch_memory_reports_exceeded_maximum() -> None:
+    exceeded = threading.Event()
+    watch_memory(1, exceeded.set, interval=0.01)
+    assert exceeded.wait(5)
+
+
+def test_watch_memory_ignores_usage_below_maximum() -> None:
+    exceeded = threading.Event()
+    stopped = watch_memory(1024**5, exceeded.set, interval=0.01)
+    try:
+        assert not exceeded.wait(0.1)
+    finally:
+        stopped.set()
@@ -0,0 +1,87 @@
+import pytest
+
+from fcg.infrastructure.metrics import (
+    Counter,
+    Gauge,
+    Histogram,
+    Observation,
+    Registry,
+    collect_timings,
+    run_recorded,
+)
+
+
+def test_counter_is_exposed() -> None:
+    registry = Registry()
+    counter = Counter("requests_total", "Requests.", ("mode",), registry=registry)
+    counter.inc(mode="hrs")
+    counter.inc(2, mode="hrs")
+    counter.inc(mode='"nir"')
+
+    text = registry.expose()
+    assert "# HELP requests_total Requests.\n" in text
+    assert "# TYPE requests_total counter\n" in text
+    assert 'requests_total{mode="hrs"} 3.0\n' in text
+    assert 'requests_total{mode="\\"nir\\""} 1.0\n' in text
+
+
+def test_histogram_counts_values_in_cumulative_buckets() -> None:
+    registry = Registry()
+    histogram = Histogram("latency", "Latency.", buckets=(1, 2), registry=registry)
+    for value in (0.5, 1.5, 1.5, 3):
+        histogram.observe(value)
+
+    text = registry.expose()
+    assert 'latency_bucket{le="1.0"} 1.0\n' in text
+    assert 'latency_bucket{le="2.0"} 3.0\n' in text
+    assert 'latency_bucket{le="+Inf"} 4.0\n' in text
+    assert "latency_sum 6.5\n" in text
+    assert "latency_count 4.0\n" in text
+
+
+def test_gauge_is_computed_when_exposed() -> None:
+    registry = Registry()
+    values: dict[tuple[str, ...], float] = {("a",): 1.0}
+    Gauge("size", "Size.", lambda: values, ("name",), registry=registry)
+    values[("a",)] = 7
+    assert 'size{name="a"} 7.0\n' in registry.expose()
+
+
+def test_labels_must_match() -> None:
+    counter = Counter("checked_total", "Checked.", ("mode",), registry=Registry())
+    with pytest.raises(ValueError):
+        counter.inc(stage="fits")
+
+
+def test_run_recorded_defers_observations() -> None:
+    counter = Counter("recorded_total", "Recorded.", ("mode",), registry=Registry())
+
+    def work(n: int) -> int:
+        counter.inc(n, mode="hrs")
+        return 2 * n
+
+    result, observations = run_recorded(work, 3)
+    assert result == 6
+    assert observations == [Observation("recorded_total", ("hrs",), 3)]
+    assert counter.values() == {}
+
+    for observation in observations:
+        counter.apply(observation.labels, observation.value)
+    assert counter.values() == {("hrs",): 3}
+
+
+def test_collect_timings_sums_durations_by_timing_label() -> None:
+    histogram = Histogram(
+        "stage_seconds",
+        "Stages.",
+        ("mode", "stage"),
+        timing_label="stage",
+        registry=Registry(),
+    )
+    histogram.observe(1, mode="hrs", stage="fits")
+    with collect_timings() as timings:
+        histogram.observe(2, mode="hrs", stage="fits")
+        histogram.observe(3, mode="nir", stage="fits")
+        histogram.observe(4, mode="hrs", stage="chart")
+
+    assert timings == {"fits": 5, "chart": 4}
@@ -1,11 +1,14 @@
 from datetime import datetime, timezone
 from typing import cast
 
+import numpy as np
 import pytest
+from astropy.coordinates import Angle
 from starlette.datastructures import FormData
 
 from fcg.infrastructure.parse import (
     is_float,
+    parse_angle_column,
     parse_bool,
     parse_declination,
     parse_float,
@@ -15,6 +18,7 @@ from fcg.infrastructure.parse import (
     parse_position_angle,
     parse_right_ascension,
     parse_slit_width,
+    parse_target_list,
     parse_timestamp,
 )
 
@@ -164,12 +168,35 @@ def test_parse_declination(text: str, expected: float) -> None:
     assert declination.degree == pytest.approx(expected)
 
 
-@pytest.mark.parametrize("text", ["", "invalid", "-90.01d", "90.01d"])
+@pytest.mark.parametrize("text", ["", "invalid", "-90.01d", "90.01d", "10:20:30"])
 def test_parse_invalid_declination(text: str) -> None:
     with pytest.raises(ValueError, match="-90"):
         parse_declination(text)
 
 
+@pytest.mark.parametrize(
+    "text",
+    [
+        "12",
+        "+0.",
+        "-45.5d",
+        "12 deg",
+        "1.5h",
+        "3 arcmin",
+        "-0d 30m",
+        "-45d 30m 36.5s",
+        "1h30m",
+        "1h 59m 59.99s",
+        "1h 60m",
+        "45d 30m 12",
+        "45d30'12\"",
+    ],
+)
+def test_fast_declination_parser_agrees_with_astropy(text: str) -> None:
+    expected = Angle(text + "d" if is_float(text) else text).degree
+    assert parse_declination(text).degree == pytest.approx(expected, abs=1e-12)
+
+
 @pytest.mark.parametrize(
     "text, expected", [("0.8", 0.8), ("3.984 arcsec", 3.984), ("0.5", 0.5), ("5", 5)]
 )
@@ -238,3 +265,88 @@ def test_parse_invalid_nir_bundle_separation(text: str) -> None:
 )
 def test_is_float(text: str, expected: bool) -> None:
     assert is_float(text) is expected
+
+
+@pytest.mark.parametrize(
+    "text",
+    [
+        "target,right_ascension,declination\nA,10,-20\nB,11,\n",
+        '[{"Target": "A", "right_ascension": 10, "declination": "-20"},'
+        ' {"target": "B", "right_ascension": "11", "declination": null}]',
+    ],
+)
+def test_parse_target_list(text: str) -> None:
+    assert parse_target_list(text) == [
+        {"target": "A", "right_ascension": "10", "declination": "-20"},
+        {"target": "B", "right_ascension": "11"},
+    ]
+
+
+def test_parse_votable_target_list() -> None:
+    text = """<?xml version="1.0"?>
+<VOTABLE version="1.4" xmlns="http://www.ivoa.net/xml/VOTable/v1.3">
+  <RESOURCE>
+    <TABLE>
+      <FIELD name="Target" datatype="char" arraysize="*"/>
+      <FIELD name="right_ascension" datatype="double" unit="deg"/>
+      <FIELD name="declination" datatype="double" unit="arcmin"/>
+      <DATA>
+        <TABLEDATA>
+          <TR><TD>A</TD><TD>10</TD><TD>-90</TD></TR>
+          <TR><TD>B</TD><TD>11.5</TD><TD></TD></TR>
+        </TABLEDATA>
+      </DATA>
+    </TABLE>
+  </RESOURCE>
+</VOTABLE>
+"""
+    assert parse_target_list(text) == [
+        {"target": "A", "right_ascension": "10.0d", "declination": "-1.5d"},
+        {"target": "B", "right_ascension": "11.5d"},
+    ]
+
+
+@pytest.mark.parametrize(
+    "text, error",
+    [
+        ("", "empty"),
+        ("<VOTABLE>", "VOTable"),
+        ("target,right_ascension\n", "empty"),
+        ("[]", "empty"),
+        ("[{", "JSON"),
+        ('["A"]', "objects"),
+        ("target\nA,10", "too many"),
+    ],
+)
+def test_parse_invalid_target_list(text: str, error: str) -> None:
+    with pytest.raises(ValueError, match=error):
+        parse_target_list(text)
+
+
+def test_parse_angle_column() -> None:
+    texts = ["10", " 1h 30m ", "225.16d", "-5", "invalid", "", "360.01", "1h 70m"]
+
+    degrees, errors = parse_angle_column(texts, "right_ascension")
+
+    np.testing.assert_allclose(degrees[:3], [10, 22.5, 225.16])
+    assert np.isnan(degrees[3:]).all()
+    assert errors[:3] == [None, None, None]
+    for text, error in zip(texts[3:], errors[3:], strict=True):
+        with pytest.raises(ValueError) as excinfo:
+            parse_right_ascension(text.strip())
+        assert error == str(excinfo.value)
+
+
+def test_parse_angle_column_uses_field_units() -> None:
+    degrees, errors = parse_angle_column(
+        ["0.5", "3.6 arcsec", "0.001d", "6"], "slit_width"
+    )
+
+    np.testing.assert_allclose(degrees[:3] * 3600, [0.5, 3.6, 3.6])
+    assert np.isnan(degrees[3])
+    assert errors == [
+        None,
+        None,
+        None,
+        "The slit width must be an angle between 0.5 and 5 arcseconds.",
+    ]
@@ -0,0 +1,105 @@
+import asyncio
+import os
+import time
+
+import pytest
+
+from fcg.infrastructure.pool import RenderPool, RenderPoolBusyError, RenderTimeoutError
+
+
+def _pid() -> int:
+    return os.getpid()
+
+
+def _sleep(seconds: float) -> float:
+    time.sleep(seconds)
+    return seconds
+
+
+def test_run_without_workers_executes_in_the_calling_process() -> None:
+    pool = RenderPool(workers=0, queue_depth=0, timeout=1)
+    assert asyncio.run(pool.run(_pid)) == os.getpid()
+
+
+def test_run_executes_in_a_worker_process() -> None:
+    pool = RenderPool(workers=1, queue_depth=0, timeout=30)
+    try:
+        pool.warm_up()
+        assert asyncio.run(pool.run(_pid)) != os.getpid()
+        assert pool.pending == 0
+    finally:
+        pool.shutdown()
+
+
+def test_warm_up_reports_worker_processes() -> None:
+    pool = RenderPool(workers=2, queue_depth=0, timeout=30)
+    try:
+        durations = pool.warm_up()
+        # A worker process may already have finished a warm-up task before the other
+        # one is started.
+        assert 1 <= len(durations) <= 2
+        assert os.getpid() not in durations
+    finally:
+        pool.shutdown()
+
+
+def test_run_rejects_tasks_if_the_queue_is_full() -> None:
+    async def run_tasks(pool: RenderPool) -> list[float | BaseException]:
+        return list(
+            await asyncio.gather(
+                pool.run(_sleep, 0.5),
+                pool.run(_sleep, 0.5),
+                pool.run(_sleep, 0.5),
+                return_exceptions=True,
+            )
+        )
+
+    pool = RenderPool(workers=1, queue_depth=1, timeout=30)
+    try:
+        pool.warm_up()
+        results = asyncio.run(run_tasks(pool))
+        assert results[:2] == [0.5, 0.5]
+        assert isinstance(results[2], RenderPoolBusyError)
+    finally:
+        pool.shutdown()
+
+
+def test_run_times_out() -> None:
+    pool = RenderPool(workers=1, queue_depth=0, timeout=0.2)
+    try:
+        pool.warm_up()
+        with pytest.raises(RenderTimeoutError):
+            asyncio.run(pool.run(_sleep, 2))
+    finally:
+        pool.shutdown()
+
+
+def test_run_replaces_worker_processes_after_max_tasks() -> None:
+    pool = RenderPool(workers=1, queue_depth=0, timeout=60, max_tasks=2)
+    try:
+        pids = [asyncio.run(pool.run(_pid)) for _ in range(3)]
+        assert pids[0] == pids[1]
+        assert pids[2] != pids[1]
+    finally:
+        pool.shutdown()
+
+
+def test_run_replaces_worker_processes_using_too_much_memory() -> None:
+    pool = RenderPool(workers=1, queue_depth=0, timeout=60, max_rss=1)
+    try:
+        first = asyncio.run(pool.run(_pid))
+        second = asyncio.run(pool.run(_pid))
+        assert first != second
+        assert pool.pending == 0
+    finally:
+        pool.shutdown()
+
+
+def test_run_keeps_worker_processes_below_max_rss() -> None:
+    pool = RenderPool(workers=1, queue_depth=0, timeout=60, max_rss=1024**5)
+    try:
+        first = asyncio.run(pool.run(_pid))
+        second = asyncio.run(pool.run(_pid))
+        assert first == second
+    finally:
+        pool.shutdown()
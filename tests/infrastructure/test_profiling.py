@@ -0,0 +1,23 @@
+import time
+
+from fcg.infrastructure.profiling import profile_call
+
+
+def _busy(seconds: float) -> str:
+    end = time.perf_counter() + seconds
+    while time.perf_counter() < end:
+        pass
+    return "done"
+
+
+def test_profile_call_samples_the_call_stack() -> None:
+    result, profile = profile_call(_busy, 0.2)
+
+    assert result == "done"
+    lines = profile.splitlines()
+    assert lines
+    for line in lines:
+        stack, count = line.rsplit(" ", 1)
+        assert int(count) > 0
+        assert " " not in stack
+    assert any(line.split(" ")[0].endswith("test_profiling._busy") for line in lines)
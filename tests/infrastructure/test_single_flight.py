@@ -0,0 +1,162 @@
+import asyncio
+import pathlib
+import threading
+import time
+from unittest import mock
+
+import pytest
+
+import fcg.infrastructure.single_flight
+from fcg.infrastructure.single_flight import (
+    SingleFlight,
+    async_file_lock,
+    file_lock,
+)
+
+
+def test_do_coalesces_concurrent_calls() -> None:
+    calls: list[str] = []
+
+    async def f(key: str) -> str:
+        calls.append(key)
+        await asyncio.sleep(0.05)
+        return key.upper()
+
+    async def run() -> list[str]:
+        flights: SingleFlight[str] = SingleFlight()
+        results = await asyncio.gather(
+            flights.do("a", lambda: f("a")),
+            flights.do("a", lambda: f("a")),
+            flights.do("b", lambda: f("b")),
+        )
+        assert flights.coalesced == 1
+        assert len(flights) == 0
+        return list(results)
+
+    assert asyncio.run(run()) == ["A", "A", "B"]
+    assert calls == ["a", "b"]
+
+
+def test_do_does_not_coalesce_consecutive_calls() -> None:
+    calls: list[str] = []
+
+    async def f() -> None:
+        calls.append("a")
+
+    async def run() -> None:
+        flights: SingleFlight[None] = SingleFlight()
+        await flights.do("a", f)
+        await flights.do("a", f)
+
+    asyncio.run(run())
+    assert len(calls) == 2
+
+
+def test_do_shares_exceptions() -> None:
+    async def f() -> None:
+        await asyncio.sleep(0.05)
+        raise ValueError("failed")
+
+    async def run() -> list[None | BaseException]:
+        flights: SingleFlight[None] = SingleFlight()
+        return list(
+            await asyncio.gather(
+                flights.do("a", f), flights.do("a", f), return_exceptions=True
+            )
+        )
+
+    results = asyncio.run(run())
+    assert all(isinstance(r, ValueError) for r in results)
+
+
+@pytest.mark.parametrize("striped", [True, False])
+def test_file_lock_is_exclusive(striped: bool, tmp_path: pathlib.Path) -> None:
+    intervals: list[tuple[float, float]] = []
+
+    def hold_lock() -> None:
+        with file_lock(tmp_path, "a", striped=striped):
+            start = time.monotonic()
+            time.sleep(0.1)
+            intervals.append((start, time.monotonic()))
+
+    threads = [threading.Thread(target=hold_lock) for _ in range(3)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+
+    intervals.sort()
+    for i in range(len(intervals) - 1):
+        assert intervals[i][1] <= intervals[i + 1][0]
+
+
+@pytest.mark.parametrize("key, waits", [("a", True), ("b", False)])
+def test_async_file_lock_waits_for_lock(
+    key: str, waits: bool, tmp_path: pathlib.Path
+) -> None:
+    waiting_times: list[float] = []
+
+    async def acquire() -> None:
+        start = time.monotonic()
+        async with async_file_lock(tmp_path, key, poll_interval=0.01):
+            waiting_times.append(time.monotonic() - start)
+
+    with file_lock(tmp_path, "a"):
+        thread = threading.Thread(target=lambda: asyncio.run(acquire()))
+        thread.start()
+        time.sleep(0.2)
+    thread.join()
+
+    assert (waiting_times[0] >= 0.15) is waits
+
+
+@pytest.mark.parametrize("asynchronous", [False, True])
+def test_file_lock_without_stripes_does_not_hold_up_other_keys(
+    asynchronous: bool, tmp_path: pathlib.Path
+) -> None:
+    waiting_times: list[float] = []
+
+    async def acquire_async() -> None:
+        async with async_file_lock(tmp_path, "b", poll_interval=0.01):
+            pass
+
+    def acquire() -> None:
+        start = time.monotonic()
+        if asynchronous:
+            asyncio.run(acquire_async())
+        else:
+            with file_lock(tmp_path, "b"):
+                pass
+        waiting_times.append(time.monotonic() - start)
+
+    # All striped locks share the same lock file.
+    with mock.patch.object(fcg.infrastructure.single_flight, "_LOCK_STRIPES", 1):
+        with file_lock(tmp_path, "a", striped=False):
+            thread = threading.Thread(target=acquire)
+            thread.start()
+            time.sleep(0.2)
+        thread.join()
+
+    assert waiting_times[0] < 0.15
+
+
+def test_file_lock_without_stripes_removes_its_lock_file(
+    tmp_path: pathlib.Path,
+) -> None:
+    async def acquire() -> None:
+        async with async_file_lock(tmp_path, "a", poll_interval=0.01, striped=False):
+            await asyncio.sleep(0.05)
+
+    def hold_lock() -> None:
+        with file_lock(tmp_path, "a", striped=False):
+            time.sleep(0.05)
+
+    threads = [threading.Thread(target=hold_lock) for _ in range(3)] + [
+        threading.Thread(target=lambda: asyncio.run(acquire())) for _ in range(2)
+    ]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+
+    assert list(tmp_path.iterdir()) == []
@@ -0,0 +1,383 @@
+import pathlib
+import threading
+import time
+from io import BytesIO
+from typing import Generator
+from unittest import mock
+
+import numpy as np
+import pytest
+from astropy import units as u
+from astropy.coordinates import Angle, SkyCoord
+from astropy.io import fits
+from astropy.wcs import WCS
+
+import fcg.infrastructure.single_flight
+import fcg.infrastructure.surveys
+from fcg.infrastructure.circuit_breaker import CircuitBreaker
+from fcg.infrastructure.disk_cache import DiskCache
+from fcg.infrastructure.footprints import FootprintIndex
+from fcg.infrastructure.settings import get_settings
+from fcg.infrastructure.surveys import (
+    SurveyStats,
+    SurveyTimeoutError,
+    SurveyUnavailableError,
+    canonical_fits_center,
+    load_survey_fits,
+    shared_tiles,
+)
+
+
+def _synthetic_fits(survey: str, fits_center: SkyCoord, size: Angle) -> BytesIO:
+    pixels = int(round(size.to_value(u.arcsec)))
+    wcs = WCS(naxis=2)
+    wcs.wcs.ctype = ["RA---TAN", "DEC--TAN"]
+    wcs.wcs.crval = [fits_center.ra.deg, fits_center.dec.deg]
+    wcs.wcs.crpix = [(pixels + 1) / 2, (pixels + 1) / 2]
+    wcs.wcs.cdelt = [-1 / 3600, 1 / 3600]
+    hdu = fits.PrimaryHDU(
+        data=np.zeros((pixels, pixels), dtype=np.int16), header=wcs.to_header()
+    )
+    content = BytesIO()
+    hdu.writeto(content)
+    content.seek(0)
+    return content
+
+
+@pytest.fixture()
+def fits_cache(tmp_path: pathlib.Path) -> Generator[DiskCache, None, None]:
+    cache = DiskCache(tmp_path, max_bytes=100_000_000)
+    index = FootprintIndex(cell_size=0.5, path=tmp_path / ".footprints")
+    with (
+        mock.patch.object(
+            fcg.infrastructure.surveys, "get_fits_cache", return_value=cache
+        ),
+        mock.patch.object(
+            fcg.infrastructure.surveys, "get_footprint_index", return_value=index
+        ),
+    ):
+        yield cache
+
+
+@pytest.fixture()
+def mock_load_fits() -> Generator[mock.MagicMock, None, None]:
+    with mock.patch.object(fcg.infrastructure.surveys, "load_fits") as m:
+        m.side_effect = lambda survey, fits_center, size: BytesIO(b"FITS")
+        yield m
+
+
+def test_canonical_fits_center_snaps_to_grid() -> None:
+    center = canonical_fits_center(SkyCoord(ra=10.00001 * u.deg, dec=-20.00002 * u.deg))
+    assert center.ra.to_value(u.arcsec) == pytest.approx(36000.0)
+    assert center.dec.to_value(u.arcsec) == pytest.approx(-72000.1)
+
+
+def test_load_survey_fits_uses_cache(
+    fits_cache: DiskCache, mock_load_fits: mock.MagicMock
+) -> None:
+    size = 10 * u.arcmin
+    position = SkyCoord(ra=10 * u.deg, dec=-20 * u.deg)
+    nearby_position = SkyCoord(ra=10.000001 * u.deg, dec=-20.000001 * u.deg)
+
+    assert load_survey_fits("2MASS-J", position, size).read() == b"FITS"
+    assert load_survey_fits("2MASS-J", nearby_position, size).read() == b"FITS"
+
+    assert mock_load_fits.call_count == 1
+    assert fits_cache.hits == 1
+    assert fits_cache.misses == 1
+
+
+@pytest.mark.parametrize(
+    "survey, position, size",
+    [
+        ("2MASS-H", SkyCoord(ra=10 * u.deg, dec=-20 * u.deg), 10 * u.arcmin),
+        ("2MASS-J", SkyCoord(ra=10.1 * u.deg, dec=-20 * u.deg), 10 * u.arcmin),
+        ("2MASS-J", SkyCoord(ra=10 * u.deg, dec=-20 * u.deg), 5 * u.arcmin),
+    ],
+)
+def test_load_survey_fits_distinguishes_requests(
+    survey: str,
+    position: SkyCoord,
+    size: u.Quantity,
+    fits_cache: DiskCache,
+    mock_load_fits: mock.MagicMock,
+) -> None:
+    load_survey_fits("2MASS-J", SkyCoord(ra=10 * u.deg, dec=-20 * u.deg), 10 * u.arcmin)
+    load_survey_fits(survey, position, size)
+
+    assert mock_load_fits.call_count == 2
+
+
+def test_load_survey_fits_crops_from_tiles(fits_cache: DiskCache) -> None:
+    size = 10 * u.arcmin
+    with mock.patch.object(fcg.infrastructure.surveys, "load_fits") as mock_load_fits:
+        mock_load_fits.side_effect = _synthetic_fits
+
+        # The first request loads a tile
+        position = SkyCoord(ra=10 * u.deg, dec=-20 * u.deg)
+        load_survey_fits("POSS2/UKSTU Red", position, size)
+        assert mock_load_fits.call_count == 1
+        assert mock_load_fits.call_args.kwargs["size"] == 30 * u.arcmin
+
+        # A nearby position is cropped from the tile
+        nearby_position = SkyCoord(ra=10.1 * u.deg, dec=-19.95 * u.deg)
+        cropped = fits.open(load_survey_fits("POSS2/UKSTU Red", nearby_position, size))
+        assert mock_load_fits.call_count == 1
+        assert cropped[0].data.shape == (600, 600)
+        center = WCS(cropped[0].header).pixel_to_world(299.5, 299.5)
+        assert center.separation(nearby_position).to_value(u.arcsec) < 1
+
+        # A position outside the tile and another survey require new tiles
+        load_survey_fits(
+            "POSS2/UKSTU Red", SkyCoord(ra=10.3 * u.deg, dec=-20 * u.deg), size
+        )
+        load_survey_fits("POSS2/UKSTU Blue", nearby_position, size)
+        assert mock_load_fits.call_count == 3
+
+
+def test_load_survey_fits_does_not_use_tiles_for_resampled_surveys(
+    fits_cache: DiskCache,
+) -> None:
+    size = 10 * u.arcmin
+    with mock.patch.object(fcg.infrastructure.surveys, "load_fits") as mock_load_fits:
+        mock_load_fits.side_effect = _synthetic_fits
+        load_survey_fits("2MASS-J", SkyCoord(ra=10 * u.deg, dec=-20 * u.deg), size)
+        assert mock_load_fits.call_args.kwargs["size"] == size
+
+
+def _slow_synthetic_fits(survey: str, fits_center: SkyCoord, size: Angle) -> BytesIO:
+    time.sleep(0.2)
+    return _synthetic_fits(survey, fits_center, size)
+
+
+def _load_concurrently(survey: str, positions: list[SkyCoord]) -> None:
+    threads = [
+        threading.Thread(
+            target=load_survey_fits, args=(survey, position, 10 * u.arcmin)
+        )
+        for position in positions
+    ]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+
+
+def test_load_survey_fits_coalesces_concurrent_requests_for_the_same_tile(
+    fits_cache: DiskCache,
+) -> None:
+    position = SkyCoord(ra=10 * u.deg, dec=-20 * u.deg)
+    nearby_position = SkyCoord(ra=10.1 * u.deg, dec=-19.95 * u.deg)
+    with mock.patch.object(fcg.infrastructure.surveys, "load_fits") as mock_load_fits:
+        mock_load_fits.side_effect = _slow_synthetic_fits
+        _load_concurrently(
+            "POSS2/UKSTU Red", [position, position, nearby_position, nearby_position]
+        )
+
+    assert mock_load_fits.call_count == 1
+
+
+def test_load_survey_fits_does_not_lock_while_querying_survey(
+    fits_cache: DiskCache,
+) -> None:
+    positions = [
+        SkyCoord(ra=10 * u.deg, dec=-20 * u.deg),
+        SkyCoord(ra=30 * u.deg, dec=-20 * u.deg),
+    ]
+    # All keys share the same lock.
+    with (
+        mock.patch.object(fcg.infrastructure.single_flight, "_LOCK_STRIPES", 1),
+        mock.patch.object(fcg.infrastructure.surveys, "load_fits") as mock_load_fits,
+    ):
+        mock_load_fits.side_effect = _slow_synthetic_fits
+        started = time.perf_counter()
+        _load_concurrently("2MASS-J", positions)
+        duration = time.perf_counter() - started
+
+    assert mock_load_fits.call_count == 2
+    assert duration < 0.35
+
+
+def test_load_survey_fits_does_not_hold_up_other_keys_while_loading_tiles(
+    fits_cache: DiskCache,
+) -> None:
+    position = SkyCoord(ra=10 * u.deg, dec=-20 * u.deg)
+
+    def load(survey: str) -> None:
+        load_survey_fits(survey, position, 10 * u.arcmin)
+
+    # All striped locks share the same lock file.
+    with (
+        mock.patch.object(fcg.infrastructure.single_flight, "_LOCK_STRIPES", 1),
+        mock.patch.object(fcg.infrastructure.surveys, "load_fits") as mock_load_fits,
+    ):
+        mock_load_fits.side_effect = _slow_synthetic_fits
+        threads = [
+            threading.Thread(target=load, args=(survey,))
+            for survey in ("POSS2/UKSTU Red", "2MASS-J")
+        ]
+        started = time.perf_counter()
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+        duration = time.perf_counter() - started
+
+    assert mock_load_fits.call_count == 2
+    assert duration < 0.35
+
+
+def test_shared_tiles_groups_fields_in_the_same_tile(fits_cache: DiskCache) -> None:
+    position = SkyCoord(ra=10 * u.deg, dec=-20 * u.deg)
+    nearby_position = SkyCoord(ra=10.1 * u.deg, dec=-19.95 * u.deg)
+    distant_position = SkyCoord(ra=10.3 * u.deg, dec=-20 * u.deg)
+    fields = [
+        ("POSS2/UKSTU Red", position),
+        None,
+        ("POSS2/UKSTU Red", distant_position),
+        ("POSS2/UKSTU Red", nearby_position),
+        ("POSS2/UKSTU Blue", nearby_position),
+        ("2MASS-J", position),
+        ("2MASS-J", nearby_position),
+    ]
+
+    assert shared_tiles(fields, 10 * u.arcmin) == [0, 1, 2, 0, 4, 5, 6]
+
+
+def test_survey_stats() -> None:
+    stats = SurveyStats(window=10)
+    for duration in range(1, 12):
+        stats.record("POSS1 Red", duration, True)
+    stats.record("poss1 red", 100, False)
+    stats.record("POSS1 Blue", 1, True)
+
+    # only the last 10 requests (of which 9 were successful) count
+    assert stats.latency("POSS1 RED", 50) == pytest.approx(7)
+    assert stats.latency("POSS1 Red", 90) == pytest.approx(10.2)
+    assert stats.error_rate("POSS1 Red") == pytest.approx(0.1)
+    # there are too few requests to the other surveys
+    assert stats.latency("POSS1 Blue", 50) is None
+    assert stats.latency("2MASS-J", 50) is None
+    assert stats.error_rate("2MASS-J") == 0
+
+
+def test_survey_stats_rank_surveys() -> None:
+    stats = SurveyStats()
+    for duration in [1] * 5:
+        stats.record("Fast", duration, True)
+        stats.record("Slow", 4 * duration, True)
+        stats.record("Flaky", duration, True)
+        stats.record("Flaky", duration, False)
+
+    assert stats.rank(["Slow", "Unknown", "Flaky", "Fast"], default_latency=3) == [
+        "Fast",
+        "Flaky",
+        "Unknown",
+        "Slow",
+    ]
+
+
+def test_load_survey_fits_records_survey_stats(mock_load_fits: mock.MagicMock) -> None:
+    stats = SurveyStats()
+    position = SkyCoord(ra=10 * u.deg, dec=-20 * u.deg)
+    with (
+        mock.patch.object(
+            fcg.infrastructure.surveys, "get_survey_stats", return_value=stats
+        ),
+        mock.patch.object(
+            fcg.infrastructure.surveys, "get_fits_cache", return_value=None
+        ),
+        mock.patch.object(
+            fcg.infrastructure.surveys, "get_survey_breaker", return_value=None
+        ),
+    ):
+        load_survey_fits("2MASS-J", position, 10 * u.arcmin)
+        mock_load_fits.side_effect = OSError("The survey is down.")
+        with pytest.raises(OSError):
+            load_survey_fits("2MASS-J", position, 10 * u.arcmin)
+
+    assert stats.error_rate("2MASS-J") == 0.5
+
+
+def test_load_survey_fits_records_invalid_responses_as_failures(
+    fits_cache: DiskCache, mock_load_fits: mock.MagicMock
+) -> None:
+    stats = SurveyStats()
+    position = SkyCoord(ra=10 * u.deg, dec=-20 * u.deg)
+    with (
+        mock.patch.object(
+            fcg.infrastructure.surveys, "get_survey_stats", return_value=stats
+        ),
+        mock.patch.object(
+            fcg.infrastructure.surveys, "get_survey_breaker", return_value=None
+        ),
+    ):
+        with pytest.raises(ValueError, match="invalid"):
+            load_survey_fits(
+                "2MASS-J", position, 10 * u.arcmin, is_valid=lambda content: False
+            )
+
+        # The invalid response has not been cached.
+        load_survey_fits(
+            "2MASS-J", position, 10 * u.arcmin, is_valid=lambda content: True
+        )
+
+    assert mock_load_fits.call_count == 2
+    # Only a single request has been recorded for the invalid response.
+    assert stats.error_rate("2MASS-J") == 0.5
+
+
+@pytest.fixture()
+def breaker() -> Generator[CircuitBreaker, None, None]:
+    breaker = CircuitBreaker("2MASS-J", failure_threshold=2, reset_timeout=60)
+    with (
+        mock.patch.object(
+            fcg.infrastructure.surveys, "get_survey_breaker", return_value=breaker
+        ),
+        mock.patch.object(
+            fcg.infrastructure.surveys, "get_fits_cache", return_value=None
+        ),
+    ):
+        yield breaker
+
+
+def test_load_survey_fits_fails_fast_for_failing_survey(
+    breaker: CircuitBreaker, mock_load_fits: mock.MagicMock
+) -> None:
+    position = SkyCoord(ra=10 * u.deg, dec=-20 * u.deg)
+    mock_load_fits.side_effect = [
+        OSError("The survey is down."),
+        OSError("The survey is still down."),
+    ]
+    for message in ["is down", "is still down"]:
+        with pytest.raises(OSError, match=message):
+            load_survey_fits("2MASS-J", position, 10 * u.arcmin)
+
+    with pytest.raises(SurveyUnavailableError, match="2MASS-J"):
+        load_survey_fits("2MASS-J", position, 10 * u.arcmin)
+
+    assert mock_load_fits.call_count == 2
+    assert breaker.state() == "open"
+
+
+def test_load_survey_fits_times_out_slow_requests(
+    breaker: CircuitBreaker, mock_load_fits: mock.MagicMock
+) -> None:
+    def hanging_load_fits(survey: str, fits_center: SkyCoord, size: Angle) -> BytesIO:
+        time.sleep(2)
+        return BytesIO(b"FITS")
+
+    mock_load_fits.side_effect = hanging_load_fits
+    position = SkyCoord(ra=10 * u.deg, dec=-20 * u.deg)
+    settings = get_settings()._replace(survey_timeout=0.1)
+    started = time.perf_counter()
+    with (
+        mock.patch.object(
+            fcg.infrastructure.surveys, "get_settings", return_value=settings
+        ),
+        pytest.raises(SurveyTimeoutError, match="0.1 seconds"),
+    ):
+        load_survey_fits("2MASS-J", position, 10 * u.arcmin)
+
+    assert time.perf_counter() - started < 1
+    assert breaker.status().failures == 1
@@ -0,0 +1,112 @@
+import time
+
+import numpy as np
+import pytest
+
+from fcg.infrastructure.coverage import get_coverage_index
+from fcg.infrastructure.targets import validate_target_list
+
+
+def test_validate_target_list() -> None:
+    targets = [
+        {"target": "A", "right_ascension": "10", "declination": "-20"},
+        {"target": "B", "right_ascension": "1h 30m", "position_angle": "45d"},
+    ]
+    shared = {"declination": "-30d 30m", "image_survey": "POSS2/UKSTU Red"}
+
+    columns, errors = validate_target_list(targets, shared)
+
+    assert errors == {}
+    assert columns.target == ["A", "B"]
+    assert columns.right_ascension.tolist() == [10, 22.5]
+    assert columns.declination.tolist() == [-20, -30.5]
+    assert np.isnan(columns.position_angle[0])
+    assert columns.position_angle[1] == 45
+
+
+def test_validate_target_list_errors() -> None:
+    targets = [
+        {"right_ascension": "10", "declination": "-20"},
+        {"target": "B", "right_ascension": "400", "declination": "-20"},
+        {"target": "C", "declination": "-95", "position_angle": "1x"},
+        {"target": "D", "declination": "-20"},
+    ]
+    shared = {"right_ascension": "twelve"}
+
+    _, errors = validate_target_list(targets, shared)
+
+    assert errors == {
+        "target": "The target is missing.",
+        "targets[1].right_ascension": errors["targets[1].right_ascension"],
+        "targets[2].declination": errors["targets[2].declination"],
+        "targets[2].position_angle": errors["targets[2].position_angle"],
+        "right_ascension": errors["right_ascension"],
+    }
+    assert "missing" not in errors["right_ascension"]
+
+
+def test_validate_target_list_missing_values() -> None:
+    _, errors = validate_target_list([{"target": "A"}], {})
+
+    assert errors == {
+        "right_ascension": "The right ascension is missing.",
+        "declination": "The declination is missing.",
+    }
+
+
+def test_validate_target_list_coverage() -> None:
+    targets = [
+        {"target": "A", "right_ascension": "0", "declination": "-29.5"},
+        {"target": "B", "right_ascension": "0", "declination": "-30.5"},
+        {
+            "target": "C",
+            "right_ascension": "0",
+            "declination": "-30.5",
+            "image_survey": "POSS2/UKSTU Red",
+        },
+        {
+            "target": "D",
+            "right_ascension": "0",
+            "declination": "0",
+            "image_survey": "Hitchhiker's Sky Survey",
+        },
+        {"target": "E", "right_ascension": "x", "declination": "-30.5"},
+    ]
+    shared = {"image_survey": "POSS1 Red"}
+
+    _, errors = validate_target_list(targets, shared)
+
+    assert set(errors) == {
+        "targets[1].image_survey",
+        "targets[3].image_survey",
+        "targets[4].right_ascension",
+    }
+    assert "does not cover" in errors["targets[1].image_survey"]
+    assert "Hitchhiker" in errors["targets[3].image_survey"]
+
+
+@pytest.mark.parametrize("survey", ["POSS2/UKSTU Red", "POSS1 Blue"])
+def test_validate_long_target_list(survey: str) -> None:
+    rng = np.random.default_rng(0)
+    ra = rng.uniform(0, 360, 10000)
+    dec = rng.uniform(-90, 90, 10000)
+    targets = [
+        {
+            "target": f"Target {i}",
+            "right_ascension": f"{r:.5f}",
+            "declination": f"{d:.5f}",
+            "position_angle": f"{i % 360 - 180}",
+        }
+        for i, (r, d) in enumerate(zip(ra, dec, strict=True))
+    ]
+    # The coverage index is created at startup.
+    get_coverage_index(survey)
+
+    started = time.perf_counter()
+    columns, errors = validate_target_list(targets, {"image_survey": survey})
+    duration = time.perf_counter() - started
+
+    assert duration < 1
+    assert len(columns.target) == 10000
+    assert not np.isnan(columns.declination).any()
+    assert all(key.endswith(".image_survey") for key in errors)
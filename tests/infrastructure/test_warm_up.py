@@ -0,0 +1,16 @@
+from fcg.infrastructure.warm_up import warm_up
+
+
+def test_warm_up_renders_a_finder_chart() -> None:
+    durations = warm_up()
+    assert list(durations) == ["imports", "astropy", "fonts", "render"]
+    assert all(duration >= 0 for duration in durations.values())
+
+
+def test_warm_up_without_rendering() -> None:
+    assert list(warm_up(render=False)) == ["imports", "astropy"]
+
+
+def test_warm_up_builds_coverage_indexes() -> None:
+    durations = warm_up(render=False, coverage=True)
+    assert list(durations) == ["imports", "astropy", "coverage"]
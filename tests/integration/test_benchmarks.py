@@ -0,0 +1,72 @@
+import json
+import pathlib
+
+from benchmarks.run import compare, main
+
+_BASELINE = {
+    "hrs": {
+        "cold_latency": 1.0,
+        "warm_latency": 0.5,
+        "throughput": {"1": 2.0, "4": 4.0},
+        "output_bytes": 1000,
+    }
+}
+
+
+def test_compare_without_regressions() -> None:
+    results = {
+        "hrs": {
+            "cold_latency": 1.1,
+            "warm_latency": 0.4,
+            "throughput": {"1": 1.9, "4": 5.0},
+            "output_bytes": 1000,
+        }
+    }
+    assert compare(results, _BASELINE, threshold=0.2) == []
+
+
+def test_compare_finds_regressions() -> None:
+    results = {
+        "hrs": {
+            "cold_latency": 1.1,
+            "warm_latency": 0.7,
+            "throughput": {"1": 2.0, "4": 3.0},
+            "output_bytes": 1000,
+        }
+    }
+    regressions = compare(results, _BASELINE, threshold=0.2)
+    assert len(regressions) == 2
+    assert regressions[0].startswith("hrs warm_latency")
+    assert regressions[1].startswith("hrs throughput.4")
+
+
+def test_compare_with_metric_thresholds() -> None:
+    results = {"hrs": {"cold_latency": 1.1, "warm_latency": 0.7}}
+    regressions = compare(
+        results, _BASELINE, threshold=0.05, thresholds={"warm_latency": 0.5}
+    )
+    assert len(regressions) == 1
+    assert regressions[0].startswith("hrs cold_latency")
+
+
+def test_benchmark_against_baseline(tmp_path: pathlib.Path) -> None:
+    output = tmp_path / "results.json"
+    args = ["--benchmark", "ephemerides", "--requests", "2", "--concurrency", "2"]
+    assert main([*args, "--output", str(output)]) == 0
+
+    results = json.loads(output.read_text())["benchmarks"]["ephemerides"]
+    assert set(results) == {
+        "startup",
+        "cold_latency",
+        "warm_latency",
+        "throughput",
+        "peak_rss_bytes",
+        "output_bytes",
+    }
+    assert results["throughput"]["2"] > 0
+
+    # A baseline with ten times the throughput is a regression.
+    results["throughput"]["2"] *= 10
+    baseline = tmp_path / "baseline.json"
+    baseline.write_text(json.dumps({"benchmarks": {"ephemerides": results}}))
+    assert main([*args, "--baseline", str(baseline)]) == 1
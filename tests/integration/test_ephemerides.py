@@ -1,14 +1,24 @@
-from datetime import datetime, timezone
+import io
+import json
+import pathlib
+import time
+from datetime import datetime, timedelta, timezone
+from typing import Any, Generator
 from unittest import mock
 
 import astropy.units as u
+import numpy as np
 import pytest
 from astropy.coordinates import SkyCoord
 from imephu.utils import Ephemeris, MagnitudeRange, SkyCoordRate
 from starlette import status
 from starlette.testclient import TestClient
 
+import fcg.infrastructure.cassettes
 import fcg.views.ephemerides
+from fcg.infrastructure.cassettes import Cassette
+from fcg.infrastructure.horizons import EphemerisCache
+from fcg.infrastructure.settings import get_settings
 
 _URL = "/ephemerides"
 
@@ -23,6 +33,15 @@ def _valid_input() -> dict[str, str]:
     return data
 
 
+@pytest.fixture(autouse=True)
+def ephemeris_cache(tmp_path: pathlib.Path) -> Generator[EphemerisCache, None, None]:
+    cache = EphemerisCache(tmp_path / "horizons.sqlite3", ttl=3600)
+    with mock.patch.object(
+        fcg.views.ephemerides, "get_ephemeris_cache", return_value=cache
+    ):
+        yield cache
+
+
 _mock_ephemerides = [
     Ephemeris(
         epoch=datetime(2023, 7, 17, 12, 0, 0, 0, tzinfo=timezone.utc),
@@ -100,3 +119,287 @@ def test_ephemerides(client: TestClient) -> None:
         assert ephemerides[1]["dec_rate"] == pytest.approx(-2.8)
         assert ephemerides[0]["magnitude"] == 16.4
         assert ephemerides[1]["magnitude"] is None
+
+
+def test_ephemerides_as_columns(client: TestClient) -> None:
+    data = _valid_input()
+    data["format"] = "columns"
+
+    with mock.patch.object(
+        fcg.views.ephemerides, "HorizonsService"
+    ) as MockHorizonsService:
+        MockHorizonsService.return_value.ephemerides.return_value = _mock_ephemerides
+        response = client.post(_URL, data=data)
+
+    assert response.status_code == status.HTTP_200_OK
+    columns = response.json()
+    assert columns["epoch"] == [
+        datetime(2023, 7, 17, 12, 0, 0, 0, tzinfo=timezone.utc).timestamp(),
+        datetime(2023, 7, 18, 12, 0, 0, 0, tzinfo=timezone.utc).timestamp(),
+    ]
+    assert columns["ra"] == pytest.approx([98.5, 98.43])
+    assert columns["dec"] == pytest.approx([-17.99, -18.34])
+    assert columns["ra_rate"] == pytest.approx([1, 1.3])
+    assert columns["dec_rate"] == pytest.approx([-2.7, -2.8])
+    assert columns["magnitude"] == [16.4, None]
+
+
+def test_ephemerides_as_npz(client: TestClient) -> None:
+    data = _valid_input()
+    data["format"] = "npz"
+
+    with mock.patch.object(
+        fcg.views.ephemerides, "HorizonsService"
+    ) as MockHorizonsService:
+        MockHorizonsService.return_value.ephemerides.return_value = _mock_ephemerides
+        response = client.post(_URL, data=data)
+
+    assert response.status_code == status.HTTP_200_OK
+    assert response.headers["content-type"] == "application/octet-stream"
+    with np.load(io.BytesIO(response.content)) as arrays:
+        assert set(arrays.files) == {
+            "epoch",
+            "ra",
+            "dec",
+            "ra_rate",
+            "dec_rate",
+            "magnitude",
+        }
+        assert arrays["ra"].dtype == np.float64
+        assert arrays["ra"] == pytest.approx([98.5, 98.43])
+        assert arrays["magnitude"][0] == pytest.approx(16.4)
+        assert np.isnan(arrays["magnitude"][1])
+
+
+def test_ephemerides_are_cached(client: TestClient) -> None:
+    data = _valid_input()
+
+    with mock.patch.object(
+        fcg.views.ephemerides, "HorizonsService"
+    ) as MockHorizonsService:
+        MockHorizonsService.return_value.ephemerides.return_value = _mock_ephemerides
+
+        first_response = client.post(_URL, data=data)
+
+        # A request for a coarser output interval is answered from the cache.
+        data["output_interval"] = str(24 * 60)
+        second_response = client.post(_URL, data=data)
+
+        assert MockHorizonsService.call_count == 1
+        assert first_response.json() == second_response.json()
+
+        # A request for another object is not.
+        data["identifier"] = "568"
+        client.post(_URL, data=data)
+        assert MockHorizonsService.call_count == 2
+
+
+def test_ephemerides_time_out(client: TestClient) -> None:
+    def slow_ephemerides(*args: Any, **kwargs: Any) -> list[Any]:
+        time.sleep(0.5)
+        return _mock_ephemerides
+
+    settings = get_settings()._replace(horizons_timeout=0.1)
+    with (
+        mock.patch.object(
+            fcg.views.ephemerides, "HorizonsService"
+        ) as MockHorizonsService,
+        mock.patch.object(fcg.views.ephemerides, "get_settings", return_value=settings),
+    ):
+        MockHorizonsService.return_value.ephemerides.side_effect = slow_ephemerides
+
+        response = client.post(_URL, data=_valid_input())
+
+    assert response.status_code == status.HTTP_504_GATEWAY_TIMEOUT
+    assert "Horizons" in response.json()["errors"]["__general"]
+
+
+class _FakeHorizonsService:
+    """A stand-in for the Horizons service, with an ephemeris for every step."""
+
+    def __init__(
+        self,
+        object_id: str,
+        location: str,
+        start: datetime,
+        end: datetime,
+        stepsize: u.Quantity,
+    ) -> None:
+        self.start = start
+        self.end = end
+        self.step = timedelta(seconds=stepsize.to_value(u.s))
+
+    def ephemerides(self) -> list[Ephemeris]:
+        epochs = [self.start]
+        while epochs[-1] < self.end:
+            epochs.append(epochs[-1] + self.step)
+        return [
+            Ephemeris(
+                epoch=epoch,
+                position=SkyCoord(ra=10 * u.deg, dec=-20 * u.deg),
+                # The target doesn't move.
+                position_rate=SkyCoordRate(
+                    ra=0 * u.arcsec / u.hour, dec=0 * u.arcsec / u.hour
+                ),
+                magnitude_range=None,
+            )
+            for epoch in epochs
+        ]
+
+
+@pytest.mark.parametrize("output_format", ["json", "ndjson"])
+def test_ephemerides_are_queried_in_chunks(
+    output_format: str, client: TestClient
+) -> None:
+    data = _valid_input()
+    data["format"] = output_format
+    settings = get_settings()._replace(horizons_chunk_size=10)
+    with (
+        mock.patch.object(
+            fcg.views.ephemerides, "HorizonsService", side_effect=_FakeHorizonsService
+        ) as MockHorizonsService,
+        mock.patch.object(fcg.views.ephemerides, "get_settings", return_value=settings),
+    ):
+        response = client.post(_URL, data=data)
+
+    assert response.status_code == status.HTTP_200_OK
+    if output_format == "ndjson":
+        assert response.headers["content-type"] == "application/x-ndjson"
+        ephemerides = [json.loads(line) for line in response.text.splitlines()]
+    else:
+        ephemerides = response.json()
+
+    assert "horizons;dur=" in response.headers["Server-Timing"]
+
+    # 24 hours with an output interval of 30 minutes
+    epochs = [e["epoch"] for e in ephemerides]
+    assert len(epochs) == 49
+    assert epochs[0] == float(data["start"])
+    assert epochs[-1] == float(data["end"])
+    assert all(b - a == 1800 for a, b in zip(epochs[:-1], epochs[1:], strict=True))
+    assert MockHorizonsService.call_count == 6
+
+
+def test_ephemerides_with_invalid_format(client: TestClient) -> None:
+    data = _valid_input()
+    data["format"] = "xml"
+    response = client.post(_URL, data=data)
+    assert response.status_code == status.HTTP_400_BAD_REQUEST
+    assert "xml" in response.json()["errors"]["format"]
+
+
+def test_ephemerides_are_interpolated(client: TestClient) -> None:
+    data = _valid_input()
+    data["output_interval"] = "5"
+    data["interpolate"] = "true"
+    with mock.patch.object(
+        fcg.views.ephemerides, "HorizonsService", side_effect=_FakeHorizonsService
+    ) as MockHorizonsService:
+        response = client.post(_URL, data=data)
+
+    assert response.status_code == status.HTTP_200_OK
+    assert float(response.headers["X-Interpolation-Position-Error"]) < 1e-6
+    assert "X-Interpolation-Magnitude-Error" not in response.headers
+
+    # Only hourly ephemerides are queried, with a margin of an hour.
+    MockHorizonsService.assert_called_once()
+    assert MockHorizonsService.call_args.kwargs["stepsize"] == 1 * u.hour
+    assert MockHorizonsService.call_args.kwargs["start"].timestamp() == (
+        float(data["start"]) - 3600
+    )
+
+    ephemerides = response.json()
+    assert len(ephemerides) == 24 * 12 + 1
+    assert ephemerides[1]["epoch"] == float(data["start"]) + 300
+    assert ephemerides[1]["ra"] == pytest.approx(10)
+    assert ephemerides[1]["magnitude"] is None
+
+
+def test_interpolated_ephemerides_end_at_the_end_of_the_time_span(
+    client: TestClient,
+) -> None:
+    data = _valid_input()
+    # The time span is not a multiple of the output interval.
+    data["output_interval"] = "7"
+    data["interpolate"] = "true"
+    with mock.patch.object(
+        fcg.views.ephemerides, "HorizonsService", side_effect=_FakeHorizonsService
+    ):
+        response = client.post(_URL, data=data)
+
+    assert response.status_code == status.HTTP_200_OK
+    epochs = [e["epoch"] for e in response.json()]
+    assert len(epochs) == 24 * 60 // 7 + 2
+    assert epochs[-2] == float(data["start"]) + 7 * 60 * (24 * 60 // 7)
+    assert epochs[-1] == float(data["end"])
+
+
+@pytest.mark.parametrize("format", ["columns", "npz"])
+def test_interpolated_ephemerides_as_columns(format: str, client: TestClient) -> None:
+    data = _valid_input()
+    data["output_interval"] = "5"
+    data["interpolate"] = "true"
+    data["format"] = format
+    with (
+        mock.patch.object(
+            fcg.views.ephemerides, "HorizonsService", side_effect=_FakeHorizonsService
+        ),
+        mock.patch.object(
+            fcg.views.ephemerides,
+            "ephemeris_rows",
+            wraps=fcg.views.ephemerides.ephemeris_rows,
+        ) as mock_ephemeris_rows,
+    ):
+        response = client.post(_URL, data=data)
+
+    assert response.status_code == status.HTTP_200_OK
+    # The interpolated columns are returned without creating rows first.
+    mock_ephemeris_rows.assert_not_called()
+    if format == "columns":
+        columns = response.json()
+        assert columns["magnitude"][1] is None
+    else:
+        with np.load(io.BytesIO(response.content)) as arrays:
+            columns = {field: arrays[field] for field in arrays.files}
+        assert columns["epoch"].dtype == np.float64
+        assert np.isnan(columns["magnitude"][1])
+    assert len(columns["epoch"]) == 24 * 12 + 1
+    assert columns["epoch"][1] == float(data["start"]) + 300
+    assert columns["ra"][1] == pytest.approx(10)
+
+
+def test_ephemerides_are_replayed_from_cassette(
+    client: TestClient, tmp_path: pathlib.Path, ephemeris_cache: EphemerisCache
+) -> None:
+    data = _valid_input()
+
+    with (
+        mock.patch.object(
+            fcg.infrastructure.cassettes,
+            "get_cassette",
+            return_value=Cassette(tmp_path / "cassettes", "record"),
+        ),
+        mock.patch.object(
+            fcg.views.ephemerides, "HorizonsService"
+        ) as MockHorizonsService,
+    ):
+        MockHorizonsService.return_value.ephemerides.return_value = _mock_ephemerides
+        recorded = client.post(_URL, data=data).json()
+
+    # The replayed response must not be taken from the ephemeris cache.
+    ephemeris_cache.ttl = 0
+    with (
+        mock.patch.object(
+            fcg.infrastructure.cassettes,
+            "get_cassette",
+            return_value=Cassette(tmp_path / "cassettes", "replay", time_scale=0),
+        ),
+        mock.patch.object(
+            fcg.views.ephemerides, "HorizonsService"
+        ) as MockHorizonsService,
+    ):
+        response = client.post(_URL, data=data)
+        MockHorizonsService.assert_not_called()
+
+    assert response.status_code == status.HTTP_200_OK
+    assert response.json() == recorded
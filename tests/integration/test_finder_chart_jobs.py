@@ -0,0 +1,83 @@
+import time
+from typing import Any
+
+from fastapi.testclient import TestClient
+from starlette import status
+
+from fcg.main import app
+
+_URL = "/finder-chart-jobs"
+
+
+def _data() -> dict[str, str]:
+    return {
+        "proposal_code": "2023-1-SCI-042",
+        "principal_investigator": "Adams",
+        "target": "Magrathea",
+        "right_ascension": "170.1",
+        "declination": "-55.5",
+        "position_angle": "30",
+        "output_format": "png",
+    }
+
+
+def _wait_for_job(client: TestClient, job_id: str) -> dict[str, Any]:
+    for ignore_me in range(200):
+        job: dict[str, Any] = client.get(f"{_URL}/{job_id}").json()
+        if job["status"] in ("finished", "failed"):
+            return job
+        time.sleep(0.05)
+    raise AssertionError("The job has not finished.")
+
+
+def test_job_generates_finder_chart() -> None:
+    # The client must be used as a context manager for the job runner to be started.
+    with TestClient(app) as client:
+        with open("tests/data/ra170.1_dec-55.5.fits", "rb") as f:
+            response = client.post(
+                _URL,
+                params={"mode": "hrs"},
+                data=_data(),
+                files={"custom_fits": f},
+            )
+        assert response.status_code == status.HTTP_202_ACCEPTED
+        job_id = response.json()["job_id"]
+        assert response.headers["location"] == f"{_URL}/{job_id}"
+
+        job = _wait_for_job(client, job_id)
+        assert job["status"] == "finished"
+
+        response = client.get(job["result"])
+        assert response.status_code == status.HTTP_200_OK
+        assert response.headers["content-type"] == "image/png"
+        assert response.content.startswith(b"\x89PNG")
+
+
+def test_job_with_invalid_input_is_rejected(client: TestClient) -> None:
+    response = client.post(_URL, params={"mode": "hrs"}, data=dict())
+    assert response.status_code == status.HTTP_400_BAD_REQUEST
+    assert "proposal code" in response.json()["errors"]["proposal_code"]
+
+
+def test_job_with_invalid_mode_is_rejected(client: TestClient) -> None:
+    response = client.post(_URL, params={"mode": "invalid"}, data=_data())
+    assert response.status_code == status.HTTP_400_BAD_REQUEST
+    assert "mode" in response.json()["errors"]["__general"]
+
+
+def test_unfinished_job_has_no_result(client: TestClient) -> None:
+    # Without the context manager the job runner is not started.
+    with open("tests/data/ra170.1_dec-55.5.fits", "rb") as f:
+        response = client.post(
+            _URL, params={"mode": "imaging"}, data=_data(), files={"custom_fits": f}
+        )
+    job_id = response.json()["job_id"]
+
+    assert client.get(f"{_URL}/{job_id}").json()["status"] == "queued"
+    response = client.get(f"{_URL}/{job_id}/result")
+    assert response.status_code == status.HTTP_409_CONFLICT
+
+
+def test_unknown_job(client: TestClient) -> None:
+    assert client.get(f"{_URL}/unknown").status_code == status.HTTP_404_NOT_FOUND
+    assert client.get(f"{_URL}/unknown/result").status_code == status.HTTP_404_NOT_FOUND
@@ -1,12 +1,50 @@
+import asyncio
+import pathlib
+import time
+import zipfile
+from collections import OrderedDict
+from contextlib import contextmanager
 from io import BytesIO
 from itertools import product
-from typing import BinaryIO, Callable, Tuple, cast
+from typing import (
+    Any,
+    BinaryIO,
+    Callable,
+    Generator,
+    Iterator,
+    Tuple,
+    TypeVar,
+    cast,
+)
+from unittest import mock
 
+import httpx
+import matplotlib.pyplot as plt
 import numpy as np
 import pytest
 from fastapi.testclient import TestClient
+from imephu.finder_chart import FinderChart
+from matplotlib.figure import Figure
+from PIL import Image
 from starlette import status
 
+import fcg.infrastructure.hedging
+import fcg.infrastructure.rendering
+import fcg.views.finder_charts
+import fcg.views.profiles
+from fcg.infrastructure.disk_cache import DiskCache
+from fcg.infrastructure.metrics import FINDER_CHART_STAGE_DURATION
+from fcg.infrastructure.pool import RenderPool
+from fcg.infrastructure.rendering import (
+    render_finder_chart,
+    render_finder_chart_formats,
+)
+from fcg.infrastructure.settings import get_settings
+from fcg.infrastructure.surveys import SurveyStats
+from fcg.main import app
+
+T = TypeVar("T")
+
 _CheckImage = Callable[[bytes], None]
 
 
@@ -508,3 +546,643 @@ def test_generate_for_invalid_output_format(mode: str, client: TestClient) -> No
     assert response.status_code == status.HTTP_400_BAD_REQUEST
     errors = response.json()["errors"]
     assert "unsupported" in errors["output_format"].lower()
+
+
+def test_generate_preview(client: TestClient) -> None:
+    data, files = _valid_input("hrs")
+    response = client.post(_URL, params={"mode": "hrs"}, data=data, files=files)
+    data, files = _valid_input("hrs")
+    data["output_format"] = "preview"
+    preview_response = client.post(_URL, params={"mode": "hrs"}, data=data, files=files)
+
+    assert preview_response.status_code == status.HTTP_200_OK
+    assert preview_response.headers["content-type"] == "image/png"
+    assert preview_response.headers["ETag"] != response.headers["ETag"]
+    chart = Image.open(BytesIO(response.content))
+    preview = Image.open(BytesIO(preview_response.content))
+    # The preview is rendered with half the resolution and without cropping the plot
+    # to its bounding box.
+    assert preview.width < chart.width
+    assert preview.height < chart.height
+    assert (preview.width, preview.height) == (500, 450)
+
+
+def test_imephu_creates_plots_for_previews() -> None:
+    # Previews are saved with imephu's private FinderChart._create_plot method (see
+    # fcg.infrastructure.rendering._encode). imephu is pinned to a version which has
+    # it, and this test fails if it is pinned to a version which hasn't.
+    with open("tests/data/ra170.1_dec-55.5.fits", "rb") as fits:
+        figure = FinderChart(fits)._create_plot()
+    try:
+        assert isinstance(figure, Figure)
+    finally:
+        plt.close(figure)
+
+
+@contextmanager
+def _real_render_pool(
+    timeout: float = 60, max_tasks: int = 0, max_rss: int = 0
+) -> Generator[RenderPool, None, None]:
+    # A render pool with a worker process, which charts are not cached for.
+    pool = RenderPool(
+        workers=1,
+        queue_depth=0,
+        timeout=timeout,
+        max_tasks=max_tasks,
+        max_rss=max_rss,
+    )
+    try:
+        with (
+            mock.patch.object(
+                fcg.views.finder_charts, "get_render_pool", return_value=pool
+            ),
+            mock.patch.object(
+                fcg.views.finder_charts, "_chart_cache", return_value=None
+            ),
+        ):
+            yield pool
+    finally:
+        pool.shutdown()
+
+
+@pytest.fixture()
+def render_pool() -> Generator[RenderPool, None, None]:
+    with _real_render_pool() as pool:
+        yield pool
+
+
+@pytest.fixture()
+def chart_cache(tmp_path: pathlib.Path) -> Generator[DiskCache, None, None]:
+    cache = DiskCache(tmp_path, max_bytes=100_000_000)
+    with mock.patch.object(fcg.views.finder_charts, "_chart_cache", return_value=cache):
+        yield cache
+
+
+@pytest.fixture()
+def mock_render_finder_chart() -> Generator[mock.MagicMock, None, None]:
+    with mock.patch.object(
+        fcg.views.finder_charts, "render_finder_chart", wraps=render_finder_chart
+    ) as m:
+        yield m
+
+
+@pytest.mark.parametrize("mode", ["hrs", "longslit", "mos"])
+def test_generate_in_render_pool(
+    mode: str, client: TestClient, render_pool: RenderPool
+) -> None:
+    data, files = _valid_input(mode)
+    pooled_response = client.post(_URL, params={"mode": mode}, data=data, files=files)
+
+    with mock.patch.object(
+        fcg.views.finder_charts,
+        "get_render_pool",
+        return_value=RenderPool(workers=0, queue_depth=0, timeout=60),
+    ):
+        data, files = _valid_input(mode)
+        response = client.post(_URL, params={"mode": mode}, data=data, files=files)
+
+    assert pooled_response.status_code == status.HTTP_200_OK
+    assert pooled_response.content == response.content
+
+
+def _stage_count(mode: str, stage: str) -> float:
+    for name, labels, value in FINDER_CHART_STAGE_DURATION.samples():
+        if name.endswith("_count") and labels == {"mode": mode, "stage": stage}:
+            return value
+    return 0
+
+
+def test_generate_in_render_pool_replays_stage_metrics(
+    client: TestClient, render_pool: RenderPool
+) -> None:
+    chart_count = _stage_count("hrs", "chart")
+    encoding_count = _stage_count("hrs", "encoding")
+
+    data, files = _valid_input("hrs")
+    response = client.post(_URL, params={"mode": "hrs"}, data=data, files=files)
+
+    # The chart is rendered in the worker process, so the metrics of these stages
+    # are only recorded here if they are replayed.
+    assert response.status_code == status.HTTP_200_OK
+    assert _stage_count("hrs", "chart") == chart_count + 1
+    assert _stage_count("hrs", "encoding") == encoding_count + 1
+    timings = [m.split(";")[0] for m in response.headers["Server-Timing"].split(", ")]
+    assert "chart" in timings
+    assert "encoding" in timings
+
+
+def test_generate_in_busy_render_pool(render_pool: RenderPool) -> None:
+    async def post_while_busy() -> httpx.Response:
+        # Keep the only worker process busy, without any room in the queue.
+        busy = asyncio.create_task(render_pool.run(time.sleep, 2))
+        await asyncio.sleep(0)
+        try:
+            data, files = _valid_input("hrs")
+            async with httpx.AsyncClient(
+                transport=httpx.ASGITransport(app=app), base_url="http://test"
+            ) as client:
+                return await client.post(
+                    _URL, params={"mode": "hrs"}, data=data, files=files
+                )
+        finally:
+            await busy
+
+    response = asyncio.run(post_while_busy())
+
+    assert response.status_code == status.HTTP_503_SERVICE_UNAVAILABLE
+    assert "busy" in response.json()["errors"]["__general"]
+
+
+def test_generate_in_render_pool_times_out(client: TestClient) -> None:
+    with _real_render_pool(timeout=0.01):
+        data, files = _valid_input("hrs")
+        response = client.post(_URL, params={"mode": "hrs"}, data=data, files=files)
+
+    assert response.status_code == status.HTTP_504_GATEWAY_TIMEOUT
+    assert "0.01 seconds" in response.json()["errors"]["__general"]
+
+
+@pytest.mark.parametrize("max_tasks, max_rss", [(2, 0), (0, 1)])
+def test_generate_in_render_pool_with_replaced_workers(
+    max_tasks: int, max_rss: int, client: TestClient
+) -> None:
+    with _real_render_pool(max_tasks=max_tasks, max_rss=max_rss) as pool:
+        executor = pool._executor
+        responses = []
+        for position_angle in ("30", "40", "50"):
+            data, files = _valid_input("hrs")
+            data["position_angle"] = position_angle
+            responses.append(
+                client.post(_URL, params={"mode": "hrs"}, data=data, files=files)
+            )
+        replaced = pool._executor is not executor
+
+    assert all(r.status_code == status.HTTP_200_OK for r in responses)
+    assert len({r.content for r in responses}) == 3
+    # The worker processes are replaced by the executor itself after max_tasks
+    # tasks, but by the render pool if they use more than max_rss bytes.
+    assert replaced == (max_rss > 0)
+
+
+@pytest.mark.parametrize("mode", ["hrs", "mos"])
+def test_generate_uses_chart_cache(
+    mode: str,
+    client: TestClient,
+    chart_cache: DiskCache,
+    mock_render_finder_chart: mock.MagicMock,
+) -> None:
+    data, files = _valid_input(mode)
+    response = client.post(_URL, params={"mode": mode}, data=data, files=files)
+    data, files = _valid_input(mode)
+    cached_response = client.post(_URL, params={"mode": mode}, data=data, files=files)
+
+    assert cached_response.status_code == status.HTTP_200_OK
+    assert cached_response.content == response.content
+    assert cached_response.headers["ETag"] == response.headers["ETag"]
+    assert mock_render_finder_chart.call_count == 1
+    assert chart_cache.hits == 1
+
+
+@pytest.mark.parametrize(
+    "field, value", [("position_angle", "31"), ("output_format", "pdf")]
+)
+def test_generate_distinguishes_requests(
+    field: str,
+    value: str,
+    client: TestClient,
+    chart_cache: DiskCache,
+    mock_render_finder_chart: mock.MagicMock,
+) -> None:
+    data, files = _valid_input("hrs")
+    response = client.post(_URL, params={"mode": "hrs"}, data=data, files=files)
+    data, files = _valid_input("hrs")
+    data[field] = value
+    other_response = client.post(_URL, params={"mode": "hrs"}, data=data, files=files)
+
+    assert other_response.headers["ETag"] != response.headers["ETag"]
+    assert mock_render_finder_chart.call_count == 2
+
+
+def test_generate_distinguishes_uploaded_fits_files(
+    client: TestClient, chart_cache: DiskCache
+) -> None:
+    data, files = _valid_input("hrs")
+    response = client.post(_URL, params={"mode": "hrs"}, data=data, files=files)
+    with open("tests/data/ra170.1_dec-55.5.fits", "rb") as f:
+        content = bytearray(f.read())
+    content[-1] = (content[-1] + 1) % 256
+    other_response = client.post(
+        _URL,
+        params={"mode": "hrs"},
+        data=data,
+        files={"custom_fits": BytesIO(content)},
+    )
+
+    assert other_response.headers["ETag"] != response.headers["ETag"]
+
+
+@pytest.mark.parametrize("weak", [False, True])
+def test_generate_supports_conditional_requests(
+    weak: bool,
+    client: TestClient,
+    chart_cache: DiskCache,
+    mock_render_finder_chart: mock.MagicMock,
+) -> None:
+    data, files = _valid_input("hrs")
+    etag = client.post(_URL, params={"mode": "hrs"}, data=data, files=files).headers[
+        "ETag"
+    ]
+    if_none_match = f'"other", {"W/" if weak else ""}{etag}'
+
+    data, files = _valid_input("hrs")
+    response = client.post(
+        _URL,
+        params={"mode": "hrs"},
+        data=data,
+        files=files,
+        headers={"If-None-Match": if_none_match},
+    )
+
+    assert response.status_code == status.HTTP_304_NOT_MODIFIED
+    assert response.headers["ETag"] == etag
+    assert response.content == b""
+    assert mock_render_finder_chart.call_count == 1
+
+
+def test_generate_restores_global_random_state(
+    client: TestClient, mock_render_finder_chart: mock.MagicMock
+) -> None:
+    np.random.seed(42)
+    expected = np.random.RandomState(42).random_sample(3)
+    data, files = _valid_input("hrs")
+    with mock.patch.object(fcg.views.finder_charts, "_chart_cache", return_value=None):
+        response = client.post(_URL, params={"mode": "hrs"}, data=data, files=files)
+
+    assert response.status_code == status.HTTP_200_OK
+    assert mock_render_finder_chart.call_count == 1
+    np.testing.assert_array_equal(np.random.random_sample(3), expected)
+
+
+@pytest.fixture()
+def mock_render_finder_chart_formats() -> Generator[mock.MagicMock, None, None]:
+    with mock.patch.object(
+        fcg.views.finder_charts,
+        "render_finder_chart_formats",
+        wraps=render_finder_chart_formats,
+    ) as m:
+        yield m
+
+
+def test_generate_in_several_formats(
+    client: TestClient,
+    chart_cache: DiskCache,
+    mock_render_finder_chart: mock.MagicMock,
+    mock_render_finder_chart_formats: mock.MagicMock,
+) -> None:
+    data, files = _valid_input("hrs")
+    data["output_formats"] = "pdf, png,png:200"
+    response = client.post(_URL, params={"mode": "hrs"}, data=data, files=files)
+
+    assert response.status_code == status.HTTP_200_OK
+    assert response.headers["content-type"] == "application/zip"
+    with zipfile.ZipFile(BytesIO(response.content)) as archive:
+        assert archive.namelist() == [
+            "Magrathea.pdf",
+            "Magrathea.png",
+            "Magrathea_200dpi.png",
+        ]
+        pdf = archive.read("Magrathea.pdf")
+        png = archive.read("Magrathea.png")
+        png_200dpi = archive.read("Magrathea_200dpi.png")
+    assert pdf.startswith(b"%PDF")
+    # The finder chart is generated once for all formats.
+    assert mock_render_finder_chart_formats.call_count == 1
+    width = Image.open(BytesIO(png)).width
+    assert Image.open(BytesIO(png_200dpi)).width == pytest.approx(2 * width, abs=4)
+
+    # Every format can then be requested from the cache.
+    data, files = _valid_input("hrs")
+    png_response = client.post(_URL, params={"mode": "hrs"}, data=data, files=files)
+    assert png_response.content == png
+    assert mock_render_finder_chart.call_count == 0
+    assert chart_cache.hits == 1
+
+
+def test_generate_in_several_formats_matches_single_formats(
+    client: TestClient,
+) -> None:
+    # The finder charts are rendered from a FITS file, whose brightness range is
+    # determined by random sampling. PDF files are left out, as they include their
+    # creation time.
+    formats = ["png:200", "png", "png:300"]
+    with mock.patch.object(fcg.views.finder_charts, "_chart_cache", return_value=None):
+        data, files = _valid_input("hrs")
+        data["output_formats"] = ",".join(formats)
+        response = client.post(_URL, params={"mode": "hrs"}, data=data, files=files)
+        singles = []
+        for output_format in formats:
+            data, files = _valid_input("hrs")
+            data["output_formats"] = output_format
+            singles.append(
+                client.post(_URL, params={"mode": "hrs"}, data=data, files=files)
+            )
+
+    assert response.status_code == status.HTTP_200_OK
+    with zipfile.ZipFile(BytesIO(response.content)) as archive:
+        contents = [archive.read(name) for name in archive.namelist()]
+    for content, single in zip(contents, singles, strict=True):
+        assert single.status_code == status.HTTP_200_OK
+        with zipfile.ZipFile(BytesIO(single.content)) as archive:
+            assert content == archive.read(archive.namelist()[0])
+
+
+def test_generate_in_several_formats_only_renders_missing_formats(
+    client: TestClient,
+    chart_cache: DiskCache,
+    mock_render_finder_chart_formats: mock.MagicMock,
+) -> None:
+    data, files = _valid_input("hrs")
+    png_response = client.post(_URL, params={"mode": "hrs"}, data=data, files=files)
+    data, files = _valid_input("hrs")
+    data["output_formats"] = "png,pdf"
+    response = client.post(_URL, params={"mode": "hrs"}, data=data, files=files)
+
+    with zipfile.ZipFile(BytesIO(response.content)) as archive:
+        assert archive.read("Magrathea.png") == png_response.content
+    assert chart_cache.hits == 1
+    specs = mock_render_finder_chart_formats.call_args.args[0]
+    assert [spec.output_format for spec in specs] == ["pdf"]
+
+
+def test_generate_in_several_formats_supports_conditional_requests(
+    client: TestClient,
+    chart_cache: DiskCache,
+    mock_render_finder_chart_formats: mock.MagicMock,
+) -> None:
+    data, files = _valid_input("hrs")
+    data["output_formats"] = "pdf,png"
+    etag = client.post(_URL, params={"mode": "hrs"}, data=data, files=files).headers[
+        "ETag"
+    ]
+    data, files = _valid_input("hrs")
+    data["output_formats"] = "pdf,png:300"
+    other_etag = client.post(
+        _URL, params={"mode": "hrs"}, data=data, files=files
+    ).headers["ETag"]
+
+    data, files = _valid_input("hrs")
+    data["output_formats"] = "pdf,png"
+    response = client.post(
+        _URL,
+        params={"mode": "hrs"},
+        data=data,
+        files=files,
+        headers={"If-None-Match": etag},
+    )
+
+    assert other_etag != etag
+    assert response.status_code == status.HTTP_304_NOT_MODIFIED
+    assert mock_render_finder_chart_formats.call_count == 2
+
+
+@pytest.mark.parametrize(
+    "output_formats", ["gif", "pdf:300", "png:5", "png:1000", "png:high", "preview"]
+)
+def test_generate_for_invalid_output_formats(
+    output_formats: str, client: TestClient
+) -> None:
+    data, files = _valid_input("hrs")
+    data["output_formats"] = f"pdf,{output_formats}"
+    response = client.post(_URL, params={"mode": "hrs"}, data=data, files=files)
+
+    assert response.status_code == status.HTTP_400_BAD_REQUEST
+    assert output_formats in response.json()["errors"]["output_formats"]
+
+
+class _SlowRenderPool:
+    async def run(self, func: Callable[..., T], *args: Any) -> T:
+        await asyncio.sleep(0.2)
+        return func(*args)
+
+
+@pytest.mark.parametrize("use_chart_cache", [False, True])
+def test_generate_coalesces_concurrent_identical_requests(
+    use_chart_cache: bool,
+    tmp_path: pathlib.Path,
+    mock_render_finder_chart: mock.MagicMock,
+) -> None:
+    async def post(position_angle: str) -> httpx.Response:
+        data, files = _valid_input("hrs")
+        data["position_angle"] = position_angle
+        async with httpx.AsyncClient(
+            transport=httpx.ASGITransport(app=app), base_url="http://test"
+        ) as client:
+            return await client.post(
+                _URL, params={"mode": "hrs"}, data=data, files=files
+            )
+
+    async def post_all() -> list[httpx.Response]:
+        return list(await asyncio.gather(post("30"), post("30"), post("40")))
+
+    chart_cache = (
+        DiskCache(tmp_path, max_bytes=100_000_000) if use_chart_cache else None
+    )
+    with (
+        mock.patch.object(
+            fcg.views.finder_charts, "get_render_pool", return_value=_SlowRenderPool()
+        ),
+        mock.patch.object(
+            fcg.views.finder_charts, "_chart_cache", return_value=chart_cache
+        ),
+    ):
+        responses = asyncio.run(post_all())
+
+    assert all(r.status_code == status.HTTP_200_OK for r in responses)
+    assert responses[0].content == responses[1].content
+    assert responses[0].content != responses[2].content
+    assert mock_render_finder_chart.call_count == 2
+
+
+@pytest.fixture()
+def survey_choices() -> Generator[OrderedDict[str, str], None, None]:
+    choices: OrderedDict[str, str] = OrderedDict()
+    with mock.patch.object(fcg.infrastructure.hedging, "_choices", choices):
+        yield choices
+
+
+@contextmanager
+def _mock_auto_surveys(
+    delay: float = 0,
+) -> Iterator[tuple[mock.MagicMock, mock.MagicMock]]:
+    def load_survey_fits(
+        survey: str, fits_center: Any, size: Any, is_valid: Any = None
+    ) -> BinaryIO:
+        time.sleep(delay)
+        return open("tests/data/ra170.1_dec-55.5.fits", "rb")
+
+    with (
+        mock.patch.object(
+            fcg.infrastructure.hedging, "load_survey_fits", wraps=load_survey_fits
+        ) as hedged_load_survey_fits,
+        mock.patch.object(
+            fcg.infrastructure.rendering, "load_survey_fits", wraps=load_survey_fits
+        ) as rendering_load_survey_fits,
+        mock.patch.object(
+            fcg.infrastructure.hedging, "get_survey_stats", return_value=SurveyStats()
+        ),
+    ):
+        yield hedged_load_survey_fits, rendering_load_survey_fits
+
+
+def test_generate_with_auto_survey(
+    client: TestClient,
+    chart_cache: DiskCache,
+    survey_choices: OrderedDict[str, str],
+    mock_render_finder_chart: mock.MagicMock,
+) -> None:
+    data, files = _valid_input("hrs")
+    del files["custom_fits"]
+    data["image_survey"] = "auto"
+    with _mock_auto_surveys() as (hedged_load_survey_fits, rendering_load_survey_fits):
+        response = client.post(_URL, params={"mode": "hrs"}, data=data)
+        cached_response = client.post(_URL, params={"mode": "hrs"}, data=data)
+
+    assert response.status_code == status.HTTP_200_OK
+    # Only the POSS2/UKSTU surveys cover the target.
+    assert response.headers["X-Image-Survey"] == "POSS2/UKSTU Red"
+    assert hedged_load_survey_fits.call_args.kwargs["survey"] == "POSS2/UKSTU Red"
+    spec = mock_render_finder_chart.call_args.args[0]
+    assert spec.background_image == "POSS2/UKSTU Red"
+    # The FITS file is passed on for rendering rather than being loaded again, and
+    # the survey is only requested for the first request.
+    assert spec.fits is not None
+    rendering_load_survey_fits.assert_not_called()
+    assert hedged_load_survey_fits.call_count == 1
+    assert cached_response.headers["ETag"] == response.headers["ETag"]
+    assert cached_response.headers["X-Image-Survey"] == "POSS2/UKSTU Red"
+    assert mock_render_finder_chart.call_count == 1
+
+
+def test_generate_with_auto_survey_uses_cached_finder_chart(
+    client: TestClient,
+    chart_cache: DiskCache,
+    survey_choices: OrderedDict[str, str],
+    mock_render_finder_chart: mock.MagicMock,
+) -> None:
+    data, files = _valid_input("hrs")
+    del files["custom_fits"]
+    data["image_survey"] = "auto"
+    with _mock_auto_surveys() as (hedged_load_survey_fits, _):
+        etag = client.post(_URL, params={"mode": "hrs"}, data=data).headers["ETag"]
+        # Another process has not chosen a survey for the position yet.
+        survey_choices.clear()
+        response = client.post(
+            _URL, params={"mode": "hrs"}, data=data, headers={"If-None-Match": etag}
+        )
+
+    assert response.status_code == status.HTTP_304_NOT_MODIFIED
+    assert response.headers["X-Image-Survey"] == "POSS2/UKSTU Red"
+    assert hedged_load_survey_fits.call_count == 1
+    assert mock_render_finder_chart.call_count == 1
+
+
+@pytest.mark.parametrize("use_chart_cache", [False, True])
+def test_generate_with_auto_survey_coalesces_survey_requests(
+    use_chart_cache: bool,
+    tmp_path: pathlib.Path,
+    survey_choices: OrderedDict[str, str],
+    mock_render_finder_chart: mock.MagicMock,
+) -> None:
+    async def post(position_angle: str) -> httpx.Response:
+        data, files = _valid_input("hrs")
+        del files["custom_fits"]
+        data["image_survey"] = "auto"
+        data["position_angle"] = position_angle
+        async with httpx.AsyncClient(
+            transport=httpx.ASGITransport(app=app), base_url="http://test"
+        ) as client:
+            return await client.post(_URL, params={"mode": "hrs"}, data=data)
+
+    async def post_all() -> list[httpx.Response]:
+        # The finder charts differ, but their position is the same.
+        return list(await asyncio.gather(post("30"), post("30"), post("40")))
+
+    chart_cache = (
+        DiskCache(tmp_path, max_bytes=100_000_000) if use_chart_cache else None
+    )
+    with (
+        _mock_auto_surveys(delay=0.2) as (hedged_load_survey_fits, _),
+        mock.patch.object(
+            fcg.views.finder_charts, "_chart_cache", return_value=chart_cache
+        ),
+    ):
+        responses = asyncio.run(post_all())
+
+    assert all(r.status_code == status.HTTP_200_OK for r in responses)
+    assert all(r.headers["X-Image-Survey"] == "POSS2/UKSTU Red" for r in responses)
+    assert hedged_load_survey_fits.call_count == 1
+    assert mock_render_finder_chart.call_count == 2
+
+
+def test_generate_reports_server_timing(
+    client: TestClient, chart_cache: DiskCache
+) -> None:
+    data, files = _valid_input("hrs")
+    response = client.post(_URL, params={"mode": "hrs"}, data=data, files=files)
+
+    assert response.status_code == status.HTTP_200_OK
+    timings = [m.split(";")[0] for m in response.headers["Server-Timing"].split(", ")]
+    assert timings == ["form", "fits", "chart", "encoding", "total"]
+
+
+@pytest.fixture()
+def admin_token() -> Generator[str, None, None]:
+    settings = get_settings()._replace(admin_token="secret")
+    with mock.patch.object(fcg.views.profiles, "get_settings", return_value=settings):
+        yield "secret"
+
+
+def test_generate_with_profiling(
+    client: TestClient, chart_cache: DiskCache, admin_token: str
+) -> None:
+    headers = {"X-Admin-Token": admin_token}
+    data, files = _valid_input("hrs")
+    client.post(_URL, params={"mode": "hrs"}, data=data, files=files)
+
+    # The finder chart is rendered again, even though it is cached.
+    data, files = _valid_input("hrs")
+    response = client.post(
+        _URL,
+        params={"mode": "hrs", "profile": "true"},
+        data=data,
+        files=files,
+        headers=headers,
+    )
+    assert response.status_code == status.HTTP_200_OK
+    assert "encoding" in response.headers["Server-Timing"]
+
+    profile = client.get(response.headers["X-Profile"], headers=headers)
+    assert profile.status_code == status.HTTP_200_OK
+    stack, count = profile.text.splitlines()[0].rsplit(" ", 1)
+    assert "fcg.infrastructure.rendering.render_finder_chart" in profile.text
+    assert int(count) > 0
+
+    assert client.get(response.headers["X-Profile"]).status_code == (
+        status.HTTP_403_FORBIDDEN
+    )
+
+
+def test_generate_without_admin_token_is_not_profiled(
+    client: TestClient, admin_token: str
+) -> None:
+    data, files = _valid_input("hrs")
+    response = client.post(
+        _URL,
+        params={"mode": "hrs", "profile": "true"},
+        data=data,
+        files=files,
+        headers={"X-Admin-Token": "wrong"},
+    )
+
+    assert response.status_code == status.HTTP_200_OK
+    assert "X-Profile" not in response.headers
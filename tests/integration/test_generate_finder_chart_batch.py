@@ -0,0 +1,113 @@
+import zipfile
+from io import BytesIO
+from typing import BinaryIO, Tuple, cast
+
+import pytest
+from fastapi.testclient import TestClient
+from pypdf import PdfReader
+from starlette import status
+
+_URL = "/finder-charts/batch"
+
+_TARGETS_CSV = """target,right_ascension,declination
+Magrathea,170.1,-55.5
+Vogsphere,170.11,-55.49
+"""
+
+
+def _valid_input(
+    output_format: str = "png",
+) -> Tuple[dict[str, str], dict[str, BinaryIO]]:
+    data = {
+        "proposal_code": "2023-1-SCI-042",
+        "principal_investigator": "Adams",
+        "position_angle": "30",
+        "output_format": output_format,
+    }
+    files = {
+        "custom_fits": open("tests/data/ra170.1_dec-55.5.fits", "rb"),
+        "targets": BytesIO(_TARGETS_CSV.encode()),
+    }
+    return data, cast(dict[str, BinaryIO], files)
+
+
+def test_generate_batch_as_zip(client: TestClient) -> None:
+    data, files = _valid_input()
+    response = client.post(_URL, params={"mode": "imaging"}, data=data, files=files)
+
+    assert response.status_code == status.HTTP_200_OK
+    assert response.headers["content-type"] == "application/zip"
+    with zipfile.ZipFile(BytesIO(response.content)) as z:
+        assert sorted(z.namelist()) == ["001_Magrathea.png", "002_Vogsphere.png"]
+        assert z.read("001_Magrathea.png").startswith(b"\x89PNG")
+
+
+def test_generate_batch_as_pdf(client: TestClient) -> None:
+    data, files = _valid_input("pdf")
+    data["batch_format"] = "pdf"
+    response = client.post(_URL, params={"mode": "hrs"}, data=data, files=files)
+
+    assert response.status_code == status.HTTP_200_OK
+    assert response.headers["content-type"] == "application/pdf"
+    assert len(PdfReader(BytesIO(response.content)).pages) == 2
+
+
+def test_generate_batch_with_json_target_list(client: TestClient) -> None:
+    data, _ = _valid_input()
+    data["targets"] = (
+        '[{"target": "Magrathea", "right_ascension": 170.1, "declination": -55.5,'
+        ' "position_angle": 45}]'
+    )
+    files = {"custom_fits": open("tests/data/ra170.1_dec-55.5.fits", "rb")}
+    response = client.post(_URL, params={"mode": "slotmode"}, data=data, files=files)
+
+    assert response.status_code == status.HTTP_200_OK
+    with zipfile.ZipFile(BytesIO(response.content)) as z:
+        assert z.namelist() == ["001_Magrathea.png"]
+
+
+def test_generate_batch_reports_errors(client: TestClient) -> None:
+    data, files = _valid_input()
+    del data["proposal_code"]
+    files["targets"] = BytesIO(
+        b"target,right_ascension,declination\nMagrathea,170.1,-55.5\nVogsphere,400,0\n"
+    )
+    response = client.post(_URL, params={"mode": "imaging"}, data=data, files=files)
+
+    assert response.status_code == status.HTTP_400_BAD_REQUEST
+    errors = response.json()["errors"]
+    assert "proposal code" in errors["proposal_code"]
+    assert "360" in errors["targets[1].right_ascension"]
+    assert "targets[0].right_ascension" not in errors
+
+
+@pytest.mark.parametrize(
+    "targets, error", [("", "empty"), ("[{", "JSON"), ("target\nA,B", "too many")]
+)
+def test_generate_batch_with_invalid_target_list(
+    targets: str, error: str, client: TestClient
+) -> None:
+    data, files = _valid_input()
+    files["targets"] = BytesIO(targets.encode())
+    response = client.post(_URL, params={"mode": "imaging"}, data=data, files=files)
+
+    assert response.status_code == status.HTTP_400_BAD_REQUEST
+    assert error in response.json()["errors"]["targets"]
+
+
+def test_generate_batch_as_pdf_requires_pdf_output_format(client: TestClient) -> None:
+    data, files = _valid_input("png")
+    data["batch_format"] = "pdf"
+    response = client.post(_URL, params={"mode": "imaging"}, data=data, files=files)
+
+    assert response.status_code == status.HTTP_400_BAD_REQUEST
+    assert "PDF" in response.json()["errors"]["output_format"]
+
+
+@pytest.mark.parametrize("mode", ["mos", "invalid"])
+def test_generate_batch_for_unsupported_mode(mode: str, client: TestClient) -> None:
+    data, files = _valid_input()
+    response = client.post(_URL, params={"mode": mode}, data=data, files=files)
+
+    assert response.status_code == status.HTTP_400_BAD_REQUEST
+    assert "mode" in response.json()["errors"]["__general"]
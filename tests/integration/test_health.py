@@ -0,0 +1,155 @@
+import time
+from typing import Any, BinaryIO, Generator
+from unittest import mock
+
+import pytest
+from fastapi.testclient import TestClient
+from starlette import status
+
+import fcg.infrastructure.surveys
+from fcg.infrastructure.circuit_breaker import CircuitBreaker
+from fcg.infrastructure.settings import get_settings
+from fcg.main import app
+
+
+def test_ready_after_startup() -> None:
+    # The client must be used as a context manager for the startup to be run.
+    with TestClient(app) as client:
+        response = client.get("/ready")
+
+    assert response.status_code == status.HTTP_200_OK
+    assert response.json()["status"] == "ready"
+    assert response.json()["startup"]["total"] >= 0
+
+
+def test_not_ready_before_startup(client: TestClient) -> None:
+    response = client.get("/ready")
+
+    assert response.status_code == status.HTTP_503_SERVICE_UNAVAILABLE
+    assert response.json()["status"] == "starting"
+
+
+def test_metrics(client: TestClient) -> None:
+    client.post("/finder-charts", params={"mode": "xyz"}, data={})
+    response = client.get("/metrics")
+
+    assert response.status_code == status.HTTP_200_OK
+    assert response.headers["content-type"].startswith("text/plain")
+    assert (
+        'fcg_finder_chart_requests_total{mode="unsupported",status="400"}'
+        in response.text
+    )
+    assert "fcg_render_tasks 0.0" in response.text
+
+
+def test_metrics_include_survey_coverage_check(client: TestClient) -> None:
+    # The coverage is checked even if other fields are invalid.
+    data = {
+        "right_ascension": "170.1",
+        "declination": "-55.5",
+        "image_survey": "POSS2/UKSTU Red",
+    }
+    client.post("/finder-charts", params={"mode": "slotmode"}, data=data)
+    response = client.get("/metrics")
+
+    assert (
+        'fcg_finder_chart_stage_duration_seconds_count{mode="slotmode",'
+        'stage="coverage"}' in response.text
+    )
+
+
+@pytest.fixture()
+def open_breaker() -> Generator[CircuitBreaker, None, None]:
+    breakers: dict[str, CircuitBreaker] = dict()
+
+    def get_survey_breaker(survey: str) -> CircuitBreaker:
+        return breakers.setdefault(
+            survey.lower(),
+            CircuitBreaker(survey, failure_threshold=1, reset_timeout=60),
+        )
+
+    with mock.patch.object(
+        fcg.infrastructure.surveys,
+        "get_survey_breaker",
+        side_effect=get_survey_breaker,
+    ):
+        breaker = get_survey_breaker("POSS2/UKSTU Red")
+        breaker.record_failure()
+        yield breaker
+
+
+def test_survey_health(client: TestClient, open_breaker: CircuitBreaker) -> None:
+    response = client.get("/health/surveys")
+
+    assert response.status_code == status.HTTP_200_OK
+    surveys = response.json()["surveys"]
+    assert surveys["POSS2/UKSTU Red"]["state"] == "open"
+    assert surveys["POSS2/UKSTU Red"]["consecutive_failures"] == 1
+    assert surveys["POSS2/UKSTU Blue"] == {
+        "state": "closed",
+        "consecutive_failures": 0,
+        "opened_at": None,
+    }
+
+
+def test_survey_circuit_state_metric(
+    client: TestClient, open_breaker: CircuitBreaker
+) -> None:
+    response = client.get("/metrics")
+
+    assert 'fcg_survey_circuit_state{survey="poss2/ukstu red"} 2.0' in response.text
+    assert 'fcg_survey_circuit_state{survey="poss2/ukstu blue"} 0.0' in response.text
+
+
+def test_finder_chart_fails_fast_for_failing_survey(
+    client: TestClient, open_breaker: CircuitBreaker
+) -> None:
+    data = {
+        "proposal_code": "2023-1-SCI-042",
+        "principal_investigator": "Adams",
+        "target": "Magrathea",
+        "right_ascension": "170.1",
+        "declination": "-55.5",
+        "position_angle": "30",
+        "output_format": "png",
+        "image_survey": "POSS2/UKSTU Red",
+    }
+    with mock.patch.object(fcg.infrastructure.surveys, "load_fits") as load_fits:
+        response = client.post("/finder-charts", params={"mode": "hrs"}, data=data)
+
+    assert response.status_code == status.HTTP_503_SERVICE_UNAVAILABLE
+    assert "POSS2/UKSTU Red" in response.json()["errors"]["__general"]
+    load_fits.assert_not_called()
+
+
+def test_finder_chart_fails_for_survey_timeout(client: TestClient) -> None:
+    def hanging_load_fits(*args: Any, **kwargs: Any) -> BinaryIO:
+        time.sleep(2)
+        raise OSError("The survey should have been given up.")
+
+    data = {
+        "proposal_code": "2023-1-SCI-042",
+        "principal_investigator": "Adams",
+        "target": "Magrathea",
+        "right_ascension": "12.3456",
+        "declination": "-65.4321",
+        "position_angle": "30",
+        "output_format": "png",
+        "image_survey": "2MASS-J",
+    }
+    settings = get_settings()._replace(survey_timeout=0.1)
+    with (
+        mock.patch.object(
+            fcg.infrastructure.surveys, "load_fits", side_effect=hanging_load_fits
+        ),
+        mock.patch.object(
+            fcg.infrastructure.surveys, "get_settings", return_value=settings
+        ),
+        mock.patch.object(
+            fcg.infrastructure.surveys, "get_survey_breaker", return_value=None
+        ),
+    ):
+        response = client.post("/finder-charts", params={"mode": "hrs"}, data=data)
+
+    assert response.status_code == status.HTTP_504_GATEWAY_TIMEOUT
+    assert "2MASS-J" in response.json()["errors"]["__general"]
@@ -0,0 +1,41 @@
+import pytest
+from starlette import status
+from starlette.testclient import TestClient
+
+_URL = "/survey-coverage"
+
+
+def test_survey_coverage_for_all_surveys(client: TestClient) -> None:
+    response = client.get(_URL, params={"right_ascension": "0", "declination": "-45"})
+
+    assert response.status_code == status.HTTP_200_OK
+    covered = response.json()["covered"]
+    assert covered["POSS2/UKSTU Red"] is True
+    assert covered["POSS1 Red"] is False
+    assert covered["2MASS-J"] is True
+
+
+@pytest.mark.parametrize(
+    "declination, expected", [("-29.5", True), ("-30d 30m", False)]
+)
+def test_survey_coverage_for_a_survey(
+    declination: str, expected: bool, client: TestClient
+) -> None:
+    params = {
+        "right_ascension": "1h 30m",
+        "declination": declination,
+        "image_survey": "poss1 blue",
+    }
+    response = client.get(_URL, params=params)
+
+    assert response.status_code == status.HTTP_200_OK
+    assert response.json() == {"covered": {"POSS1 Blue": expected}}
+
+
+def test_survey_coverage_with_invalid_input(client: TestClient) -> None:
+    params = {"declination": "100", "image_survey": "Hitchhiker's Sky Survey"}
+    response = client.get(_URL, params=params)
+
+    assert response.status_code == status.HTTP_400_BAD_REQUEST
+    errors = response.json()["errors"]
+    assert set(errors) == {"right_ascension", "declination", "image_survey"}
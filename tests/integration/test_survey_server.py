@@ -0,0 +1,87 @@
+import pathlib
+import urllib.error
+import urllib.request
+from io import BytesIO
+from unittest import mock
+
+import pytest
+from astropy import units as u
+from astropy.coordinates import SkyCoord
+from astropy.io import fits
+from astropy.wcs import WCS
+
+import fcg.infrastructure.surveys
+from benchmarks.survey_server import SurveyServerOptions, run_survey_server
+from fcg.infrastructure.settings import get_settings
+from fcg.infrastructure.surveys import load_survey_fits
+
+
+def test_survey_server_returns_synthetic_fits() -> None:
+    with run_survey_server(SurveyServerOptions()) as server:
+        url = f"{server.url}/?survey=POSS2/UKSTU+Red&ra=170.1&dec=-55.5&size=5"
+        with urllib.request.urlopen(url) as response:  # nosec B310
+            content = response.read()
+        with urllib.request.urlopen(url) as response:  # nosec B310
+            assert response.read() == content
+
+    hdu = fits.open(BytesIO(content))[0]
+    height, width = hdu.data.shape
+    center = WCS(hdu.header).pixel_to_world((width - 1) / 2, (height - 1) / 2)
+    assert center.separation(SkyCoord(ra=170.1 * u.deg, dec=-55.5 * u.deg)).arcsec < 1
+    assert server.requests == 2
+
+
+def test_survey_server_serves_recordings() -> None:
+    options = SurveyServerOptions(recordings=pathlib.Path("tests/data"))
+    with run_survey_server(options) as server:
+        url = f"{server.url}/?survey=POSS2/UKSTU+Red&ra=170.12&dec=-55.49&size=4"
+        with urllib.request.urlopen(url) as response:  # nosec B310
+            content = response.read()
+
+    hdu = fits.open(BytesIO(content))[0]
+    original = fits.open("tests/data/ra170.1_dec-55.5.fits")[0]
+    assert hdu.data.shape[0] < original.data.shape[0]
+
+
+def test_survey_server_rejects_incomplete_requests() -> None:
+    with run_survey_server(SurveyServerOptions()) as server:
+        with pytest.raises(urllib.error.HTTPError) as excinfo:
+            urllib.request.urlopen(f"{server.url}/?ra=170.1&dec=-55.5")  # nosec B310
+    assert excinfo.value.code == 400
+
+
+def test_survey_server_simulates_failures_and_latency() -> None:
+    options = SurveyServerOptions(latency=0.05, error_rate=0.5, seed=42)
+    failures = 0
+    with run_survey_server(options) as server:
+        for i in range(20):
+            try:
+                urllib.request.urlopen(  # nosec B310
+                    f"{server.url}/?survey=2MASS-J&ra={i}&dec=-20&size=1"
+                ).read()
+            except urllib.error.HTTPError as e:
+                assert e.code == 503
+                failures += 1
+    assert 3 <= failures <= 17
+    assert server.requests == 20
+
+
+def test_load_survey_fits_uses_survey_server() -> None:
+    position = SkyCoord(ra=10 * u.deg, dec=-20 * u.deg)
+    with run_survey_server(SurveyServerOptions()) as server:
+        settings = get_settings()._replace(survey_url=server.url)
+        with (
+            mock.patch.object(
+                fcg.infrastructure.surveys, "get_settings", return_value=settings
+            ),
+            mock.patch.object(
+                fcg.infrastructure.surveys, "get_fits_cache", return_value=None
+            ),
+            mock.patch.object(fcg.infrastructure.surveys, "load_fits") as load_fits,
+        ):
+            content = load_survey_fits("2MASS-J", position, 5 * u.arcmin).read()
+
+    load_fits.assert_not_called()
+    assert server.requests == 1
+    hdu = fits.open(BytesIO(content))[0]
+    assert hdu.data.shape == (177, 177)
@@ -0,0 +1,57 @@
+from unittest import mock
+
+from starlette import status
+from starlette.testclient import TestClient
+
+from fcg.infrastructure.settings import get_settings
+
+_URL = "/target-lists/validate"
+
+_TARGET_LIST = """target,right_ascension,declination,position_angle
+Magrathea,170.1,-55.5,30
+Vogsphere,11h 20m,-55d 24m,
+"""
+
+
+def test_validate_target_list(client: TestClient) -> None:
+    files = {"targets": ("targets.csv", _TARGET_LIST.encode(), "text/csv")}
+    data = {"image_survey": "POSS2/UKSTU Red"}
+    response = client.post(_URL, data=data, files=files)
+
+    assert response.status_code == status.HTTP_200_OK
+    targets = response.json()["targets"]
+    assert [t["target"] for t in targets] == ["Magrathea", "Vogsphere"]
+    assert targets[1]["right_ascension"] == 170
+    assert targets[1]["declination"] == -55.4
+    assert targets[0]["position_angle"] == 30
+    assert targets[1]["position_angle"] is None
+
+
+def test_validate_target_list_with_invalid_targets(client: TestClient) -> None:
+    targets = "target,right_ascension,declination\n" "A,10,-95\n" ",10,20\n" "C,10,20\n"
+    data = {"targets": targets, "image_survey": "POSS1 Red"}
+    response = client.post(_URL, data=data)
+
+    assert response.status_code == status.HTTP_400_BAD_REQUEST
+    assert set(response.json()["errors"]) == {
+        "targets[0].declination",
+        "target",
+    }
+
+
+def test_validate_target_list_with_invalid_list(client: TestClient) -> None:
+    response = client.post(_URL, data={"targets": "[{"})
+
+    assert response.status_code == status.HTTP_400_BAD_REQUEST
+    assert set(response.json()["errors"]) == {"targets"}
+
+
+def test_validate_target_list_with_too_many_targets(client: TestClient) -> None:
+    settings = get_settings()._replace(target_list_max_targets=1)
+    with mock.patch(
+        "fcg.viewmodels.target_list_viewmodel.get_settings", return_value=settings
+    ):
+        response = client.post(_URL, data={"targets": _TARGET_LIST})
+
+    assert response.status_code == status.HTTP_400_BAD_REQUEST
+    assert "more than 1 targets" in response.json()["errors"]["targets"]